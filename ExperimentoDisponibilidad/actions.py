@@ -2,3 +2,4 @@ ITEM_UPSERTED = "ItemUpserted"
 ITEM_ADJUSTED = "ItemAdjusted"
 ITEM_RESERVED = "ItemReserved"
 ITEM_RELEASED = "ItemReleased"
+ITEMS_BULK_UPSERTED = "ItemsBulkUpserted"   # resumen de un chunk de /items/upsert:bulk (claves en columnas)
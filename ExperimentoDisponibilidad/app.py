@@ -1,12 +1,18 @@
-from fastapi import FastAPI, HTTPException, Response
-from models import ItemUpsert, StockAdjust, StockReserve, ItemResponse, ItemKey
-import commands, queries
-import db, events
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from datetime import date
+from uuid import UUID
+from models import (ItemUpsert, StockAdjust, StockReserve, ItemResponse, ItemKey, ReservationResponse, ItemBuckets,
+                    StockAllocate, AllocationResponse)
+import bulk, commands, queries
+import db, events, metrics
 from db import init_db
 from events import init_redis
-import logging, os
+import asyncio, logging, os
 
 
+READY_MAX_LAG_S = float(os.getenv("READY_MAX_LAG_S", "30"))  # antigüedad máx. sin proyectar; 0 = sin límite
+READY_MAX_LAG   = int(os.getenv("READY_MAX_LAG", "0"))        # entradas sin entregar al grupo; 0 = sin límite
+
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 app = FastAPI(title="CQRS inventario API", version="1.1.0")
 
@@ -38,6 +44,19 @@ async def readyz():
         await asyncio.wait_for(events.redis_client.ping(), timeout=1.0)
     except Exception as e:
         errors.append(f"redis:{e}")
+    if not errors and (READY_MAX_LAG_S or READY_MAX_LAG):
+        # Con el proyector atrasado las lecturas quedan viejas: se saca la réplica del balanceo
+        try:
+            stats = await asyncio.wait_for(
+                metrics.stream_stats(events.redis_client, events.all_streams(), events.EVENT_GROUP), timeout=1.0
+            )
+            for stream, s in stats.items():
+                if READY_MAX_LAG_S and s["lag_s"] > READY_MAX_LAG_S:
+                    errors.append(f"lag:{stream}:{s['lag_s']}s")
+                if READY_MAX_LAG and s["lag"] > READY_MAX_LAG:
+                    errors.append(f"lag:{stream}:{s['lag']} entradas")
+        except Exception as e:
+            errors.append(f"lag:{e}")
     if errors:
         return Response(
             status_code=503,
@@ -47,6 +66,17 @@ async def readyz():
     return {"status":"ready"}
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    if not metrics.PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=404, detail="prometheus-client no instalado")
+    try:
+        await metrics.stream_stats(events.redis_client, events.all_streams(), events.EVENT_GROUP)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Métricas de streams: {e}")
+    return Response(content=metrics.generate_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 # --- COMANDOS ---
 @app.post("/items/upsert", response_model=ItemResponse)
 async def upsert_item(data: ItemUpsert):
@@ -69,16 +99,86 @@ async def upsert_item(data: ItemUpsert):
     )
 
 
+@app.post("/items/upsert:bulk")
+async def bulk_upsert_items(request: Request):
+    """Carga masiva en NDJSON o Arrow IPC; cada chunk se confirma aparte (repetir la carga es seguro)."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in bulk.ARROW_TYPES:
+        if not bulk.ARROW_AVAILABLE:
+            raise HTTPException(status_code=415, detail="Arrow requiere pyarrow")
+        chunks = bulk.arrow_chunks(await request.body())
+    elif content_type in bulk.NDJSON_TYPES:
+        chunks = bulk.ndjson_chunks(request.stream())
+    else:
+        raise HTTPException(status_code=415, detail="Use application/x-ndjson o application/vnd.apache.arrow.stream")
+
+    totals = {"rows": 0, "inserted": 0, "updated": 0, "chunks": 0}
+
+    def add(result: dict):
+        for k in ("rows", "inserted", "updated"):
+            totals[k] += result[k]
+        totals["chunks"] += 1
+
+    # Mientras se guarda un chunk se lee y valida el siguiente; se guardan de a uno, en orden
+    pending = None
+    try:
+        async for chunk in chunks:
+            if pending:
+                add(await pending)
+            pending = asyncio.create_task(commands.bulk_upsert_items(chunk))
+        if pending:
+            add(await pending)
+    except bulk.BulkRowError as e:
+        if pending:
+            add(await pending)
+        raise HTTPException(status_code=422, detail={"row": e.row, "errors": e.errors, "committed": totals})
+    return totals
+
+
 @app.post("/items/adjust")
 async def adjust_stock(data: StockAdjust):
     await commands.adjust_stock(data)
     return {"status": "ok"}
 
 
-@app.post("/items/reserve")
+@app.post("/items/reserve", response_model=ReservationResponse)
 async def reserve_stock(data: StockReserve):
-    await commands.reserve_stock(data)
-    return {"status": "ok"}
+    try:
+        return await commands.reserve_stock(data)
+    except commands.ItemNotFound:
+        raise HTTPException(status_code=404, detail="No encontrado")
+    except commands.InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Disponible insuficiente",
+                                                     "qty_available": e.qty_available})
+
+
+@app.post("/items/allocate", response_model=AllocationResponse)
+async def allocate_stock(data: StockAllocate):
+    # Reserva el picking de GET /items/allocate en una transacción (todas las líneas o ninguna)
+    try:
+        return await commands.allocate_stock(data)
+    except commands.ItemNotFound:
+        raise HTTPException(status_code=409, detail={"message": "El picking cambió; reintente", "qty_available": 0})
+    except commands.InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Disponible insuficiente",
+                                                     "qty_available": e.qty_available})
+
+
+@app.post("/items/reservations/{reservation_id}/release", response_model=ReservationResponse)
+async def release_reservation(reservation_id: UUID):
+    reservation = await commands.release_reservation(reservation_id)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="No encontrado")
+    return reservation
+
+
+@app.post("/items/buckets")
+async def set_buckets(data: ItemBuckets):
+    try:
+        available = await commands.set_buckets(data)
+    except commands.ItemNotFound:
+        raise HTTPException(status_code=404, detail="No encontrado")
+    return {"status": "ok", "buckets": data.buckets, "qty_available": available}
 
 
 # --- QUERIES ---
@@ -101,9 +201,35 @@ async def obtener_inventario(inventario_id: int):
 
 
 @app.get("/items")
-async def listar_items(tenant_id: str, warehouse_id: str):
-    rows = await queries.listar_items(tenant_id, warehouse_id)
-    return [dict(r) for r in rows]
+async def listar_items(request: Request, tenant_id: str, warehouse_id: str,
+                       limit: int = Query(default=queries.PAGE_SIZE, ge=1, le=queries.MAX_PAGE_SIZE),
+                       cursor: str = None):
+    # Páginas por keyset; la siguiente viaja en X-Next-Cursor y Link.
+    # Cache-Control: no-cache lee de la base (y deja la página en la caché)
+    use_cache = "no-cache" not in request.headers.get("cache-control", "").lower()
+    try:
+        body, next_cursor = await queries.listar_items(
+            events.redis_client, tenant_id, warehouse_id, limit, cursor, use_cache
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    # El JSON sale tal cual de la caché, sin volver a serializar
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/items/allocate")
+async def allocate_items(tenant_id: str, warehouse_id: str, product_id: str, qty: int = Query(gt=0),
+                         min_expiry_date: date = None):
+    """Picking FEFO de qty unidades: ubicaciones/lotes en orden de vencimiento y cuánto tomar de cada una."""
+    lines = await queries.asignar_fefo(tenant_id, warehouse_id, product_id, qty, min_expiry_date)
+    allocated = sum(line["qty"] for line in lines)
+    return {"tenant_id": tenant_id, "warehouse_id": warehouse_id, "product_id": product_id,
+            "qty_requested": qty, "qty_allocated": allocated, "complete": allocated == qty, "lines": lines}
 
 
 @app.get("/items/by-key")
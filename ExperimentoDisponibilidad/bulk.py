@@ -0,0 +1,71 @@
+import os
+from pydantic import ValidationError
+
+from models import ItemUpsert
+
+# Lectura de /items/upsert:bulk en chunks de BULK_CHUNK_SIZE ItemUpsert ya validados.
+# NDJSON se lee a medida que llega el cuerpo; Arrow IPC (stream) necesita pyarrow y el cuerpo completo.
+
+CHUNK_SIZE   = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+ARROW_TYPES  = {"application/vnd.apache.arrow.stream"}
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+
+class BulkRowError(Exception):
+    def __init__(self, row: int, errors: list):
+        super().__init__(f"Fila {row} inválida")
+        self.row = row          # 1-based: línea del NDJSON o fila del Arrow
+        self.errors = errors
+
+
+async def ndjson_chunks(stream, chunk_size: int = CHUNK_SIZE):
+    """Chunks de ItemUpsert desde un cuerpo NDJSON (iterador async de bytes); ignora líneas vacías."""
+    chunk, buf, row = [], b"", 0
+
+    def parse(line: bytes):
+        nonlocal row
+        row += 1
+        if line.strip():
+            try:
+                chunk.append(ItemUpsert.model_validate_json(line))
+            except ValidationError as e:
+                raise BulkRowError(row, e.errors(include_url=False, include_context=False))
+
+    async for data in stream:
+        buf += data
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            parse(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    parse(buf)
+    if chunk:
+        yield chunk
+
+
+async def arrow_chunks(body: bytes, chunk_size: int = CHUNK_SIZE):
+    """Chunks de ItemUpsert desde un Arrow IPC stream; las columnas se llaman como los campos de ItemUpsert."""
+    chunk, row = [], 0
+    try:
+        reader = pa.ipc.open_stream(body)
+    except pa.ArrowInvalid as e:
+        raise BulkRowError(0, [{"msg": str(e)}])
+    for batch in reader:
+        for values in batch.to_pylist():
+            row += 1
+            try:
+                chunk.append(ItemUpsert.model_validate(values))
+            except ValidationError as e:
+                raise BulkRowError(row, e.errors(include_url=False, include_context=False))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
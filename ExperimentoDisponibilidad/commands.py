@@ -1,10 +1,10 @@
 from datetime import datetime
-import logging
-from uuid import UUID, uuid4
+import logging, os
+from uuid import uuid4, uuid5
 
-from actions import ITEM_UPSERTED, ITEM_ADJUSTED, ITEM_RESERVED, ITEM_RELEASED
-import db
-from events import publish_event
+from actions import ITEM_UPSERTED, ITEM_ADJUSTED, ITEM_RESERVED, ITEM_RELEASED, ITEMS_BULK_UPSERTED
+import db, queries
+from events import STREAM_SHARDS, enqueue_event, shard_for
 from unit_of_work import UnitOfWork
 
 log = logging.getLogger(__name__)
@@ -75,9 +75,83 @@ async def upsert_item(data):
 
         payload = dict(row)
         payload["qty_available"] = int(row["qty_on_hand"]) - int(row["qty_reserved"])
-        await publish_event(ITEM_UPSERTED, payload)
+        # SKU con buckets: las cantidades nuevas reemplazan a las anteriores, también en los buckets
+        await _rebalance_buckets(conn, _key(data), total=payload["qty_available"])
+        await enqueue_event(conn, ITEM_UPSERTED, payload)
         return payload
 
+#region Carga masiva
+# Un chunk de /items/upsert:bulk: COPY a una tabla temporal y un solo INSERT ... ON CONFLICT contra
+# inventory_item (si una clave se repite en el chunk gana la última fila). Se emite un evento
+# ItemsBulkUpserted por chunk (uno por shard) con las claves en columnas; el proyector las refresca juntas.
+BULK_COLUMNS = KEY_COLUMNS + [
+    "uom", "qty_on_hand", "qty_reserved", "quality_status", "storage_class", "temp_min_c", "temp_max_c",
+    "mfg_date", "expiry_date", "country_of_origin", "gs1_gtin", "regulatory_cert_id",
+]
+
+BULK_MERGE_SQL = f"""
+    INSERT INTO inventory_item({", ".join(BULK_COLUMNS)}, created_at, updated_at, row_version, is_active)
+    SELECT DISTINCT ON ({KEY_COLS}) {", ".join(BULK_COLUMNS)}, now(), now(), 0, TRUE
+    FROM bulk_item
+    ORDER BY {KEY_COLS}, ord DESC
+    ON CONFLICT (tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number)
+    DO UPDATE SET
+        uom=EXCLUDED.uom,
+        qty_on_hand=EXCLUDED.qty_on_hand,
+        qty_reserved=EXCLUDED.qty_reserved,
+        quality_status=EXCLUDED.quality_status,
+        storage_class=EXCLUDED.storage_class,
+        temp_min_c=EXCLUDED.temp_min_c,
+        temp_max_c=EXCLUDED.temp_max_c,
+        mfg_date=EXCLUDED.mfg_date,
+        expiry_date=EXCLUDED.expiry_date,
+        country_of_origin=EXCLUDED.country_of_origin,
+        gs1_gtin=EXCLUDED.gs1_gtin,
+        regulatory_cert_id=EXCLUDED.regulatory_cert_id,
+        updated_at=now(),
+        row_version=inventory_item.row_version + 1
+    RETURNING {KEY_COLS}, (xmax = 0) AS inserted
+"""
+
+
+async def bulk_upsert_items(items: list) -> dict:
+    """Upsert set-based de un chunk de ItemUpsert en una transacción. Devuelve insertados/actualizados."""
+    records = [
+        (i, *_key(item), item.uom, item.qty_on_hand, item.qty_reserved, item.quality_status, item.storage_class,
+         item.temp_min_c, item.temp_max_c, item.mfg_date, item.expiry_date,
+         item.country_of_origin, item.gs1_gtin, item.regulatory_cert_id)
+        for i, item in enumerate(items)
+    ]
+    async with UnitOfWork(db.pool) as conn:
+        await conn.execute("CREATE TEMP TABLE bulk_item (ord INTEGER, LIKE inventory_item INCLUDING DEFAULTS) ON COMMIT DROP")
+        await conn.copy_records_to_table("bulk_item", records=records, columns=["ord"] + BULK_COLUMNS)
+        rows = await conn.fetch(BULK_MERGE_SQL)
+
+        # SKU con buckets: las cantidades nuevas se reparten de nuevo (normalmente ninguno en una carga)
+        bucketed = await conn.fetch(f"""
+            SELECT {KEY_COLS}, i.qty_on_hand - i.qty_reserved AS available
+            FROM inventory_item i
+            WHERE ({KEY_COLS}) IN (SELECT {KEY_COLS} FROM bulk_item)
+              AND ({KEY_COLS}) IN (SELECT {KEY_COLS} FROM inventory_bucket)
+        """)
+        for row in bucketed:
+            await _rebalance_buckets(conn, tuple(row[k] for k in KEY_COLUMNS), total=row["available"])
+
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(shard_for(row) if STREAM_SHARDS > 1 else 0, []).append(row)
+        for shard, shard_rows in by_shard.items():
+            await enqueue_event(conn, ITEMS_BULK_UPSERTED, {
+                "shard" : shard,
+                "count" : len(shard_rows),
+                "keys"  : {k: [row[k] for row in shard_rows] for k in KEY_COLUMNS}
+            })
+
+    inserted = sum(1 for row in rows if row["inserted"])
+    return {"rows": len(items), "inserted": inserted, "updated": len(rows) - inserted}
+#endregion
+
+
 async def adjust_stock(data):
     async with UnitOfWork(db.pool) as conn:
         event_id = uuid4()
@@ -90,16 +164,18 @@ async def adjust_stock(data):
             WHERE tenant_id=$1 AND warehouse_id=$2 AND location_id=$3 AND product_id=$4
             AND lot_number=COALESCE($5,'') AND serial_number=COALESCE($6,'')
         """, data.tenant_id, data.warehouse_id, data.location_id, data.product_id, data.lot_number, data.serial_number, data.qty_delta)
+        # SKU con buckets: el ajuste cambia el disponible repartido
+        await _rebalance_buckets(conn, _key(data), delta=data.qty_delta)
 
         # Ledger
         await conn.execute(f"""
             INSERT INTO inventory_tx(event_id, tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number, tx_type, qty_delta, reason)
             VALUES($1,$2,$3,$4,$5,COALESCE($6,''),COALESCE($7,''),'Adjust',$8,$9)
-            ON CONFLICT (event_id) DO NOTHING
+            ON CONFLICT DO NOTHING
         """, event_id, data.tenant_id, data.warehouse_id, data.location_id, data.product_id, data.lot_number, data.serial_number, data.qty_delta, data.reason)
 
-        # Emitir evento
-        await publish_event(ITEM_ADJUSTED, {
+        # Emitir evento (outbox, mismo event_id que el ledger)
+        await enqueue_event(conn, ITEM_ADJUSTED, {
             "event_id"      : str(event_id),
             "tenant_id"     : data.tenant_id,
             "warehouse_id"  : data.warehouse_id,
@@ -108,26 +184,364 @@ async def adjust_stock(data):
             "lot_number"    : data.lot_number or "",
             "serial_number" : data.serial_number or "",
             "qty_delta"     : data.qty_delta
-        })
+        }, event_id=event_id)
 
-async def reserve_stock(data):
-    async with UnitOfWork(db.pool) as conn:
-        # reserva (aumenta qty_reserved)
+#region Reservas
+# Reserva atómica: el descuento solo ocurre si alcanza el disponible, en la misma sentencia. Un item
+# sin buckets se reserva sobre su fila de inventory_item; uno con buckets (SKU caliente) toma un bucket
+# al azar con SKIP LOCKED, así N reservas del mismo SKU avanzan en paralelo. Si ningún bucket libre
+# alcanza, se bloquean todos en orden y se reserva del total (los buckets pueden estar fragmentados).
+RESERVATION_TTL_S = int(os.getenv("RESERVATION_TTL_S", "900"))   # vencimiento por defecto: 15 min
+MAX_BUCKETS       = int(os.getenv("RESERVATION_MAX_BUCKETS", "64"))
+
+KEY_WHERE = "tenant_id=$1 AND warehouse_id=$2 AND location_id=$3 AND product_id=$4 AND lot_number=$5 AND serial_number=$6"
+
+
+class InsufficientStock(Exception):
+    def __init__(self, qty_available: int):
+        super().__init__(f"Disponible insuficiente: {qty_available}")
+        self.qty_available = qty_available
+
+
+class ItemNotFound(Exception):
+    pass
+
+
+class _DuplicateReservation(Exception):
+    pass
+
+
+def _key(data) -> tuple:
+    return (data.tenant_id, data.warehouse_id, data.location_id, data.product_id,
+            data.lot_number or "", data.serial_number or "")
+
+
+def _key_payload(key: tuple) -> dict:
+    return dict(zip(KEY_COLUMNS, key))
+
+
+def _split(total: int, buckets: int) -> list:
+    """Reparte total en partes casi iguales; un total negativo (faltante) queda entero en el bucket 0."""
+    if total < 0:
+        return [total] + [0] * (buckets - 1)
+    share, extra = divmod(total, buckets)
+    return [share + (1 if i < extra else 0) for i in range(buckets)]
+
+
+async def _rebalance_buckets(conn, key: tuple, delta: int = 0, total: int | None = None) -> bool:
+    """Reparte de nuevo el disponible (total, o el actual + delta) entre los buckets del item.
+    False si el item no tiene buckets."""
+    rows = await conn.fetch(
+        f"SELECT bucket, qty_available FROM inventory_bucket WHERE {KEY_WHERE} ORDER BY bucket FOR UPDATE", *key
+    )
+    if not rows:
+        return False
+    if total is None:
+        total = sum(row["qty_available"] for row in rows) + delta
+    await conn.execute(f"""
+        UPDATE inventory_bucket b SET qty_available = s.qty
+        FROM unnest($7::smallint[], $8::int[]) AS s(bucket, qty)
+        WHERE {KEY_WHERE} AND b.bucket = s.bucket
+    """, *key, [row["bucket"] for row in rows], _split(total, len(rows)))
+    return True
+
+
+async def _reserve_from_buckets(conn, key: tuple, qty: int):
+    """Bucket del que salió la reserva; None si el item no tiene buckets."""
+    bucket = await conn.fetchval(f"""
+        WITH pick AS (
+            SELECT bucket FROM inventory_bucket
+            WHERE {KEY_WHERE} AND qty_available >= $7
+            ORDER BY random() LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE inventory_bucket b SET qty_available = b.qty_available - $7
+        FROM pick
+        WHERE {KEY_WHERE} AND b.bucket = pick.bucket
+        RETURNING b.bucket
+    """, *key, qty)
+    if bucket is not None:
+        return bucket
+
+    # Todos ocupados, sin buckets o fragmentado: se bloquean todos en orden (sin deadlocks entre sí)
+    rows = await conn.fetch(
+        f"SELECT bucket, qty_available FROM inventory_bucket WHERE {KEY_WHERE} ORDER BY bucket FOR UPDATE", *key
+    )
+    if not rows:
+        return None
+    available = sum(max(row["qty_available"], 0) for row in rows)
+    if available < qty:
+        raise InsufficientStock(sum(row["qty_available"] for row in rows))
+    taken, remaining = [], qty
+    for row in sorted(rows, key=lambda row: -row["qty_available"]):
+        if remaining <= 0:
+            break
+        take = min(remaining, row["qty_available"])
+        taken.append((row["bucket"], take))
+        remaining -= take
+    await conn.execute(f"""
+        UPDATE inventory_bucket b SET qty_available = b.qty_available - s.qty
+        FROM unnest($7::smallint[], $8::int[]) AS s(bucket, qty)
+        WHERE {KEY_WHERE} AND b.bucket = s.bucket
+    """, *key, [b for b, _ in taken], [q for _, q in taken])
+    return taken[0][0]
+
+
+async def _reserve_from_item(conn, key: tuple, qty: int):
+    available = await conn.fetchval(f"""
+        UPDATE inventory_item
+        SET qty_reserved = qty_reserved + $7,
+            updated_at = now(),
+            row_version = row_version + 1
+        WHERE {KEY_WHERE} AND qty_on_hand - qty_reserved >= $7
+        RETURNING qty_on_hand - qty_reserved
+    """, *key, qty)
+    if available is not None:
+        return
+    current = await conn.fetchval(f"SELECT qty_on_hand - qty_reserved FROM inventory_item WHERE {KEY_WHERE}", *key)
+    if current is None:
+        raise ItemNotFound()
+    raise InsufficientStock(current)
+
+
+async def _get_reservation(conn, reservation_id) -> dict:
+    row = await conn.fetchrow("""
+        SELECT reservation_id, tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number,
+               qty, bucket, status, created_at, expires_at, released_at
+        FROM reservation WHERE reservation_id=$1
+    """, reservation_id)
+    return dict(row) if row else None
+
+
+async def _reserve(conn, key: tuple, qty: int, reservation_id, ttl_s: int, reason, allocation_id=None) -> dict:
+    """Descuenta qty de key y registra la reserva, en la transacción de conn. Lanza _DuplicateReservation
+    si reservation_id ya existe (quien llama deshace la transacción)."""
+    bucket = await _reserve_from_buckets(conn, key, qty)
+    if bucket is None:
+        await _reserve_from_item(conn, key, qty)
+
+    expires_at = await conn.fetchval("""
+        INSERT INTO reservation(reservation_id, tenant_id, warehouse_id, location_id, product_id,
+                                lot_number, serial_number, qty, bucket, reason, expires_at, allocation_id)
+        VALUES($1,$2,$3,$4,$5,$6,$7,$8,$9,$10, now() + make_interval(secs => $11), $12)
+        ON CONFLICT (reservation_id) DO NOTHING
+        RETURNING expires_at
+    """, reservation_id, *key, qty, bucket, reason, ttl_s, allocation_id)
+    if expires_at is None:
+        raise _DuplicateReservation()  # deshace el descuento
+
+    event_id = uuid4()
+    await conn.execute("""
+        INSERT INTO inventory_tx(event_id, tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number, tx_type, qty_delta, reason)
+        VALUES($1,$2,$3,$4,$5,$6,$7,'Reserve',$8,$9)
+        ON CONFLICT DO NOTHING
+    """, event_id, *key, qty, reason)
+
+    await enqueue_event(conn, ITEM_RESERVED, {
+        **_key_payload(key),
+        "reservation_id" : str(reservation_id),
+        "qty_to_reserve" : qty,
+        "bucket"         : bucket,
+        "expires_at"     : expires_at.isoformat()
+    }, event_id=event_id)
+
+    return {**_key_payload(key), "reservation_id": reservation_id, "qty": qty,
+            "bucket": bucket, "status": "Active", "expires_at": expires_at}
+
+
+async def reserve_stock(data) -> dict:
+    """Reserva qty_to_reserve si hay disponible; devuelve la reserva. Repetir con el mismo reservation_id
+    devuelve la reserva existente sin volver a descontar."""
+    reservation_id = data.reservation_id or uuid4()
+    try:
+        async with UnitOfWork(db.pool) as conn:
+            return await _reserve(conn, _key(data), data.qty_to_reserve, reservation_id,
+                                  data.ttl_s or RESERVATION_TTL_S, data.reason)
+    except _DuplicateReservation:
+        async with db.pool.acquire() as conn:
+            return await _get_reservation(conn, reservation_id)
+
+
+async def allocate_stock(data) -> dict:
+    """Reserva las líneas del picking FEFO de qty_to_allocate, todas o ninguna. Las líneas salen de
+    inventory_search; si alguna ya no alcanza en inventory_item (proyección atrasada) lanza
+    InsufficientStock. Repetir con el mismo allocation_id devuelve las reservas ya tomadas."""
+    allocation_id = data.allocation_id or uuid4()
+    if data.allocation_id:
+        existing = await _allocation(allocation_id)
+        if existing:
+            return {"allocation_id": allocation_id, "reservations": existing}
+
+    lines = await queries.asignar_fefo(data.tenant_id, data.warehouse_id, data.product_id,
+                                       data.qty_to_allocate, data.min_expiry_date)
+    allocated = sum(line["qty"] for line in lines)
+    if allocated < data.qty_to_allocate:
+        raise InsufficientStock(allocated)
+
+    keys = [(data.tenant_id, data.warehouse_id, line["location_id"], data.product_id,
+             line["lot_number"], line["serial_number"]) for line in lines]
+    try:
+        async with UnitOfWork(db.pool) as conn:
+            reservations = {}
+            # Se bloquean en orden de clave, como el proyector, para no cruzarse con otro picking
+            for i in sorted(range(len(lines)), key=lambda i: keys[i]):
+                # Id por línea derivado del picking: dos intentos con el mismo allocation_id chocan en la línea 0
+                reservations[i] = await _reserve(conn, keys[i], lines[i]["qty"], uuid5(allocation_id, str(i)),
+                                                 data.ttl_s or RESERVATION_TTL_S, data.reason, allocation_id)
+    except _DuplicateReservation:
+        return {"allocation_id": allocation_id, "reservations": await _allocation(allocation_id)}
+
+    return {"allocation_id": allocation_id,
+            "reservations": [{**reservations[i], "expiry_date": lines[i]["expiry_date"]} for i in range(len(lines))]}
+
+
+async def _allocation(allocation_id) -> list:
+    async with db.pool.acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT r.reservation_id, r.tenant_id, r.warehouse_id, r.location_id, r.product_id, r.lot_number,
+                   r.serial_number, r.qty, r.bucket, r.status, r.created_at, r.expires_at, r.released_at,
+                   i.expiry_date
+            FROM reservation r
+            LEFT JOIN inventory_item i USING (tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number)
+            WHERE r.allocation_id = $1
+            ORDER BY COALESCE(i.expiry_date, 'infinity'::date), r.location_id, r.lot_number, r.serial_number
+        """, allocation_id)
+    return [dict(row) for row in rows]
+
+
+async def _release(conn, reservation: dict, reason: str):
+    """Devuelve la cantidad al bucket de la reserva (o a la fila si ya no tiene buckets) y emite ItemReleased."""
+    key = tuple(reservation[k] for k in KEY_COLUMNS)
+    qty = reservation["qty"]
+    returned = None
+    if reservation["bucket"] is not None:
+        returned = await conn.fetchval(f"""
+            UPDATE inventory_bucket SET qty_available = qty_available + $8
+            WHERE {KEY_WHERE} AND bucket = $7
+            RETURNING bucket
+        """, *key, reservation["bucket"], qty)
+    if returned is None:
+        # Reserva hecha antes del reparto (o su bucket ya no existe): si el item tiene buckets la cantidad
+        # vuelve al primero; en la fila la pisaría sync_bucketed_reserved (on_hand - sum(buckets))
+        returned = await conn.fetchval(f"""
+            UPDATE inventory_bucket SET qty_available = qty_available + $7
+            WHERE {KEY_WHERE} AND bucket = (SELECT min(bucket) FROM inventory_bucket WHERE {KEY_WHERE})
+            RETURNING bucket
+        """, *key, qty)
+    if returned is None:
         await conn.execute(f"""
             UPDATE inventory_item
-            SET qty_reserved = GREATEST(0, qty_reserved + $7),
+            SET qty_reserved = GREATEST(0, qty_reserved - $7),
                 updated_at = now(),
                 row_version = row_version + 1
-            WHERE tenant_id=$1 AND warehouse_id=$2 AND location_id=$3 AND product_id=$4
-            AND lot_number=COALESCE($5,'') AND serial_number=COALESCE($6,'')
-        """, data.tenant_id, data.warehouse_id, data.location_id, data.product_id, data.lot_number, data.serial_number, data.qty_to_reserve)
-
-        await publish_event(ITEM_RESERVED, {
-            "tenant_id"      : data.tenant_id,
-            "warehouse_id"   : data.warehouse_id,
-            "location_id"    : data.location_id,
-            "product_id"     : data.product_id,
-            "lot_number"     : data.lot_number or "",
-            "serial_number"  : data.serial_number or "",
-            "qty_to_reserve" : data.qty_to_reserve
-        })
+            WHERE {KEY_WHERE}
+        """, *key, qty)
+
+    event_id = uuid4()
+    await conn.execute("""
+        INSERT INTO inventory_tx(event_id, tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number, tx_type, qty_delta, reason)
+        VALUES($1,$2,$3,$4,$5,$6,$7,'Release',$8,$9)
+        ON CONFLICT DO NOTHING
+    """, event_id, *key, -qty, reason)
+    await enqueue_event(conn, ITEM_RELEASED, {
+        **_key_payload(key),
+        "reservation_id" : str(reservation["reservation_id"]),
+        "qty_released"   : qty,
+        "reason"         : reason
+    }, event_id=event_id)
+
+
+async def release_reservation(reservation_id, reason: str = "released"):
+    """Libera una reserva activa. Devuelve la reserva (ya liberada) o None si no existe."""
+    async with UnitOfWork(db.pool) as conn:
+        row = await conn.fetchrow("""
+            UPDATE reservation SET status='Released', released_at=now()
+            WHERE reservation_id=$1 AND status='Active'
+            RETURNING *
+        """, reservation_id)
+        if row:
+            await _release(conn, dict(row), reason)
+    async with db.pool.acquire() as conn:
+        return await _get_reservation(conn, reservation_id)
+
+
+async def expire_reservations(limit: int = 500) -> int:
+    """Libera hasta `limit` reservas vencidas en una transacción (varias instancias: SKIP LOCKED)."""
+    async with UnitOfWork(db.pool) as conn:
+        rows = await conn.fetch("""
+            WITH due AS (
+                SELECT reservation_id FROM reservation
+                WHERE status='Active' AND expires_at <= now()
+                ORDER BY expires_at LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE reservation r SET status='Expired', released_at=now()
+            FROM due WHERE r.reservation_id = due.reservation_id
+            RETURNING r.*
+        """, limit)
+        # Orden fijo de bloqueo de buckets/filas entre reapers y liberaciones
+        for row in sorted(rows, key=lambda row: (*(row[k] for k in KEY_COLUMNS), row["bucket"] or 0)):
+            await _release(conn, dict(row), "expired")
+    return len(rows)
+
+
+async def set_buckets(data) -> int:
+    """Reparte el disponible del item en data.buckets filas (1 = sin buckets). Devuelve el disponible."""
+    key = _key(data)
+    buckets = max(1, min(data.buckets, MAX_BUCKETS))
+    async with UnitOfWork(db.pool) as conn:
+        item = await conn.fetchrow(
+            f"SELECT qty_on_hand, qty_reserved FROM inventory_item WHERE {KEY_WHERE} FOR UPDATE", *key
+        )
+        if not item:
+            raise ItemNotFound()
+        current = await conn.fetch(
+            f"SELECT qty_available FROM inventory_bucket WHERE {KEY_WHERE} ORDER BY bucket FOR UPDATE", *key
+        )
+        available = (sum(row["qty_available"] for row in current) if current
+                     else item["qty_on_hand"] - item["qty_reserved"])
+
+        await conn.execute(f"DELETE FROM inventory_bucket WHERE {KEY_WHERE}", *key)
+        if buckets > 1:
+            await conn.executemany(f"""
+                INSERT INTO inventory_bucket({KEY_COLS}, bucket, qty_available)
+                VALUES($1,$2,$3,$4,$5,$6,$7,$8)
+            """, [(*key, i, qty) for i, qty in enumerate(_split(available, buckets))])
+        # inventory_item.qty_reserved queda al día en el momento del cambio
+        await conn.execute(f"""
+            UPDATE inventory_item SET qty_reserved = qty_on_hand - $7, updated_at = now(), row_version = row_version + 1
+            WHERE {KEY_WHERE}
+        """, *key, available)
+        await enqueue_event(conn, ITEM_ADJUSTED, {**_key_payload(key), "qty_delta": 0, "buckets": buckets})
+    return available
+
+
+async def sync_bucketed_reserved() -> int:
+    """Copia a inventory_item.qty_reserved el reservado de los items con buckets (on_hand - sum(buckets))."""
+    async with UnitOfWork(db.pool) as conn:
+        # Primero se bloquean las filas: la suma se calcula después, con los buckets ya confirmados
+        # (un set_buckets concurrente no deja un reservado viejo)
+        keys = await conn.fetch(f"""
+            SELECT {KEY_COLS} FROM inventory_item i
+            WHERE EXISTS (
+                SELECT 1 FROM inventory_bucket b
+                WHERE (b.tenant_id, b.warehouse_id, b.location_id, b.product_id, b.lot_number, b.serial_number)
+                    = (i.tenant_id, i.warehouse_id, i.location_id, i.product_id, i.lot_number, i.serial_number)
+            )
+            ORDER BY {KEY_COLS}
+            FOR UPDATE
+        """)
+        if not keys:
+            return 0
+        status = await conn.execute(f"""
+            UPDATE inventory_item i SET qty_reserved = i.qty_on_hand - b.available
+            FROM (
+                SELECT {KEY_COLS}, sum(qty_available)::int AS available
+                FROM inventory_bucket GROUP BY {KEY_COLS}
+            ) b
+            WHERE (i.tenant_id, i.warehouse_id, i.location_id, i.product_id, i.lot_number, i.serial_number)
+                = (b.tenant_id, b.warehouse_id, b.location_id, b.product_id, b.lot_number, b.serial_number)
+              AND i.qty_reserved <> i.qty_on_hand - b.available
+        """)
+    return int(status.split()[-1])
+#endregion
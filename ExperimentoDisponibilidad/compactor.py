@@ -0,0 +1,280 @@
+import asyncio, logging, os, re, sys, time, uuid
+from datetime import date, datetime, timedelta, timezone
+import redis.asyncio as redis
+
+import db
+from db import init_db
+from events import all_streams
+
+# Compactador: mantiene las particiones de processed_events (por día) e inventory_tx (por mes),
+# borra las llaves de idempotencia que ya no pueden volver a llegar, resume el ledger por día en
+# inventory_tx_daily y publica tamaños y latencia de búsqueda para los tableros.
+#
+# Una llave de processed_events solo sirve mientras su evento pueda entregarse de nuevo: mientras
+# siga en algún stream (STREAM_MAXLEN recorta los viejos) o en la DLQ, y como mínimo RETRY_TTL_S
+# (lo que dura el contador de reintentos). El corte es el menor de los dos; sin Redis no se borra.
+
+INTERVAL_S       = float(os.getenv("COMPACT_INTERVAL_S", "300"))
+DAYS_AHEAD       = int(os.getenv("COMPACT_DAYS_AHEAD", "3"))          # particiones diarias creadas por adelantado
+RETRY_TTL_S      = int(os.getenv("RETRY_TTL_S", "86400"))              # mismo valor que el consumidor
+DLQ_STREAM       = os.getenv("DLQ_STREAM", "events-dlq")
+LEDGER_RETENTION = int(os.getenv("LEDGER_RETENTION_DAYS", "0"))        # 0 = el ledger no se borra nunca
+LOCK_TIMEOUT_MS  = int(os.getenv("COMPACT_LOCK_TIMEOUT_MS", "2000"))   # DDL que no consigue el lock → siguiente vuelta
+PROBE_SIZE       = int(os.getenv("PROJECTOR_BATCH_SIZE", "512"))       # llaves por búsqueda, como un lote del proyector
+METRICS_PORT     = int(os.getenv("COMPACTOR_METRICS_PORT", "9108"))
+
+TABLES = ("processed_events", "inventory_tx", "inventory_tx_daily", "outbox")
+DAILY_RE   = re.compile(r"^processed_events_p(\d{8})$")
+MONTHLY_RE = re.compile(r"^inventory_tx_p(\d{6})$")
+
+log = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+if PROMETHEUS_AVAILABLE:
+    TABLE_BYTES = Gauge("inventory_table_bytes", "Tamaño total (datos + índices) de la tabla y sus particiones", ["table"])
+    TABLE_ROWS  = Gauge("inventory_table_rows", "Filas estimadas (reltuples) de la tabla y sus particiones", ["table"])
+    PARTITIONS  = Gauge("inventory_table_partitions", "Particiones de la tabla", ["table"])
+    LOOKUP      = Histogram("processed_events_lookup_seconds", f"Búsqueda de {PROBE_SIZE} llaves en processed_events",
+                            buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+    DROPPED     = Counter("compactor_partitions_dropped_total", "Particiones borradas por retención", ["table"])
+    ROLLED_UP   = Counter("compactor_rollup_days_total", "Días resumidos en inventory_tx_daily")
+
+
+def _utc(d: date) -> datetime:
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _lit(ts: datetime) -> str:
+    # Los límites de una partición van literales en el DDL (no admite parámetros); son fechas propias
+    return f"'{ts.isoformat()}'"
+
+
+#region Particiones
+async def partitions(conn, parent: str) -> list:
+    rows = await conn.fetch(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = $1::regclass ORDER BY c.relname",
+        parent,
+    )
+    return [row["relname"] for row in rows]
+
+
+async def ensure_partition(conn, parent: str, column: str, name: str, lo: datetime, hi: datetime) -> bool:
+    """Crea la partición [lo, hi) si falta, moviendo antes las filas que la DEFAULT tenga en ese rango."""
+    if await conn.fetchval("SELECT to_regclass($1)", name):
+        return False
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL lock_timeout = {LOCK_TIMEOUT_MS}")
+        await conn.execute(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS)")
+        await conn.execute(
+            f"WITH moved AS (DELETE FROM {parent}_default WHERE {column} >= $1 AND {column} < $2 RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            lo, hi,
+        )
+        await conn.execute(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM ({_lit(lo)}) TO ({_lit(hi)})")
+    log.info(f"Partición {name} creada")
+    return True
+
+
+async def ensure_partitions(conn, today: date, keep_from: date | None):
+    # processed_events: un día por partición, desde el corte de retención (si hay filas en la DEFAULT)
+    # hasta DAYS_AHEAD días adelante
+    days = {today + timedelta(days=i) for i in range(DAYS_AHEAD + 1)}
+    for row in await conn.fetch(
+        "SELECT DISTINCT (processed_at AT TIME ZONE 'UTC')::date AS d FROM processed_events_default"
+    ):
+        if keep_from is None or row["d"] >= keep_from:
+            days.add(row["d"])
+    for d in sorted(days):
+        await ensure_partition(conn, "processed_events", "processed_at",
+                               f"processed_events_p{d:%Y%m%d}", _utc(d), _utc(d + timedelta(days=1)))
+
+    # inventory_tx: un mes por partición; el actual, el siguiente y los que tengan filas en la DEFAULT
+    month = today.replace(day=1)
+    months = {month, _next_month(month)}
+    for row in await conn.fetch(
+        "SELECT DISTINCT date_trunc('month', performed_at AT TIME ZONE 'UTC')::date AS m FROM inventory_tx_default"
+    ):
+        months.add(row["m"])
+    for m in sorted(months):
+        await ensure_partition(conn, "inventory_tx", "performed_at",
+                               f"inventory_tx_p{m:%Y%m}", _utc(m), _utc(_next_month(m)))
+
+
+async def drop_partition(conn, parent: str, name: str) -> bool:
+    try:
+        async with conn.transaction():
+            await conn.execute(f"SET LOCAL lock_timeout = {LOCK_TIMEOUT_MS}")
+            await conn.execute(f"DROP TABLE {name}")
+    except Exception as e:
+        log.warning(f"No se pudo borrar {name}: {e}")
+        return False
+    if PROMETHEUS_AVAILABLE:
+        DROPPED.labels(parent).inc()
+    log.info(f"Partición {name} borrada")
+    return True
+#endregion
+
+
+#region Retención de llaves de idempotencia
+async def idempotency_cutoff(r) -> datetime | None:
+    """Instante antes del cual ningún evento puede volver a entregarse; None si Redis no responde."""
+    cutoff_ms = int(time.time() * 1000) - RETRY_TTL_S * 1000
+    try:
+        for stream in all_streams() + [DLQ_STREAM]:
+            first = await r.xrange(stream, "-", "+", count=1)
+            if first:
+                cutoff_ms = min(cutoff_ms, int(first[0][0].split("-")[0]))
+    except Exception as e:
+        log.warning(f"Sin Redis no se borran llaves de idempotencia: {e}")
+        return None
+    return datetime.fromtimestamp(cutoff_ms / 1000, tz=timezone.utc)
+
+
+async def expire_processed(conn, cutoff: datetime) -> int:
+    """Borra las particiones diarias que terminan antes del corte y las filas viejas de la DEFAULT."""
+    dropped = 0
+    for name in await partitions(conn, "processed_events"):
+        m = DAILY_RE.match(name)
+        if m and _utc(datetime.strptime(m.group(1), "%Y%m%d").date() + timedelta(days=1)) <= cutoff:
+            dropped += await drop_partition(conn, "processed_events", name)
+    await conn.execute("DELETE FROM processed_events_default WHERE processed_at < $1", cutoff)
+    return dropped
+#endregion
+
+
+#region Rollup del ledger
+async def rollup_ledger(conn, today: date) -> int:
+    """Resume inventory_tx por día hasta ayer. Recalcula el último día resumido por si quedó a medias."""
+    start = await conn.fetchval("SELECT max(day) FROM inventory_tx_daily")
+    if start is None:
+        first = await conn.fetchval("SELECT min(performed_at) FROM inventory_tx")
+        if first is None:
+            return 0
+        start = first.astimezone(timezone.utc).date()
+
+    rolled = 0
+    d = start
+    while d < today:
+        # Un día por transacción para no retener locks largos al ponerse al día
+        await conn.execute(
+            """
+            INSERT INTO inventory_tx_daily(day, tenant_id, warehouse_id, location_id, product_id,
+                                           lot_number, serial_number, tx_type, qty_delta, tx_count)
+            SELECT $1::date, tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number,
+                   tx_type, sum(qty_delta), count(*)
+            FROM inventory_tx
+            WHERE performed_at >= $2 AND performed_at < $3
+            GROUP BY tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number, tx_type
+            ON CONFLICT (day, tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number, tx_type)
+            DO UPDATE SET qty_delta = EXCLUDED.qty_delta, tx_count = EXCLUDED.tx_count
+            """,
+            d, _utc(d), _utc(d + timedelta(days=1)),
+        )
+        rolled += 1
+        d += timedelta(days=1)
+    if PROMETHEUS_AVAILABLE:
+        ROLLED_UP.inc(rolled)
+    return rolled
+
+
+async def expire_ledger(conn, today: date) -> int:
+    """Con LEDGER_RETENTION_DAYS > 0 borra los meses del ledger ya vencidos y ya resumidos."""
+    if LEDGER_RETENTION <= 0:
+        return 0
+    rolled_until = await conn.fetchval("SELECT max(day) FROM inventory_tx_daily")
+    if rolled_until is None:
+        return 0
+    # El último día resumido puede recalcularse, así que solo cuenta hasta el anterior
+    limit = _utc(min(today - timedelta(days=LEDGER_RETENTION), rolled_until))
+    dropped = 0
+    for name in await partitions(conn, "inventory_tx"):
+        m = MONTHLY_RE.match(name)
+        if m and _utc(_next_month(datetime.strptime(m.group(1), "%Y%m").date())) <= limit:
+            dropped += await drop_partition(conn, "inventory_tx", name)
+    await conn.execute("DELETE FROM inventory_tx_default WHERE performed_at < $1", limit)
+    return dropped
+#endregion
+
+
+#region Métricas
+async def table_stats(conn) -> dict:
+    stats = {}
+    for table in TABLES:
+        row = await conn.fetchrow(
+            """
+            SELECT COALESCE(sum(pg_total_relation_size(t.relid)), 0)::bigint AS bytes,
+                   COALESCE(sum(GREATEST(c.reltuples, 0)), 0)::bigint        AS rows,
+                   count(*) FILTER (WHERE t.isleaf AND t.level > 0)          AS partitions
+            FROM pg_partition_tree($1::regclass) t JOIN pg_class c ON c.oid = t.relid
+            """,
+            table,
+        )
+        stats[table] = dict(row)
+        if PROMETHEUS_AVAILABLE:
+            TABLE_BYTES.labels(table).set(row["bytes"])
+            TABLE_ROWS.labels(table).set(row["rows"])
+            PARTITIONS.labels(table).set(row["partitions"])
+    return stats
+
+
+async def probe_lookup(conn) -> float:
+    """Mide la búsqueda de llaves que hace el proyector por lote (llaves al azar: el peor caso, no están)."""
+    ids = [uuid.uuid4() for _ in range(PROBE_SIZE)]
+    t0 = time.perf_counter()
+    await conn.fetch("SELECT event_id FROM processed_events WHERE event_id = ANY($1::uuid[])", ids)
+    elapsed = time.perf_counter() - t0
+    if PROMETHEUS_AVAILABLE:
+        LOOKUP.observe(elapsed)
+    return elapsed
+#endregion
+
+
+async def compact_once(r):
+    today = datetime.now(timezone.utc).date()
+    cutoff = await idempotency_cutoff(r)
+    async with db.pool.acquire() as conn:
+        await ensure_partitions(conn, today, cutoff.date() if cutoff else None)
+        dropped = await expire_processed(conn, cutoff) if cutoff else 0
+        rolled = await rollup_ledger(conn, today)
+        dropped_tx = await expire_ledger(conn, today)
+        stats = await table_stats(conn)
+        lookup = await probe_lookup(conn)
+    log.info(
+        f"Compactación: corte={cutoff.isoformat() if cutoff else '-'} borradas={dropped}+{dropped_tx} "
+        f"días resumidos={rolled} lookup={lookup * 1000:.1f}ms "
+        + " ".join(f"{t}={s['bytes'] // 1024}kB/{s['rows']}" for t, s in stats.items())
+    )
+
+
+async def main(once: bool = False):
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    await init_db()
+    r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True)
+    if PROMETHEUS_AVAILABLE and not once:
+        start_http_server(METRICS_PORT)
+    log.info(f"Compactador listo: cada {INTERVAL_S}s, retry_ttl={RETRY_TTL_S}s, ledger={LEDGER_RETENTION or '∞'} días")
+
+    while True:
+        try:
+            await compact_once(r)
+        except Exception as e:
+            log.exception(f"Loop compactador: {e}")
+            if once:
+                raise
+        if once:
+            return
+        await asyncio.sleep(INTERVAL_S)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(once="--once" in sys.argv[1:]))
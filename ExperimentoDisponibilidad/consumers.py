@@ -1,11 +1,12 @@
-import asyncio, logging, json, os
+import asyncio, hashlib, logging, json, multiprocessing, os, signal, time, uuid
 import redis.asyncio as redis
 from datetime import datetime
 from redis.exceptions import ResponseError
 
-import db
+import db, metrics, queries
 from db import init_db #, execute, fetchrow, fetchval
-from actions import ITEM_UPSERTED, ITEM_ADJUSTED, ITEM_RESERVED
+from actions import ITEM_UPSERTED, ITEM_ADJUSTED, ITEM_RESERVED, ITEM_RELEASED, ITEMS_BULK_UPSERTED
+from events import STREAM_SHARDS, all_streams, shard_stream
 from unit_of_work import UnitOfWork
 
 STREAM_KEY    = os.getenv("EVENT_STREAM", "events-stream")
@@ -15,42 +16,21 @@ CLAIM_IDLE_MS = int(os.getenv("CLAIM_IDLE_MS", "60000"))  # reclamar mensajes in
 DLQ_STREAM   = os.getenv("DLQ_STREAM", "events-dlq")
 MAX_RETRIES  = int(os.getenv("MAX_RETRIES", "5"))
 RETRY_TTL_S  = int(os.getenv("RETRY_TTL_S", "86400"))  # contador de reintentos dura 1 día
+BATCH_SIZE   = int(os.getenv("PROJECTOR_BATCH_SIZE", "512"))  # máximo de entradas por lote
+LINGER_MS    = int(os.getenv("PROJECTOR_LINGER_MS", "5"))     # espera para completar un lote parcial
+PROCESSES    = int(os.getenv("PROJECTOR_PROCESSES", "1"))     # procesos del supervisor (modo shards)
+LEASE_MS     = int(os.getenv("SHARD_LEASE_MS", "10000"))      # dueño de un shard sin renovar → libre
+REBALANCE_S  = float(os.getenv("SHARD_REBALANCE_S", "2"))     # cada cuánto se revisan miembros y shards
+KEYS_PER_SQL = int(os.getenv("PROJECTOR_KEYS_PER_STATEMENT", "10000"))  # claves por sentencia de proyección
+METRICS_PORT = int(os.getenv("PROJECTOR_METRICS_PORT", "9100"))  # +i en el proceso i del supervisor
+METRICS_S    = float(os.getenv("PROJECTOR_METRICS_INTERVAL_S", "5"))  # cada cuánto se consulta XINFO
 
+KEY_FIELDS = ["tenant_id", "warehouse_id", "location_id", "product_id", "lot_number", "serial_number"]
 
-async def upsert_projection_from_db(conn, key: dict):
-    row = await conn.fetchrow("""
-      SELECT tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number,
-             qty_on_hand, qty_reserved, storage_class, expiry_date, quality_status, updated_at
-      FROM inventory_item
-      WHERE tenant_id=$1 AND warehouse_id=$2 AND location_id=$3 AND product_id=$4
-        AND lot_number=$5 AND serial_number=$6
-    """, key["tenant_id"], key["warehouse_id"], key["location_id"], key["product_id"], key["lot_number"], key["serial_number"])
-
-    if not row:
-        await conn.execute("""
-          DELETE FROM inventory_search
-          WHERE tenant_id=$1 AND warehouse_id=$2 AND location_id=$3 AND product_id=$4 AND lot_number=$5 AND serial_number=$6
-        """, key["tenant_id"], key["warehouse_id"], key["location_id"], key["product_id"], key["lot_number"], key["serial_number"])
-        return
 
-    qty_available = int(row["qty_on_hand"]) - int(row["qty_reserved"])
-    await conn.execute("""
-      INSERT INTO inventory_search
-        (tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number,
-         qty_on_hand, qty_reserved, qty_available, storage_class, expiry_date, quality_status, updated_at)
-      VALUES($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13)
-      ON CONFLICT (tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number)
-      DO UPDATE SET
-        qty_on_hand=excluded.qty_on_hand,
-        qty_reserved=excluded.qty_reserved,
-        qty_available=excluded.qty_available,
-        storage_class=excluded.storage_class,
-        expiry_date=excluded.expiry_date,
-        quality_status=excluded.quality_status,
-        updated_at=excluded.updated_at
-    """,
-    row["tenant_id"], row["warehouse_id"], row["location_id"], row["product_id"], row["lot_number"], row["serial_number"],
-    row["qty_on_hand"], row["qty_reserved"], qty_available, row["storage_class"], row["expiry_date"], row["quality_status"], row["updated_at"])
+async def upsert_projection_from_db(conn, key: dict):
+    # Misma sentencia que el proyector por lotes, con una sola clave
+    await conn.execute(PROJECT_BATCH_SQL, *[[key[k]] for k in KEY_FIELDS])
 
 
 async def handle_item_upserted(conn, event: dict):
@@ -71,10 +51,22 @@ async def handle_item_reserved(conn, event: dict):
     await upsert_projection_from_db(conn, key)
 
 
+async def handle_item_released(conn, event: dict):
+    p = event["payload"]
+    key = {k: (p.get(k) or "") for k in ["tenant_id","warehouse_id","location_id","product_id","lot_number","serial_number"]}
+    await upsert_projection_from_db(conn, key)
+
+
+async def handle_items_bulk_upserted(conn, event: dict):
+    await project_keys(conn, _keys_of(event))
+
+
 switch = {
     ITEM_UPSERTED: handle_item_upserted,
     ITEM_ADJUSTED: handle_item_adjusted,
     ITEM_RESERVED: handle_item_reserved,
+    ITEM_RELEASED: handle_item_released,
+    ITEMS_BULK_UPSERTED: handle_items_bulk_upserted,
 }
 
 
@@ -106,113 +98,292 @@ async def process_event(event: dict):
         await mark_processed(conn, ev_id)
 
 
+#region Proyección por lotes
+# Columnas de inventory_search y cómo salen de inventory_item: las usan el proyector y rebuild.py.
+# Un item con buckets (SKU caliente) tiene su disponible en inventory_bucket; sin buckets, sum() es NULL.
+PROJECTION_COLUMNS = """tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number,
+       qty_on_hand, qty_reserved, qty_available, storage_class, expiry_date, quality_status, updated_at"""
+PROJECTION_SELECT = """SELECT i.tenant_id, i.warehouse_id, i.location_id, i.product_id, i.lot_number, i.serial_number,
+           i.qty_on_hand, i.qty_on_hand - r.available, r.available, i.storage_class, i.expiry_date,
+           i.quality_status, i.updated_at
+    FROM inventory_item i
+    CROSS JOIN LATERAL (
+      SELECT COALESCE(sum(b.qty_available)::int, i.qty_on_hand - i.qty_reserved) AS available
+      FROM inventory_bucket b
+      WHERE (b.tenant_id, b.warehouse_id, b.location_id, b.product_id, b.lot_number, b.serial_number)
+          = (i.tenant_id, i.warehouse_id, i.location_id, i.product_id, i.lot_number, i.serial_number)
+    ) r"""
+
+
+def project_batch_sql(table: str = "inventory_search") -> str:
+    # Todas las proyecciones de un lote se refrescan con una sola sentencia: las claves van como
+    # arreglos (unnest); se insertan/actualizan las que siguen en inventory_item y se borran las que ya
+    # no están. El ORDER BY fija el orden de bloqueo para que dos consumidores no se bloqueen entre sí.
+    return f"""
+  WITH keys AS (
+    SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[], $6::text[])
+      AS k(tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number)
+  ), upserted AS (
+    INSERT INTO {table} ({PROJECTION_COLUMNS})
+    {PROJECTION_SELECT}
+    JOIN keys k USING (tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number)
+    ORDER BY i.tenant_id, i.warehouse_id, i.location_id, i.product_id, i.lot_number, i.serial_number
+    ON CONFLICT (tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number)
+    DO UPDATE SET
+      qty_on_hand=excluded.qty_on_hand,
+      qty_reserved=excluded.qty_reserved,
+      qty_available=excluded.qty_available,
+      storage_class=excluded.storage_class,
+      expiry_date=excluded.expiry_date,
+      quality_status=excluded.quality_status,
+      updated_at=excluded.updated_at
+    RETURNING 1
+  ), deleted AS (
+    DELETE FROM {table} s
+    USING keys k
+    WHERE (s.tenant_id, s.warehouse_id, s.location_id, s.product_id, s.lot_number, s.serial_number)
+        = (k.tenant_id, k.warehouse_id, k.location_id, k.product_id, k.lot_number, k.serial_number)
+      AND NOT EXISTS (
+        SELECT 1 FROM inventory_item i
+        WHERE (i.tenant_id, i.warehouse_id, i.location_id, i.product_id, i.lot_number, i.serial_number)
+            = (k.tenant_id, k.warehouse_id, k.location_id, k.product_id, k.lot_number, k.serial_number)
+      )
+    RETURNING 1
+  )
+  SELECT (SELECT count(*) FROM upserted) AS upserted, (SELECT count(*) FROM deleted) AS deleted
+"""
+
+
+PROJECT_BATCH_SQL = project_batch_sql()
+
+
+def _key_of(event: dict) -> tuple:
+    p = event["payload"]
+    return tuple(p.get(k) or "" for k in KEY_FIELDS)
+
+
+def _keys_of(event: dict) -> list:
+    # Un evento de carga masiva trae las claves de su chunk en columnas: {"keys": {"tenant_id": [...], ...}}
+    if event["type"] == ITEMS_BULK_UPSERTED:
+        keys = event["payload"].get("keys") or {}
+        return list(zip(*(keys.get(k) or [] for k in KEY_FIELDS)))
+    return [_key_of(event)]
+
+
+async def project_keys(conn, keys, sql: str = PROJECT_BATCH_SQL):
+    """Refresca las proyecciones de keys en sentencias de hasta KEYS_PER_SQL claves, en orden."""
+    keys = sorted(set(keys))
+    for i in range(0, len(keys), KEYS_PER_SQL):
+        await conn.execute(sql, *[list(col) for col in zip(*keys[i:i + KEYS_PER_SQL])])
+
+
+async def project_batch(conn, events: list) -> int:
+    """Proyecta un lote dentro de la transacción de conn. Devuelve cuántos eventos eran nuevos."""
+    ids = list({e["id"] for e in events if e.get("id")})
+    done = set()
+    if ids:
+        rows = await conn.fetch("SELECT event_id::text FROM processed_events WHERE event_id = ANY($1::uuid[])", ids)
+        done = {row[0] for row in rows}
+
+    new = [e for e in events if not e.get("id") or e["id"] not in done]
+    # Varias modificaciones del mismo item en el lote se proyectan una sola vez (se relee el estado actual)
+    await project_keys(conn, [key for e in new if e["type"] in switch for key in _keys_of(e)])
+
+    new_ids = list({e["id"] for e in new if e.get("id")})
+    if new_ids:
+        await conn.execute(
+            "INSERT INTO processed_events(event_id) SELECT unnest($1::uuid[]) ON CONFLICT DO NOTHING", new_ids
+        )
+    return len(new)
+#endregion
+
+
 # --------- Bucle del consumidor (XREADGROUP + XAUTOCLAIM) ---------
-async def ensure_group(r):
-    try:
-        await r.xgroup_create(STREAM_KEY, GROUP, id="$", mkstream=True)
-    except ResponseError as e:
-        if "BUSYGROUP" not in str(e):
-            raise
+async def ensure_group(r, streams=None):
+    for stream in streams or [STREAM_KEY]:
+        try:
+            await r.xgroup_create(stream, GROUP, id="$", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
 
 
 def _to_event(fields: dict) -> dict:
-    # Campos llegan como strings; payload es JSON string
+    # Campos llegan como strings; payload es JSON string. Un id que no es UUID no pasaría por
+    # processed_events: se trata como mensaje inválido (reintentos y DLQ)
+    ev_id = fields.get("id")
     return {
-        "id"      : fields.get("id"),
+        "id"      : str(uuid.UUID(ev_id)) if ev_id else None,
         "type"    : fields.get("type"),
         "payload" : json.loads(fields.get("payload", "{}"))
     }
 
 
-async def main():
-    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
-    await init_db()
+def _stream_ms(msg_id: str) -> int:
+    # Los ids del stream empiezan con el timestamp (ms) en que Redis recibió la entrada
+    return int(msg_id.split("-", 1)[0])
+
+
+async def read_batch(r, stream: str = STREAM_KEY, consumer: str = CONSUMER, block: int = 5000,
+                     pending: bool = False) -> list:
+    """XREADGROUP de hasta BATCH_SIZE entradas; si llega un lote parcial espera LINGER_MS por más.
+
+    Con pending=True devuelve, en orden, las entradas ya entregadas a `consumer` y sin ACK.
+    """
+    start_id = "0" if pending else ">"
+    resp = await r.xreadgroup(GROUP, consumer, streams={stream: start_id}, count=BATCH_SIZE, block=block)
+    entries = list(resp[0][1]) if resp else []
+    if pending or not entries or LINGER_MS <= 0:
+        return entries
+
+    deadline = time.monotonic() + LINGER_MS / 1000
+    while len(entries) < BATCH_SIZE:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:  # block=0 sería esperar para siempre
+            break
+        resp = await r.xreadgroup(
+            GROUP, consumer, streams={stream: ">"}, count=BATCH_SIZE - len(entries), block=remaining_ms
+        )
+        if not resp:
+            break
+        entries.extend(resp[0][1])
+    return entries
+
+
+async def handle_failure(r, msg_id: str, fields: dict, e: Exception, stream: str = STREAM_KEY):
+    # contador de reintentos por mensaje; el mensaje queda pendiente hasta que se reclame
+    retry_key = f"retry:{stream}:{GROUP}:{msg_id}"
+    try:
+        count = int(await r.incr(retry_key))
+        await r.expire(retry_key, RETRY_TTL_S)
+    except Exception:
+        count = MAX_RETRIES + 1  # si falla redis, evita loop infinito
+
+    if count <= MAX_RETRIES:
+        if metrics.PROMETHEUS_AVAILABLE:
+            metrics.RETRIES.labels(stream).inc()
+        return
 
-    url = os.getenv("REDIS_URL", "redis://localhost:6379")
-    r = redis.from_url(url, decode_responses=True)
-    await ensure_group(r)
+    # Mover a DLQ y ACK para no ciclar (con el id del evento: dlq_replay.py lo reinyecta igual)
+    if metrics.PROMETHEUS_AVAILABLE:
+        metrics.DLQ_MOVED.labels(stream, fields.get("type", "")).inc()
+    try:
+        await r.xadd(DLQ_STREAM, {
+            "orig_id"     : msg_id,
+            "orig_stream" : stream,
+            "id"          : fields.get("id", ""),
+            "type"        : fields.get("type", ""),
+            "payload"     : fields.get("payload", ""),
+            "error"       : str(e)[:500]
+        })
+    finally:
+        await r.xack(stream, GROUP, msg_id)
+
+
+async def refresh_cache(r, events: list, prefix: str = ""):
+    """Refresca la caché de /items de las bodegas tocadas por events (ya confirmados)."""
+    try:
+        await queries.refresh_cache(
+            r, {key[:2] for e in events if e["type"] in switch for key in _keys_of(e)}
+        )
+    except Exception as e:
+        # El TTL de la caché acota lo que quede sin refrescar
+        logging.getLogger(__name__).warning(f"{prefix}No se refrescó la caché de /items: {e}")
+
+
+async def process_entries(r, entries: list, prefix: str = "", stream: str = STREAM_KEY) -> tuple:
+    """Proyecta un lote en una transacción y lo confirma con un solo XACK.
 
+    Si el lote falla se reintenta evento por evento, para que solo el mensaje culpable
+    vaya a reintentos/DLQ. Devuelve el lag (ms) del evento más antiguo del lote y cuántas
+    entradas quedaron sin ACK.
+    """
     log = logging.getLogger(__name__)
-    log.info(f"Consumidor listo: stream={STREAM_KEY} group={GROUP} consumer={CONSUMER} idle={CLAIM_IDLE_MS}ms")
+    parsed, trimmed = [], []
+    for msg_id, fields in entries:
+        if not fields:
+            # Pendiente cuya entrada ya recortó el MAXLEN del stream: no hay nada que proyectar
+            trimmed.append(msg_id)
+            continue
+        try:
+            parsed.append((msg_id, fields, _to_event(fields)))
+        except Exception as e:
+            log.exception(f"{prefix}Evento inválido {msg_id}: {e}")
+            await handle_failure(r, msg_id, fields, e, stream)
+    if trimmed:
+        await r.xack(stream, GROUP, *trimmed)
+    if not parsed:
+        return 0, 0
+
+    try:
+        t0 = time.perf_counter()
+        async with UnitOfWork(db.pool) as conn:
+            new = await project_batch(conn, [event for _, _, event in parsed])
+        metrics.observe_batch([event for _, _, event in parsed], time.perf_counter() - t0)
+        acked = [msg_id for msg_id, _, _ in parsed]
+        log.debug(f"{prefix}Lote proyectado: {len(parsed)} entradas, {new} nuevas")
+    except Exception as e:
+        log.warning(f"{prefix}Falló el lote de {len(parsed)} entradas ({e}); se procesan una por una")
+        acked = []
+        for msg_id, fields, event in parsed:
+            t0 = time.perf_counter()
+            try:
+                await process_event(event)
+                metrics.observe_event(event["type"], time.perf_counter() - t0, "ok")
+                acked.append(msg_id)
+            except Exception as e:
+                metrics.observe_event(event["type"], time.perf_counter() - t0, "failed")
+                log.exception(f"{prefix}Error procesando {msg_id}: {e}")
+                await handle_failure(r, msg_id, fields, e, stream)
+
+    if acked:
+        await r.xack(stream, GROUP, *acked)
+        await refresh_cache(r, [event for _, _, event in parsed], prefix)
+    lag_ms = int(time.time() * 1000) - min(_stream_ms(msg_id) for msg_id, _, _ in parsed)
+    if metrics.PROMETHEUS_AVAILABLE:
+        metrics.PROJECTION_LAG.labels(stream).set(lag_ms / 1000)
+    return lag_ms, len(parsed) - len(acked)
+
+
+async def run_single(r):
+    """Modo clásico: un stream y un grupo; varios consumidores se reparten las entradas sin orden por item."""
+    log = logging.getLogger(__name__)
+    await ensure_group(r)
+    log.info(f"Consumidor listo: stream={STREAM_KEY} group={GROUP} consumer={CONSUMER} idle={CLAIM_IDLE_MS}ms "
+             f"batch={BATCH_SIZE} linger={LINGER_MS}ms")
 
     backoff = 1
+    next_read = None
     while True:
         try:
-            # 1) Leer NUEVOS mensajes
-            resp = await r.xreadgroup(GROUP, CONSUMER, streams={STREAM_KEY: ">"}, count=128, block=5000)
-            if resp:
-                _, entries = resp[0]
-                for msg_id, fields in entries:
-                    try:
-                        event = _to_event(fields)
-                        await process_event(event)
-                        await r.xack(STREAM_KEY, GROUP, msg_id)
-                    except Exception as e:
-                        log.exception(f"Error procesando {msg_id}: {e}")
-
-                        # contador de reintentos por mensaje
-                        retry_key = f"retry:{STREAM_KEY}:{GROUP}:{msg_id}"
-                        try:
-                            count = int(await r.incr(retry_key))
-                            await r.expire(retry_key, RETRY_TTL_S)
-                        except Exception:
-                            count = MAX_RETRIES + 1  # si falla redis, evita loop infinito
-
-                        if count > MAX_RETRIES:
-                            # Mover a DLQ y ACK para no ciclar
-                            try:
-                                await r.xadd(DLQ_STREAM, {
-                                    "orig_id" : msg_id,
-                                    "type"    : fields.get("type", ""),
-                                    "payload" : fields.get("payload", ""),
-                                    "error"   : str(e)[:500]
-                                })
-                            finally:
-                                await r.xack(STREAM_KEY, GROUP, msg_id)
+            # 1) Leer NUEVOS mensajes. Mientras se proyecta un lote ya se está leyendo el siguiente
+            reading, next_read = next_read or asyncio.create_task(read_batch(r)), None
+            entries = await reading
+            lag_ms = 0
+            if entries:
+                next_read = asyncio.create_task(read_batch(r))
+                lag_ms, _ = await process_entries(r, entries)
 
             # 2) Reclamar PENDIENTES inactivos (por si un consumer murió)
             next_id = "0-0"
             while True:
                 next_id, claimed, _ = await r.xautoclaim(
-                    STREAM_KEY, GROUP, CONSUMER, min_idle_time=CLAIM_IDLE_MS, start_id=next_id, count=128
+                    STREAM_KEY, GROUP, CONSUMER, min_idle_time=CLAIM_IDLE_MS, start_id=next_id, count=BATCH_SIZE
                 )
 
                 if not claimed:
                     break
 
-                for msg_id, fields in claimed:
-                    try:
-                        event = _to_event(fields)
-                        await process_event(event)
-                        await r.xack(STREAM_KEY, GROUP, msg_id)
-                    except Exception as e:
-                        log.exception(f"[reclaimed] Error {msg_id}: {e}")
-
-                        retry_key = f"retry:{STREAM_KEY}:{GROUP}:{msg_id}"
-                        try:
-                            count = int(await r.incr(retry_key))
-                            await r.expire(retry_key, RETRY_TTL_S)
-                        except Exception:
-                            count = MAX_RETRIES + 1
-
-                        if count > MAX_RETRIES:
-                            try:
-                                await r.xadd(DLQ_STREAM, {
-                                    "orig_id" : msg_id,
-                                    "type"    : fields.get("type", ""),
-                                    "payload" : fields.get("payload", ""),
-                                    "error"   : str(e)[:500]
-                                })
-                            finally:
-                                await r.xack(STREAM_KEY, GROUP, msg_id)
+                await process_entries(r, claimed, prefix="[reclaimed] ")
 
             # éxito → resetea backoff
             backoff = 1
 
-            # (opcional) heartbeat para monitoreo
+            # (opcional) heartbeat y lag del último lote para monitoreo
             try:
                 hb_key = f"hb:{STREAM_KEY}:{GROUP}:{CONSUMER}"
                 await r.set(hb_key, int(datetime.utcnow().timestamp()), ex=30)
+                await r.set(f"lag:{STREAM_KEY}:{GROUP}:{CONSUMER}", lag_ms, ex=30)
             except Exception:
                 pass
 
@@ -222,5 +393,196 @@ async def main():
             backoff = min(backoff * 2, 30)  # backoff exponencial con techo
 
 
+#region Modo particionado (EVENT_STREAM_SHARDS > 1)
+# Cada shard tiene un solo dueño a la vez (lease en Redis) y se lee con el nombre de consumidor
+# fijo "shard-N": sus pendientes pasan al nuevo dueño tal cual, sin XAUTOCLAIM, y se reprocesan
+# antes que las entradas nuevas. Así los eventos de un item se proyectan en el orden publicado.
+# Los miembros vivos están en un ZSET (score = último latido); cada shard se asigna por rendezvous
+# hashing, de modo que al entrar o salir un miembro solo se mueven los shards que le tocan.
+
+MEMBERS_KEY = f"members:{STREAM_KEY}:{GROUP}"
+
+RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end
+return 0
+"""
+RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+
+
+def lease_key(shard: int) -> str:
+    return f"lease:{STREAM_KEY}:{GROUP}:{shard}"
+
+
+def shard_owner(shard: int, members: list) -> str:
+    """Rendezvous hashing: el miembro con el mayor hash(miembro, shard) es el dueño."""
+    return max(members, key=lambda m: hashlib.sha1(f"{m}|{shard}".encode()).digest())
+
+
+async def run_shard(r, shard: int, stop: asyncio.Event):
+    """Proyecta un shard hasta que `stop` se active (se termina el lote en curso)."""
+    log = logging.getLogger(__name__)
+    stream, consumer, prefix = shard_stream(shard), f"shard-{shard}", f"[shard {shard}] "
+    backoff = 1
+    while not stop.is_set():
+        try:
+            # Primero los pendientes (fallidos o del dueño anterior), en orden; después los nuevos
+            entries = await read_batch(r, stream, consumer, pending=True)
+            retrying = bool(entries)
+            if not entries:
+                entries = await read_batch(r, stream, consumer, block=1000)
+            if not entries:
+                continue
+
+            lag_ms, failed = await process_entries(r, entries, prefix=prefix, stream=stream)
+            await r.set(f"lag:{stream}:{GROUP}", lag_ms, ex=30)
+            if failed and retrying:
+                # El mismo mensaje sigue fallando: se espera antes de reintentar (bloquea el shard)
+                await asyncio.sleep(min(backoff, 30))
+                backoff = min(backoff * 2, 30)
+            elif not failed:
+                backoff = 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.exception(f"{prefix}Loop: {e}")
+            await asyncio.sleep(min(backoff, 30))
+            backoff = min(backoff * 2, 30)
+
+
+class ShardSupervisor:
+    """Mantiene la membresía de este consumidor y una tarea por cada shard que le corresponde."""
+
+    def __init__(self, r, consumer: str = CONSUMER, shards: int = STREAM_SHARDS):
+        self.r = r
+        self.consumer = consumer
+        self.shards = shards
+        self.running = {}  # shard -> (task, stop event)
+        self.log = logging.getLogger(__name__)
+
+    async def tick(self):
+        now_ms = int(time.time() * 1000)
+        await self.r.zadd(MEMBERS_KEY, {self.consumer: now_ms})
+        await self.r.zremrangebyscore(MEMBERS_KEY, "-inf", now_ms - LEASE_MS)
+        members = sorted(await self.r.zrange(MEMBERS_KEY, 0, -1)) or [self.consumer]
+        wanted = {s for s in range(self.shards) if shard_owner(s, members) == self.consumer}
+
+        # Shards que ya no tocan: terminan su lote y liberan el lease
+        for shard in [s for s in self.running if s not in wanted]:
+            await self._stop(shard)
+
+        for shard in range(self.shards):
+            if shard in self.running:
+                task, _ = self.running[shard]
+                renewed = not task.done() and await self.r.eval(
+                    RENEW_LEASE, 1, lease_key(shard), self.consumer, LEASE_MS
+                )
+                if not renewed:
+                    # Lease perdido (pausa larga, Redis reiniciado) o tarea caída
+                    self.log.warning(f"Shard {shard}: lease perdido, se detiene")
+                    task.cancel()
+                    self.running.pop(shard)
+            elif shard in wanted:
+                # El dueño anterior puede estar terminando su lote: se reintenta en el próximo tick
+                # (o el lease sigue a nombre propio porque su tarea se cayó)
+                key = lease_key(shard)
+                if (await self.r.set(key, self.consumer, nx=True, px=LEASE_MS)
+                        or await self.r.eval(RENEW_LEASE, 1, key, self.consumer, LEASE_MS)):
+                    stop = asyncio.Event()
+                    self.running[shard] = (asyncio.create_task(run_shard(self.r, shard, stop)), stop)
+                    self.log.info(f"Shard {shard} asignado a {self.consumer} ({len(members)} miembros)")
+
+    async def _stop(self, shard: int):
+        task, stop = self.running.pop(shard)
+        stop.set()
+        try:
+            await asyncio.wait_for(task, timeout=LEASE_MS / 1000)
+        except asyncio.TimeoutError:
+            task.cancel()
+        except Exception:
+            pass
+        await self.r.eval(RELEASE_LEASE, 1, lease_key(shard), self.consumer)
+        self.log.info(f"Shard {shard} liberado por {self.consumer}")
+
+    async def run(self, stopping: asyncio.Event):
+        backoff = 1
+        while not stopping.is_set():
+            try:
+                await self.tick()
+                await self.r.set(f"hb:{STREAM_KEY}:{GROUP}:{self.consumer}",
+                                 int(datetime.utcnow().timestamp()), ex=30)
+                backoff = 1
+            except Exception as e:
+                self.log.exception(f"Supervisor: {e}")
+                backoff = min(backoff * 2, 30)
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=REBALANCE_S if backoff == 1 else backoff)
+            except asyncio.TimeoutError:
+                pass
+
+        # Salida ordenada: los demás miembros toman los shards en su próximo tick
+        for shard in list(self.running):
+            await self._stop(shard)
+        await self.r.zrem(MEMBERS_KEY, self.consumer)
+
+
+async def run_sharded(r, consumer: str = CONSUMER):
+    await ensure_group(r, all_streams())
+    logging.getLogger(__name__).info(
+        f"Supervisor listo: stream={STREAM_KEY} shards={STREAM_SHARDS} group={GROUP} consumer={consumer} "
+        f"batch={BATCH_SIZE} linger={LINGER_MS}ms"
+    )
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    await ShardSupervisor(r, consumer).run(stopping)
+#endregion
+
+
+async def metrics_loop(r):
+    """Actualiza los gauges de los streams (XINFO) para Prometheus."""
+    log = logging.getLogger(__name__)
+    while True:
+        try:
+            await metrics.stream_stats(r, all_streams(), GROUP)
+        except Exception as e:
+            log.warning(f"Métricas de streams: {e}")
+        await asyncio.sleep(METRICS_S)
+
+
+async def main(consumer: str = CONSUMER, metrics_port: int = METRICS_PORT):
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    await init_db()
+
+    url = os.getenv("REDIS_URL", "redis://localhost:6379")
+    r = redis.from_url(url, decode_responses=True)
+    if metrics.PROMETHEUS_AVAILABLE and metrics_port:
+        metrics.start_http_server(metrics_port)
+        asyncio.create_task(metrics_loop(r))
+    if STREAM_SHARDS > 1:
+        await run_sharded(r, consumer)
+    else:
+        await run_single(r)
+
+
+def _run_process(consumer: str, metrics_port: int):
+    asyncio.run(main(consumer, metrics_port))
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    if STREAM_SHARDS > 1 and PROCESSES > 1:
+        # Un supervisor por proceso (un núcleo cada uno); se reparten los shards como cualquier otro miembro
+        procs = [multiprocessing.Process(target=_run_process, args=(f"{CONSUMER}-{i}", METRICS_PORT and METRICS_PORT + i))
+                 for i in range(PROCESSES)]
+        for p in procs:
+            p.start()
+        # SIGTERM del pod llega al proceso padre: se reenvía para que cada supervisor salga ordenadamente
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: [p.terminate() for p in procs if p.is_alive()])
+        for p in procs:
+            p.join()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,78 @@
+import argparse, asyncio, json, logging, os, uuid
+import redis.asyncio as redis
+
+from events import STREAM_MAXLEN, stream_entry
+
+# Reinyecta en los streams los eventos de la DLQ, por lotes (un pipeline XADD + XDEL por lote).
+# Cada evento vuelve con su id original: si ya se había proyectado, processed_events lo descarta.
+# El stream se recalcula con stream_entry (no orig_stream) por si cambió EVENT_STREAM_SHARDS.
+# Las entradas con payload inválido se dejan en la DLQ; reinyectarlas solo las devolvería ahí.
+#   python dlq_replay.py --dry-run
+#   python dlq_replay.py --type ItemAdjusted --max 1000
+
+DLQ_STREAM = os.getenv("DLQ_STREAM", "events-dlq")
+
+log = logging.getLogger(__name__)
+
+
+def _replay_fields(fields: dict):
+    """(stream, campos) para reinyectar una entrada de la DLQ; None si no se puede."""
+    try:
+        payload = json.loads(fields.get("payload") or "")
+    except ValueError:
+        return None
+    if not fields.get("type") or not isinstance(payload, dict):
+        return None
+    # Las entradas anteriores a que la DLQ guardara el id vuelven con uno nuevo
+    event_id = fields.get("id") or str(uuid.uuid4())
+    return stream_entry(fields["type"], fields["payload"], event_id)
+
+
+async def replay(r, batch: int = 100, limit: int = 0, event_type: str = None, dry_run: bool = False) -> dict:
+    stats = {"replayed": 0, "skipped": 0}
+    last_id = "-"
+    while not limit or stats["replayed"] < limit:
+        count = min(batch, limit - stats["replayed"]) if limit else batch
+        entries = await r.xrange(DLQ_STREAM, last_id, "+", count=count)
+        if not entries:
+            break
+        last_id = f"({entries[-1][0]}"
+
+        pipe = r.pipeline(transaction=False)
+        replayed = []
+        for dlq_id, fields in entries:
+            if event_type and fields.get("type") != event_type:
+                continue
+            entry = _replay_fields(fields)
+            if entry is None:
+                log.warning(f"{dlq_id}: payload o tipo inválido; queda en la DLQ")
+                stats["skipped"] += 1
+                continue
+            stream, new_fields = entry
+            pipe.xadd(stream, new_fields, maxlen=STREAM_MAXLEN, approximate=True)
+            replayed.append(dlq_id)
+        if replayed and not dry_run:
+            # XADD antes que XDEL: si se corta a mitad, el evento queda repetido, no perdido
+            pipe.xdel(DLQ_STREAM, *replayed)
+            await pipe.execute()
+        stats["replayed"] += len(replayed)
+        log.info(f"Lote: {len(replayed)} reinyectados ({stats})")
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Reinyecta los eventos de la DLQ en sus streams")
+    parser.add_argument("--batch", type=int, default=100, help="entradas por lote")
+    parser.add_argument("--max", type=int, default=0, help="máximo de eventos a reinyectar (0 = todos)")
+    parser.add_argument("--type", dest="event_type", help="solo eventos de este tipo")
+    parser.add_argument("--dry-run", action="store_true", help="muestra qué se reinyectaría sin tocar nada")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True)
+    stats = await replay(r, args.batch, args.max, args.event_type, args.dry_run)
+    log.info(f"{'(dry-run) ' if args.dry_run else ''}DLQ: {stats}; quedan {await r.xlen(DLQ_STREAM)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
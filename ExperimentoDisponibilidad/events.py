@@ -1,4 +1,4 @@
-import json, os, logging, uuid
+import json, os, logging, uuid, zlib
 from fastapi.encoders import jsonable_encoder
 import redis.asyncio as redis
 from redis.exceptions import ResponseError
@@ -8,6 +8,25 @@ redis_client: Redis = None
 EVENT_GROUP   = os.getenv("EVENT_GROUP", "projector")
 STREAM_KEY    = os.getenv("EVENT_STREAM", "events-stream")
 STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "100000"))
+STREAM_SHARDS = int(os.getenv("EVENT_STREAM_SHARDS", "1"))  # 1 = un solo stream (modo clásico)
+SHARD_KEY     = ("tenant_id", "warehouse_id", "product_id")
+
+
+def shard_for(payload: dict, shards: int = STREAM_SHARDS) -> int:
+    """Shard de un evento: hash estable (crc32, igual en todos los procesos) de tenant+bodega+producto."""
+    if shards <= 1:
+        return 0
+    key = "|".join(str(payload.get(k) or "") for k in SHARD_KEY)
+    return zlib.crc32(key.encode()) % shards
+
+
+def shard_stream(shard: int, shards: int = STREAM_SHARDS) -> str:
+    # Con un solo shard se conserva el nombre original del stream
+    return STREAM_KEY if shards <= 1 else f"{STREAM_KEY}:{shard}"
+
+
+def all_streams(shards: int = STREAM_SHARDS) -> list:
+    return [shard_stream(i, shards) for i in range(max(shards, 1))]
 
 def _get_redis_url():
     return os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -18,28 +37,50 @@ async def init_redis():
     global redis_client
     url = _get_redis_url()
     logging.getLogger(__name__).info(
-        f"Conectando a Redis en {url} | stream={STREAM_KEY} group={EVENT_GROUP}"
+        f"Conectando a Redis en {url} | stream={STREAM_KEY} shards={STREAM_SHARDS} group={EVENT_GROUP}"
     )
     redis_client = redis.from_url(url, decode_responses=True)
 
-    try:
-        # Crea stream (si no existe) y grupo; si ya existe, ignora BUSYGROUP
-        await redis_client.xgroup_create(name=STREAM_KEY, groupname=EVENT_GROUP, id="$", mkstream=True)
-    except ResponseError as e:
-        if "BUSYGROUP" not in str(e):
-            raise
+    for stream in all_streams():
+        try:
+            # Crea stream (si no existe) y grupo; si ya existe, ignora BUSYGROUP
+            await redis_client.xgroup_create(name=stream, groupname=EVENT_GROUP, id="$", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+
+def stream_entry(event_type: str, payload, event_id: str) -> tuple:
+    """(stream, campos) de un evento; payload puede ser dict o JSON ya serializado (outbox)."""
+    if isinstance(payload, str):
+        raw, data = payload, json.loads(payload)
+    else:
+        data = jsonable_encoder(payload)  # encoding payload por problema de json.dumps
+        raw = json.dumps(data)
+    # Todos los eventos de un mismo producto (por tenant y bodega) van al mismo shard, en orden.
+    # Un evento con varias claves (carga masiva) ya viene agrupado por shard y lo indica en "shard"
+    shard = data["shard"] if "shard" in data else shard_for(data)
+    return shard_stream(shard), {"id": str(event_id), "type": event_type, "payload": raw}
 
 
 async def publish_event(event_type: str, payload: dict, event_id: str | None = None):
-    """Publica evento duradero (Stream) con un event_id para idempotencia del proyector."""
+    """Publica evento duradero (Stream) con un event_id para idempotencia del proyector.
+
+    Los comandos no lo usan: escriben en el outbox (enqueue_event) y outbox_relay.py publica.
+    """
     if not redis_client:
         raise RuntimeError("Redis no inicializado; llama init_redis() en startup")
 
-    encoded_payload = jsonable_encoder(payload) # encoding payload por problema de json.dumps
-    event = {
-        "id"     : event_id or str(uuid.uuid4()),  # id lógico para idempotencia
-        "type"   : event_type,
-        "payload": json.dumps(encoded_payload)
-    }
+    # id lógico para idempotencia
+    stream, event = stream_entry(event_type, payload, event_id or str(uuid.uuid4()))
+    await redis_client.xadd(stream, event, maxlen=STREAM_MAXLEN, approximate=True)
 
-    await redis_client.xadd(STREAM_KEY, event, maxlen=STREAM_MAXLEN, approximate=True)
+
+async def enqueue_event(conn, event_type: str, payload: dict, event_id=None) -> str:
+    """Guarda el evento en el outbox dentro de la transacción de conn; se publica tras el commit."""
+    event_id = str(event_id or uuid.uuid4())
+    await conn.execute(
+        "INSERT INTO outbox(event_id, event_type, payload) VALUES($1, $2, $3::jsonb)",
+        uuid.UUID(event_id), event_type, json.dumps(jsonable_encoder(payload)),
+    )
+    return event_id
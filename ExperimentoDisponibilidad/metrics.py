@@ -0,0 +1,88 @@
+import os, time
+
+# Métricas del pipeline de eventos (Prometheus, opcional) y estado de los streams para /readyz.
+# La API las publica en /metrics; consumers.py en PROJECTOR_METRICS_PORT (un puerto por proceso).
+
+DLQ_STREAM = os.getenv("DLQ_STREAM", "events-dlq")
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+if PROMETHEUS_AVAILABLE:
+    # Estado de los streams (XINFO): igual en todas las réplicas, lo reporta quien lo consulte
+    STREAM_LENGTH  = Gauge("stream_length", "Entradas en el stream", ["stream"])
+    STREAM_LAG     = Gauge("stream_group_lag", "Entradas del stream aún no entregadas al grupo", ["stream"])
+    STREAM_PENDING = Gauge("stream_group_pending", "Entradas entregadas al grupo y sin ACK", ["stream"])
+    STREAM_LAG_S   = Gauge("stream_group_lag_seconds",
+                           "Antigüedad de la entrada más vieja sin proyectar (no entregada o pendiente)", ["stream"])
+    DLQ_LENGTH     = Gauge("stream_dlq_length", "Entradas en la DLQ")
+
+    # Proyector
+    EVENTS         = Counter("projector_events_total", "Eventos procesados", ["type", "result"])  # ok|failed
+    EVENT_SECONDS  = Counter("projector_event_seconds_total",
+                             "Tiempo de proyección atribuido a cada tipo (el de un lote se reparte por evento)", ["type"])
+    BATCH_SECONDS  = Histogram("projector_batch_seconds", "Duración de la transacción de un lote",
+                               buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+    BATCH_SIZE     = Histogram("projector_batch_size", "Entradas por lote",
+                               buckets=(1, 8, 32, 64, 128, 256, 512, 1024, 2048))
+    PROJECTION_LAG = Gauge("projector_lag_seconds", "Lag del evento más viejo del último lote proyectado", ["stream"])
+    RETRIES        = Counter("projector_retries_total", "Fallos de proyección que quedan para reintento", ["stream"])
+    DLQ_MOVED      = Counter("projector_dlq_total", "Eventos enviados a la DLQ", ["stream", "type"])
+
+
+def _ms(entry_id: str) -> int:
+    return int(entry_id.split("-", 1)[0])
+
+
+async def stream_stats(r, streams: list, group: str) -> dict:
+    """Por stream: length, lag (entradas sin entregar), pending y lag_s (segundos). Actualiza los gauges."""
+    now_ms = int(time.time() * 1000)
+    stats = {}
+    for stream in streams:
+        length = await r.xlen(stream)
+        info = next((g for g in await r.xinfo_groups(stream) if g["name"] == group), None) if length else None
+        lag, pending, oldest_ms = 0, 0, None
+        if info:
+            pending = int(info["pending"])
+            # Primera entrada no entregada al grupo: su antigüedad es el lag
+            undelivered = await r.xrange(stream, f"({info['last-delivered-id']}", "+", count=1)
+            if undelivered:
+                oldest_ms = _ms(undelivered[0][0])
+            lag = info.get("lag")
+            if lag is None:  # Redis < 7 no informa lag
+                lag = len(await r.xrange(stream, f"({info['last-delivered-id']}", "+", count=10000))
+            if pending:
+                summary = await r.xpending(stream, group)
+                oldest_ms = min(oldest_ms or now_ms, _ms(summary["min"]))
+        stats[stream] = {
+            "length": length, "lag": int(lag or 0), "pending": pending,
+            "lag_s": round((now_ms - oldest_ms) / 1000, 3) if oldest_ms else 0.0,
+        }
+        if PROMETHEUS_AVAILABLE:
+            STREAM_LENGTH.labels(stream).set(length)
+            STREAM_LAG.labels(stream).set(stats[stream]["lag"])
+            STREAM_PENDING.labels(stream).set(pending)
+            STREAM_LAG_S.labels(stream).set(stats[stream]["lag_s"])
+    if PROMETHEUS_AVAILABLE:
+        DLQ_LENGTH.set(await r.xlen(DLQ_STREAM))
+    return stats
+
+
+def observe_batch(events: list, seconds: float, result: str = "ok"):
+    if not PROMETHEUS_AVAILABLE or not events:
+        return
+    BATCH_SECONDS.observe(seconds)
+    BATCH_SIZE.observe(len(events))
+    share = seconds / len(events)
+    for event in events:
+        EVENTS.labels(event.get("type") or "", result).inc()
+        EVENT_SECONDS.labels(event.get("type") or "").inc(share)
+
+
+def observe_event(event_type: str, seconds: float, result: str):
+    if PROMETHEUS_AVAILABLE:
+        EVENTS.labels(event_type or "", result).inc()
+        EVENT_SECONDS.labels(event_type or "").inc(seconds)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional
+from uuid import UUID
 from datetime import datetime, date
 
 class ItemKey(BaseModel):
@@ -29,8 +30,38 @@ class StockAdjust(ItemKey):
     reason: Optional[str] = None
 
 class StockReserve(ItemKey):
-    qty_to_reserve: int
+    qty_to_reserve: int = Field(gt=0)
     reason: Optional[str] = None
+    reservation_id: Optional[UUID] = None       # para reintentar sin reservar dos veces
+    ttl_s: Optional[int] = Field(default=None, gt=0)
+
+class ReservationResponse(ItemKey):
+    reservation_id: UUID
+    qty: int
+    bucket: Optional[int] = None
+    status: str
+    expires_at: datetime
+    released_at: Optional[datetime] = None
+
+class StockAllocate(BaseModel):
+    tenant_id: str
+    warehouse_id: str
+    product_id: str
+    qty_to_allocate: int = Field(gt=0)
+    min_expiry_date: Optional[date] = None      # por defecto: lo que no ha vencido
+    reason: Optional[str] = None
+    allocation_id: Optional[UUID] = None        # para reintentar sin reservar dos veces
+    ttl_s: Optional[int] = Field(default=None, gt=0)
+
+class AllocatedReservation(ReservationResponse):
+    expiry_date: Optional[date] = None
+
+class AllocationResponse(BaseModel):
+    allocation_id: UUID
+    reservations: list[AllocatedReservation]
+
+class ItemBuckets(ItemKey):
+    buckets: int = Field(ge=1, le=64)           # 1 = sin buckets
 
 class ItemResponse(ItemKey):
     qty_on_hand: int
@@ -0,0 +1,91 @@
+import asyncio, logging, os
+import asyncpg
+import redis.asyncio as redis
+
+import db
+from db import init_db
+from events import STREAM_MAXLEN, stream_entry
+
+# Relay del outbox: publica en el stream los eventos que los comandos guardaron en la tabla outbox
+# (misma transacción que el cambio) y los borra. Despierta con LISTEN/NOTIFY al confirmarse cada
+# comando y, por si se pierde un aviso, revisa la tabla cada OUTBOX_POLL_S.
+#
+# Orden: dos comandos sobre el mismo item se serializan en el bloqueo de su fila, así que el
+# segundo toma su id del outbox después del commit del primero; publicando por id el orden por
+# item se conserva. Por eso solo un relay publica a la vez (advisory lock); los demás esperan.
+# Entrega: si el relay cae entre XADD y DELETE, el evento se publica de nuevo con el mismo id y
+# el proyector lo descarta en processed_events.
+
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+POLL_S     = float(os.getenv("OUTBOX_POLL_S", "1"))
+LOCK_ID    = int(os.getenv("OUTBOX_LOCK_ID", "7310001"))
+CHANNEL    = "outbox_new"
+
+log = logging.getLogger(__name__)
+
+
+async def drain(r) -> int:
+    """Publica el outbox por lotes de BATCH_SIZE (un pipeline de XADD por lote). Devuelve cuántos."""
+    total = 0
+    while True:
+        async with db.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, event_id, event_type, payload::text AS payload FROM outbox ORDER BY id LIMIT $1",
+                BATCH_SIZE,
+            )
+        if not rows:
+            return total
+
+        pipe = r.pipeline(transaction=False)
+        for row in rows:
+            stream, fields = stream_entry(row["event_type"], row["payload"], row["event_id"])
+            pipe.xadd(stream, fields, maxlen=STREAM_MAXLEN, approximate=True)
+        await pipe.execute()
+
+        async with db.pool.acquire() as conn:
+            await conn.execute("DELETE FROM outbox WHERE id = ANY($1::bigint[])", [row["id"] for row in rows])
+
+        total += len(rows)
+        if len(rows) < BATCH_SIZE:
+            return total
+
+
+async def main():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    await init_db()
+    r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True)
+
+    # Conexión propia (fuera del pool) para el lock y LISTEN: si se cae, se pierden los dos
+    listen_conn = await asyncpg.connect(db._get_db_dsn())
+    while not await listen_conn.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_ID):
+        log.info("Otro relay está publicando; en espera")
+        await asyncio.sleep(POLL_S * 5)
+
+    wake = asyncio.Event()
+    await listen_conn.add_listener(CHANNEL, lambda *_: wake.set())
+    log.info(f"Relay listo: batch={BATCH_SIZE} poll={POLL_S}s")
+
+    backoff = 1
+    while True:
+        if listen_conn.is_closed():
+            # Sin la conexión no hay lock: otro relay puede haber tomado el relevo
+            raise SystemExit("Conexión de LISTEN cerrada; se reinicia el relay")
+        try:
+            # Se limpia antes de drenar: un aviso que llegue mientras tanto provoca otra vuelta
+            wake.clear()
+            published = await drain(r)
+            if published:
+                log.debug(f"Publicados {published} eventos del outbox")
+            backoff = 1
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=POLL_S)
+            except asyncio.TimeoutError:
+                pass
+        except Exception as e:
+            log.exception(f"Loop relay: {e}")
+            await asyncio.sleep(min(backoff, 30))
+            backoff = min(backoff * 2, 30)  # backoff exponencial con techo
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
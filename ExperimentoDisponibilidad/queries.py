@@ -1,16 +1,152 @@
-from db import fetch
+import base64, binascii, json, logging, os
+from db import fetch, fetchrow
+
+PAGE_SIZE     = int(os.getenv("ITEMS_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("ITEMS_MAX_PAGE_SIZE", "1000"))
+CACHE_TTL_S   = int(os.getenv("ITEMS_CACHE_TTL_S", "300"))   # cota si se pierde un refresco del proyector
+CACHE_WARM    = int(os.getenv("ITEMS_CACHE_WARM_MAX", "16"))  # bodegas cuya primera página recalcula el proyector por lote
+CACHE_PREFIX  = "items:cache"
+
+log = logging.getLogger(__name__)
+
+#region Listado por bodega
+# Orden FEFO (vence primero, sin vencimiento al final) con la clave completa como desempate, para que
+# el cursor sea único. COALESCE(..., 'infinity') equivale a NULLS LAST y permite comparar filas;
+# inv_search_idx_list (schema.sql) tiene estas columnas en este orden e incluye el resto.
+SORT_KEY = "COALESCE(expiry_date, 'infinity'::date), product_id, location_id, lot_number, serial_number"
+
+LIST_SQL = f"""
+  SELECT * FROM inventory_search
+  WHERE tenant_id=$1 AND warehouse_id=$2 {{after}}
+  ORDER BY {SORT_KEY}
+  LIMIT $3
+"""
+FIRST_PAGE_SQL = LIST_SQL.format(after="")
+NEXT_PAGE_SQL  = LIST_SQL.format(after=f"AND ({SORT_KEY}) > ($4::text::date, $5, $6, $7, $8)")
+
+
+def encode_cursor(row) -> str:
+    expiry = row["expiry_date"].isoformat() if row["expiry_date"] else "infinity"
+    raw = json.dumps([expiry, row["product_id"], row["location_id"], row["lot_number"], row["serial_number"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Lanza ValueError si el cursor no es uno de encode_cursor."""
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(after, list) or len(after) != 5 or not all(isinstance(v, str) for v in after):
+        raise ValueError("Cursor inválido")
+    return after
+
+
+def _json_default(value):
+    # Lo mismo que jsonable_encoder para los tipos de inventory_search (fechas y NUMERIC), sin su costo por campo
+    return value.isoformat() if hasattr(value, "isoformat") else float(value)
+
+
+async def _load_page(tenant_id: str, warehouse_id: str, limit: int, cursor: str = None) -> tuple:
+    """(items en JSON, cursor siguiente o None) desde inventory_search."""
+    if cursor:
+        rows = await fetch(NEXT_PAGE_SQL, tenant_id, warehouse_id, limit, *decode_cursor(cursor))
+    else:
+        rows = await fetch(FIRST_PAGE_SQL, tenant_id, warehouse_id, limit)
+    body = json.dumps([dict(r) for r in rows], default=_json_default)
+    return body, encode_cursor(rows[-1]) if len(rows) == limit else None
+#endregion
+
+
+#region Caché (Redis)
+# Una generación por (tenant, bodega): el proyector la incrementa al cambiar inventory_search y las
+# páginas se guardan bajo la generación leída antes de consultar la base. Una lectura que se cruza
+# con un refresco deja su página en la generación vieja, que ya nadie lee y vence por TTL.
+def _gen_key(tenant_id: str, warehouse_id: str) -> str:
+    return f"{CACHE_PREFIX}:gen:{tenant_id}:{warehouse_id}"
+
+
+def _pages_key(tenant_id: str, warehouse_id: str, gen) -> str:
+    return f"{CACHE_PREFIX}:{tenant_id}:{warehouse_id}:{gen}"
+
+
+async def listar_items(r, tenant_id: str, warehouse_id: str, limit: int = PAGE_SIZE, cursor: str = None,
+                       use_cache: bool = True) -> tuple:
+    """(items en JSON, cursor siguiente). Con r=None o Redis caído lee directo de la base."""
+    if cursor:
+        decode_cursor(cursor)  # un cursor inválido no llega a la caché
+    if r is None:
+        return await _load_page(tenant_id, warehouse_id, limit, cursor)
+
+    field = f"{limit}:{cursor or ''}"
+    try:
+        gen = await r.get(_gen_key(tenant_id, warehouse_id)) or "0"
+        pages_key = _pages_key(tenant_id, warehouse_id, gen)
+        if use_cache:
+            body, next_cursor = await r.hmget(pages_key, field, f"{field}:next")
+            if body is not None:
+                return body, next_cursor or None
+    except Exception as e:
+        log.warning(f"Caché de /items no disponible: {e}")
+        return await _load_page(tenant_id, warehouse_id, limit, cursor)
+
+    body, next_cursor = await _load_page(tenant_id, warehouse_id, limit, cursor)
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.hset(pages_key, mapping={field: body, f"{field}:next": next_cursor or ""})
+        pipe.expire(pages_key, CACHE_TTL_S)
+        await pipe.execute()
+    except Exception as e:
+        log.warning(f"No se guardó la página en caché: {e}")
+    return body, next_cursor
+
+
+async def refresh_cache(r, warehouses) -> None:
+    """Invalida las páginas de las bodegas (tenant, bodega) y recalcula la primera de hasta CACHE_WARM."""
+    warehouses = sorted(set(warehouses))
+    if not warehouses:
+        return
+    pipe = r.pipeline(transaction=False)
+    for tenant_id, warehouse_id in warehouses:
+        pipe.incr(_gen_key(tenant_id, warehouse_id))
+    await pipe.execute()
+    for tenant_id, warehouse_id in warehouses[:CACHE_WARM]:
+        await listar_items(r, tenant_id, warehouse_id, use_cache=False)
+#endregion
+
+
+#region Picking FEFO
+# Las filas despachables del producto en orden de vencimiento (inv_search_idx_fefo) con el acumulado
+# de disponible; se corta en la primera fila con la que el acumulado alcanza lo pedido.
+FEFO_ORDER = "COALESCE(expiry_date, 'infinity'::date), location_id, lot_number, serial_number"
+
+ALLOCATE_SQL = f"""
+  SELECT location_id, lot_number, serial_number, expiry_date, qty_available,
+         LEAST(qty_available, $4 - (running - qty_available))::int AS qty
+  FROM (
+    SELECT location_id, lot_number, serial_number, expiry_date, qty_available,
+           sum(qty_available) OVER (ORDER BY {FEFO_ORDER} ROWS UNBOUNDED PRECEDING) AS running
+    FROM inventory_search
+    WHERE tenant_id=$1 AND warehouse_id=$2 AND product_id=$3
+      AND qty_available > 0 AND quality_status = 'Available'
+      AND COALESCE(expiry_date, 'infinity'::date) >= COALESCE($5::date, current_date)
+  ) s
+  WHERE running - qty_available < $4
+  ORDER BY {FEFO_ORDER}
+"""
+
+
+async def asignar_fefo(tenant_id: str, warehouse_id: str, product_id: str, qty: int, min_expiry_date=None) -> list:
+    """Líneas de picking (ubicación, lote, serie, cantidad) que suman qty, o todo lo que haya si no alcanza.
+    Sin min_expiry_date se omite lo ya vencido."""
+    rows = await fetch(ALLOCATE_SQL, tenant_id, warehouse_id, product_id, qty, min_expiry_date)
+    return [dict(r) for r in rows]
+#endregion
 
-async def listar_items(tenant_id: str, warehouse_id: str):
-    return await fetch("""
-      SELECT * FROM inventory_search
-      WHERE tenant_id=$1 AND warehouse_id=$2
-      ORDER BY expiry_date NULLS LAST, product_id
-    """, tenant_id, warehouse_id)
 
 async def obtener_item(key):
-    rows = await fetch("""
+    return await fetchrow("""
       SELECT * FROM inventory_search
       WHERE tenant_id=$1 AND warehouse_id=$2 AND location_id=$3 AND product_id=$4
         AND lot_number=COALESCE($5,'') AND serial_number=COALESCE($6,'')
     """, key.tenant_id, key.warehouse_id, key.location_id, key.product_id, key.lot_number, key.serial_number)
-    return rows[0] if rows else None
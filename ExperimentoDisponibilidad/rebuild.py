@@ -0,0 +1,207 @@
+import asyncio, logging, os, re, time
+import asyncpg
+import redis.asyncio as redis
+
+import db
+from db import init_db
+from consumers import (BATCH_SIZE, PROJECTION_COLUMNS, PROJECTION_SELECT, _keys_of, _to_event, project_batch_sql,
+                       project_keys, switch)
+from events import all_streams
+
+# Reconstrucción de inventory_search sin cortar las consultas de /items:
+#   1. Se anota el último id de cada stream y después se abre un snapshot REPEATABLE READ exportado.
+#      Todo cambio que no esté en el snapshot se publicó después de esos ids.
+#   2. WORKERS conexiones comparten el snapshot (SET TRANSACTION SNAPSHOT) y copian cada una un
+#      rango de páginas (ctid) de inventory_item a la tabla sombra, que aún no tiene índices.
+#   3. Se crean los índices de inventory_search sobre la sombra (en paralelo) y se hace ANALYZE.
+#   4. Se ponen al día desde los ids anotados: la proyección relee inventory_item, así que basta con
+#      juntar las claves de los eventos y refrescarlas con la misma sentencia del proyector.
+#   5. Cuando quedan pocos eventos se bloquea inventory_search contra escrituras (las lecturas siguen),
+#      se hace la última pasada y se intercambian los nombres en la misma transacción. El proyector
+#      que esperaba el bloqueo escribe ya en la tabla nueva.
+
+TABLE       = "inventory_search"
+SHADOW      = f"{TABLE}_rebuild"
+WORKERS     = int(os.getenv("REBUILD_WORKERS", "4"))
+CATCHUP_MAX = int(os.getenv("REBUILD_CATCHUP_MAX", str(BATCH_SIZE)))   # eventos pendientes para pasar al swap
+LOCK_MS     = int(os.getenv("REBUILD_LOCK_TIMEOUT_MS", "2000"))         # espera máxima por los locks del swap
+SWAP_TRIES  = int(os.getenv("REBUILD_SWAP_RETRIES", "10"))
+LOCK_ID     = int(os.getenv("REBUILD_LOCK_ID", "7310002"))
+INDEX_MEM   = os.getenv("REBUILD_MAINTENANCE_WORK_MEM", "256MB")        # por índice; se crean en paralelo
+
+log = logging.getLogger(__name__)
+
+
+async def stream_offsets(r) -> dict:
+    """Último id publicado en cada stream ("0-0" si está vacío)."""
+    offsets = {}
+    for stream in all_streams():
+        last = await r.xrevrange(stream, "+", "-", count=1)
+        offsets[stream] = last[0][0] if last else "0-0"
+    return offsets
+
+
+#region Carga inicial
+async def bulk_load(dsn: str) -> int:
+    """Copia inventory_item a la sombra desde un snapshot consistente, en WORKERS rangos de páginas."""
+    leader = await asyncpg.connect(dsn)
+    try:
+        async with leader.transaction(isolation="repeatable_read", readonly=True):
+            snapshot = await leader.fetchval("SELECT pg_export_snapshot()")
+            pages = await leader.fetchval(
+                "SELECT GREATEST(pg_relation_size('inventory_item') / current_setting('block_size')::int, 1)"
+            )
+            step = -(-pages // WORKERS)
+
+            async def load_range(first: int) -> int:
+                # El último rango queda abierto: cubre las páginas que se agreguen durante la carga
+                upper = f"AND i.ctid < '({first + step},0)'::tid" if first + step < pages else ""
+                conn = await asyncpg.connect(dsn)
+                try:
+                    async with conn.transaction(isolation="repeatable_read"):
+                        await conn.execute(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+                        status = await conn.execute(
+                            f"INSERT INTO {SHADOW} ({PROJECTION_COLUMNS}) {PROJECTION_SELECT} "
+                            f"WHERE i.ctid >= '({first},0)'::tid {upper}"
+                        )
+                    return int(status.split()[-1])
+                finally:
+                    await conn.close()
+
+            # El snapshot exportado vale mientras la transacción del líder siga abierta
+            loaded = await asyncio.gather(*(load_range(first) for first in range(0, pages, step)))
+    finally:
+        await leader.close()
+    return sum(loaded)
+
+
+async def create_shadow(conn):
+    await conn.execute(f"DROP TABLE IF EXISTS {SHADOW}")
+    await conn.execute(f"CREATE TABLE {SHADOW} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+
+
+async def shadow_indexes(conn) -> list:
+    """(índice de la sombra, nombre final, DDL) por cada índice de inventory_search, PK incluida."""
+    rows = await conn.fetch(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = $1", TABLE
+    )
+    indexes = []
+    for row in rows:
+        name = row["indexname"]
+        ddl = re.sub(rf" ON (\S+\.)?{TABLE} ", f" ON {SHADOW} ", row["indexdef"], count=1)
+        ddl = ddl.replace(f"INDEX {name} ON", f"INDEX {name}_rebuild ON", 1)
+        indexes.append((f"{name}_rebuild", name, ddl))
+    return indexes
+
+
+async def build_indexes(dsn: str, indexes: list):
+    async def build(ddl: str):
+        conn = await asyncpg.connect(dsn)
+        try:
+            await conn.execute(f"SET maintenance_work_mem = '{INDEX_MEM}'")
+            await conn.execute(ddl)
+        finally:
+            await conn.close()
+
+    await asyncio.gather(*(build(ddl) for _, _, ddl in indexes))
+    async with db.pool.acquire() as conn:
+        pkey = await conn.fetchval(
+            "SELECT conname FROM pg_constraint WHERE conrelid = $1::regclass AND contype = 'p'", TABLE
+        )
+        if pkey:
+            await conn.execute(f"ALTER TABLE {SHADOW} ADD CONSTRAINT {pkey}_rebuild PRIMARY KEY USING INDEX {pkey}_rebuild")
+        await conn.execute(f"ANALYZE {SHADOW}")
+#endregion
+
+
+#region Puesta al día y swap
+async def catch_up(r, conn, offsets: dict, sql: str) -> int:
+    """Refresca en la sombra las claves de los eventos posteriores a offsets (que avanza). Devuelve cuántos."""
+    total = 0
+    for stream, last_id in offsets.items():
+        while True:
+            entries = await r.xrange(stream, f"({last_id}", "+", count=BATCH_SIZE)
+            if not entries:
+                break
+            keys = set()
+            for _, fields in entries:
+                try:
+                    event = _to_event(fields)
+                except Exception:
+                    continue  # el proyector lo manda a la DLQ; aquí no aporta claves
+                if event["type"] in switch:
+                    keys.update(_keys_of(event))
+            await project_keys(conn, keys, sql)
+            last_id = entries[-1][0]
+            total += len(entries)
+        offsets[stream] = last_id
+    return total
+
+
+async def swap(r, offsets: dict, indexes: list, sql: str) -> int:
+    """Última pasada y cambio de nombres en una transacción; reintenta si no consigue los locks."""
+    for attempt in range(1, SWAP_TRIES + 1):
+        try:
+            async with db.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(f"SET LOCAL lock_timeout = {LOCK_MS}")
+                    # EXCLUSIVE frena al proyector pero deja leer; el ACCESS EXCLUSIVE del rename dura ms
+                    await conn.execute(f"LOCK TABLE {TABLE} IN EXCLUSIVE MODE")
+                    pending = await catch_up(r, conn, dict(offsets), sql)
+                    await conn.execute(f"DROP TABLE {TABLE}")
+                    await conn.execute(f"ALTER TABLE {SHADOW} RENAME TO {TABLE}")
+                    for shadow_name, name, _ in indexes:
+                        await conn.execute(f"ALTER INDEX {shadow_name} RENAME TO {name}")
+            return pending
+        except (asyncpg.LockNotAvailableError, asyncpg.QueryCanceledError) as e:
+            log.warning(f"Swap {attempt}/{SWAP_TRIES} sin lock ({e}); se reintenta")
+            async with db.pool.acquire() as conn:
+                await catch_up(r, conn, offsets, sql)
+    raise SystemExit("No se consiguió el lock para el swap; la tabla sombra queda para revisar")
+#endregion
+
+
+async def rebuild(r) -> dict:
+    dsn = db._get_db_dsn()
+    sql = project_batch_sql(SHADOW)
+    t0 = time.monotonic()
+    async with db.pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_ID):
+            raise SystemExit("Ya hay una reconstrucción en curso")
+        try:
+            await create_shadow(conn)
+            offsets = await stream_offsets(r)  # antes del snapshot: nada queda entre los dos
+            loaded = await bulk_load(dsn)
+            t_load = time.monotonic()
+            log.info(f"Carga inicial: {loaded} filas en {t_load - t0:.1f}s; offsets {offsets}")
+
+            indexes = await shadow_indexes(conn)
+            await build_indexes(dsn, indexes)
+            t_index = time.monotonic()
+            log.info(f"Índices: {len(indexes)} en {t_index - t_load:.1f}s")
+
+            caught = 0
+            while True:
+                n = await catch_up(r, conn, offsets, sql)
+                caught += n
+                if n <= CATCHUP_MAX:
+                    break
+            caught += await swap(r, offsets, indexes, sql)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_ID)
+
+    stats = {"rows": loaded, "caught_up": caught, "load_s": round(t_load - t0, 1),
+             "index_s": round(t_index - t_load, 1), "total_s": round(time.monotonic() - t0, 1)}
+    log.info(f"inventory_search reconstruida: {stats}")
+    return stats
+
+
+async def main():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    await init_db()
+    r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True)
+    await rebuild(r)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
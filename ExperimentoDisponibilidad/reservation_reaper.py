@@ -0,0 +1,56 @@
+import asyncio, logging, os
+
+import commands
+import db
+from db import init_db
+
+# Libera las reservas vencidas (evento ItemReleased por cada una), copia a inventory_item el reservado
+# de los SKU con buckets y borra las reservas cerradas hace más de RESERVATION_RETENTION_S.
+# Puede correr en varias réplicas: cada una toma reservas distintas (SKIP LOCKED).
+
+INTERVAL_S   = float(os.getenv("REAPER_INTERVAL_S", "1"))
+BATCH_SIZE   = int(os.getenv("REAPER_BATCH_SIZE", "500"))
+RETENTION_S  = int(os.getenv("RESERVATION_RETENTION_S", str(7 * 86400)))
+
+log = logging.getLogger(__name__)
+
+
+async def reap_once() -> dict:
+    expired = 0
+    while True:
+        n = await commands.expire_reservations(BATCH_SIZE)
+        expired += n
+        if n < BATCH_SIZE:
+            break
+    synced = await commands.sync_bucketed_reserved()
+    purged = await db.execute("""
+        DELETE FROM reservation WHERE reservation_id IN (
+            SELECT reservation_id FROM reservation
+            WHERE status <> 'Active' AND released_at < now() - make_interval(secs => $1)
+            LIMIT $2
+        )
+    """, RETENTION_S, BATCH_SIZE * 10)
+    return {"expired": expired, "synced": synced, "purged": int(purged.split()[-1])}
+
+
+async def main():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    await init_db()
+    log.info(f"Reaper listo: cada {INTERVAL_S}s, lote={BATCH_SIZE}")
+
+    backoff = 1
+    while True:
+        try:
+            stats = await reap_once()
+            if any(stats.values()):
+                log.info(f"Reservas: {stats}")
+            backoff = 1
+            await asyncio.sleep(INTERVAL_S)
+        except Exception as e:
+            log.exception(f"Loop reaper: {e}")
+            await asyncio.sleep(min(backoff, 30))
+            backoff = min(backoff * 2, 30)  # backoff exponencial con techo
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -46,10 +46,22 @@ CREATE INDEX IF NOT EXISTS inv_item_idx_loc
 CREATE INDEX IF NOT EXISTS inv_item_idx_storage
   ON inventory_item(tenant_id, warehouse_id, storage_class, product_id);
 
--- Ledger inmutable de movimientos (auditoría e idempotencia)
+-- Tablas de antes del particionado: se renombran y sus filas se copian más abajo
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'inventory_tx' AND relkind = 'r') THEN
+    ALTER TABLE inventory_tx RENAME TO inventory_tx_legacy;
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'processed_events' AND relkind = 'r') THEN
+    ALTER TABLE processed_events RENAME TO processed_events_legacy;
+  END IF;
+END $$;
+
+-- Ledger inmutable de movimientos (auditoría e idempotencia), particionado por mes.
+-- compactor.py crea las particiones por adelantado; la DEFAULT solo recibe filas fuera de rango.
 CREATE TABLE IF NOT EXISTS inventory_tx (
-  tx_id           BIGSERIAL PRIMARY KEY,
-  event_id        UUID NOT NULL UNIQUE,                 -- para idempotencia
+  tx_id           BIGSERIAL,
+  event_id        UUID NOT NULL,                        -- para idempotencia
   tenant_id       TEXT NOT NULL,
   warehouse_id    TEXT NOT NULL,
   location_id     TEXT NOT NULL,
@@ -61,9 +73,76 @@ CREATE TABLE IF NOT EXISTS inventory_tx (
   reason          TEXT,
   evidence_url    TEXT,
   performed_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
-  performed_by    TEXT
+  performed_by    TEXT,
+  PRIMARY KEY (tx_id, performed_at),
+  UNIQUE (event_id, performed_at)                       -- la clave de partición va en toda clave única
+) PARTITION BY RANGE (performed_at);
+
+CREATE TABLE IF NOT EXISTS inventory_tx_default PARTITION OF inventory_tx DEFAULT;
+
+-- Rollup diario del ledger: lo mantiene compactor.py; permite borrar meses viejos del ledger
+CREATE TABLE IF NOT EXISTS inventory_tx_daily (
+  day             DATE NOT NULL,                        -- UTC
+  tenant_id       TEXT NOT NULL,
+  warehouse_id    TEXT NOT NULL,
+  location_id     TEXT NOT NULL,
+  product_id      TEXT NOT NULL,
+  lot_number      TEXT NOT NULL DEFAULT '',
+  serial_number   TEXT NOT NULL DEFAULT '',
+  tx_type         TEXT NOT NULL,
+  qty_delta       BIGINT NOT NULL,
+  tx_count        INTEGER NOT NULL,
+  PRIMARY KEY (day, tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number, tx_type)
+);
+
+CREATE INDEX IF NOT EXISTS inv_tx_daily_idx_prod
+  ON inventory_tx_daily(tenant_id, product_id, day);
+
+-- Reservas con vencimiento: reservation_reaper.py libera las vencidas (evento ItemReleased)
+CREATE TABLE IF NOT EXISTS reservation (
+  reservation_id  UUID PRIMARY KEY,
+  tenant_id       TEXT NOT NULL,
+  warehouse_id    TEXT NOT NULL,
+  location_id     TEXT NOT NULL,
+  product_id      TEXT NOT NULL,
+  lot_number      TEXT NOT NULL DEFAULT '',
+  serial_number   TEXT NOT NULL DEFAULT '',
+  qty             INTEGER NOT NULL CHECK (qty > 0),
+  bucket          SMALLINT,                             -- NULL = reservada sobre inventory_item
+  status          TEXT NOT NULL DEFAULT 'Active',       -- Active|Released|Expired
+  reason          TEXT,
+  created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+  expires_at      TIMESTAMPTZ NOT NULL,
+  released_at     TIMESTAMPTZ
 );
 
+-- Reservas tomadas juntas por POST /items/allocate (una por línea del picking)
+ALTER TABLE reservation ADD COLUMN IF NOT EXISTS allocation_id UUID;
+
+CREATE INDEX IF NOT EXISTS reservation_idx_allocation
+  ON reservation(allocation_id) WHERE allocation_id IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS reservation_idx_expiry
+  ON reservation(expires_at) WHERE status = 'Active';
+
+CREATE INDEX IF NOT EXISTS reservation_idx_closed
+  ON reservation(released_at) WHERE status <> 'Active';
+
+-- Buckets de un SKU caliente: el disponible (qty_on_hand - qty_reserved) repartido en N filas para
+-- que N reservas avancen en paralelo. Con buckets, el reservado de verdad es qty_on_hand - sum(buckets);
+-- inventory_item.qty_reserved se sincroniza después (reservation_reaper.py).
+CREATE TABLE IF NOT EXISTS inventory_bucket (
+  tenant_id       TEXT NOT NULL,
+  warehouse_id    TEXT NOT NULL,
+  location_id     TEXT NOT NULL,
+  product_id      TEXT NOT NULL,
+  lot_number      TEXT NOT NULL DEFAULT '',
+  serial_number   TEXT NOT NULL DEFAULT '',
+  bucket          SMALLINT NOT NULL,
+  qty_available   INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (tenant_id, warehouse_id, location_id, product_id, lot_number, serial_number, bucket)
+) WITH (fillfactor = 50);                               -- espacio para updates HOT
+
 -- =========================
 -- READ-SIDE (denormalizado)
 -- =========================
@@ -93,14 +172,72 @@ CREATE TABLE IF NOT EXISTS inventory_search (
 CREATE INDEX IF NOT EXISTS inv_search_idx_product
   ON inventory_search(tenant_id, product_id);
 
-CREATE INDEX IF NOT EXISTS inv_search_idx_exp
-  ON inventory_search(tenant_id, warehouse_id, expiry_date);
+-- Listado de /items por bodega (queries.py): orden FEFO + clave como desempate del cursor, con el resto
+-- de columnas incluidas para que cada página sea un index-only scan. Reemplaza a inv_search_idx_exp
+DROP INDEX IF EXISTS inv_search_idx_exp;
+CREATE INDEX IF NOT EXISTS inv_search_idx_list
+  ON inventory_search(tenant_id, warehouse_id, (COALESCE(expiry_date, 'infinity'::date)),
+                      product_id, location_id, lot_number, serial_number)
+  INCLUDE (expiry_date, product_sku, product_name, manufacturer_id, manufacturer_name, qty_on_hand,
+           qty_reserved, qty_available, storage_class, last_temp_c, last_temp_ts, quality_status, updated_at);
+
+-- Picking FEFO (GET /items/allocate): solo lo que se puede despachar, en orden de vencimiento
+CREATE INDEX IF NOT EXISTS inv_search_idx_fefo
+  ON inventory_search(tenant_id, warehouse_id, product_id, (COALESCE(expiry_date, 'infinity'::date)),
+                      location_id, lot_number, serial_number)
+  INCLUDE (expiry_date, qty_available)
+  WHERE qty_available > 0 AND quality_status = 'Available';
 
 CREATE INDEX IF NOT EXISTS inv_search_idx_loc
   ON inventory_search(tenant_id, warehouse_id, location_id);
 
--- Eventos ya procesados por el proyector (para no duplicar)
+-- Eventos ya procesados por el proyector (para no duplicar), particionado por día: compactor.py
+-- borra las particiones más viejas que la retención del stream y de los reintentos
 CREATE TABLE IF NOT EXISTS processed_events (
-  event_id  UUID PRIMARY KEY,
-  processed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+  event_id  UUID NOT NULL,
+  processed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (event_id, processed_at)
+) PARTITION BY RANGE (processed_at);
+
+CREATE TABLE IF NOT EXISTS processed_events_default PARTITION OF processed_events DEFAULT;
+
+-- Copia de las tablas anteriores al particionado (caen en la DEFAULT; compactor.py las reparte)
+DO $$
+BEGIN
+  IF to_regclass('inventory_tx_legacy') IS NOT NULL THEN
+    INSERT INTO inventory_tx SELECT * FROM inventory_tx_legacy;
+    PERFORM setval(pg_get_serial_sequence('inventory_tx', 'tx_id'),
+                   (SELECT COALESCE(max(tx_id), 0) + 1 FROM inventory_tx_legacy), false);
+    DROP TABLE inventory_tx_legacy;
+  END IF;
+  IF to_regclass('processed_events_legacy') IS NOT NULL THEN
+    INSERT INTO processed_events SELECT * FROM processed_events_legacy;
+    DROP TABLE processed_events_legacy;
+  END IF;
+END $$;
+
+-- =========================
+-- OUTBOX (eventos pendientes de publicar)
+-- =========================
+-- Los comandos escriben aquí en la misma transacción que el cambio; outbox_relay.py los publica
+-- en el stream y los borra. Si el relay cae entre XADD y DELETE el evento se publica de nuevo con
+-- el mismo event_id, y processed_events lo descarta.
+CREATE TABLE IF NOT EXISTS outbox (
+  id          BIGSERIAL PRIMARY KEY,                    -- orden de publicación
+  event_id    UUID NOT NULL UNIQUE,
+  event_type  TEXT NOT NULL,
+  payload     JSONB NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
 );
+
+-- Avisa al relay al confirmar la transacción (un aviso por sentencia; PostgreSQL junta los repetidos)
+CREATE OR REPLACE FUNCTION outbox_notify() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('outbox_new', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER outbox_notify
+  AFTER INSERT ON outbox
+  FOR EACH STATEMENT EXECUTE FUNCTION outbox_notify();
@@ -0,0 +1,46 @@
+import http from "k6/http";
+import { check } from "k6";
+import { Trend } from "k6/metrics";
+
+// Carga inicial de una bodega por /items/upsert:bulk: ROWS items en NDJSON, en un solo POST.
+// Mide filas/s de la carga; la segunda iteración reenvía lo mismo (todo debe quedar como actualizado).
+//   k6 run -e BASE=http://localhost:8000 -e ROWS=1000000 tests/bulk_load.js
+
+const BASE = __ENV.BASE || "http://localhost:8000";
+const ROWS = parseInt(__ENV.ROWS || "200000", 10);
+const ROWS_PER_SEC = new Trend("bulk_rows_per_sec");
+
+export const options = {
+  iterations: 2,
+  vus: 1,
+  thresholds: {
+    checks: ["rate==1"],
+    bulk_rows_per_sec: ["min>10000"],   // 1M items en menos de ~100 s
+  },
+};
+
+function body() {
+  const lines = new Array(ROWS);
+  for (let i = 0; i < ROWS; i++) {
+    lines[i] = JSON.stringify({
+      tenant_id: "t-bulk", warehouse_id: `wh${i % 20}`, location_id: `L-${i % 500}`, product_id: `P-${i}`,
+      lot_number: "L1", qty_on_hand: 100, expiry_date: "2027-01-01",
+    });
+  }
+  return lines.join("\n") + "\n";
+}
+
+const BODY = body();
+
+export default function () {
+  const t0 = Date.now();
+  const r = http.post(`${BASE}/items/upsert:bulk`, BODY, {
+    headers: { "Content-Type": "application/x-ndjson" },
+    timeout: "600s",
+  });
+  const ok = check(r, {
+    "200": (res) => res.status === 200,
+    "todas las filas": (res) => res.json().rows === ROWS,
+  });
+  if (ok) ROWS_PER_SEC.add(ROWS / ((Date.now() - t0) / 1000));
+}
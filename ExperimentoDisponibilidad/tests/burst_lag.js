@@ -0,0 +1,78 @@
+import http from "k6/http";
+import { check, sleep } from "k6";
+import { Trend, Counter } from "k6/metrics";
+
+// Lag de proyección bajo ráfagas de ajustes: cada iteración ajusta +1 un item y mide cuánto tarda
+// el read-side (inventory_search) en mostrar el qty_on_hand nuevo.
+//   k6 run -e BASE=http://localhost:8000 tests/burst_lag.js
+// Comparar con PROJECTOR_BATCH_SIZE=1 PROJECTOR_LINGER_MS=0 en el worker (un evento por transacción).
+
+const BASE = __ENV.BASE || "http://localhost:8000";
+const ITEMS = parseInt(__ENV.ITEMS || "200", 10);
+const BURST_RPS = parseInt(__ENV.BURST_RPS || "800", 10);
+const HEADERS = { headers: { "Content-Type": "application/json" } };
+
+const LAG = new Trend("projection_lag", true);
+const TIMEOUTS = new Counter("projection_timeouts");
+
+export const options = {
+  scenarios: {
+    bursts: {
+      executor: "ramping-arrival-rate",
+      startRate: 10,
+      timeUnit: "1s",
+      preAllocatedVUs: 200,
+      maxVUs: 1000,
+      // tres ráfagas de 10s separadas por períodos tranquilos
+      stages: [
+        { target: BURST_RPS, duration: "2s" }, { target: BURST_RPS, duration: "10s" }, { target: 10, duration: "2s" },
+        { target: 10, duration: "15s" },
+        { target: BURST_RPS, duration: "2s" }, { target: BURST_RPS, duration: "10s" }, { target: 10, duration: "2s" },
+        { target: 10, duration: "15s" },
+        { target: BURST_RPS, duration: "2s" }, { target: BURST_RPS, duration: "10s" }, { target: 10, duration: "2s" },
+      ],
+    },
+  },
+  thresholds: {
+    http_req_failed: ["rate<0.01"],
+    projection_lag: ["p(95)<250", "p(99)<1000"],
+    projection_timeouts: ["count<1"],
+  },
+};
+
+function keyOf(i) {
+  return { tenant_id: "t-burst", warehouse_id: "wh1", location_id: "A-01", product_id: `P-${i}`, lot_number: "L1", serial_number: "" };
+}
+
+function readQty(key) {
+  const q = Object.entries(key).map(([k, v]) => `${k}=${encodeURIComponent(v)}`).join("&");
+  const r = http.get(`${BASE}/items/by-key?${q}`, { tags: { name: "by-key" } });
+  return r.status === 200 ? r.json().qty_on_hand : null;
+}
+
+export function setup() {
+  for (let i = 0; i < ITEMS; i++) {
+    http.post(`${BASE}/items/upsert`, JSON.stringify({ ...keyOf(i), qty_on_hand: 1000000 }), HEADERS);
+  }
+  sleep(2); // que el proyector alcance las altas
+}
+
+export default function () {
+  const key = keyOf(Math.floor(Math.random() * ITEMS));
+  const before = readQty(key);
+
+  const t0 = Date.now();
+  const r = http.post(`${BASE}/items/adjust`, JSON.stringify({ ...key, qty_delta: 1 }), HEADERS);
+  check(r, { "200": (res) => res.status === 200 });
+
+  // Otros VUs pueden ajustar el mismo item: basta con ver al menos nuestro +1
+  for (let i = 0; i < 300; i++) {
+    const qty = readQty(key);
+    if (qty !== null && before !== null && qty >= before + 1) {
+      LAG.add(Date.now() - t0);
+      return;
+    }
+    sleep(0.01);
+  }
+  TIMEOUTS.add(1);
+}
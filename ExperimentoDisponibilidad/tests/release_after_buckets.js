@@ -0,0 +1,43 @@
+import http from "k6/http";
+import { check, sleep } from "k6";
+
+// Reserva sin buckets -> set_buckets(BUCKETS) -> release -> sync del reaper.
+// Lo liberado debe volver a estar disponible (antes quedaba en inventory_item.qty_reserved y el sync lo pisaba).
+//   k6 run -e BASE=http://localhost:8000 tests/release_after_buckets.js
+// Requiere reservation_reaper.py corriendo (copia el reservado de los items con buckets a inventory_item).
+
+const BASE = __ENV.BASE || "http://localhost:8000";
+const STOCK = parseInt(__ENV.STOCK || "10", 10);
+const QTY = parseInt(__ENV.QTY || "4", 10);
+const BUCKETS = parseInt(__ENV.BUCKETS || "4", 10);
+const HEADERS = { headers: { "Content-Type": "application/json" } };
+const KEY = { tenant_id: "t-rel", warehouse_id: "wh1", location_id: "A-01", product_id: `REL-${Date.now()}`, lot_number: "", serial_number: "" };
+
+export const options = {
+  iterations: 1,
+  thresholds: { checks: ["rate==1"] },
+};
+
+export default function () {
+  http.post(`${BASE}/items/upsert`, JSON.stringify({ ...KEY, qty_on_hand: STOCK }), HEADERS);
+
+  const reserve = http.post(`${BASE}/items/reserve`, JSON.stringify({ ...KEY, qty_to_reserve: QTY, ttl_s: 3600 }), HEADERS);
+  check(reserve, { "reserva sin bucket": (r) => r.status === 200 && r.json().bucket === null });
+
+  const split = http.post(`${BASE}/items/buckets`, JSON.stringify({ ...KEY, buckets: BUCKETS }), HEADERS);
+  check(split, { "reparto del disponible": (r) => r.status === 200 && r.json().qty_available === STOCK - QTY });
+
+  const release = http.post(`${BASE}/items/reservations/${reserve.json().reservation_id}/release`, null, HEADERS);
+  check(release, { "liberada": (r) => r.status === 200 && r.json().status === "Released" });
+
+  sleep(3); // reaper (sync_bucketed_reserved) y proyector
+
+  // Repartir de nuevo con los mismos buckets devuelve la suma actual de los buckets
+  const again = http.post(`${BASE}/items/buckets`, JSON.stringify({ ...KEY, buckets: BUCKETS }), HEADERS);
+  check(again, { "lo liberado vuelve a los buckets": (r) => r.json().qty_available === STOCK });
+
+  sleep(2);
+  const q = Object.entries(KEY).map(([k, v]) => `${k}=${encodeURIComponent(v)}`).join("&");
+  const item = http.get(`${BASE}/items/by-key?${q}`).json();
+  check(item, { "sin reservado": (i) => i.qty_reserved === 0 && i.qty_available === STOCK });
+}
@@ -0,0 +1,63 @@
+import http from "k6/http";
+import { check, sleep } from "k6";
+import { Counter } from "k6/metrics";
+
+// Reservas concurrentes sobre un solo SKU: RATE reservas/s de 1 unidad contra STOCK unidades.
+// Nunca debe reservarse más que el stock (reserved_units <= STOCK) y al final el item debe cuadrar.
+//   k6 run -e BASE=http://localhost:8000 tests/reserve_hot_sku.js
+//   k6 run -e BUCKETS=1 tests/reserve_hot_sku.js   // sin buckets, para comparar
+// Con BUCKETS > 1 correr también reservation_reaper.py (copia el reservado a inventory_item).
+
+const BASE = __ENV.BASE || "http://localhost:8000";
+const RATE = parseInt(__ENV.RATE || "5000", 10);
+const DURATION = __ENV.DURATION || "30s";
+const STOCK = parseInt(__ENV.STOCK || "100000", 10);
+const BUCKETS = parseInt(__ENV.BUCKETS || "16", 10);
+const HEADERS = { headers: { "Content-Type": "application/json" } };
+const KEY = { tenant_id: "t-hot", warehouse_id: "wh1", location_id: "A-01", product_id: "HOT-1", lot_number: "", serial_number: "" };
+
+const RESERVED = new Counter("reserved_units");
+const REJECTED = new Counter("rejected_reservations");
+
+export const options = {
+  scenarios: {
+    flash: {
+      executor: "constant-arrival-rate",
+      rate: RATE,
+      timeUnit: "1s",
+      duration: DURATION,
+      preAllocatedVUs: 500,
+      maxVUs: 3000,
+    },
+  },
+  thresholds: {
+    http_req_failed: ["rate<0.01"],          // 409 (sin stock) se marca como respuesta esperada
+    reserved_units: [`count<=${STOCK}`],     // sin sobreventa
+    "http_req_duration{name:reserve}": ["p(99)<250"],
+  },
+};
+
+export function setup() {
+  http.post(`${BASE}/items/upsert`, JSON.stringify({ ...KEY, qty_on_hand: STOCK }), HEADERS);
+  http.post(`${BASE}/items/buckets`, JSON.stringify({ ...KEY, buckets: BUCKETS }), HEADERS);
+}
+
+export default function () {
+  const r = http.post(`${BASE}/items/reserve`, JSON.stringify({ ...KEY, qty_to_reserve: 1, ttl_s: 3600 }), {
+    ...HEADERS,
+    tags: { name: "reserve" },
+    responseCallback: http.expectedStatuses(200, 409),
+  });
+  check(r, { "200|409": (res) => res.status === 200 || res.status === 409 });
+  if (r.status === 200) RESERVED.add(1);
+  else REJECTED.add(1);
+}
+
+export function teardown() {
+  sleep(3); // proyector y reaper
+  const q = Object.entries(KEY).map(([k, v]) => `${k}=${encodeURIComponent(v)}`).join("&");
+  const item = http.get(`${BASE}/items/by-key?${q}`).json();
+  check(item, {
+    "sin sobreventa": (i) => i.qty_reserved <= i.qty_on_hand && i.qty_available >= 0,
+  });
+}
@@ -3,9 +3,12 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.services.user_service import init_db
+from app.services.user_service import init_db, SessionLocal
 from app.routes import user_routes
 from app.middleware.jwt_middleware import JWTMiddleware, get_metrics, get_redis_status
+from app.utils.revocation_filter import revocation_index
+from app.utils.revocation_store import revocation_store
+from app.utils.rbac import rbac_manager
 from config.config import PROMETHEUS_ENABLED, METRICS_PATH
 
 app = FastAPI(
@@ -36,13 +39,25 @@ async def on_startup():
         print("✅ Base de datos inicializada correctamente")
         
         # Verificar estado de Redis
+        await revocation_store.ping_redis()
         redis_status = get_redis_status()
         print(f"🔴 Estado Redis: {redis_status}")
         
+        # Tabla RBAC (método + plantilla -> permiso) con las rutas del router
+        rbac_manager.compile_routes(app.routes)
+        
+        # Índice local de revocación: carga desde SQL y suscripción a las revocaciones
+        revocation_index.start(SessionLocal)
+        
     except Exception as e:
         print(f"❌ Error al inicializar BD: {str(e)}")
         raise e
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    revocation_index.stop()
+    await revocation_store.close()
+
 # Handler global para 422
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
@@ -6,15 +6,13 @@ import logging
 from typing import Optional, Dict, Any
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Receive, Scope, Send
 import jwt as pyjwt
-from datetime import datetime, timedelta
 
-from app.utils.auth import verify_token
+from app.utils.auth import decode_token
 from app.utils.revocation_store import revocation_store
-from app.utils.rbac import rbac_manager
-from config.config import JWT_ISS, JWT_AUD, SKEW_SECONDS
+from app.utils.revocation_filter import revocation_index
+from app.utils.rbac import RouteRule, rbac_manager
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -58,36 +56,61 @@ except ImportError:
     PROMETHEUS_AVAILABLE = False
     logger.warning("Prometheus no disponible. Métricas deshabilitadas.")
 
-class JWTMiddleware(BaseHTTPMiddleware):
-    """Middleware JWT con métricas y validación completa"""
+class JWTMiddleware:
+    """Middleware JWT con métricas y validación completa
+
+    Middleware ASGI puro: BaseHTTPMiddleware agrega una tarea y un wrapper de streaming por request.
+    Aquí la request sigue a la app tal cual y las respuestas de error se envían directamente.
+    """
     
     def __init__(self, app: ASGIApp, skip_paths: Optional[list] = None):
-        super().__init__(app)
-        self.skip_paths = skip_paths or [
+        self.app = app
+        # Paths exactos sin validación; las rutas públicas de la API vienen de la política RBAC
+        self.skip_paths = frozenset(skip_paths or [
             "/",
             "/docs",
+            "/docs/oauth2-redirect",
             "/redoc",
             "/openapi.json",
             "/.well-known/jwks.json",
             "/metrics",
             "/health"
-        ]
+        ])
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Procesa la request con validación JWT"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        rbac_manager.maybe_reload()
+        rule = rbac_manager.resolve(scope["method"], scope["path"])
         
         # Verificar si debe saltar la validación
-        if self._should_skip_validation(request):
-            return await call_next(request)
+        if self._should_skip_validation(scope, rule):
+            await self.app(scope, receive, send)
+            return
+        
+        response = await self._authenticate(Request(scope), rule)
+        if response is not None:
+            await response(scope, receive, send)
+            return
         
-        # Iniciar medición de tiempo
-        start_time = time.time()
+        await self.app(scope, receive, send)
+    
+    async def _authenticate(self, request: Request, rule: Optional[RouteRule]) -> Optional[JSONResponse]:
+        """Valida token, revocación y RBAC; devuelve la respuesta de error o None si puede seguir"""
+        # Etiqueta de métricas: la plantilla de la ruta (/users/{user_id}), no el path con ids
+        path = rule.template if rule is not None else request.scope["path"]
+        
+        # Iniciar medición de tiempo (solo la validación, sin el handler)
+        start_time = time.perf_counter()
         
         try:
             # Extraer token del header Authorization
             token = self._extract_token(request)
             if not token:
-                self._record_failure("no_token", request.url.path)
+                self._record_failure("no_token", path)
                 return self._unauthorized_response("Token de autorización requerido")
             
             # Validar token JWT
@@ -95,45 +118,39 @@ class JWTMiddleware(BaseHTTPMiddleware):
             
             # Verificar revocación
             if await self._is_token_revoked(payload.get("jti"), request):
-                self._record_failure("token_revoked", request.url.path)
+                self._record_failure("token_revoked", path)
                 return self._unauthorized_response("Token revocado")
             
             # Verificar permisos RBAC
-            if not await self._check_rbac_permissions(payload, request):
-                self._record_failure("insufficient_permissions", request.url.path)
+            if not self._check_rbac_permissions(payload, rule):
+                self._record_failure("insufficient_permissions", path)
                 return self._forbidden_response("Permisos insuficientes")
             
-            # Agregar información del usuario a la request
+            # Agregar información del usuario a la request (request.state en la app)
             request.state.user_payload = payload
             request.state.user_role = payload.get("role")
             request.state.user_email = payload.get("sub")
             
-            # Registrar éxito
-            self._record_success(request.url.path)
-            
-            # Procesar request
-            response = await call_next(request)
-            
-            # Calcular tiempo de validación
-            validation_time = time.time() - start_time
-            self._record_validation_time(request.url.path, request.method, validation_time)
-            
-            return response
+            # Registrar éxito y tiempo de validación
+            self._record_success(path)
+            self._record_validation_time(path, request.method, time.perf_counter() - start_time)
+            return None
             
         except HTTPException as e:
-            self._record_failure("http_exception", request.url.path)
+            self._record_failure("http_exception", path)
             return JSONResponse(
                 status_code=e.status_code,
                 content={"detail": e.detail}
             )
         except Exception as e:
             logger.error(f"Error en middleware JWT: {e}")
-            self._record_failure("internal_error", request.url.path)
+            self._record_failure("internal_error", path)
             return self._internal_error_response("Error interno del servidor")
     
-    def _should_skip_validation(self, request: Request) -> bool:
-        """Verifica si debe saltar la validación JWT"""
-        return any(request.url.path.startswith(path) for path in self.skip_paths)
+    def _should_skip_validation(self, scope: Scope, rule: Optional[RouteRule]) -> bool:
+        """Paths exactos de skip_paths, rutas públicas y preflight CORS (OPTIONS no lleva token)"""
+        return (scope["path"] in self.skip_paths or scope["method"] == "OPTIONS"
+                or (rule is not None and rule.public))
     
     def _extract_token(self, request: Request) -> Optional[str]:
         """Extrae el token del header Authorization"""
@@ -145,29 +162,8 @@ class JWTMiddleware(BaseHTTPMiddleware):
     async def _validate_jwt_token(self, token: str, request: Request) -> Dict[str, Any]:
         """Valida el token JWT con validaciones completas"""
         try:
-            # Decodificar header para obtener kid
-            unverified_header = pyjwt.get_unverified_header(token)
-            kid = unverified_header.get("kid")
-            
-            if not kid:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token inválido: no contiene kid"
-                )
-            
-            # Obtener clave pública
-            from app.utils.key_manager import key_manager
-            public_key_pem = key_manager.get_public_key_pem(kid)
-            
-            # Decodificar con validaciones completas
-            payload = pyjwt.decode(
-                token,
-                public_key_pem,
-                algorithms=["RS256"],
-                issuer=JWT_ISS,
-                audience=JWT_AUD,
-                leeway=SKEW_SECONDS  # Tolerancia de ±60s
-            )
+            # Firma + iss/aud/exp con la clave parseada del kid; los tokens ya vistos salen de la caché
+            payload = decode_token(token)
             
             # Validaciones adicionales
             if not payload.get("sub"):
@@ -184,6 +180,8 @@ class JWTMiddleware(BaseHTTPMiddleware):
             
             return payload
             
+        except HTTPException:
+            raise
         except pyjwt.ExpiredSignatureError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -202,63 +200,29 @@ class JWTMiddleware(BaseHTTPMiddleware):
             )
     
     async def _is_token_revoked(self, jti: str, request: Request) -> bool:
-        """Verifica si el token está revocado"""
+        """Verifica si el token está revocado (índice local; Redis/SQL solo para los positivos)"""
         try:
-            # Obtener sesión de DB (simplificado para el middleware)
-            from app.services.user_service import get_db
-            db = next(get_db())
-            
-            try:
-                return revocation_store.is_token_revoked(jti, db)
-            finally:
-                db.close()
-                
+            return await revocation_index.is_revoked(jti, revocation_store.is_token_revoked)
         except Exception as e:
             logger.error(f"Error verificando revocación: {e}")
             return True  # Fail-closed
     
-    async def _check_rbac_permissions(self, payload: Dict[str, Any], request: Request) -> bool:
-        """Verifica permisos RBAC para el endpoint"""
+    def _check_rbac_permissions(self, payload: Dict[str, Any], rule: Optional[RouteRule]) -> bool:
+        """Verifica permisos RBAC para el endpoint (máscara del rol contra la de la ruta)"""
         try:
             role = payload.get("role")
             if not role:
                 return False
             
-            # Mapear endpoint a recurso y acción
-            resource, action = self._map_endpoint_to_permission(request)
-            if not resource or not action:
-                return True  # Si no se puede mapear, permitir (endpoints públicos)
+            if rule is None:
+                return True  # Ruta que el router no conoce: solo token (la app responde 404)
             
-            return rbac_manager.has_permission(role, resource, action)
+            return rbac_manager.is_allowed(role, rule)
             
         except Exception as e:
             logger.error(f"Error verificando RBAC: {e}")
             return False
     
-    def _map_endpoint_to_permission(self, request: Request) -> tuple:
-        """Mapea endpoint HTTP a recurso y acción RBAC"""
-        path = request.url.path
-        method = request.method
-        
-        # Mapeo de endpoints a permisos
-        if path.startswith("/users"):
-            if method == "GET":
-                return "users", "read"
-            elif method == "POST":
-                return "users", "create"
-            elif method == "PUT":
-                return "users", "update"
-            elif method == "DELETE":
-                return "users", "delete"
-        
-        elif path.startswith("/auth"):
-            if "rotate-keys" in path:
-                return "auth", "rotate_keys"
-            elif "blacklist" in path:
-                return "auth", "view_blacklist"
-        
-        return None, None
-    
     def _record_failure(self, reason: str, endpoint: str):
         """Registra fallo en métricas"""
         if PROMETHEUS_AVAILABLE:
@@ -299,6 +263,7 @@ class JWTMiddleware(BaseHTTPMiddleware):
 def get_metrics():
     """Obtiene métricas de Prometheus"""
     if PROMETHEUS_AVAILABLE:
+        revocation_index.update_metrics()
         return generate_latest()
     return b"# Prometheus no disponible\n"
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -19,6 +19,7 @@ from app.services.user_service import (
     get_blacklist_entries,
     login_user
 )
+from config.config import JWKS_MAX_AGE_SECONDS
 
 router = APIRouter()
 
@@ -169,13 +170,22 @@ def get_token_blacklist(
 
 # JWKS endpoint para descubrimiento de claves públicas
 @router.get("/.well-known/jwks.json")
-def get_jwks():
-    """Endpoint JWKS para descubrimiento de claves públicas"""
+def get_jwks(request: Request):
+    """Endpoint JWKS para descubrimiento de claves públicas
+
+    Cacheable: ETag + Cache-Control max-age. Los servicios revalidan con If-None-Match y reciben 304
+    sin cuerpo mientras no haya rotación.
+    """
     try:
         from app.utils.key_manager import key_manager
-        return key_manager.get_jwks()
+        body, etag = key_manager.get_jwks_document()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener JWKS: {str(e)}")
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={JWKS_MAX_AGE_SECONDS}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 # Endpoint para rotación de claves (solo para admins)
 @router.post("/auth/rotate-keys")
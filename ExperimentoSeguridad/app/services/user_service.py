@@ -12,6 +12,7 @@ from app.models.user import UserCreate, UserUpdate
 from config.config import DATABASE_URL, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.utils.auth import create_access_token, verify_token
 from app.utils.key_manager import key_manager
+from app.utils.revocation_store import revocation_store
 import secrets
 import hashlib
 
@@ -345,6 +346,7 @@ def revoke_token(jti: str, token_type: str, revoked_by: str, reason: str, db: Se
         
         db.add(blacklist_entry)
         db.commit()
+        revocation_store.publish_revocation(jti)
         
     except Exception as e:
         db.rollback()
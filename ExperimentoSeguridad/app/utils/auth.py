@@ -5,6 +5,7 @@ from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from config.config import ACCESS_TOKEN_EXPIRE_MINUTES, JWT_ISS, JWT_AUD, SKEW_SECONDS
 from app.utils.key_manager import key_manager
+from app.utils.token_cache import verified_token_cache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -34,15 +35,15 @@ def create_access_token(data: dict, kid: str = None):
         if not kid:
             kid = key_manager.get_active_kid()
 
-        # Clave privada PEM (str)
-        private_key_pem = key_manager.get_private_key_pem(kid)
+        # Clave privada ya parseada (parsear el PEM en cada login costaba más que firmar)
+        private_key = key_manager.get_private_key(kid)
 
         # Headers con kid (incluye typ/alg por claridad)
         headers = {"kid": kid, "typ": "JWT", "alg": "RS256"}
 
         encoded_jwt = pyjwt.encode(
             to_encode,
-            private_key_pem,
+            private_key,
             algorithm="RS256",
             headers=headers
         )
@@ -54,28 +55,37 @@ def create_access_token(data: dict, kid: str = None):
             detail=f"Error al crear el token: {str(e)}"
         )
 
+class MissingKidError(pyjwt.InvalidTokenError):
+    """El header del token no trae kid"""
+
+
+def decode_token(token: str) -> dict:
+    """Verifica firma RS256 e iss/aud/exp; los tokens ya verificados salen de la caché sin tocar RSA"""
+    payload = verified_token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    # Leer header para obtener kid
+    kid = pyjwt.get_unverified_header(token).get("kid")
+    if not kid:
+        raise MissingKidError("no contiene kid")
+
+    # Decodificar con validaciones completas, con la clave ya parseada del kid
+    payload = pyjwt.decode(
+        token,
+        key_manager.get_public_key(kid),
+        algorithms=["RS256"],
+        issuer=JWT_ISS,
+        audience=JWT_AUD,
+        leeway=SKEW_SECONDS  # Tolerancia de ±60s
+    )
+    verified_token_cache.put(token, payload)
+    return payload
+
 def verify_token(token: str) -> dict:
     """Verifica un token JWT RS256 con validaciones completas (PyJWT)"""
     try:
-        # Leer header para obtener kid
-        unverified_header = pyjwt.get_unverified_header(token)
-        kid = unverified_header.get("kid")
-        if not kid:
-            raise HTTPException(status_code=401, detail="Token inválido: no contiene kid")
-
-        # Clave pública correspondiente
-        public_key_pem = key_manager.get_public_key_pem(kid)
-
-        # Decodificar con validaciones completas
-        payload = pyjwt.decode(
-            token,
-            public_key_pem,
-            algorithms=["RS256"],
-            issuer=JWT_ISS,
-            audience=JWT_AUD,
-            leeway=SKEW_SECONDS  # Tolerancia de ±60s
-        )
-        return payload
+        return decode_token(token)
 
     except pyjwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
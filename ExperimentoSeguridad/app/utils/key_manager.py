@@ -1,5 +1,6 @@
 import os
 import json
+import hashlib
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
 import secrets
@@ -14,6 +15,9 @@ class RSAKeyManager:
         self.keys_dir = keys_dir
         self.active_kid = active_kid or "key-1"
         self.keys_cache: Dict[str, Dict] = {}
+        # kid -> (PEM, clave parseada): parsear el PEM cuesta más que firmar o verificar
+        self._public_keys: Dict[str, Tuple[str, rsa.RSAPublicKey]] = {}
+        self._private_keys: Dict[str, Tuple[str, rsa.RSAPrivateKey]] = {}
         self._ensure_keys_directory()
         self._load_or_generate_keys()
     
@@ -147,6 +151,26 @@ class RSAKeyManager:
         
         return self.keys_cache[kid]["public_key_pem"]
     
+    def get_private_key(self, kid: str = None) -> rsa.RSAPrivateKey:
+        """Obtiene la clave privada ya parseada para firmar (se parsea una vez por kid)"""
+        kid = kid or self.active_kid
+        pem = self.get_private_key_pem(kid)
+        cached = self._private_keys.get(kid)
+        if cached is None or cached[0] is not pem:
+            cached = (pem, serialization.load_pem_private_key(pem.encode("utf-8"), password=None))
+            self._private_keys[kid] = cached
+        return cached[1]
+    
+    def get_public_key(self, kid: str) -> rsa.RSAPublicKey:
+        """Obtiene la clave pública ya parseada (se parsea una vez por kid)"""
+        pem = self.get_public_key_pem(kid)
+        cached = self._public_keys.get(kid)
+        if cached is None or cached[0] is not pem:
+            # Si el PEM del kid cambió (se recargó la clave) se vuelve a parsear
+            cached = (pem, serialization.load_pem_public_key(pem.encode("utf-8")))
+            self._public_keys[kid] = cached
+        return cached[1]
+    
     def get_jwk(self, kid: str) -> Dict:
         """Obtiene el JWK para una clave específica"""
         if kid not in self.keys_cache:
@@ -164,6 +188,11 @@ class RSAKeyManager:
             "keys": [self.get_jwk(kid) for kid in self.keys_cache.keys()]
         }
     
+    def get_jwks_document(self) -> Tuple[bytes, str]:
+        """JWKS serializado y su ETag (hash del contenido): cambia solo cuando cambia el conjunto de claves"""
+        body = json.dumps(self.get_jwks(), separators=(",", ":"), sort_keys=True).encode("utf-8")
+        return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    
     def rotate_key(self) -> str:
         """Rota la clave activa generando una nueva"""
         # Generar nuevo kid
@@ -1,15 +1,135 @@
 """
 Sistema RBAC (Role-Based Access Control) policy-as-data
 """
-from typing import Dict, List, Optional
+import json
+import logging
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
 from fastapi import HTTPException, status
-from config.config import RBAC_POLICIES
+from starlette.routing import compile_path
+from config.config import (
+    RBAC_POLICIES, RBAC_POLICY_FILE, RBAC_PUBLIC_ROUTES, RBAC_RELOAD_SECONDS, RBAC_ROUTES
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RouteRule(NamedTuple):
+    """Regla compilada de una ruta: pública, o los bits de permiso que exige (0 = solo token)"""
+    template: str
+    public: bool
+    mask: int
+
+
+class CompiledPolicy:
+    """Política compilada e inmutable; al recargar se reemplaza entera (un solo cambio de referencia)
+
+    Cada (recurso, acción) recibe un bit; cada rol, la máscara con sus bits. Las rutas sin parámetros
+    se resuelven en un dict por (método, path); las con parámetros, con la regex del router por método.
+    """
+
+    def __init__(self, roles: Dict, route_permissions: Dict, public_routes: List, routes: List):
+        bits: Dict[tuple, int] = {}
+
+        def bit(resource: str, action: str) -> int:
+            return bits.setdefault((resource, action), 1 << len(bits))
+
+        self.role_masks: Dict[str, int] = {}
+        for role, resources in roles.items():
+            mask = 0
+            for resource, actions in resources.items():
+                for action in actions:
+                    mask |= bit(resource, action)
+            self.role_masks[role] = mask
+
+        public = set(public_routes)
+        self.static: Dict[tuple, RouteRule] = {}
+        self.templated: Dict[str, list] = {}
+        for method, template, regex in routes:
+            key = f"{method} {template}"
+            permission = route_permissions.get(key)
+            # Un permiso que ningún rol tiene igual recibe bit: la ruta queda denegada para todos
+            mask = bit(*permission.split(":", 1)) if permission else 0
+            rule = RouteRule(template, key in public, mask)
+            if "{" in template:
+                self.templated.setdefault(method, []).append((regex, rule))
+            else:
+                self.static[(method, template)] = rule
+        self.bits = bits
+
+    def resolve(self, method: str, path: str) -> Optional[RouteRule]:
+        rule = self.static.get((method, path))
+        if rule is not None:
+            return rule
+        for regex, rule in self.templated.get(method, ()):
+            if regex.match(path):
+                return rule
+        return None
+
+
+def _policy_routes(route_permissions: Dict, public_routes: List) -> List[tuple]:
+    """(método, plantilla, regex) de las rutas nombradas en la política, con el mismo compilador que Starlette"""
+    routes = []
+    for key in list(route_permissions) + list(public_routes):
+        method, template = key.split(" ", 1)
+        routes.append((method, template, compile_path(template)[0]))
+    return routes
+
 
 class RBACManager:
-    """Gestor de RBAC con políticas basadas en datos"""
+    """Gestor de RBAC con políticas basadas en datos
+
+    Las políticas se compilan a máscaras de bits por rol y a una tabla de rutas (método + plantilla ->
+    permiso), de modo que cada decisión es una búsqueda en dict y un AND. La tabla se arma con las rutas
+    de la política y, al arrancar, con las del router de FastAPI (compile_routes). Con RBAC_POLICY_FILE
+    la política se recarga cuando cambia el archivo; un archivo inválido deja la política anterior.
+    """
     
-    def __init__(self, policies: Dict = None):
+    def __init__(self, policies: Dict = None, route_permissions: Dict = None, public_routes: List = None,
+                 policy_file: str = RBAC_POLICY_FILE):
         self.policies = policies or RBAC_POLICIES
+        self.route_permissions = dict(RBAC_ROUTES if route_permissions is None else route_permissions)
+        self.public_routes = list(RBAC_PUBLIC_ROUTES if public_routes is None else public_routes)
+        self.policy_file = policy_file
+        self._routes = None  # rutas del router; None = solo las de la política
+        self._policy_mtime = None
+        self._next_reload_check = 0.0
+        if policy_file:
+            self.load_policy_file()
+        self._compile()
+    
+    def _compile(self) -> None:
+        routes = self._routes
+        if routes is None:
+            routes = _policy_routes(self.route_permissions, self.public_routes)
+        self._compiled = CompiledPolicy(self.policies, self.route_permissions, self.public_routes, routes)
+    
+    def compile_routes(self, app_routes) -> None:
+        """Arma la tabla con las rutas del router (app.routes); avisa de las que la política no cubre"""
+        routes = []
+        for route in app_routes:
+            methods = getattr(route, "methods", None)
+            if not methods:
+                continue
+            for method in methods:
+                routes.append((method, route.path, route.path_regex))
+        self._routes = routes
+        self._compile()
+        
+        known = {f"{method} {template}" for method, template, _ in routes}
+        for key in set(self.route_permissions) | set(self.public_routes):
+            if key not in known:
+                logger.warning(f"RBAC: la ruta '{key}' de la política no existe en el router")
+    
+    def resolve(self, method: str, path: str) -> Optional[RouteRule]:
+        """Regla de la ruta que atiende (método, path); None si el router no la conoce"""
+        return self._compiled.resolve(method, path)
+    
+    def is_allowed(self, role: str, rule: RouteRule) -> bool:
+        """El rol tiene todos los bits que exige la ruta"""
+        mask = self._compiled.role_masks.get(role)
+        return mask is not None and mask & rule.mask == rule.mask
     
     def has_permission(self, role: str, resource: str, action: str) -> bool:
         """
@@ -24,23 +144,53 @@ class RBACManager:
             bool: True si tiene permiso, False en caso contrario
         """
         try:
-            # Verificar si el rol existe
-            if role not in self.policies:
-                return False
-            
-            # Verificar si el recurso existe para el rol
-            role_policies = self.policies[role]
-            if resource not in role_policies:
-                return False
-            
-            # Verificar si la acción está permitida
-            allowed_actions = role_policies[resource]
-            return action in allowed_actions
+            compiled = self._compiled
+            bit = compiled.bits.get((resource, action))
+            return bit is not None and bool(compiled.role_masks.get(role, 0) & bit)
             
         except Exception as e:
             # En caso de error, denegar acceso (fail-closed)
             return False
     
+    # Recarga en caliente
+    def maybe_reload(self) -> None:
+        """Mira el mtime de RBAC_POLICY_FILE como mucho cada RBAC_RELOAD_SECONDS"""
+        if not self.policy_file:
+            return
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + RBAC_RELOAD_SECONDS
+        try:
+            mtime = os.stat(self.policy_file).st_mtime
+        except OSError as e:
+            logger.warning(f"RBAC: no se pudo leer {self.policy_file}: {e}")
+            return
+        if mtime != self._policy_mtime and self.load_policy_file():
+            self._compile()
+    
+    def load_policy_file(self) -> bool:
+        """Carga roles/rutas del JSON; si es inválido mantiene la política vigente"""
+        try:
+            mtime = os.stat(self.policy_file).st_mtime
+            with open(self.policy_file, encoding="utf-8") as f:
+                data = json.load(f)
+            roles = data.get("roles", self.policies)
+            route_permissions = data.get("routes", self.route_permissions)
+            public_routes = data.get("public", self.public_routes)
+            if not self.validate_policy_structure(roles):
+                raise ValueError("estructura de roles inválida")
+            # Compilar antes de aplicar: valida plantillas y permisos "recurso:acción"
+            CompiledPolicy(roles, route_permissions, public_routes,
+                           _policy_routes(route_permissions, public_routes))
+        except Exception as e:
+            logger.error(f"RBAC: política {self.policy_file} no aplicada: {e}")
+            return False
+        self.policies, self.route_permissions, self.public_routes = roles, dict(route_permissions), list(public_routes)
+        self._policy_mtime = mtime
+        logger.info(f"RBAC: política cargada desde {self.policy_file}")
+        return True
+    
     def check_permission(self, role: str, resource: str, action: str) -> None:
         """
         Verifica permisos y lanza excepción si no tiene acceso
@@ -88,6 +238,7 @@ class RBACManager:
             self.policies[role] = {}
         
         self.policies[role][resource] = actions
+        self._compile()
     
     def remove_role_policy(self, role: str, resource: str) -> None:
         """
@@ -99,16 +250,21 @@ class RBACManager:
         """
         if role in self.policies and resource in self.policies[role]:
             del self.policies[role][resource]
+            self._compile()
     
-    def validate_policy_structure(self) -> bool:
+    def validate_policy_structure(self, policies: Dict = None) -> bool:
         """
         Valida que la estructura de políticas sea correcta
         
+        Args:
+            policies: Políticas a validar (por defecto, las vigentes)
+        
         Returns:
             bool: True si la estructura es válida
         """
         try:
-            for role, resources in self.policies.items():
+            policies = self.policies if policies is None else policies
+            for role, resources in policies.items():
                 if not isinstance(resources, dict):
                     return False
                 
@@ -0,0 +1,231 @@
+"""
+Índice local de revocación: filtro de Bloom + jti revocados recientemente, por proceso
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+import redis
+
+from config.config import (
+    REDIS_URL, REVOCATION_CHANNEL, REVOCATION_FILTER_CAPACITY, REVOCATION_FILTER_ENABLED,
+    REVOCATION_FILTER_FP_RATE, REVOCATION_RELOAD_SECONDS
+)
+from app.models.db_models import TokenBlacklist
+
+logger = logging.getLogger(__name__)
+
+# Métricas Prometheus
+try:
+    from prometheus_client import Counter, Gauge
+    PROMETHEUS_AVAILABLE = True
+
+    revocation_filter_checks_total = Counter(
+        'revocation_filter_checks_total',
+        'Consultas al índice local de revocación',
+        ['result']  # negative | positive | false_positive | recent | bypass
+    )
+
+    revocation_filter_false_positive_rate = Gauge(
+        'revocation_filter_false_positive_rate',
+        'Falsos positivos observados sobre tokens no revocados consultados'
+    )
+
+    revocation_filter_estimated_fp_rate = Gauge(
+        'revocation_filter_estimated_fp_rate',
+        'Tasa de falsos positivos esperada según la ocupación del filtro'
+    )
+
+    revocation_filter_entries = Gauge(
+        'revocation_filter_entries',
+        'jti cargados en el filtro de Bloom'
+    )
+
+    revocation_filter_synced = Gauge(
+        'revocation_filter_synced',
+        'Índice cargado y suscrito a las revocaciones (1=sí, 0=se consulta Redis/SQL en cada request)'
+    )
+
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray; k posiciones por doble hashing de un blake2b de 128 bits"""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(fp_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def estimated_fp_rate(self) -> float:
+        """(1 - e^(-k·n/m))^k con los n jti agregados"""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class RevocationIndex:
+    """Responde localmente si un jti no está revocado; solo los positivos del filtro van a Redis/SQL
+
+    Se carga desde TokenBlacklist y se mantiene al día con las revocaciones publicadas en
+    REVOCATION_CHANNEL. Mientras no esté cargado y suscrito (Redis caído, arranque, reconexión) no
+    responde: todas las consultas van al store como antes, que falla cerrado. Una publicación perdida
+    (Redis cae justo al revocar) queda cubierta por la recarga completa cada REVOCATION_RELOAD_SECONDS.
+    """
+
+    def __init__(self, capacity: int = REVOCATION_FILTER_CAPACITY, fp_rate: float = REVOCATION_FILTER_FP_RATE,
+                 channel: str = REVOCATION_CHANNEL, reload_seconds: int = REVOCATION_RELOAD_SECONDS):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.channel = channel
+        self.reload_seconds = reload_seconds
+        self._bloom = BloomFilter(capacity, fp_rate)
+        # Revocados desde la última carga: respuesta exacta, sin ir al store (son los que más se reintentan)
+        self._recent = set()
+        self._loaded = False
+        self._subscribed = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.negatives = 0
+        self.false_positives = 0
+
+    @property
+    def synced(self) -> bool:
+        return self._loaded and self._subscribed
+
+    def load(self, jtis) -> None:
+        """Reemplaza el contenido por los jti dados (revocados y aún no vencidos)"""
+        jtis = list(jtis)
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.fp_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom, self._recent = bloom, set()
+            self._loaded = True
+        logger.info(f"Índice de revocación cargado: {len(jtis)} jti")
+
+    def load_from_db(self, session_factory: Callable) -> None:
+        db = session_factory()
+        try:
+            rows = db.query(TokenBlacklist.jti).filter(TokenBlacklist.expires_at > datetime.utcnow()).all()
+        finally:
+            db.close()
+        self.load(row[0] for row in rows)
+
+    def add(self, jti: str) -> None:
+        with self._lock:
+            self._bloom.add(jti)
+            self._recent.add(jti)
+
+    async def is_revoked(self, jti: Optional[str], lookup: Callable[[str], Awaitable[bool]]) -> bool:
+        """lookup(jti) es la consulta autoritativa (Redis/SQL); solo se llama si el índice no descarta el jti"""
+        if not self.synced or not jti:
+            self._count("bypass")
+            return await lookup(jti)
+        if jti in self._recent:
+            self._count("recent")
+            return True
+        if jti not in self._bloom:
+            self.negatives += 1
+            self._count("negative")
+            return False
+        revoked = await lookup(jti)
+        if revoked:
+            self._count("positive")
+        else:
+            self.false_positives += 1
+            self._count("false_positive")
+        return revoked
+
+    def observed_fp_rate(self) -> float:
+        checked = self.negatives + self.false_positives
+        return self.false_positives / checked if checked else 0.0
+
+    def update_metrics(self) -> None:
+        """Gauges del índice; se actualizan al exponer /metrics"""
+        if not PROMETHEUS_AVAILABLE:
+            return
+        revocation_filter_false_positive_rate.set(self.observed_fp_rate())
+        revocation_filter_estimated_fp_rate.set(self._bloom.estimated_fp_rate())
+        revocation_filter_entries.set(self._bloom.count)
+        revocation_filter_synced.set(1 if self.synced else 0)
+
+    @staticmethod
+    def _count(result: str) -> None:
+        if PROMETHEUS_AVAILABLE:
+            revocation_filter_checks_total.labels(result=result).inc()
+
+    # Sincronización
+    def start(self, session_factory: Callable, redis_url: str = REDIS_URL) -> None:
+        """Arranca el hilo que se suscribe al canal y recarga desde SQL (idempotente)"""
+        if not REVOCATION_FILTER_ENABLED or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sync_loop, args=(session_factory, redis_url), name="revocation-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._subscribed = False
+
+    def _sync_loop(self, session_factory: Callable, redis_url: str) -> None:
+        backoff = 1
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = redis.from_url(redis_url, decode_responses=True).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Cargar después de suscribirse: lo revocado entre ambos pasos llega por el canal
+                self.load_from_db(session_factory)
+                self._subscribed = True
+                backoff = 1
+                logger.info(f"Índice de revocación suscrito a '{self.channel}'")
+                next_reload = time.monotonic() + self.reload_seconds
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self.add(message["data"])
+                    if time.monotonic() >= next_reload or self._bloom.count > self._bloom.capacity:
+                        # Descarta los vencidos y redimensiona el filtro si creció más de lo previsto
+                        self.load_from_db(session_factory)
+                        next_reload = time.monotonic() + self.reload_seconds
+            except Exception as e:
+                logger.warning(f"Índice de revocación sin sincronizar: {e}. Consultando Redis/SQL")
+            finally:
+                self._subscribed = False
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+# Instancia global (por proceso)
+revocation_index = RevocationIndex()
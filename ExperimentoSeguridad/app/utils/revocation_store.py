@@ -1,74 +1,184 @@
 """
 Sistema de revocación de tokens con Redis + fallback SQL (fail-closed)
 """
+import asyncio
 import redis
+import redis.asyncio as aioredis
 import json
 import logging
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import Session
-from config.config import REDIS_URL
+from config.config import (
+    DATABASE_URL, DB_POOL_SIZE, REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT_SECONDS, REDIS_RECONNECT_MAX_SECONDS,
+    REDIS_SOCKET_TIMEOUT_SECONDS, REDIS_URL, REVOCATION_CHANNEL
+)
 from app.models.db_models import TokenBlacklist
+from app.utils.revocation_filter import revocation_index
 
 logger = logging.getLogger(__name__)
 
+# Drivers async para el fallback SQL (mismo DATABASE_URL que la app)
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+REDIS_RECONNECT_MIN_SECONDS = 0.5
+
+
+def async_database_url(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://..., sqlite:///... -> sqlite+aiosqlite:///..."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Sin driver async para {backend}")
+    return str(parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}"))
+
+
 class RevocationStore:
-    """Store para revocación de tokens con Redis + fallback SQL"""
+    """Store para revocación de tokens con Redis + fallback SQL
+
+    La consulta (is_token_revoked) es async: redis.asyncio con pool acotado y SQLAlchemy async, sin
+    bloquear el event loop. Si Redis falla se marca caído y se reintenta con backoff exponencial
+    (REDIS_RECONNECT_MIN_SECONDS .. REDIS_RECONNECT_MAX_SECONDS); mientras tanto se consulta SQL.
+    Las escrituras (revoke_token, limpieza) siguen siendo síncronas: corren en el threadpool de las rutas.
+    """
     
-    def __init__(self, redis_url: str = REDIS_URL):
+    def __init__(self, redis_url: str = REDIS_URL, database_url: str = DATABASE_URL):
         self.redis_url = redis_url
+        self.database_url = database_url
         self.redis_client = None
         self.redis_available = False
+        self._sync_client = None
+        self._engine = None
+        self._backoff = REDIS_RECONNECT_MIN_SECONDS
+        self._retry_at = 0.0
         self._connect_redis()
     
     def _connect_redis(self):
-        """Intenta conectar a Redis"""
+        """Crea el cliente async con su pool; la conexión se prueba en el primer uso (ping_redis)"""
+        pool = aioredis.ConnectionPool.from_url(
+            self.redis_url,
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT_SECONDS
+        )
+        self.redis_client = aioredis.Redis(connection_pool=pool)
+        # La espera por conexión libre va aquí y no en BlockingConnectionPool: en redis 5.0.1 ese pool
+        # se bloquea a sí mismo hasta su timeout cuando falla la conexión (release dentro de su lock)
+        self._slots = asyncio.Semaphore(REDIS_MAX_CONNECTIONS)
+    
+    async def ping_redis(self) -> bool:
+        """Prueba Redis y actualiza el estado; si falla, agenda el próximo intento con backoff"""
+        self._retry_at = time.monotonic() + self._backoff  # un solo intento por ventana
         try:
-            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
-            # Test de conexión
-            self.redis_client.ping()
-            self.redis_available = True
-            logger.info("✅ Redis conectado exitosamente")
+            await self.redis_client.ping()
         except Exception as e:
+            if self.redis_available:
+                self._backoff = REDIS_RECONNECT_MIN_SECONDS
+            else:
+                self._backoff = min(self._backoff * 2, REDIS_RECONNECT_MAX_SECONDS)
+            self.redis_available = False
             logger.warning(f"⚠️ Redis no disponible: {e}. Usando fallback SQL")
+            return False
+        if not self.redis_available:
+            logger.info("✅ Redis conectado exitosamente")
+        self.redis_available = True
+        self._backoff = REDIS_RECONNECT_MIN_SECONDS
+        return True
+    
+    async def _redis(self):
+        """Cliente Redis si está disponible o si ya toca reintentar; None para ir directo a SQL"""
+        if self.redis_available:
+            return self.redis_client
+        if time.monotonic() < self._retry_at:
+            return None
+        return self.redis_client if await self.ping_redis() else None
+    
+    async def _acquire_slot(self) -> bool:
+        """Espera una conexión libre del pool; si se agota REDIS_POOL_TIMEOUT_SECONDS se va a SQL
+        sin marcar Redis como caído (responde, solo está ocupado)"""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), REDIS_POOL_TIMEOUT_SECONDS)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Pool de Redis agotado. Consultando SQL")
+            return False
+    
+    def _mark_redis_down(self, error: Exception):
+        if self.redis_available:
+            logger.warning(f"Error consultando Redis: {error}. Reintento en {self._backoff}s")
             self.redis_available = False
-            self.redis_client = None
+            self._retry_at = time.monotonic() + self._backoff
     
-    def is_token_revoked(self, jti: str, db: Session) -> bool:
+    async def is_token_revoked(self, jti: str) -> bool:
         """
         Verifica si un token está revocado (fail-closed)
         Intenta Redis primero, fallback a SQL
         """
         try:
             # Intentar Redis primero
-            if self.redis_available and self.redis_client:
+            client = await self._redis()
+            if client is not None and await self._acquire_slot():
                 try:
-                    result = self.redis_client.get(f"revoked:{jti}")
+                    result = await client.get(f"revoked:{jti}")
                     if result is not None:
                         return True  # Token encontrado en Redis = revocado
                 except Exception as e:
-                    logger.warning(f"Error consultando Redis: {e}")
-                    self.redis_available = False
+                    self._mark_redis_down(e)
+                finally:
+                    self._slots.release()
             
             # Fallback a SQL
-            return self._is_token_revoked_sql(jti, db)
+            return await self._is_token_revoked_sql(jti)
             
         except Exception as e:
             logger.error(f"Error verificando revocación: {e}")
             # Fail-closed: si hay error, asumir que está revocado
             return True
     
-    def _is_token_revoked_sql(self, jti: str, db: Session) -> bool:
-        """Verifica revocación en SQL"""
+    def _async_engine(self):
+        if self._engine is None:
+            url = async_database_url(self.database_url)
+            options = {} if url.startswith("sqlite") else {"pool_size": DB_POOL_SIZE, "pool_pre_ping": True}
+            self._engine = create_async_engine(url, **options)
+        return self._engine
+    
+    async def _is_token_revoked_sql(self, jti: str) -> bool:
+        """Verifica revocación en SQL sin bloquear el event loop"""
         try:
-            blacklist_entry = db.query(TokenBlacklist).filter(
-                TokenBlacklist.jti == jti
-            ).first()
-            return blacklist_entry is not None
+            async with self._async_engine().connect() as conn:
+                result = await conn.execute(
+                    select(TokenBlacklist.jti).where(TokenBlacklist.jti == jti).limit(1)
+                )
+                return result.first() is not None
         except Exception as e:
             logger.error(f"Error consultando SQL: {e}")
             return True  # Fail-closed
     
+    async def close(self):
+        """Cierra los pools (al apagar la app: las conexiones quedan atadas a su event loop)"""
+        await self.redis_client.connection_pool.disconnect()
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+        # El pool nuevo se ata al próximo event loop que lo use
+        self._connect_redis()
+        self.redis_available = False
+        self._retry_at = 0.0
+    
+    def _sync_redis(self):
+        """Cliente síncrono para las escrituras (poco frecuentes, desde el threadpool)"""
+        if self._sync_client is None:
+            self._sync_client = redis.from_url(
+                self.redis_url, decode_responses=True,
+                socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_SOCKET_TIMEOUT_SECONDS
+            )
+        return self._sync_client
+    
     def revoke_token(self, jti: str, token_type: str, revoked_by: str, 
                     reason: str, expires_at: datetime, db: Session) -> bool:
         """
@@ -86,23 +196,22 @@ class RevocationStore:
             }
             
             # Almacenar en Redis (si está disponible)
-            if self.redis_available and self.redis_client:
-                try:
-                    # Calcular TTL para Redis (hasta expiración del token)
-                    ttl_seconds = int((expires_at - datetime.utcnow()).total_seconds())
-                    if ttl_seconds > 0:
-                        self.redis_client.setex(
-                            f"revoked:{jti}",
-                            ttl_seconds,
-                            json.dumps(token_data)
-                        )
-                        logger.info(f"Token {jti} revocado en Redis")
-                except Exception as e:
-                    logger.warning(f"Error almacenando en Redis: {e}")
-                    self.redis_available = False
+            try:
+                # Calcular TTL para Redis (hasta expiración del token)
+                ttl_seconds = int((expires_at - datetime.utcnow()).total_seconds())
+                if ttl_seconds > 0:
+                    self._sync_redis().setex(
+                        f"revoked:{jti}",
+                        ttl_seconds,
+                        json.dumps(token_data)
+                    )
+                    logger.info(f"Token {jti} revocado en Redis")
+            except Exception as e:
+                logger.warning(f"Error almacenando en Redis: {e}")
             
             # Almacenar en SQL (siempre)
             self._revoke_token_sql(jti, token_type, revoked_by, reason, expires_at, db)
+            self.publish_revocation(jti)
             
             return True
             
@@ -138,6 +247,15 @@ class RevocationStore:
             logger.error(f"Error almacenando en SQL: {e}")
             raise
     
+    def publish_revocation(self, jti: str) -> None:
+        """Agrega el jti al índice local y lo publica para los demás procesos (después de guardarlo en SQL)"""
+        revocation_index.add(jti)
+        try:
+            self._sync_redis().publish(REVOCATION_CHANNEL, jti)
+        except Exception as e:
+            # Los demás procesos lo verán en su próxima recarga desde SQL
+            logger.warning(f"Error publicando revocación: {e}")
+    
     def get_redis_status(self) -> Dict[str, Any]:
         """Obtiene el estado de Redis"""
         return {
@@ -0,0 +1,72 @@
+"""
+Caché LRU de tokens JWT ya verificados (firma RS256 + iss/aud/exp)
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config.config import SKEW_SECONDS, VERIFIED_TOKEN_CACHE_SIZE
+
+
+class VerifiedTokenCache:
+    """LRU acotado: hash del token -> payload, hasta el exp del token (+ la tolerancia de reloj)
+
+    Un cliente repite el mismo token en cada request hasta que vence; con la caché solo la primera
+    request de cada token paga la verificación RSA. La revocación no se guarda aquí: se consulta
+    en cada request.
+    """
+
+    def __init__(self, max_entries: int = VERIFIED_TOKEN_CACHE_SIZE, leeway: int = SKEW_SECONDS):
+        self.max_entries = max_entries
+        self.leeway = leeway
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        # get_current_user corre en el threadpool de FastAPI, el middleware en el event loop
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Payload del token si se verificó antes y no ha vencido; None si no"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(payload)
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """Guarda un payload ya verificado; los tokens sin exp numérico no se guardan"""
+        exp = payload.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (exp + self.leeway, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Instancia global (por proceso)
+verified_token_cache = VerifiedTokenCache()
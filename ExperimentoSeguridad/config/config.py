@@ -5,6 +5,13 @@ from typing import Optional
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./users.db")
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+# Pools de la revocación (camino async): Redis y SQL
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT_SECONDS = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", "1"))  # espera por una conexión libre
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "0.5"))
+REDIS_RECONNECT_MAX_SECONDS = float(os.getenv("REDIS_RECONNECT_MAX_SECONDS", "30"))  # tope del backoff
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+
 # Configuración de JWT (ahora usa RS256)
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 ACCESS_TTL_SEC = ACCESS_TOKEN_EXPIRE_MINUTES * 60  # En segundos
@@ -20,15 +27,31 @@ KEYS_DIR = KEYS_DIRECTORY  # Alias para compatibilidad
 DEFAULT_KID = "key-1"
 ACTIVE_KID = os.getenv("ACTIVE_KID", DEFAULT_KID)
 
+# Caché de tokens ya verificados (firma + claims) en cada proceso; cada entrada vence con el exp del token
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "10000"))
+
+# Índice local de revocación (Bloom + jti recientes), sincronizado entre procesos por Redis pub/sub
+REVOCATION_FILTER_ENABLED = os.getenv("REVOCATION_FILTER_ENABLED", "true").lower() == "true"
+REVOCATION_CHANNEL = os.getenv("REVOCATION_CHANNEL", "revocations")
+REVOCATION_FILTER_CAPACITY = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+REVOCATION_FILTER_FP_RATE = float(os.getenv("REVOCATION_FILTER_FP_RATE", "0.001"))
+REVOCATION_RELOAD_SECONDS = int(os.getenv("REVOCATION_RELOAD_SECONDS", "300"))  # recarga completa desde SQL
+
 # Configuración JWT Claims
 JWT_ISS = os.getenv("JWT_ISS", "experimento-seguridad")
 JWT_AUD = os.getenv("JWT_AUD", "api-users")
+# Los demás servicios cachean /.well-known/jwks.json este tiempo: una rotación llega a todos en ese plazo
+JWKS_MAX_AGE_SECONDS = int(os.getenv("JWKS_MAX_AGE_SECONDS", "300"))
 
 # Configuración de observabilidad
 PROMETHEUS_ENABLED = os.getenv("PROMETHEUS_ENABLED", "true").lower() == "true"
 METRICS_PATH = "/metrics"
 
-# Configuración de RBAC
+# Configuración de RBAC (policy-as-data). Si RBAC_POLICY_FILE apunta a un JSON con "roles", "routes"
+# y/o "public", reemplaza estos valores y se recarga en caliente cuando cambia el archivo
+RBAC_POLICY_FILE = os.getenv("RBAC_POLICY_FILE", "")
+RBAC_RELOAD_SECONDS = float(os.getenv("RBAC_RELOAD_SECONDS", "5"))  # cada cuánto se mira el mtime
+
 RBAC_POLICIES = {
     "admin": {
         "users": ["read", "create", "update", "delete"],
@@ -39,3 +62,20 @@ RBAC_POLICIES = {
         "auth": []
     }
 }
+
+# Permiso por ruta ("MÉTODO plantilla" del router -> "recurso:acción"); None = solo requiere token
+RBAC_ROUTES = {
+    "GET /users/{user_id}": "users:read",
+    "PUT /users/{user_id}": "users:update",
+    "DELETE /users/{user_id}": "users:delete",
+    "POST /auth/revoke": None,
+    "GET /auth/blacklist": "auth:view_blacklist",
+    "POST /auth/rotate-keys": "auth:rotate_keys"
+}
+
+# Rutas sin token (registro, login y refresh, que trae su propio token en el body)
+RBAC_PUBLIC_ROUTES = [
+    "POST /users/",
+    "POST /token",
+    "POST /auth/refresh"
+]
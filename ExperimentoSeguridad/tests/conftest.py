@@ -1,6 +1,7 @@
 """
 Configuración de tests para el experimento de seguridad
 """
+import os
 import pytest
 import asyncio
 from fastapi.testclient import TestClient
@@ -10,6 +11,20 @@ from app.main import app
 from app.models.db_models import Base
 from config.config import DATABASE_URL
 
+# Umbrales de tiempo (p95, req/s): dependen de la máquina, solo se verifican con RUN_BENCHMARKS=1
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS") == "1"
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: medición de rendimiento, solo con RUN_BENCHMARKS=1")
+
+def pytest_collection_modifyitems(config, items):
+    if RUN_BENCHMARKS:
+        return
+    skip = pytest.mark.skip(reason="benchmark: exportar RUN_BENCHMARKS=1")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
 # Base de datos de prueba
 TEST_DATABASE_URL = "sqlite:///./test_users.db"
 engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -67,7 +67,7 @@ def test_user_cannot_rotate_keys(client, user_token):
     headers = {"Authorization": f"Bearer {user_token}"}
     response = client.post("/auth/rotate-keys", headers=headers)
     assert response.status_code == 403
-    assert "administradores" in response.json()["detail"].lower()
+    assert "permisos" in response.json()["detail"].lower()
 
 def test_admin_can_view_blacklist(client, admin_token):
     """Test que admin puede ver la blacklist"""
@@ -81,7 +81,7 @@ def test_user_cannot_view_blacklist(client, user_token):
     headers = {"Authorization": f"Bearer {user_token}"}
     response = client.get("/auth/blacklist", headers=headers)
     assert response.status_code == 403
-    assert "administradores" in response.json()["detail"].lower()
+    assert "permisos" in response.json()["detail"].lower()
 
 def test_unauthorized_access_returns_401(client, regular_user_data):
     """Test que acceso sin token retorna 401"""
@@ -231,3 +231,22 @@ def test_rotation_preserves_jwks_endpoint(client, admin_token):
         assert key["kty"] == "RSA"
         assert key["alg"] == "RS256"
         assert key["use"] == "sig"
+
+def test_jwks_revalidation_with_etag(client, admin_token):
+    """JWKS cacheable: If-None-Match con el ETag vigente da 304; tras rotar, 200 con ETag nuevo"""
+    response = client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "max-age=" in response.headers["cache-control"]
+    
+    response = client.get("/.well-known/jwks.json", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    new_kid = client.post("/auth/rotate-keys", headers=headers).json()["new_kid"]
+    
+    response = client.get("/.well-known/jwks.json", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert new_kid in [key["kid"] for key in response.json()["keys"]]
@@ -0,0 +1,66 @@
+"""
+Test: tabla RBAC compilada desde el router, skip_paths exactos y política recargable en caliente
+"""
+import json
+import os
+
+from app.main import app
+from app.utils.rbac import RBACManager
+from config.config import RBAC_POLICIES
+
+
+def test_root_skip_path_does_not_skip_everything(client):
+    """'/' en skip_paths solo salta '/', no todas las rutas que empiezan con '/'"""
+    assert client.get("/").status_code == 200
+    response = client.get("/users/1")
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token de autorización requerido"
+
+
+def test_route_table_compiled_from_router():
+    """Cada (método, plantilla) del router resuelve a su regla; rutas públicas sin máscara"""
+    rbac = RBACManager()
+    rbac.compile_routes(app.routes)
+
+    rule = rbac.resolve("DELETE", "/users/42")
+    assert rule.template == "/users/{user_id}" and not rule.public
+    assert rbac.is_allowed("admin", rule)
+    assert not rbac.is_allowed("user", rule)
+    assert not rbac.is_allowed("desconocido", rule)
+
+    assert rbac.resolve("POST", "/token").public
+    assert rbac.resolve("POST", "/auth/revoke").mask == 0  # solo token
+    assert rbac.resolve("GET", "/no-existe") is None
+
+
+def test_bitsets_match_policies():
+    """has_permission con máscaras equivale a la pertenencia en las listas de la política"""
+    rbac = RBACManager()
+    actions = {(resource, action) for resources in RBAC_POLICIES.values()
+               for resource, acts in resources.items() for action in acts}
+    for role, resources in RBAC_POLICIES.items():
+        for resource, action in actions | {("users", "purge")}:
+            assert rbac.has_permission(role, resource, action) == (action in resources.get(resource, []))
+
+
+def test_policy_file_hot_reload(tmp_path, monkeypatch):
+    """Un cambio en RBAC_POLICY_FILE se aplica sin reiniciar; un archivo inválido no reemplaza la política"""
+    monkeypatch.setattr("app.utils.rbac.RBAC_RELOAD_SECONDS", 0)
+    policy_file = tmp_path / "rbac.json"
+    policy = {"roles": {"user": {"users": ["read"]}}, "routes": {"GET /users/{user_id}": "users:read"}}
+    policy_file.write_text(json.dumps(policy))
+
+    rbac = RBACManager(policy_file=str(policy_file))
+    assert rbac.is_allowed("user", rbac.resolve("GET", "/users/1"))
+
+    policy["roles"]["user"]["users"] = []
+    policy_file.write_text(json.dumps(policy))
+    os.utime(policy_file, (1, 1))
+    rbac.maybe_reload()
+    assert not rbac.is_allowed("user", rbac.resolve("GET", "/users/1"))
+
+    policy_file.write_text("{no es json")
+    os.utime(policy_file, (2, 2))
+    rbac.maybe_reload()
+    assert rbac.resolve("GET", "/users/1") is not None
+    assert not rbac.has_permission("user", "users", "read")
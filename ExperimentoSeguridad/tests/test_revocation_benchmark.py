@@ -0,0 +1,124 @@
+"""
+Test: consulta de revocación síncrona vs async con 1000 requests concurrentes contra Redis con RTT fijo
+"""
+import asyncio
+import threading
+import time
+import uuid
+
+import pytest
+import redis
+
+from app.utils.revocation_store import RevocationStore
+
+CONCURRENCY = 1000
+RTT_S = 0.002  # Redis en otro host de la misma zona
+
+
+class _SlowRedis:
+    """Redis mínimo (PING/GET) que responde cada comando tras RTT_S, en su propio hilo y event loop"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    await reader.readline()
+                    args.append((await reader.readline()).strip().upper())
+                await asyncio.sleep(self.rtt)
+                if args[0] == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif args[0] == b"GET":
+                    writer.write(b"$1\r\n1\r\n")  # todo jti figura como revocado: no se llega a SQL
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self.loop.run_forever()
+
+    def __enter__(self):
+        self._thread.start()
+        self._ready.wait(5)
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def __exit__(self, *exc):
+        async def _drain_handlers():
+            # Los clientes ya cerraron sus conexiones: cada handler termina al leer EOF
+            handlers = asyncio.all_tasks() - {asyncio.current_task()}
+            if handlers:
+                await asyncio.wait(handlers, timeout=5)
+
+        asyncio.run_coroutine_threadsafe(_drain_handlers(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+
+
+async def _concurrent(check, jtis) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(check(jti) for jti in jtis))
+    assert all(results)
+    return len(jtis) / (time.perf_counter() - start)
+
+
+def test_concurrent_async_lookups_all_answered():
+    """1000 consultas concurrentes por el pool async: todas responden revocado"""
+    jtis = [str(uuid.uuid4()) for _ in range(CONCURRENCY)]
+    with _SlowRedis(RTT_S) as redis_url:
+        store = RevocationStore(redis_url=redis_url)
+
+        async def run_async():
+            assert await store.ping_redis()
+            try:
+                await _concurrent(store.is_token_revoked, jtis)
+            finally:
+                await store.close()
+
+        asyncio.run(run_async())
+
+
+@pytest.mark.benchmark
+def test_async_revocation_beats_sync_under_concurrency():
+    """El cliente síncrono bloquea el event loop (un request por RTT); el async solapa las esperas"""
+    jtis = [str(uuid.uuid4()) for _ in range(CONCURRENCY)]
+    with _SlowRedis(RTT_S) as redis_url:
+        # Como antes: GET síncrono dentro del middleware async
+        sync_client = redis.from_url(redis_url, decode_responses=True)
+
+        async def sync_check(jti):
+            return sync_client.get(f"revoked:{jti}") is not None
+
+        sync_rate = asyncio.run(_concurrent(sync_check, jtis))
+        sync_client.close()
+
+        store = RevocationStore(redis_url=redis_url)
+
+        async def run_async():
+            assert await store.ping_redis()  # como en el arranque de la app
+            try:
+                return await _concurrent(store.is_token_revoked, jtis)
+            finally:
+                await store.close()
+
+        async_rate = asyncio.run(run_async())
+
+    print(f"\nrevocación ({CONCURRENCY} concurrentes, RTT {RTT_S * 1000:.0f} ms): "
+          f"síncrona {sync_rate:.0f} req/s  async {async_rate:.0f} req/s")
+    assert sync_rate < 1 / RTT_S
+    assert async_rate > 2 * sync_rate
@@ -0,0 +1,90 @@
+"""
+Test: índice local de revocación (Bloom + recientes), solo los positivos consultan Redis/SQL
+"""
+import asyncio
+import uuid
+
+import pytest
+
+from app.utils.revocation_filter import BloomFilter, RevocationIndex, revocation_index
+
+
+def _synced_index(jtis) -> RevocationIndex:
+    index = RevocationIndex(capacity=1000, fp_rate=0.01)
+    index.load(jtis)
+    index._subscribed = True  # como si el hilo de sincronización estuviera suscrito
+    return index
+
+
+def _is_revoked(index, jti, lookup) -> bool:
+    async def _lookup(j):
+        return lookup(j)
+    return asyncio.run(index.is_revoked(jti, _lookup))
+
+
+def test_bloom_has_no_false_negatives_and_bounded_fp_rate():
+    """Todo jti agregado da positivo; los ajenos, cerca de la tasa configurada"""
+    bloom = BloomFilter(capacity=10000, fp_rate=0.01)
+    revoked = [str(uuid.uuid4()) for _ in range(10000)]
+    for jti in revoked:
+        bloom.add(jti)
+    assert all(jti in bloom for jti in revoked)
+
+    others = [str(uuid.uuid4()) for _ in range(20000)]
+    observed = sum(jti in bloom for jti in others) / len(others)
+    assert observed < 0.02
+    assert bloom.estimated_fp_rate() == pytest.approx(0.01, rel=0.2)
+
+
+def test_only_filter_positives_reach_the_store():
+    """Negativos se responden localmente; positivos y falsos positivos van al store"""
+    revoked = [str(uuid.uuid4()) for _ in range(100)]
+    index = _synced_index(revoked)
+    lookups = []
+
+    def lookup(jti):
+        lookups.append(jti)
+        return jti in revoked
+
+    assert all(_is_revoked(index, jti, lookup) for jti in revoked)
+    assert lookups == revoked
+
+    lookups.clear()
+    valid = [str(uuid.uuid4()) for _ in range(1000)]
+    assert not any(_is_revoked(index, jti, lookup) for jti in valid)
+    assert len(lookups) == index.false_positives
+    assert index.negatives + index.false_positives == len(valid)
+    assert index.observed_fp_rate() == index.false_positives / len(valid)
+
+
+def test_recent_revocations_answered_exactly():
+    """Un jti publicado después de la carga se da por revocado sin consultar el store"""
+    index = _synced_index([])
+    jti = str(uuid.uuid4())
+    index.add(jti)
+    assert _is_revoked(index, jti, lambda _: pytest.fail("no debe consultar el store"))
+
+
+def test_unsynced_index_falls_back_to_store():
+    """Sin carga o sin suscripción (Redis caído) todas las consultas van al store (fail-closed)"""
+    index = RevocationIndex(capacity=1000, fp_rate=0.01)
+    assert _is_revoked(index, "cualquiera", lambda _: True)
+
+    index.load([])
+    assert not index.synced
+    assert _is_revoked(index, "cualquiera", lambda _: True)
+
+
+def test_revoked_token_rejected_through_index(client, admin_token, monkeypatch):
+    """/auth/revoke agrega el jti al índice del proceso; el siguiente request se rechaza"""
+    monkeypatch.setattr(revocation_index, "_loaded", True)
+    monkeypatch.setattr(revocation_index, "_subscribed", True)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    assert client.get("/users/1", headers=headers).status_code != 401
+    response = client.post("/auth/revoke", json={"token": admin_token}, headers=headers)
+    assert response.status_code == 200
+
+    response = client.get("/users/1", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revocado"
@@ -1,8 +1,9 @@
 """
 Test: Simula Redis caído, usa fallback SQL, 0 accesos indebidos, métrica redis_down
 """
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from app.utils.revocation_store import RevocationStore
 
 def test_redis_status_metric_when_down():
@@ -19,3 +20,43 @@ def test_redis_status_metric_when_down():
         status = revocation_store.get_redis_status()
         assert not status["available"]
         assert status["status"] == "disconnected"
+
+def test_redis_reconnects_with_backoff(db_session):
+    """Redis caído: fallback SQL sin latch permanente; se reintenta con backoff y se reconecta"""
+    from tests.conftest import TEST_DATABASE_URL
+    import app.utils.revocation_store as store_module
+
+    clock = [1000.0]
+    client = MagicMock()
+    client.ping = AsyncMock(side_effect=[Exception("Redis connection failed"), True])
+    client.get = AsyncMock(return_value=None)
+
+    with patch.object(store_module.time, 'monotonic', lambda: clock[0]):
+        revocation_store = RevocationStore(database_url=TEST_DATABASE_URL)
+        revocation_store.redis_client = client
+
+        async def scenario():
+            try:
+                # Primer intento: ping falla, responde SQL (no revocado)
+                assert not await revocation_store.is_token_revoked("jti-1")
+                assert revocation_store.get_redis_status()["status"] == "disconnected"
+                # Dentro del backoff no se reintenta
+                assert not await revocation_store.is_token_revoked("jti-1")
+                assert client.ping.await_count == 1
+                # Vencido el backoff se reconecta y vuelve a consultar Redis
+                clock[0] += 5
+                assert not await revocation_store.is_token_revoked("jti-1")
+                assert client.ping.await_count == 2
+                client.get.assert_awaited_with("revoked:jti-1")
+                assert revocation_store.get_redis_status()["status"] == "connected"
+            finally:
+                await revocation_store._engine.dispose()
+
+        asyncio.run(scenario())
+
+
+def test_fail_closed_when_redis_and_sql_down():
+    """Sin Redis y sin SQL el token se considera revocado"""
+    revocation_store = RevocationStore(database_url="sqlite:////nonexistent/dir/users.db")
+    revocation_store.redis_client = MagicMock(ping=AsyncMock(side_effect=Exception("Redis connection failed")))
+    assert asyncio.run(revocation_store.is_token_revoked("jti-1"))
@@ -1,20 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import date
 
 from ..services import crud
 from ..models.database import get_db
 from ..models.ventas import VentaCreate, VentaUpdate, VentaOut
 from ..models.visitas import VisitaCreate
+from ..utils import pagination
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[VentaOut])
-def get_ventas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_ventas(request: Request, response: Response, skip: int = 0, limit: int = 100,
+               cursor: Optional[str] = None, count: bool = False, db: Session = Depends(get_db)):
     """Obtener listado de ventas"""
-    return crud.get_ventas(db, skip=skip, limit=limit)
+    ventas = crud.get_ventas(db, skip=skip, limit=limit, cursor=cursor)
+    pagination.agregar_encabezados(request, response, ventas, limit, crud.contar_ventas(db) if count else None)
+    return ventas
 
 
 @router.post("/", response_model=VentaOut, status_code=201)
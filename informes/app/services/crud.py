@@ -12,7 +12,8 @@ from app.models.ventas import VentaCreate
 from app.models.visitas import VisitaBase, VisitaCreate
 from config.config import DATABASE_URL, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.models import models
-from typing import List, Optional
+from app.utils import pagination
+from typing import List, Optional, Tuple
 import pandas as pd
 
 # Configuración de encriptación
@@ -57,16 +58,20 @@ def get_venta(db: Session, venta_id: int) -> Optional[models.Venta]:
     return db.query(models.Venta).filter(models.Venta.id == venta_id).first()
 
 
-def get_ventas(db: Session, skip: int = 0, limit: int = 100) -> List[models.Venta]:
+def get_ventas(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[models.Venta]:
     """
     /**
-     * @brief Obtiene la lista de ventas.
+     * @brief Obtiene una página de ventas ordenada por id.
      * @param db Sesión de base de datos.
-     * @param skip y limit para paginación.
+     * @param skip y limit para paginación; cursor (X-Next-Cursor) para paginación por keyset.
      * @return Ventas encontradas o lista vacía si no existen.
      */
     """
-    return db.query(models.Venta).offset(skip).limit(limit).all()
+    return pagination.paginar(db.query(models.Venta), models.Venta.id, skip, limit, cursor).all()
+
+
+def contar_ventas(db: Session) -> Tuple[int, bool]:
+    return pagination.contar(db.query(models.Venta))
 
 
 def create_venta(db: Session, venta: VentaCreate) -> models.Venta:
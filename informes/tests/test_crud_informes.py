@@ -51,14 +51,14 @@ class TestCRUDVentas(unittest.TestCase):
     # ---------------------------------------------------------------------
     def test_get_ventas_lista(self):
         """Debe retornar una lista de ventas"""
-        self.mock_db.query().offset().limit().all.return_value = [self.mock_venta]
+        self.mock_db.query().order_by().offset().limit().all.return_value = [self.mock_venta]
         ventas = crud.get_ventas(self.mock_db)
         self.assertEqual(len(ventas), 1)
         self.assertEqual(ventas[0].producto, "Paracetamol")
 
     def test_get_ventas_vacia(self):
         """Debe retornar lista vacía cuando no hay registros"""
-        self.mock_db.query().offset().limit().all.return_value = []
+        self.mock_db.query().order_by().offset().limit().all.return_value = []
         ventas = crud.get_ventas(self.mock_db)
         self.assertEqual(ventas, [])
 
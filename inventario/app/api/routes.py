@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
-from ..application.commands import AjustarStockCommand, CrearProductoCommand, CrearBodegaCommand
+from ..application.commands import AjustarStockCommand, AjustarStockLoteCommand, CrearProductoCommand, CrearBodegaCommand
 from ..application.handlers import (
     handle_ajustar_stock,
+    handle_ajustar_stock_lote,
     handle_crear_producto,
     handle_listar_productos,
     handle_obtener_producto,
@@ -13,9 +14,14 @@ from ..application.handlers import (
     handle_crear_bodega,
 )
 from ..application.queries import ListarProductosQuery, ObtenerProductoQuery, ListarBodegasQuery, ObtenerBodegaQuery
+from ..domain.models import ConflictoDeVersion, EstadoAjuste
 from ..domain.repositories import UnitOfWork
+from ..infrastructure.cache import CacheProductos
 from ..schemas.inventario import (
     AjusteStockRequest,
+    AjustesLoteRequest,
+    AjustesLoteResponse,
+    ResultadoAjusteSchema,
     CrearProductoRequest,
     BodegaSchema,
     BodegaDetalleSchema,
@@ -25,19 +31,53 @@ from ..schemas.inventario import (
 
 
 def get_uow() -> UnitOfWork:
-    # Dependency injected in app.__init__ at startup
-    from ..container import uow
+    # Una unidad de trabajo nueva por petición (ver container.crear_uow)
+    from ..container import crear_uow
 
-    return uow
+    return crear_uow()
+
+
+def get_cache() -> CacheProductos | None:
+    from ..container import cache
+
+    return cache
+
+
+def _usar_cache(request: Request) -> bool:
+    # Cache-Control: no-cache lee de la base (y deja la respuesta en la caché)
+    return "no-cache" not in request.headers.get("cache-control", "").lower()
 
 
 router = APIRouter(prefix="/inventario", tags=["inventario"])
 
 
+EXPOSE_HEADERS = ["X-Next-Cursor", "Link"]
+
+
 @router.get("/productos", response_model=list[ProductoInventarioSchema])
-def listar_productos(q: str | None = Query(default=None), uow: UnitOfWork = Depends(get_uow)):
-    query = ListarProductosQuery(q=q)
-    productos = handle_listar_productos(uow, query)
+def listar_productos(
+    request: Request,
+    response: Response,
+    q: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=500),
+    cursor: str | None = Query(default=None),
+    uow: UnitOfWork = Depends(get_uow),
+    cache: CacheProductos | None = Depends(get_cache),
+):
+    # Sin limit se devuelve la lista completa, como antes; con limit la página siguiente
+    # viaja en X-Next-Cursor y Link
+    query = ListarProductosQuery(q=q, limit=limit, cursor=cursor, usar_cache=_usar_cache(request))
+    try:
+        pagina = handle_listar_productos(uow, query, cache)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if pagina.siguiente_cursor:
+        siguiente = request.url.include_query_params(cursor=pagina.siguiente_cursor)
+        response.headers["X-Next-Cursor"] = pagina.siguiente_cursor
+        response.headers["Link"] = f'<{siguiente}>; rel="next"'
+
+    productos = pagina.items
     # Pydantic will use aliases for camelCase
     return [
         ProductoInventarioSchema(
@@ -53,15 +93,21 @@ def listar_productos(q: str | None = Query(default=None), uow: UnitOfWork = Depe
             proveedor=p.proveedor,
             categoria=p.categoria,
             valor_unitario=p.valor_unitario,
+            version=p.version,
         )
         for p in productos
     ]
 
 
 @router.get("/productos/{producto_id}", response_model=ProductoInventarioSchema)
-def obtener_producto(producto_id: int, uow: UnitOfWork = Depends(get_uow)):
-    query = ObtenerProductoQuery(producto_id=producto_id)
-    p = handle_obtener_producto(uow, query)
+def obtener_producto(
+    producto_id: int,
+    request: Request,
+    uow: UnitOfWork = Depends(get_uow),
+    cache: CacheProductos | None = Depends(get_cache),
+):
+    query = ObtenerProductoQuery(producto_id=producto_id, usar_cache=_usar_cache(request))
+    p = handle_obtener_producto(uow, query, cache)
     if not p:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     return ProductoInventarioSchema(
@@ -77,18 +123,27 @@ def obtener_producto(producto_id: int, uow: UnitOfWork = Depends(get_uow)):
         proveedor=p.proveedor,
         categoria=p.categoria,
         valor_unitario=p.valor_unitario,
+        version=p.version,
     )
 
 
 @router.post("/productos/{producto_id}/ajustar", response_model=ProductoInventarioSchema)
-def ajustar_stock(producto_id: int, body: AjusteStockRequest, uow: UnitOfWork = Depends(get_uow)):
+def ajustar_stock(
+    producto_id: int,
+    body: AjusteStockRequest,
+    uow: UnitOfWork = Depends(get_uow),
+    cache: CacheProductos | None = Depends(get_cache),
+):
     try:
         updated = handle_ajustar_stock(
             uow,
             AjustarStockCommand(
-                producto_id=producto_id, bodega_id=body.bodegaId, delta=body.delta
+                producto_id=producto_id, bodega_id=body.bodegaId, delta=body.delta, version=body.version
             ),
+            cache,
         )
+    except ConflictoDeVersion as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -105,11 +160,61 @@ def ajustar_stock(producto_id: int, body: AjusteStockRequest, uow: UnitOfWork =
         proveedor=updated.proveedor,
         categoria=updated.categoria,
         valor_unitario=updated.valor_unitario,
+        version=updated.version,
+    )
+
+
+@router.post("/ajustes:batch", response_model=AjustesLoteResponse)
+def ajustar_stock_lote(
+    body: AjustesLoteRequest,
+    uow: UnitOfWork = Depends(get_uow),
+    cache: CacheProductos | None = Depends(get_cache),
+):
+    # Los ajustes inválidos no hacen fallar el lote: cada uno trae su propio resultado
+    resultados = handle_ajustar_stock_lote(
+        uow,
+        AjustarStockLoteCommand(
+            ajustes=[
+                AjustarStockCommand(
+                    producto_id=a.productoId,
+                    bodega_id=a.bodegaId,
+                    delta=a.delta,
+                    version=a.version,
+                    clave_idempotencia=a.idempotencyKey,
+                )
+                for a in body.ajustes
+            ]
+        ),
+        cache,
+    )
+
+    return AjustesLoteResponse(
+        aplicados=sum(r.estado == EstadoAjuste.aplicado for r in resultados),
+        duplicados=sum(r.estado == EstadoAjuste.duplicado for r in resultados),
+        rechazados=sum(r.estado in (EstadoAjuste.rechazado, EstadoAjuste.conflicto) for r in resultados),
+        resultados=[
+            ResultadoAjusteSchema(
+                productoId=r.producto_id,
+                bodegaId=r.bodega_id,
+                delta=r.delta,
+                estado=r.estado.value,
+                idempotencyKey=r.clave,
+                cantidadDisponible=r.cantidad_disponible,
+                stockTotal=r.stock_total,
+                version=r.version,
+                error=r.error,
+            )
+            for r in resultados
+        ],
     )
 
 
 @router.post("/productos", response_model=ProductoInventarioSchema, status_code=201)
-def crear_producto(body: CrearProductoRequest, uow: UnitOfWork = Depends(get_uow)):
+def crear_producto(
+    body: CrearProductoRequest,
+    uow: UnitOfWork = Depends(get_uow),
+    cache: CacheProductos | None = Depends(get_cache),
+):
     if body.stockMinimo < 0:
         raise HTTPException(status_code=400, detail="Stock mínimo no puede ser negativo")
 
@@ -129,6 +234,7 @@ def crear_producto(body: CrearProductoRequest, uow: UnitOfWork = Depends(get_uow
             valor_unitario=body.valorUnitario,
             bodegas=[b.model_dump(by_alias=True) for b in body.bodegas],
         ),
+        cache,
     )
 
     return ProductoInventarioSchema(
@@ -144,9 +250,18 @@ def crear_producto(body: CrearProductoRequest, uow: UnitOfWork = Depends(get_uow
         proveedor=created.proveedor,
         categoria=created.categoria,
         valor_unitario=created.valor_unitario,
+        version=created.version,
     )
 
 
+@router.get("/cache")
+def estadisticas_cache(cache: CacheProductos | None = Depends(get_cache)):
+    # Aciertos por nivel, fallos, lecturas que omitieron la caché e invalidaciones
+    if cache is None:
+        return {"activa": False}
+    return cache.estadisticas()
+
+
 @router.get("/bodegas", response_model=list[BodegaSchema])
 def listar_bodegas(uow: UnitOfWork = Depends(get_uow)):
     bodegas = handle_listar_bodegas(uow, ListarBodegasQuery())
@@ -7,6 +7,15 @@ class AjustarStockCommand:
     producto_id: int
     bodega_id: int
     delta: int
+    # Versión del producto que conoce el cliente; None ajusta sin comprobarla
+    version: int | None = None
+    # Solo en lotes: un reintento con la misma clave no se vuelve a aplicar
+    clave_idempotencia: str | None = None
+
+
+@dataclass
+class AjustarStockLoteCommand:
+    ajustes: List[AjustarStockCommand]
 
 
 @dataclass
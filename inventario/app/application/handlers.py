@@ -1,22 +1,47 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List
-
-from ..domain.models import Bodega, BodegaDetalle, ProductoInventario
+from typing import TYPE_CHECKING, List
+
+from ..domain.models import (
+    AjusteStock,
+    Bodega,
+    BodegaDetalle,
+    EstadoAjuste,
+    PaginaProductos,
+    ProductoInventario,
+    ResultadoAjuste,
+)
 from ..domain.repositories import UnitOfWork
-from .commands import AjustarStockCommand, CrearProductoCommand, CrearBodegaCommand
+from .commands import AjustarStockCommand, AjustarStockLoteCommand, CrearProductoCommand, CrearBodegaCommand
 from .queries import ListarProductosQuery, ObtenerProductoQuery, ListarBodegasQuery, ObtenerBodegaQuery
 
+if TYPE_CHECKING:
+    from ..infrastructure.cache import CacheProductos
 
-def handle_listar_productos(uow: UnitOfWork, query: ListarProductosQuery) -> List[ProductoInventario]:
-    with uow:
-        return uow.productos.list(q=query.q)
 
+def handle_listar_productos(
+    uow: UnitOfWork, query: ListarProductosQuery, cache: CacheProductos | None = None
+) -> PaginaProductos:
+    def cargar() -> PaginaProductos:
+        with uow:
+            return uow.productos.buscar(q=query.q, limit=query.limit, cursor=query.cursor)
 
-def handle_obtener_producto(uow: UnitOfWork, query: ObtenerProductoQuery) -> ProductoInventario | None:
-    with uow:
-        return uow.productos.get(query.producto_id)
+    if cache is None:
+        return cargar()
+    return cache.pagina(query.q, query.limit, query.cursor, cargar, refrescar=not query.usar_cache)
+
+
+def handle_obtener_producto(
+    uow: UnitOfWork, query: ObtenerProductoQuery, cache: CacheProductos | None = None
+) -> ProductoInventario | None:
+    def cargar() -> ProductoInventario | None:
+        with uow:
+            return uow.productos.get(query.producto_id)
+
+    if cache is None:
+        return cargar()
+    return cache.producto(query.producto_id, cargar, refrescar=not query.usar_cache)
 
 
 def handle_listar_bodegas(uow: UnitOfWork, query: ListarBodegasQuery):
@@ -29,21 +54,46 @@ def handle_obtener_bodega(uow: UnitOfWork, query: ObtenerBodegaQuery) -> Bodega
         return uow.bodegas.get(query.bodega_id)
 
 
-def handle_ajustar_stock(uow: UnitOfWork, cmd: AjustarStockCommand) -> ProductoInventario:
+def handle_ajustar_stock(
+    uow: UnitOfWork, cmd: AjustarStockCommand, cache: CacheProductos | None = None
+) -> ProductoInventario:
     with uow:
-        producto = uow.productos.get(cmd.producto_id)
+        # El repositorio aplica el delta en la base (sin leer y reescribir el producto), así dos
+        # ajustes simultáneos no se pisan
+        producto = uow.productos.ajustar_stock(cmd.producto_id, cmd.bodega_id, cmd.delta, version=cmd.version)
+        uow.commit()
 
-        if not producto:
-            raise ValueError("Producto no encontrado")
+    # Después del commit: una lectura que llegue antes de invalidar aún ve el valor anterior
+    if cache is not None:
+        cache.invalidar_productos([cmd.producto_id])
+    return producto
 
-        producto.ajustar_stock_bodega(cmd.bodega_id, cmd.delta)
-        uow.productos.save(producto)
+
+def handle_ajustar_stock_lote(
+    uow: UnitOfWork, cmd: AjustarStockLoteCommand, cache: CacheProductos | None = None
+) -> List[ResultadoAjuste]:
+    with uow:
+        # Todo el lote se aplica en una sola transacción
+        resultados = uow.productos.ajustar_stock_lote([
+            AjusteStock(
+                producto_id=a.producto_id,
+                bodega_id=a.bodega_id,
+                delta=a.delta,
+                version=a.version,
+                clave=a.clave_idempotencia,
+            )
+            for a in cmd.ajustes
+        ])
         uow.commit()
 
-        return producto
+    if cache is not None:
+        cache.invalidar_productos(r.producto_id for r in resultados if r.estado == EstadoAjuste.aplicado)
+    return resultados
 
 
-def handle_crear_producto(uow: UnitOfWork, cmd: CrearProductoCommand) -> ProductoInventario:
+def handle_crear_producto(
+    uow: UnitOfWork, cmd: CrearProductoCommand, cache: CacheProductos | None = None
+) -> ProductoInventario:
     with uow:
         bodegas = [
             BodegaDetalle(
@@ -78,7 +128,9 @@ def handle_crear_producto(uow: UnitOfWork, cmd: CrearProductoCommand) -> Product
         uow.productos.save(producto)
         uow.commit()
 
-        return producto
+    if cache is not None:
+        cache.invalidar_paginas()
+    return producto
 
 
 def handle_crear_bodega(uow: UnitOfWork, cmd: CrearBodegaCommand) -> Bodega:
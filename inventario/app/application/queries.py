@@ -5,11 +5,16 @@ from typing import Optional
 @dataclass
 class ListarProductosQuery:
     q: Optional[str] = None
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    # False lee de la base y refresca la caché (Cache-Control: no-cache)
+    usar_cache: bool = True
 
 
 @dataclass
 class ObtenerProductoQuery:
     producto_id: int
+    usar_cache: bool = True
 
 
 @dataclass
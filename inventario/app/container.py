@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+from .infrastructure.cache import CacheProductos
 from .infrastructure.memory_repo import InMemoryProductoRepo, InMemoryUnitOfWork
 from .infrastructure.seed import seed_items
-from .infrastructure.postgres import build_uow_from_env
+from .infrastructure.postgres import build_uow_factory_from_env
 
 
 # Contenedor DI. Si hay una URL de base de datos presente, use Postgres; de lo contrario, en memoria.
-_pg_uow = build_uow_from_env()
-if _pg_uow is not None:
-	uow = _pg_uow
+# Cada petición pide su unidad de trabajo a crear_uow: la de Postgres guarda la sesión en la instancia.
+_pg_uow_factory = build_uow_factory_from_env()
+if _pg_uow_factory is not None:
+	crear_uow = _pg_uow_factory
 else:
 	repo = InMemoryProductoRepo(items=seed_items())
-	uow = InMemoryUnitOfWork(repo=repo)
+	crear_uow = lambda: InMemoryUnitOfWork(repo=repo)  # noqa: E731
+
+# Caché de lecturas de productos (INVENTARIO_CACHE=0 la desactiva; INVENTARIO_CACHE_REDIS_URL agrega Redis)
+cache = CacheProductos.desde_env()
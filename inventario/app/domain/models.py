@@ -12,6 +12,13 @@ class EstadoInventario(str, Enum):
     agotado = "agotado"
 
 
+class EstadoAjuste(str, Enum):
+    aplicado = "aplicado"
+    duplicado = "duplicado"
+    rechazado = "rechazado"
+    conflicto = "conflicto"
+
+
 @dataclass
 class Bodega:
     id: int | None
@@ -42,6 +49,8 @@ class ProductoInventario:
     proveedor: str = ""
     categoria: str = ""
     valor_unitario: float = 0.0
+    # Aumenta con cada modificación; permite ajustes con control optimista de concurrencia
+    version: int = 0
 
     @property
     def status(self) -> EstadoInventario:
@@ -51,20 +60,62 @@ class ProductoInventario:
             return EstadoInventario.existencias_bajas
         return EstadoInventario.disponible
 
-    def ajustar_stock_bodega(self, bodega_id: int, delta: int) -> None:
-        found = False
-
-        for b in self.bodegas:
-            if b.id == bodega_id:
-                # El ajuste de stock ahora se hace a nivel de inventario_bodega
-                # Este método se mantiene para compatibilidad, pero el dominio
-                # de Bodega ya no tiene campos de cantidad.
-                found = True
-                break
+    def ajustar_stock_bodega(self, bodega_id: int, delta: int) -> BodegaDetalle:
+        bodega = next((b for b in self.bodegas if b.id == bodega_id), None)
 
-        if not found:
+        if bodega is None:
             raise ValueError("Bodega no encontrada para el producto")
 
-        # El cálculo de stock_total ahora debe hacerse desde infraestructura
-        # en función de inventario_bodega.
-        self.fecha_ultima_actualizacion = datetime.utcnow()
\ No newline at end of file
+        if bodega.cantidad_disponible + delta < 0:
+            raise ValueError("Stock insuficiente en la bodega")
+
+        bodega.cantidad_disponible += delta
+        self.stock_total += delta
+        self.version += 1
+        self.fecha_ultima_actualizacion = datetime.utcnow()
+
+        return bodega
+
+
+class ConflictoDeVersion(Exception):
+    """El producto cambió desde la versión con la que se pidió la modificación."""
+
+    def __init__(self, producto_id: int, version_esperada: int, version_actual: int | None = None) -> None:
+        if version_actual is None:
+            mensaje = f"El producto {producto_id} cambió después de la versión {version_esperada}"
+        else:
+            mensaje = f"El producto {producto_id} está en la versión {version_actual}, no en la {version_esperada}"
+        super().__init__(mensaje)
+        self.producto_id = producto_id
+        self.version_esperada = version_esperada
+        self.version_actual = version_actual
+
+
+@dataclass
+class PaginaProductos:
+    items: List[ProductoInventario]
+    siguiente_cursor: str | None = None
+
+
+@dataclass
+class AjusteStock:
+    producto_id: int
+    bodega_id: int
+    delta: int
+    version: int | None = None
+    # Clave de idempotencia del movimiento (p. ej. el id que genera el escáner)
+    clave: str | None = None
+
+
+@dataclass
+class ResultadoAjuste:
+    producto_id: int
+    bodega_id: int
+    delta: int
+    estado: EstadoAjuste
+    clave: str | None = None
+    # Valores justo después del ajuste (para un duplicado, los de la primera vez que se aplicó)
+    cantidad_disponible: int | None = None
+    stock_total: int | None = None
+    version: int | None = None
+    error: str | None = None
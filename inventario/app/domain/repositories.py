@@ -3,7 +3,7 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import List, Optional
 
-from .models import ProductoInventario, Bodega
+from .models import AjusteStock, Bodega, PaginaProductos, ProductoInventario, ResultadoAjuste
 
 
 class ProductoInventarioRepository(ABC):
@@ -11,6 +11,11 @@ class ProductoInventarioRepository(ABC):
     def list(self, q: Optional[str] = None) -> List[ProductoInventario]:
         raise NotImplementedError
 
+    @abstractmethod
+    def buscar(self, q: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None) -> PaginaProductos:
+        """Productos que coinciden con `q`, por relevancia, desde `cursor` y hasta `limit` resultados."""
+        raise NotImplementedError
+
     @abstractmethod
     def get(self, producto_id: int) -> Optional[ProductoInventario]:
         raise NotImplementedError
@@ -19,6 +24,29 @@ class ProductoInventarioRepository(ABC):
     def save(self, producto: ProductoInventario) -> None:
         raise NotImplementedError
 
+    @abstractmethod
+    def ajustar_stock(
+        self, producto_id: int, bodega_id: int, delta: int, version: Optional[int] = None
+    ) -> ProductoInventario:
+        """
+        Suma `delta` a la cantidad de la bodega y al stock total en una sola operación atómica.
+
+        Con `version` el ajuste solo se aplica si el producto sigue en esa versión (si no, lanza
+        ConflictoDeVersion). Lanza ValueError si el producto o la bodega no existen o si la
+        cantidad quedaría negativa.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def ajustar_stock_lote(self, ajustes: List[AjusteStock]) -> List[ResultadoAjuste]:
+        """
+        Aplica los ajustes en orden, como si fueran uno tras otro, y devuelve un resultado por ajuste.
+
+        Un ajuste inválido queda rechazado sin afectar a los demás. Un ajuste cuya clave ya se
+        aplicó (en este lote o en uno anterior) se devuelve como duplicado sin volver a aplicarse.
+        """
+        raise NotImplementedError
+
 
 class BodegaRepository(ABC):
     @abstractmethod
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Búsqueda de productos compartida por los repositorios en memoria y SQL.
+#
+# Cada término de `q` debe ser prefijo de alguna palabra de sku, lote, nombre, proveedor o
+# categoría (todos los términos deben aparecer). La relevancia es el peso más bajo entre los
+# términos, tomando para cada término el campo de mayor peso en que aparece:
+#   3 -> todos los términos están en sku o lote (el usuario escribió un código)
+#   2 -> todos están en sku, lote o nombre
+#   1 -> alguno solo aparece en proveedor o categoría
+# Los resultados se ordenan por relevancia descendente y luego por id, y se paginan con un
+# cursor opaco que guarda (relevancia, id) del último elemento devuelto.
+
+PESOS: Dict[str, int] = {"sku": 3, "lote": 3, "nombre": 2, "proveedor": 1, "categoria": 1}
+RELEVANCIAS = (3, 2, 1)
+
+# Filas que se recorren en orden de id buscando los primeros resultados de una relevancia antes
+# de recurrir al índice invertido. Con resultados frecuentes la ventana se llena enseguida; si
+# no se llena, los resultados son escasos y el índice devuelve pocos candidatos.
+VENTANA = 10_000
+
+_PALABRA = re.compile(r"[^\W_]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes, igual que el translate() de las columnas de PostgreSQL."""
+    texto = texto or ""
+    if texto.isascii():
+        return texto.lower()
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def palabras(texto: str) -> List[str]:
+    """Palabras (letras y dígitos) de un texto; guiones, puntos y demás signos separan palabras."""
+    return _PALABRA.findall(normalizar(texto))
+
+
+def campos_con_peso(peso_minimo: int) -> List[str]:
+    return [campo for campo, peso in PESOS.items() if peso >= peso_minimo]
+
+
+def encode_cursor(relevancia: Optional[int], producto_id: int) -> str:
+    valor = [relevancia, producto_id] if relevancia is not None else producto_id
+    crudo = json.dumps({"id": valor}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, con_relevancia: bool) -> Tuple[Optional[int], int]:
+    """Devuelve (relevancia, id) del cursor; lanza ValueError si no corresponde a la búsqueda."""
+    try:
+        valor = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
+
+    if con_relevancia and isinstance(valor, list) and len(valor) == 2 and all(type(v) is int for v in valor):
+        if valor[0] in RELEVANCIAS:
+            return valor[0], valor[1]
+    if not con_relevancia and type(valor) is int:
+        return None, valor
+    raise ValueError("Cursor inválido")
+
+
+def primeros_por_relevancia(
+    en_ventana: Callable[[int, int], Dict[int, List[int]]],
+    en_indice: Callable[[int, int, int], List[int]],
+    limite: int,
+    cursor: Optional[Tuple[Optional[int], int]] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Primeros `limite` resultados (id, relevancia) en orden (relevancia desc, id asc).
+
+    en_ventana(desde_id, n) recorre en orden VENTANA filas con id > desde_id y devuelve, por
+    relevancia, hasta n ids. Si la ventana no completa una relevancia, en_indice(relevancia,
+    desde_id, n) obtiene sus ids a partir del índice de texto. Las relevancias se completan de
+    mayor a menor hasta llegar al límite.
+    """
+    relevancia_cursor, id_cursor = cursor if cursor else (RELEVANCIAS[0], 0)
+    ventanas: Dict[int, Dict[int, List[int]]] = {}
+    resultado: List[Tuple[int, int]] = []
+
+    for relevancia in RELEVANCIAS:
+        if relevancia > relevancia_cursor:
+            continue
+
+        desde = id_cursor if relevancia == relevancia_cursor else 0
+        if desde not in ventanas:
+            ventanas[desde] = en_ventana(desde, limite)
+
+        faltan = limite - len(resultado)
+        ids = ventanas[desde].get(relevancia, [])[:faltan]
+        if len(ids) < faltan:
+            ids = en_indice(relevancia, desde, faltan)
+
+        resultado.extend((producto_id, relevancia) for producto_id in ids)
+        if len(resultado) >= limite:
+            break
+
+    return resultado
+
+
+class IndiceInvertido:
+    """
+    Índices palabra -> ids, uno por peso, con vocabulario ordenado para buscar por prefijo.
+
+    Guarda además, por producto, el texto normalizado de cada peso (" palabra palabra") para
+    comprobar un término con una búsqueda de subcadena en lugar de recorrer el vocabulario.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[int, Dict[str, Set[int]]] = {peso: {} for peso in RELEVANCIAS}
+        self._vocabulario: Dict[int, List[str]] = {peso: [] for peso in RELEVANCIAS}
+        # Palabras nuevas que aún no están en el vocabulario ordenado (se ordenan al buscar)
+        self._nuevas: Dict[int, List[str]] = {peso: [] for peso in RELEVANCIAS}
+        self._textos: Dict[int, Dict[int, str]] = {}
+        self.ids: List[int] = []
+
+    def indexar(self, producto_id: int, campos: Dict[str, str]) -> None:
+        if producto_id in self._textos:
+            self.quitar(producto_id)
+
+        por_peso: Dict[int, List[str]] = {peso: [] for peso in RELEVANCIAS}
+        for campo, valor in campos.items():
+            por_peso[PESOS[campo]].extend(palabras(valor))
+
+        for peso, lista in por_peso.items():
+            postings = self._postings[peso]
+            for palabra in set(lista):
+                posting = postings.get(palabra)
+                if posting is None:
+                    posting = postings[palabra] = set()
+                    self._nuevas[peso].append(palabra)
+                posting.add(producto_id)
+
+        self._textos[producto_id] = {peso: " " + " ".join(lista) for peso, lista in por_peso.items()}
+        insort(self.ids, producto_id)
+
+    def quitar(self, producto_id: int) -> None:
+        textos = self._textos.pop(producto_id, None)
+        if textos is None:
+            return
+
+        for peso, texto in textos.items():
+            postings, vocabulario = self._postings[peso], self._vocabulario[peso]
+            for palabra in set(texto.split()):
+                posting = postings[palabra]
+                posting.discard(producto_id)
+                if not posting:
+                    del postings[palabra]
+                    i = bisect_left(vocabulario, palabra)
+                    if i < len(vocabulario) and vocabulario[i] == palabra:
+                        del vocabulario[i]
+                    else:
+                        self._nuevas[peso].remove(palabra)
+        del self.ids[bisect_left(self.ids, producto_id)]
+
+    def relevancia(self, producto_id: int, terminos: List[str]) -> int:
+        """Relevancia del producto para los términos; 0 si alguno no aparece."""
+        textos = self._textos[producto_id]
+        minima = RELEVANCIAS[0]
+        for termino in terminos:
+            buscado = " " + termino
+            peso = next((p for p in RELEVANCIAS if buscado in textos[p]), 0)
+            if peso < minima:
+                minima = peso
+                if not minima:
+                    break
+        return minima
+
+    def _ordenar(self, peso: int) -> List[str]:
+        nuevas, vocabulario = self._nuevas[peso], self._vocabulario[peso]
+        if len(nuevas) > 1000:
+            vocabulario.extend(nuevas)
+            vocabulario.sort()
+        else:
+            for palabra in nuevas:
+                insort(vocabulario, palabra)
+        nuevas.clear()
+        return vocabulario
+
+    def _palabras_con_prefijo(self, peso: int, prefijo: str) -> List[str]:
+        vocabulario = self._ordenar(peso) if self._nuevas[peso] else self._vocabulario[peso]
+        # Todas las palabras con el prefijo quedan antes de prefijo + el mayor carácter posible
+        return vocabulario[bisect_left(vocabulario, prefijo):bisect_right(vocabulario, prefijo + "\U0010ffff")]
+
+    def _con_prefijo(self, prefijo: str, peso_minimo: int) -> List[Set[int]]:
+        return [
+            self._postings[peso][palabra]
+            for peso in RELEVANCIAS if peso >= peso_minimo
+            for palabra in self._palabras_con_prefijo(peso, prefijo)
+        ]
+
+    def estimar(self, terminos: List[str], peso_minimo: int = RELEVANCIAS[-1]) -> int:
+        """Cota superior de los ids que contienen todos los términos: la del término más escaso."""
+        return min((sum(len(p) for p in self._con_prefijo(t, peso_minimo)) for t in set(terminos)), default=0)
+
+    def candidatos(self, terminos: List[str], peso_minimo: int = RELEVANCIAS[-1]) -> Set[int]:
+        """Ids que contienen todos los términos en campos con peso >= peso_minimo."""
+        if not terminos:
+            return set()
+
+        # Se parte del término con menos ids y los demás se comprueban sobre esos candidatos
+        postings = {t: self._con_prefijo(t, peso_minimo) for t in set(terminos)}
+        primero = min(postings, key=lambda t: sum(len(p) for p in postings[t]))
+        resultado: Set[int] = set().union(*postings[primero])
+
+        if len(postings) > 1 or peso_minimo > RELEVANCIAS[-1]:
+            resultado = {i for i in resultado if self.relevancia(i, terminos) >= peso_minimo}
+        return resultado
+
+    def buscar(self, terminos: Iterable[str]) -> Dict[int, int]:
+        """Todos los ids que contienen los términos, con su relevancia."""
+        terminos = list(terminos)
+        return {i: self.relevancia(i, terminos) for i in self.candidatos(terminos)}
+
+    def en_ventana(self, terminos: List[str], desde: int, n: int) -> Dict[int, List[int]]:
+        inicio = bisect_right(self.ids, desde)
+        por_relevancia: Dict[int, List[int]] = {peso: [] for peso in RELEVANCIAS}
+        for producto_id in self.ids[inicio:inicio + VENTANA]:
+            relevancia = self.relevancia(producto_id, terminos)
+            if relevancia and len(por_relevancia[relevancia]) < n:
+                por_relevancia[relevancia].append(producto_id)
+                # Con la relevancia más alta completa, las demás ya no entran en la página
+                if relevancia == RELEVANCIAS[0] and len(por_relevancia[relevancia]) == n:
+                    break
+        return por_relevancia
+
+    def en_indice(self, terminos: List[str], relevancia: int, desde: int, n: int) -> List[int]:
+        ids = sorted(
+            i for i in self.candidatos(terminos, relevancia) if i > desde and self.relevancia(i, terminos) == relevancia
+        )
+        return ids[:n]
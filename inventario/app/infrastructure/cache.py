@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..domain.models import BodegaDetalle, PaginaProductos, ProductoInventario
+from . import busqueda
+
+logger = logging.getLogger(__name__)
+
+# Caché read-through de las lecturas del tablero de inventario (GET /productos y /productos/{id}).
+#
+# Dos niveles: un LRU en el proceso y, si se configura INVENTARIO_CACHE_REDIS_URL, Redis compartido
+# entre réplicas. Las escrituras invalidan solo lo que cambia: el producto ajustado y las páginas
+# que lo contienen (un índice producto -> páginas en cada nivel); al crear un producto se invalidan
+# todas las páginas, porque puede aparecer en cualquiera. Con Redis, cada invalidación se publica
+# para que las demás réplicas la apliquen en su LRU. El TTL acota lo que pueda quedar desactualizado
+# si se pierde una invalidación.
+
+try:
+    import redis
+except ImportError:  # el nivel Redis es opcional
+    redis = None
+
+try:
+    from prometheus_client import Counter
+
+    PROMETHEUS_AVAILABLE = True
+
+    cache_consultas_total = Counter(
+        "inventario_cache_consultas_total",
+        "Lecturas de la caché de productos por tipo (producto, pagina) y resultado (local, redis, fallo, omitido)",
+        ["tipo", "resultado"],
+    )
+    cache_invalidaciones_total = Counter(
+        "inventario_cache_invalidaciones_total",
+        "Invalidaciones de la caché de productos por motivo",
+        ["motivo"],
+    )
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+PREFIJO = "inventario:cache:"
+CANAL_INVALIDACIONES = PREFIJO + "invalidaciones"
+RESULTADOS = ("local", "redis", "fallo", "omitido")
+
+# Las páginas más grandes (p. ej. el listado completo sin limit) solo se guardan en el proceso
+MAX_ITEMS_REDIS = 1000
+
+
+def clave_producto(producto_id: int) -> str:
+    return f"{PREFIJO}producto:{producto_id}"
+
+
+def clave_pagina(q: Optional[str], limit: Optional[int], cursor: Optional[str]) -> str:
+    # Búsquedas con las mismas palabras (mayúsculas, tildes, espacios) comparten entrada
+    terminos = " ".join(busqueda.palabras(q)) if q else ""
+    crudo = json.dumps([terminos, limit, cursor]).encode("utf-8")
+    return f"{PREFIJO}pagina:{hashlib.sha1(crudo).hexdigest()}"
+
+
+def _indice_redis(producto_id: int) -> str:
+    return f"{PREFIJO}paginas-de:{producto_id}"
+
+
+_PAGINAS_REDIS = PREFIJO + "paginas"
+
+
+def _producto_a_dict(producto: ProductoInventario) -> dict:
+    datos = asdict(producto)
+    datos["fecha_ultima_actualizacion"] = producto.fecha_ultima_actualizacion.isoformat()
+    return datos
+
+
+def _producto_desde_dict(datos: dict) -> ProductoInventario:
+    datos = dict(datos)
+    datos["bodegas"] = [BodegaDetalle(**b) for b in datos["bodegas"]]
+    datos["fecha_ultima_actualizacion"] = datetime.fromisoformat(datos["fecha_ultima_actualizacion"])
+    return ProductoInventario(**datos)
+
+
+def _pagina_a_dict(pagina: PaginaProductos) -> dict:
+    return {"items": [_producto_a_dict(p) for p in pagina.items], "siguiente_cursor": pagina.siguiente_cursor}
+
+
+def _pagina_desde_dict(datos: dict) -> PaginaProductos:
+    return PaginaProductos(
+        items=[_producto_desde_dict(p) for p in datos["items"]], siguiente_cursor=datos["siguiente_cursor"]
+    )
+
+
+class CacheProductos:
+    def __init__(
+        self,
+        max_entradas: int = 10_000,
+        ttl: float = 60.0,
+        redis_client=None,
+        activa: bool = True,
+    ) -> None:
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        # Con activa=False todas las lecturas van a la base (interruptor para descartar la caché)
+        self.activa = activa
+        self._redis = redis_client
+
+        # clave -> (expira, valor, ids de productos que contiene)
+        self._entradas: OrderedDict[str, Tuple[float, object, Tuple[int, ...]]] = OrderedDict()
+        self._paginas_por_producto: Dict[int, Set[str]] = {}
+        self._paginas: Set[str] = set()
+        # Aumenta con cada invalidación: una lectura que empezó antes no guarda su resultado
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._lock_conteo = threading.Lock()
+        self._conteo: Dict[str, int] = {r: 0 for r in RESULTADOS}
+        self._invalidaciones = 0
+        self._suscripcion = None
+
+        if self._redis is not None:
+            self._escuchar_invalidaciones()
+
+    @classmethod
+    def desde_env(cls) -> "CacheProductos":
+        activa = os.getenv("INVENTARIO_CACHE", "1").lower() not in ("0", "false", "no", "off")
+        url = os.getenv("INVENTARIO_CACHE_REDIS_URL")
+        cliente = None
+
+        if activa and url:
+            if redis is None:
+                logger.warning("INVENTARIO_CACHE_REDIS_URL definido pero el paquete redis no está instalado")
+            else:
+                try:
+                    cliente = redis.Redis.from_url(url, decode_responses=True, socket_timeout=0.5)
+                    cliente.ping()
+                except Exception as e:
+                    logger.warning(f"Redis no disponible para la caché de inventario: {e}. Solo caché en proceso")
+                    cliente = None
+
+        return cls(
+            max_entradas=int(os.getenv("INVENTARIO_CACHE_MAX_ENTRADAS", "10000")),
+            ttl=float(os.getenv("INVENTARIO_CACHE_TTL", "60")),
+            redis_client=cliente,
+            activa=activa,
+        )
+
+    # Lecturas
+
+    def producto(
+        self, producto_id: int, cargar: Callable[[], Optional[ProductoInventario]], refrescar: bool = False
+    ) -> Optional[ProductoInventario]:
+        return self._leer(
+            "producto",
+            clave_producto(producto_id),
+            cargar,
+            refrescar,
+            _producto_a_dict,
+            _producto_desde_dict,
+            lambda p: (p.id,),
+        )
+
+    def pagina(
+        self,
+        q: Optional[str],
+        limit: Optional[int],
+        cursor: Optional[str],
+        cargar: Callable[[], PaginaProductos],
+        refrescar: bool = False,
+    ) -> PaginaProductos:
+        return self._leer(
+            "pagina",
+            clave_pagina(q, limit, cursor),
+            cargar,
+            refrescar,
+            _pagina_a_dict,
+            _pagina_desde_dict,
+            lambda p: tuple(item.id for item in p.items),
+        )
+
+    def _leer(self, tipo, clave, cargar, refrescar, a_dict, desde_dict, ids_de):
+        if not self.activa or refrescar:
+            self._contar(tipo, "omitido")
+            with self._lock:
+                generacion = self._generacion
+            valor = cargar()
+            if self.activa and valor is not None:
+                self._guardar(tipo, clave, valor, ids_de(valor), a_dict, generacion)
+            return valor
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self._entradas.move_to_end(clave)
+                self._contar(tipo, "local")
+                return entrada[1]
+            generacion = self._generacion
+
+        crudo = self._redis_get(clave)
+        if crudo is not None:
+            valor = desde_dict(json.loads(crudo))
+            self._contar(tipo, "redis")
+            self._guardar_local(tipo, clave, valor, ids_de(valor), generacion)
+            return valor
+
+        self._contar(tipo, "fallo")
+        valor = cargar()
+        # No se guardan productos inexistentes: al crearse no habría qué invalidar
+        if valor is not None:
+            self._guardar(tipo, clave, valor, ids_de(valor), a_dict, generacion)
+        return valor
+
+    # Escrituras en la caché
+
+    def _guardar(self, tipo, clave, valor, ids, a_dict, generacion) -> None:
+        if not self._guardar_local(tipo, clave, valor, ids, generacion):
+            return
+        if self._redis is not None and len(ids) <= MAX_ITEMS_REDIS:
+            self._redis_set(tipo, clave, json.dumps(a_dict(valor)), ids)
+
+    def _guardar_local(self, tipo, clave, valor, ids, generacion) -> bool:
+        with self._lock:
+            if generacion != self._generacion:
+                # Hubo una invalidación mientras se leía de la base: el valor puede ser anterior
+                return False
+
+            self._quitar(clave)
+            self._entradas[clave] = (time.monotonic() + self.ttl, valor, ids if tipo == "pagina" else ())
+            if tipo == "pagina":
+                self._paginas.add(clave)
+                for producto_id in ids:
+                    self._paginas_por_producto.setdefault(producto_id, set()).add(clave)
+
+            while len(self._entradas) > self.max_entradas:
+                self._quitar(next(iter(self._entradas)))
+        return True
+
+    def _quitar(self, clave: str) -> None:
+        entrada = self._entradas.pop(clave, None)
+        if entrada is None:
+            return
+        self._paginas.discard(clave)
+        for producto_id in entrada[2]:
+            paginas = self._paginas_por_producto.get(producto_id)
+            if paginas is not None:
+                paginas.discard(clave)
+                if not paginas:
+                    del self._paginas_por_producto[producto_id]
+
+    # Invalidación
+
+    def invalidar_productos(self, producto_ids: Iterable[int]) -> None:
+        """El stock de estos productos cambió: su entrada y las páginas que los contienen."""
+        ids = sorted(set(producto_ids))
+        if not ids:
+            return
+
+        self._invalidar_local(ids, todas_las_paginas=False)
+        self._contar_invalidacion("producto", len(ids))
+        if self._redis is not None:
+            try:
+                indices = [_indice_redis(i) for i in ids]
+                pipe = self._redis.pipeline()
+                for indice in indices:
+                    pipe.smembers(indice)
+                claves = set().union(*pipe.execute())
+                self._redis.delete(*claves, *indices, *[clave_producto(i) for i in ids])
+                self._redis.publish(CANAL_INVALIDACIONES, json.dumps({"productos": ids}))
+            except Exception as e:
+                logger.warning(f"No se pudo invalidar la caché en Redis: {e}")
+
+    def invalidar_paginas(self) -> None:
+        """Se creó un producto: cualquier página puede haber cambiado."""
+        self._invalidar_local([], todas_las_paginas=True)
+        self._contar_invalidacion("paginas", 1)
+        if self._redis is not None:
+            try:
+                claves = self._redis.smembers(_PAGINAS_REDIS)
+                self._redis.delete(*claves, _PAGINAS_REDIS)
+                self._redis.publish(CANAL_INVALIDACIONES, json.dumps({"paginas": True}))
+            except Exception as e:
+                logger.warning(f"No se pudo invalidar la caché en Redis: {e}")
+
+    def _invalidar_local(self, producto_ids: List[int], todas_las_paginas: bool) -> None:
+        with self._lock:
+            self._generacion += 1
+            if todas_las_paginas:
+                claves = set(self._paginas)
+            else:
+                claves = {clave_producto(i) for i in producto_ids}
+                for producto_id in producto_ids:
+                    claves |= self._paginas_por_producto.get(producto_id, set())
+            for clave in claves:
+                self._quitar(clave)
+
+    def _escuchar_invalidaciones(self) -> None:
+        # Las invalidaciones de otras réplicas (y las propias, que no hacen daño) llegan por pub/sub
+        try:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{CANAL_INVALIDACIONES: self._al_recibir_invalidacion})
+            self._suscripcion = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            logger.warning(f"No se pudo suscribir a las invalidaciones de la caché: {e}")
+
+    def _al_recibir_invalidacion(self, mensaje) -> None:
+        try:
+            datos = json.loads(mensaje["data"])
+        except (TypeError, ValueError, KeyError):
+            return
+        self._invalidar_local(datos.get("productos", []), todas_las_paginas=bool(datos.get("paginas")))
+
+    def cerrar(self) -> None:
+        if self._suscripcion is not None:
+            self._suscripcion.stop()
+            self._suscripcion = None
+
+    # Redis (los errores solo degradan a la caché en proceso)
+
+    def _redis_get(self, clave: str) -> Optional[str]:
+        if self._redis is None:
+            return None
+        try:
+            return self._redis.get(clave)
+        except Exception as e:
+            logger.warning(f"Error leyendo la caché en Redis: {e}")
+            return None
+
+    def _redis_set(self, tipo: str, clave: str, valor: str, ids: Tuple[int, ...]) -> None:
+        ttl = max(int(self.ttl), 1)
+        try:
+            pipe = self._redis.pipeline()
+            pipe.set(clave, valor, ex=ttl)
+            if tipo == "pagina":
+                pipe.sadd(_PAGINAS_REDIS, clave)
+                pipe.expire(_PAGINAS_REDIS, ttl)
+                for producto_id in ids:
+                    pipe.sadd(_indice_redis(producto_id), clave)
+                    pipe.expire(_indice_redis(producto_id), ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Error escribiendo la caché en Redis: {e}")
+
+    # Métricas
+
+    def _contar(self, tipo: str, resultado: str) -> None:
+        with self._lock_conteo:
+            self._conteo[resultado] += 1
+        if PROMETHEUS_AVAILABLE:
+            cache_consultas_total.labels(tipo=tipo, resultado=resultado).inc()
+
+    def _contar_invalidacion(self, motivo: str, n: int) -> None:
+        with self._lock_conteo:
+            self._invalidaciones += n
+        if PROMETHEUS_AVAILABLE:
+            cache_invalidaciones_total.labels(motivo=motivo).inc(n)
+
+    def estadisticas(self) -> dict:
+        with self._lock_conteo:
+            conteo = dict(self._conteo)
+        aciertos = conteo["local"] + conteo["redis"]
+        consultas = aciertos + conteo["fallo"]
+        return {
+            "activa": self.activa,
+            "redis": self._redis is not None,
+            "entradas": len(self._entradas),
+            **conteo,
+            "invalidaciones": self._invalidaciones,
+            "hitRatio": round(aciertos / consultas, 4) if consultas else None,
+        }
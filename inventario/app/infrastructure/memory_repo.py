@@ -1,41 +1,125 @@
 from __future__ import annotations
 
+import threading
+from bisect import bisect_right
+from dataclasses import replace
 from typing import Dict, List, Optional
 
-from ..domain.models import ProductoInventario
+from ..domain.models import (
+    AjusteStock,
+    ConflictoDeVersion,
+    EstadoAjuste,
+    PaginaProductos,
+    ProductoInventario,
+    ResultadoAjuste,
+)
 from ..domain.repositories import ProductoInventarioRepository, UnitOfWork
+from . import busqueda
+
+
+def _campos_busqueda(producto: ProductoInventario) -> Dict[str, str]:
+    return {campo: getattr(producto, campo) or "" for campo in busqueda.PESOS}
 
 
 class InMemoryProductoRepo(ProductoInventarioRepository):
     def __init__(self, items: Optional[List[ProductoInventario]] = None) -> None:
         self._items: Dict[int, ProductoInventario] = {p.id: p for p in (items or [])}
+        self._indice = busqueda.IndiceInvertido()
+        # Los ajustes de stock llegan desde varios hilos del servidor
+        self._lock = threading.RLock()
+        self._ajustes_aplicados: Dict[str, ResultadoAjuste] = {}
 
-    def list(self, q: Optional[str] = None) -> List[ProductoInventario]:
-        items = list(self._items.values())
+        for p in self._items.values():
+            self._indice.indexar(p.id, _campos_busqueda(p))
 
-        if q:
-            q_lower = q.lower()
+    def list(self, q: Optional[str] = None) -> List[ProductoInventario]:
+        return self.buscar(q).items
+
+    def buscar(self, q: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None) -> PaginaProductos:
+        terminos = busqueda.palabras(q) if q else []
+        ultimo = busqueda.decode_cursor(cursor, con_relevancia=bool(terminos)) if cursor else None
+        limite = limit + 1 if limit is not None else len(self._items) + 1
+
+        if terminos:
+            # Si el término más escaso tiene menos ids que la ventana, recorrerla no vale la pena
+            if self._indice.estimar(terminos) <= busqueda.VENTANA:
+                en_ventana = lambda desde, n: {}  # noqa: E731
+            else:
+                en_ventana = lambda desde, n: self._indice.en_ventana(terminos, desde, n)  # noqa: E731
+
+            ordenados = busqueda.primeros_por_relevancia(
+                en_ventana,
+                lambda relevancia, desde, n: self._indice.en_indice(terminos, relevancia, desde, n),
+                limite,
+                ultimo,
+            )
+        else:
+            inicio = bisect_right(self._indice.ids, ultimo[1]) if ultimo else 0
+            ordenados = [(producto_id, None) for producto_id in self._indice.ids[inicio:inicio + limite]]
 
-            items = [
-                p
-                for p in items
-                if q_lower in p.nombre.lower()
-                or q_lower in p.sku.lower()
-                or q_lower in p.lote.lower()
-                or q_lower in p.proveedor.lower()
-            ]
+        siguiente = None
+        if len(ordenados) >= limite:
+            ordenados = ordenados[: limite - 1]
+            siguiente = busqueda.encode_cursor(ordenados[-1][1], ordenados[-1][0])
 
-        return sorted(items, key=lambda p: p.id)
+        return PaginaProductos(items=[self._items[producto_id] for producto_id, _ in ordenados], siguiente_cursor=siguiente)
 
     def get(self, producto_id: int) -> Optional[ProductoInventario]:
         return self._items.get(producto_id)
 
     def save(self, producto: ProductoInventario) -> None:
-        if producto.id is None:
-            next_id = max(self._items.keys(), default=0) + 1
-            producto.id = next_id
-
-        self._items[producto.id] = producto
+        with self._lock:
+            if producto.id is None:
+                next_id = max(self._items.keys(), default=0) + 1
+                producto.id = next_id
+
+            actual = self._items.get(producto.id)
+            if actual is not None and actual is not producto and actual.version != producto.version:
+                raise ConflictoDeVersion(producto.id, producto.version, actual.version)
+
+            producto.version += 1
+            self._items[producto.id] = producto
+            self._indice.indexar(producto.id, _campos_busqueda(producto))
+
+    def ajustar_stock(
+        self, producto_id: int, bodega_id: int, delta: int, version: Optional[int] = None
+    ) -> ProductoInventario:
+        with self._lock:
+            producto = self._items.get(producto_id)
+            if producto is None:
+                raise ValueError("Producto no encontrado")
+
+            if version is not None and producto.version != version:
+                raise ConflictoDeVersion(producto_id, version, producto.version)
+
+            producto.ajustar_stock_bodega(bodega_id, delta)
+            return producto
+
+    def ajustar_stock_lote(self, ajustes: List[AjusteStock]) -> List[ResultadoAjuste]:
+        resultados: List[ResultadoAjuste] = []
+        with self._lock:
+            for a in ajustes:
+                previo = self._ajustes_aplicados.get(a.clave) if a.clave else None
+                if previo is not None:
+                    resultados.append(replace(previo, estado=EstadoAjuste.duplicado))
+                    continue
+
+                resultado = ResultadoAjuste(a.producto_id, a.bodega_id, a.delta, EstadoAjuste.aplicado, clave=a.clave)
+                try:
+                    producto = self.ajustar_stock(a.producto_id, a.bodega_id, a.delta, version=a.version)
+                except ConflictoDeVersion as e:
+                    resultado.estado, resultado.error = EstadoAjuste.conflicto, str(e)
+                except ValueError as e:
+                    resultado.estado, resultado.error = EstadoAjuste.rechazado, str(e)
+                else:
+                    bodega = next(b for b in producto.bodegas if b.id == a.bodega_id)
+                    resultado.cantidad_disponible = bodega.cantidad_disponible
+                    resultado.stock_total = producto.stock_total
+                    resultado.version = producto.version
+                    if a.clave:
+                        self._ajustes_aplicados[a.clave] = resultado
+                resultados.append(resultado)
+        return resultados
 
 
 class InMemoryUnitOfWork(UnitOfWork):
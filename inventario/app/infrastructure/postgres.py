@@ -2,9 +2,9 @@ from __future__ import annotations
 
 import os
 from contextlib import AbstractContextManager
-from dataclasses import asdict
+from dataclasses import asdict, replace
 from datetime import datetime
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional
 
 from sqlalchemy import (
     DateTime,
@@ -12,10 +12,22 @@ from sqlalchemy import (
     ForeignKey,
     Integer,
     String,
+    and_,
+    bindparam,
+    case,
     create_engine,
+    literal,
+    literal_column,
+    or_,
     select,
     func,
+    text,
+    update,
 )
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -24,12 +36,36 @@ from sqlalchemy.orm import (
     Session,
     sessionmaker,
     joinedload,
+    selectinload,
 )
 
 from ..domain.models import Bodega as BodegaDomain
 from ..domain.models import BodegaDetalle as BodegaDetalleDomain
+from ..domain.models import AjusteStock, ConflictoDeVersion, EstadoAjuste, ResultadoAjuste
+from ..domain.models import PaginaProductos
 from ..domain.models import ProductoInventario as ProductoDomain
 from ..domain.repositories import BodegaRepository, ProductoInventarioRepository, UnitOfWork
+from . import busqueda
+
+try:
+    from prometheus_client import Counter, Gauge
+
+    PROMETHEUS_AVAILABLE = True
+
+    db_pool_en_uso = Gauge("inventario_db_pool_en_uso", "Conexiones del pool prestadas a peticiones")
+    db_pool_overflow = Gauge("inventario_db_pool_overflow", "Conexiones abiertas por encima de pool_size")
+    db_pool_saturacion = Gauge(
+        "inventario_db_pool_saturacion", "Conexiones en uso sobre el máximo (pool_size + max_overflow)"
+    )
+    db_timeouts_total = Counter(
+        "inventario_db_timeouts_total",
+        "Peticiones cortadas por espera de conexión (pool) o por statement_timeout (sentencia)",
+        ["tipo"],
+    )
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+_timeouts = {"pool": 0, "sentencia": 0}
 
 
 class Base(DeclarativeBase):
@@ -49,6 +85,7 @@ class ProductoORM(Base):
     valor_unitario: Mapped[float] = mapped_column(Float, default=0.0)
     fecha_ultima_actualizacion: Mapped[datetime] = mapped_column(DateTime(timezone=False), default=datetime.utcnow)
     stock_total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     inventarios: Mapped[list[InventarioBodegaORM]] = relationship(
         back_populates="producto",
@@ -56,6 +93,9 @@ class ProductoORM(Base):
         lazy="selectin",
     )
 
+    # Cada UPDATE del ORM incrementa version y exige la versión leída (StaleDataError si cambió)
+    __mapper_args__ = {"version_id_col": version}
+
 
 class BodegaORM(Base):
     __tablename__ = "bodegas"
@@ -83,17 +123,213 @@ class InventarioBodegaORM(Base):
     bodega: Mapped[BodegaORM] = relationship(back_populates="inventarios")
 
 
-def create_sql_engine(db_url: str):
-    return create_engine(db_url, future=True, pool_pre_ping=True)
+class AjusteAplicadoORM(Base):
+    """Ajustes de lote ya aplicados, por clave de idempotencia, con el resultado que se devolvió."""
+
+    __tablename__ = "inventario_ajustes_aplicados"
+
+    clave: Mapped[str] = mapped_column(String(200), primary_key=True)
+    producto_id: Mapped[int] = mapped_column(ForeignKey("inventario_productos.id", ondelete="CASCADE"), nullable=False)
+    bodega_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    delta: Mapped[int] = mapped_column(Integer, nullable=False)
+    cantidad_disponible: Mapped[int] = mapped_column(Integer, nullable=False)
+    stock_total: Mapped[int] = mapped_column(Integer, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    aplicado_en: Mapped[datetime] = mapped_column(DateTime(timezone=False), default=datetime.utcnow, index=True)
+
+
+# translate() quita tildes y convierte en espacios los signos que el parser de PostgreSQL
+# interpreta (p. ej. "-001" como número negativo), para partir las palabras igual que
+# busqueda.palabras() en el repositorio en memoria.
+_CON_TILDE = "áàâäéèêëíìîïóòôöúùûüñçÁÀÂÄÉÈÊËÍÌÎÏÓÒÔÖÚÙÛÜÑÇ-_./@:+#"
+_SIN_TILDE = "aaaaeeeeiiiioooouuuuncAAAAEEEEIIIIOOOOUUUUNC         "
+
+
+def _vector_postgres(*columnas: str) -> str:
+    texto = " || ' ' || ".join(f"coalesce({c}, '')" for c in columnas)
+    return f"to_tsvector('simple', translate({texto}, '{_CON_TILDE}', '{_SIN_TILDE}'))"
+
+
+# Una columna generada (no mapeada en el ORM) por peso, cada una con su índice GIN: así el
+# índice responde exactamente "el término está en sku/lote", "en nombre", etc. sin releer la fila
+COLUMNAS_BUSQUEDA = {peso: f"busqueda_{peso}" for peso in busqueda.RELEVANCIAS}
+
+_DDL_BUSQUEDA_POSTGRES = [
+    sentencia
+    for peso, columna in COLUMNAS_BUSQUEDA.items()
+    for sentencia in (
+        f"ALTER TABLE inventario_productos ADD COLUMN IF NOT EXISTS {columna} tsvector GENERATED ALWAYS AS "
+        f"({_vector_postgres(*[c for c, p in busqueda.PESOS.items() if p == peso])}) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_inventario_productos_{columna} ON inventario_productos USING GIN ({columna})",
+    )
+]
+
+
+def _columna_busqueda(peso: int, origen=None):
+    nombre = COLUMNAS_BUSQUEDA[peso]
+    return origen.c[nombre] if origen is not None else literal_column(f"inventario_productos.{nombre}")
+
+
+# Columnas agregadas después de la primera versión de las tablas (create_all no altera tablas existentes)
+_DDL_COLUMNAS_POSTGRES = [
+    "ALTER TABLE inventario_productos ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0",
+]
+
+
+def actualizar_esquema(engine) -> None:
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        # Los índices sobre tablas grandes pueden tardar más que el statement_timeout de las peticiones
+        conn.exec_driver_sql("SET LOCAL statement_timeout = 0")
+        for sentencia in _DDL_COLUMNAS_POSTGRES + _DDL_BUSQUEDA_POSTGRES:
+            conn.exec_driver_sql(sentencia)
+
+
+# Ajuste de stock en una sola sentencia: bloquea el producto (comprobando la versión si se pide),
+# suma el delta a la bodega solo si no queda negativa y mueve stock_total y version con el mismo
+# delta. Como cada UPDATE parte del valor vigente de la fila, los ajustes concurrentes se
+# serializan en el bloqueo del producto y ninguno se pierde.
+_AJUSTE_POSTGRES = text(
+    """
+    WITH producto AS (
+        SELECT id FROM inventario_productos
+        WHERE id = :producto_id AND (CAST(:version AS INTEGER) IS NULL OR version = :version)
+        FOR UPDATE
+    ), bodega AS (
+        UPDATE inventario_bodega AS b
+        SET cantidad_disponible = b.cantidad_disponible + :delta
+        FROM producto
+        WHERE b.producto_id = producto.id AND b.bodega_id = :bodega_id
+          AND b.cantidad_disponible + :delta >= 0
+        RETURNING b.producto_id, b.cantidad_disponible
+    )
+    UPDATE inventario_productos AS p
+    SET stock_total = p.stock_total + :delta, version = p.version + 1, fecha_ultima_actualizacion = :fecha
+    FROM bodega
+    WHERE p.id = bodega.producto_id
+    RETURNING p.version, p.stock_total, bodega.cantidad_disponible
+    """
+)
+
+
+# Escrituras de un lote de ajustes, una sentencia por tabla sin importar cuántos ajustes traiga:
+# los arreglos llegan como parámetros y unnest() los convierte en filas
+_LOTE_BODEGAS_POSTGRES = text(
+    """
+    UPDATE inventario_bodega AS b
+    SET cantidad_disponible = b.cantidad_disponible + v.delta
+    FROM unnest(CAST(:productos AS INTEGER[]), CAST(:bodegas AS INTEGER[]), CAST(:deltas AS INTEGER[]))
+        AS v(producto_id, bodega_id, delta)
+    WHERE b.producto_id = v.producto_id AND b.bodega_id = v.bodega_id
+    """
+)
+
+_LOTE_PRODUCTOS_POSTGRES = text(
+    """
+    UPDATE inventario_productos AS p
+    SET stock_total = p.stock_total + v.delta, version = p.version + v.ajustes, fecha_ultima_actualizacion = :fecha
+    FROM unnest(CAST(:productos AS INTEGER[]), CAST(:deltas AS INTEGER[]), CAST(:ajustes AS INTEGER[]))
+        AS v(producto_id, delta, ajustes)
+    WHERE p.id = v.producto_id
+    """
+)
+
+_LOTE_CLAVES_POSTGRES = text(
+    """
+    INSERT INTO inventario_ajustes_aplicados
+        (clave, producto_id, bodega_id, delta, cantidad_disponible, stock_total, version, aplicado_en)
+    SELECT v.*, :fecha
+    FROM unnest(
+        CAST(:claves AS VARCHAR[]), CAST(:productos AS INTEGER[]), CAST(:bodegas AS INTEGER[]),
+        CAST(:deltas AS INTEGER[]), CAST(:cantidades AS INTEGER[]), CAST(:totales AS INTEGER[]),
+        CAST(:versiones AS INTEGER[])
+    ) AS v
+    """
+)
+
+
+def create_sql_engine(db_url: str, statement_timeout_ms: Optional[int] = None, **opciones):
+    connect_args = {}
+    if db_url.startswith("postgresql"):
+        # psycopg prepara las sentencias que se repiten y, tras cinco ejecuciones, PostgreSQL
+        # pasa a un plan genérico que no ve los términos de búsqueda (y recorre la tabla)
+        connect_args["options"] = "-c plan_cache_mode=force_custom_plan"
+        if statement_timeout_ms:
+            # Una consulta colgada no retiene la conexión del pool más que esto
+            connect_args["options"] += f" -c statement_timeout={int(statement_timeout_ms)}"
+
+    return create_engine(db_url, future=True, pool_pre_ping=True, connect_args=connect_args, **opciones)
+
 
+def opciones_pool_desde_env() -> dict:
+    """Tamaño del pool y timeouts de create_sql_engine a partir de las variables INVENTARIO_DB_*."""
+    return {
+        "pool_size": int(os.getenv("INVENTARIO_DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("INVENTARIO_DB_MAX_OVERFLOW", "10")),
+        # Segundos esperando una conexión libre antes de responder 503
+        "pool_timeout": float(os.getenv("INVENTARIO_DB_POOL_TIMEOUT", "5")),
+        "pool_recycle": int(os.getenv("INVENTARIO_DB_POOL_RECYCLE", "1800")),
+        "statement_timeout_ms": int(os.getenv("INVENTARIO_DB_STATEMENT_TIMEOUT_MS", "5000")),
+    }
 
-def create_session_factory(db_url: str) -> sessionmaker[Session]:
-    engine = create_sql_engine(db_url)
+
+def create_session_factory(db_url: str, **opciones) -> sessionmaker[Session]:
+    engine = create_sql_engine(db_url, **opciones)
     Base.metadata.create_all(engine)
+    actualizar_esquema(engine)
+    registrar_metricas_pool(engine)
 
     return sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, class_=Session)
 
 
+def estadisticas_pool(engine) -> dict:
+    """Conexiones en uso, libres y de overflow; saturacion = en uso / máximo posible."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"tipo": type(pool).__name__}
+
+    maximo = pool.size() + max(pool._max_overflow, 0)
+    en_uso = pool.checkedout()
+    return {
+        "tipo": type(pool).__name__,
+        "tamano": pool.size(),
+        "maxOverflow": pool._max_overflow,
+        "enUso": en_uso,
+        "libres": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "saturacion": round(en_uso / maximo, 4) if maximo > 0 else None,
+        "timeoutsPool": _timeouts["pool"],
+        "timeoutsSentencia": _timeouts["sentencia"],
+    }
+
+
+def registrar_metricas_pool(engine) -> None:
+    """Expone el estado del pool de este engine en /metrics (el último registrado gana)."""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    db_pool_en_uso.set_function(lambda: estadisticas_pool(engine).get("enUso", 0))
+    db_pool_overflow.set_function(lambda: estadisticas_pool(engine).get("overflow", 0))
+    db_pool_saturacion.set_function(lambda: estadisticas_pool(engine).get("saturacion") or 0)
+
+
+def clasificar_timeout(exc: Exception) -> Optional[str]:
+    """'pool' si no hubo conexión libre a tiempo, 'sentencia' si PostgreSQL canceló la consulta por
+    statement_timeout; None para cualquier otro error. Cuenta el timeout en las métricas."""
+    if isinstance(exc, PoolTimeoutError):
+        tipo = "pool"
+    elif isinstance(exc, OperationalError) and getattr(exc.orig, "sqlstate", None) == "57014":  # query_canceled
+        tipo = "sentencia"
+    else:
+        return None
+
+    _timeouts[tipo] += 1
+    if PROMETHEUS_AVAILABLE:
+        db_timeouts_total.labels(tipo=tipo).inc()
+    return tipo
+
+
 def _to_domain(prod: ProductoORM) -> ProductoDomain:
     bodegas_detalle: list[BodegaDetalleDomain] = []
 
@@ -124,37 +360,215 @@ def _to_domain(prod: ProductoORM) -> ProductoDomain:
         proveedor=prod.proveedor,
         categoria=prod.categoria,
         valor_unitario=prod.valor_unitario,
+        version=prod.version or 0,
     )
 
 
+def _planificar_lote(
+    ajustes: List[AjusteStock],
+    productos: Dict[int, List[int]],
+    cantidades: Dict[tuple, int],
+    aplicados: Dict[str, ResultadoAjuste],
+) -> List[ResultadoAjuste]:
+    """
+    Recorre el lote en orden sobre el estado leído (productos: id -> [version, stock_total];
+    cantidades: (producto, bodega) -> cantidad) y decide el resultado de cada ajuste, igual que si
+    se aplicaran uno por uno. Modifica productos y cantidades.
+    """
+    resultados: List[ResultadoAjuste] = []
+    for a in ajustes:
+        previo = aplicados.get(a.clave) if a.clave else None
+        if previo is not None:
+            resultados.append(replace(previo, estado=EstadoAjuste.duplicado))
+            continue
+
+        resultado = ResultadoAjuste(a.producto_id, a.bodega_id, a.delta, EstadoAjuste.rechazado, clave=a.clave)
+        producto = productos.get(a.producto_id)
+        cantidad = cantidades.get((a.producto_id, a.bodega_id))
+        if producto is None:
+            resultado.error = "Producto no encontrado"
+        elif a.version is not None and producto[0] != a.version:
+            resultado.estado = EstadoAjuste.conflicto
+            resultado.error = str(ConflictoDeVersion(a.producto_id, a.version, producto[0]))
+        elif cantidad is None:
+            resultado.error = "Bodega no encontrada para el producto"
+        elif cantidad + a.delta < 0:
+            resultado.error = "Stock insuficiente en la bodega"
+        else:
+            cantidades[(a.producto_id, a.bodega_id)] = cantidad + a.delta
+            producto[0] += 1
+            producto[1] += a.delta
+            resultado.estado = EstadoAjuste.aplicado
+            resultado.cantidad_disponible = cantidad + a.delta
+            resultado.version, resultado.stock_total = producto
+            if a.clave:
+                aplicados[a.clave] = resultado
+        resultados.append(resultado)
+    return resultados
+
+
 class SqlProductoRepo(ProductoInventarioRepository):
     def __init__(self, session: Session) -> None:
         self.session = session
 
     def list(self, q: Optional[str] = None) -> List[ProductoDomain]:
-        stmt = select(ProductoORM).options(joinedload(ProductoORM.inventarios).joinedload(InventarioBodegaORM.bodega))
-
-        if q:
-            like = f"%{q.lower()}%"
-            stmt = stmt.where(
-                func.lower(ProductoORM.nombre).like(like)
-                | func.lower(ProductoORM.sku).like(like)
-                | func.lower(ProductoORM.lote).like(like)
-                | func.lower(ProductoORM.proveedor).like(like)
-                | func.lower(ProductoORM.categoria).like(like)
+        return self.buscar(q).items
+
+    def _es_postgres(self) -> bool:
+        return self.session.get_bind().dialect.name == "postgresql"
+
+    def _coinciden(self, terminos: List[str], peso_minimo: int, origen=None):
+        """Condición: todos los términos aparecen como prefijo en campos con peso >= peso_minimo."""
+        if self._es_postgres():
+            columnas = [_columna_busqueda(p, origen) for p in busqueda.RELEVANCIAS if p >= peso_minimo]
+            return and_(
+                *[or_(*[c.op("@@")(func.to_tsquery("simple", f"{t}:*")) for c in columnas]) for t in terminos]
+            )
+
+        # Sin PostgreSQL no hay índice: prefijo al inicio del campo o de una palabra
+        columnas = [getattr(ProductoORM, c) for c in busqueda.campos_con_peso(peso_minimo)]
+        return and_(
+            *[
+                or_(*[or_(func.lower(c).like(f"{t}%"), func.lower(c).like(f"% {t}%")) for c in columnas])
+                for t in terminos
+            ]
+        )
+
+    def _con_relevancia(self, terminos: List[str], relevancia: int, origen=None):
+        condicion = self._coinciden(terminos, relevancia, origen)
+        if relevancia < busqueda.RELEVANCIAS[0]:
+            condicion = and_(condicion, ~self._coinciden(terminos, relevancia + 1, origen))
+        return condicion
+
+    def _relevancia(self, terminos: List[str], origen=None):
+        return case(
+            *[(self._coinciden(terminos, r, origen), r) for r in busqueda.RELEVANCIAS[:-1]],
+            else_=busqueda.RELEVANCIAS[-1],
+        )
+
+    def _en_ventana(self, terminos: List[str], desde: int, n: int) -> Dict[int, List[int]]:
+        # El LIMIT interno obliga a recorrer la llave primaria: cuesta como mucho VENTANA filas
+        ventana = (
+            select(ProductoORM.id, *[_columna_busqueda(p).label(c) for p, c in COLUMNAS_BUSQUEDA.items()])
+            .where(ProductoORM.id > desde)
+            .order_by(ProductoORM.id)
+            .limit(busqueda.VENTANA)
+            .subquery("ventana")
+        )
+        relevancia = self._relevancia(terminos, ventana)
+        clasificadas = (
+            select(
+                ventana.c.id,
+                relevancia.label("relevancia"),
+                func.row_number().over(partition_by=relevancia, order_by=ventana.c.id).label("orden"),
             )
+            .where(self._coinciden(terminos, busqueda.RELEVANCIAS[-1], ventana))
+            .subquery("clasificadas")
+        )
+        stmt = (
+            select(clasificadas.c.id, clasificadas.c.relevancia)
+            .where(clasificadas.c.orden <= n)
+            .order_by(clasificadas.c.id)
+        )
+
+        por_relevancia: Dict[int, List[int]] = {}
+        for producto_id, relevancia in self.session.execute(stmt):
+            por_relevancia.setdefault(relevancia, []).append(producto_id)
+        return por_relevancia
+
+    def _en_indice(self, terminos: List[str], relevancia: int, desde: int, n: int) -> List[int]:
+        # GIN arma el bitmap completo de cada prefijo, así que solo se consulta con el término
+        # más largo (normalmente el más selectivo); los demás se comprueban sobre esas filas.
+        # OFFSET 0 impide aplanar la subconsulta y volver a recorrer la llave primaria.
+        guia = max(terminos, key=len)
+        coincidencias = (
+            select(ProductoORM.id, *[_columna_busqueda(p).label(c) for p, c in COLUMNAS_BUSQUEDA.items()])
+            .where(self._coinciden([guia], relevancia), ProductoORM.id > desde)
+            .offset(0)
+            .subquery("coincidencias")
+        )
+        stmt = (
+            select(coincidencias.c.id)
+            .where(self._con_relevancia(terminos, relevancia, coincidencias))
+            .order_by(coincidencias.c.id)
+            .limit(n)
+        )
+        return list(self.session.execute(stmt).scalars())
+
+    def _cargar(self, ids: List[int]) -> List[ProductoORM]:
+        if not ids:
+            return []
+        stmt = (
+            select(ProductoORM)
+            .options(selectinload(ProductoORM.inventarios).selectinload(InventarioBodegaORM.bodega))
+            .where(ProductoORM.id.in_(ids))
+        )
+        por_id = {p.id: p for p in self.session.execute(stmt).scalars()}
+        return [por_id[i] for i in ids if i in por_id]
+
+    def buscar(self, q: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None) -> PaginaProductos:
+        terminos = busqueda.palabras(q) if q else []
+        ultimo = busqueda.decode_cursor(cursor, con_relevancia=bool(terminos)) if cursor else None
+
+        if terminos and limit is not None and self._es_postgres():
+            # Primero los ids de la página con los índices; después los productos de esa página
+            ordenados = busqueda.primeros_por_relevancia(
+                lambda desde, n: self._en_ventana(terminos, desde, n),
+                lambda relevancia, desde, n: self._en_indice(terminos, relevancia, desde, n),
+                limit + 1,
+                ultimo,
+            )
+            productos = self._cargar([producto_id for producto_id, _ in ordenados])
+            filas = list(zip(productos, [relevancia for _, relevancia in ordenados]))
+        else:
+            filas = self._listar(terminos, limit, ultimo)
+
+        siguiente = None
+        if limit is not None and len(filas) > limit:
+            filas = filas[:limit]
+            siguiente = busqueda.encode_cursor(filas[-1][1], filas[-1][0].id)
+
+        return PaginaProductos(items=[_to_domain(producto) for producto, _ in filas], siguiente_cursor=siguiente)
+
+    def _listar(self, terminos: List[str], limit: Optional[int], ultimo) -> list:
+        """Listado completo o sin búsqueda en una sola consulta: (producto, relevancia)."""
+        # selectin en lugar de joinedload: una consulta por relación para toda la página, sin
+        # multiplicar las filas de productos por inventario y bodega
+        stmt = select(ProductoORM).options(
+            selectinload(ProductoORM.inventarios).selectinload(InventarioBodegaORM.bodega)
+        )
+
+        if terminos:
+            relevancia = self._relevancia(terminos)
+            stmt = stmt.where(self._coinciden(terminos, busqueda.RELEVANCIAS[-1]))
+            stmt = stmt.add_columns(relevancia).order_by(relevancia.desc(), ProductoORM.id.asc())
+        else:
+            relevancia = None
+            stmt = stmt.add_columns(literal(None)).order_by(ProductoORM.id.asc())
+
+        if ultimo:
+            ultima_relevancia, ultimo_id = ultimo
+            if relevancia is None:
+                stmt = stmt.where(ProductoORM.id > ultimo_id)
+            else:
+                stmt = stmt.where(
+                    or_(relevancia < ultima_relevancia, and_(relevancia == ultima_relevancia, ProductoORM.id > ultimo_id))
+                )
 
-        stmt = stmt.order_by(ProductoORM.id.asc())
-        productos = self.session.execute(stmt).scalars().unique().all()
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
 
-        return [_to_domain(p) for p in productos]
+        return self.session.execute(stmt).all()
 
-    def get(self, producto_id: int) -> Optional[ProductoDomain]:
+    def get(self, producto_id: int, refrescar: bool = False) -> Optional[ProductoDomain]:
         stmt = (
             select(ProductoORM)
             .options(joinedload(ProductoORM.inventarios).joinedload(InventarioBodegaORM.bodega))
             .where(ProductoORM.id == producto_id)
         )
+        if refrescar:
+            # Tras un UPDATE directo en la base, lo que haya en la sesión está desactualizado
+            stmt = stmt.execution_options(populate_existing=True)
 
         prod = self.session.execute(stmt).scalars().first()
 
@@ -170,6 +584,8 @@ class SqlProductoRepo(ProductoInventarioRepository):
                 prod = ProductoORM(id=producto.id)
 
             self.session.add(prod)
+        elif prod.version is not None and prod.version != producto.version:
+            raise ConflictoDeVersion(producto.id, producto.version, prod.version)
 
         prod.nombre = producto.nombre
         prod.lote = producto.lote
@@ -200,30 +616,224 @@ class SqlProductoRepo(ProductoInventarioRepository):
                 self.session.add(orm_bodega)
                 existing[b.id] = orm_bodega
 
-        self.session.flush()
-
         if not producto.id:
+            self.session.flush()
             producto.id = prod.id
 
-        for inv in list(prod.inventarios):
-            self.session.delete(inv)
-        prod.inventarios.clear()
-
+        # Las filas de inventario_bodega se actualizan en su lugar; solo se insertan las bodegas
+        # nuevas y se borran las que ya no están
+        actuales = {inv.bodega_id: inv for inv in prod.inventarios}
         for detalle in producto.bodegas:
             if detalle.id is None:
                 continue
 
-            inv = InventarioBodegaORM(
-                producto_id=producto.id,
-                bodega_id=detalle.id,
-                cantidad_disponible=detalle.cantidad_disponible,
-                pasillo=detalle.pasillo,
-                estante=detalle.estante,
-            )
-            prod.inventarios.append(inv)
+            inv = actuales.pop(detalle.id, None)
+            if inv is None:
+                inv = InventarioBodegaORM(producto_id=producto.id, bodega_id=detalle.id)
+                prod.inventarios.append(inv)
+
+            inv.cantidad_disponible = detalle.cantidad_disponible
+            inv.pasillo = detalle.pasillo
+            inv.estante = detalle.estante
+
+        for inv in actuales.values():
+            prod.inventarios.remove(inv)
 
         prod.stock_total = sum(inv.cantidad_disponible for inv in prod.inventarios)
 
+        try:
+            self.session.flush()
+        except StaleDataError:
+            # Otra transacción modificó el producto entre la lectura y el UPDATE
+            raise ConflictoDeVersion(producto.id, producto.version)
+
+        if prod.version is not None:
+            producto.version = prod.version
+
+    def ajustar_stock(
+        self, producto_id: int, bodega_id: int, delta: int, version: Optional[int] = None
+    ) -> ProductoDomain:
+        if self._es_postgres():
+            fila = self.session.execute(
+                _AJUSTE_POSTGRES,
+                {
+                    "producto_id": producto_id,
+                    "bodega_id": bodega_id,
+                    "delta": delta,
+                    "version": version,
+                    "fecha": datetime.utcnow(),
+                },
+            ).first()
+            if fila is None:
+                self._rechazar_ajuste(producto_id, bodega_id, delta, version)
+        else:
+            self._ajustar_stock_generico(producto_id, bodega_id, delta, version)
+
+        return self.get(producto_id, refrescar=True)
+
+    def _ajustar_stock_generico(self, producto_id: int, bodega_id: int, delta: int, version: Optional[int]) -> None:
+        # Mismo ajuste en tres sentencias para bases sin UPDATE dentro de un WITH (p. ej. SQLite)
+        actual = self.session.execute(
+            select(ProductoORM.version).where(ProductoORM.id == producto_id).with_for_update()
+        ).scalar_one_or_none()
+        if actual is None or (version is not None and actual != version):
+            self._rechazar_ajuste(producto_id, bodega_id, delta, version)
+
+        cantidad = self.session.execute(
+            update(InventarioBodegaORM)
+            .where(
+                InventarioBodegaORM.producto_id == producto_id,
+                InventarioBodegaORM.bodega_id == bodega_id,
+                InventarioBodegaORM.cantidad_disponible + delta >= 0,
+            )
+            .values(cantidad_disponible=InventarioBodegaORM.cantidad_disponible + delta)
+            .returning(InventarioBodegaORM.cantidad_disponible)
+        ).scalar_one_or_none()
+        if cantidad is None:
+            self._rechazar_ajuste(producto_id, bodega_id, delta, version)
+
+        self.session.execute(
+            update(ProductoORM)
+            .where(ProductoORM.id == producto_id)
+            .values(
+                stock_total=ProductoORM.stock_total + delta,
+                version=ProductoORM.version + 1,
+                fecha_ultima_actualizacion=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def ajustar_stock_lote(self, ajustes: List[AjusteStock]) -> List[ResultadoAjuste]:
+        if not ajustes:
+            return []
+
+        # Se bloquean los productos en orden de id (dos lotes concurrentes no se bloquean en
+        # cruz) y, ya con el bloqueo, se leen las cantidades y las claves aplicadas: un reintento
+        # que llega mientras se aplica el original espera y luego ve su clave
+        productos = {
+            producto_id: [version, stock_total]
+            for producto_id, version, stock_total in self.session.execute(
+                select(ProductoORM.id, ProductoORM.version, ProductoORM.stock_total)
+                .where(ProductoORM.id.in_(sorted({a.producto_id for a in ajustes})))
+                .order_by(ProductoORM.id)
+                .with_for_update()
+            )
+        }
+        cantidades = {
+            (producto_id, bodega_id): cantidad
+            for producto_id, bodega_id, cantidad in self.session.execute(
+                select(InventarioBodegaORM.producto_id, InventarioBodegaORM.bodega_id, InventarioBodegaORM.cantidad_disponible)
+                .where(InventarioBodegaORM.producto_id.in_(list(productos)))
+            )
+        } if productos else {}
+        claves = {a.clave for a in ajustes if a.clave}
+        aplicados = {
+            orm.clave: ResultadoAjuste(
+                orm.producto_id, orm.bodega_id, orm.delta, EstadoAjuste.duplicado, clave=orm.clave,
+                cantidad_disponible=orm.cantidad_disponible, stock_total=orm.stock_total, version=orm.version,
+            )
+            for orm in self.session.execute(select(AjusteAplicadoORM).where(AjusteAplicadoORM.clave.in_(list(claves)))).scalars()
+        } if claves else {}
+
+        resultados = _planificar_lote(ajustes, productos, cantidades, aplicados)
+        self._aplicar_lote([r for r in resultados if r.estado == EstadoAjuste.aplicado])
+
+        # Las escrituras no pasan por el ORM: lo que la sesión tenga cargado de estos productos ya no vale
+        for objeto in list(self.session.identity_map.values()):
+            if isinstance(objeto, ProductoORM) and objeto.id in productos:
+                self.session.expire(objeto)
+            elif isinstance(objeto, InventarioBodegaORM) and objeto.producto_id in productos:
+                self.session.expire(objeto)
+        return resultados
+
+    def _aplicar_lote(self, aplicados: List[ResultadoAjuste]) -> None:
+        """Escribe los ajustes aceptados: el delta neto por bodega y por producto y sus claves."""
+        if not aplicados:
+            return
+
+        por_bodega: Dict[tuple, int] = {}
+        por_producto: Dict[int, List[int]] = {}
+        for r in aplicados:
+            por_bodega[(r.producto_id, r.bodega_id)] = por_bodega.get((r.producto_id, r.bodega_id), 0) + r.delta
+            neto = por_producto.setdefault(r.producto_id, [0, 0])
+            neto[0] += r.delta
+            neto[1] += 1
+        con_clave = [r for r in aplicados if r.clave]
+        fecha = datetime.utcnow()
+
+        if self._es_postgres():
+            self.session.execute(_LOTE_BODEGAS_POSTGRES, {
+                "productos": [p for p, _ in por_bodega],
+                "bodegas": [b for _, b in por_bodega],
+                "deltas": list(por_bodega.values()),
+            })
+            self.session.execute(_LOTE_PRODUCTOS_POSTGRES, {
+                "productos": list(por_producto),
+                "deltas": [delta for delta, _ in por_producto.values()],
+                "ajustes": [n for _, n in por_producto.values()],
+                "fecha": fecha,
+            })
+            if con_clave:
+                self.session.execute(_LOTE_CLAVES_POSTGRES, {
+                    "claves": [r.clave for r in con_clave],
+                    "productos": [r.producto_id for r in con_clave],
+                    "bodegas": [r.bodega_id for r in con_clave],
+                    "deltas": [r.delta for r in con_clave],
+                    "cantidades": [r.cantidad_disponible for r in con_clave],
+                    "totales": [r.stock_total for r in con_clave],
+                    "versiones": [r.version for r in con_clave],
+                    "fecha": fecha,
+                })
+            return
+
+        # Otras bases: las mismas escrituras con executemany
+        inventario, productos = InventarioBodegaORM.__table__, ProductoORM.__table__
+        self.session.execute(
+            update(inventario)
+            .where(inventario.c.producto_id == bindparam("p_id"), inventario.c.bodega_id == bindparam("b_id"))
+            .values(cantidad_disponible=inventario.c.cantidad_disponible + bindparam("delta")),
+            [{"p_id": p, "b_id": b, "delta": delta} for (p, b), delta in por_bodega.items()],
+        )
+        self.session.execute(
+            update(productos)
+            .where(productos.c.id == bindparam("p_id"))
+            .values(
+                stock_total=productos.c.stock_total + bindparam("delta"),
+                version=productos.c.version + bindparam("ajustes"),
+                fecha_ultima_actualizacion=fecha,
+            ),
+            [{"p_id": p, "delta": delta, "ajustes": n} for p, (delta, n) in por_producto.items()],
+        )
+        if con_clave:
+            self.session.execute(AjusteAplicadoORM.__table__.insert(), [
+                {
+                    "clave": r.clave, "producto_id": r.producto_id, "bodega_id": r.bodega_id, "delta": r.delta,
+                    "cantidad_disponible": r.cantidad_disponible, "stock_total": r.stock_total,
+                    "version": r.version, "aplicado_en": fecha,
+                }
+                for r in con_clave
+            ])
+
+    def _rechazar_ajuste(self, producto_id: int, bodega_id: int, delta: int, version: Optional[int]) -> None:
+        """Explica por qué el ajuste no modificó ninguna fila."""
+        actual = self.session.execute(
+            select(ProductoORM.version).where(ProductoORM.id == producto_id)
+        ).scalar_one_or_none()
+        if actual is None:
+            raise ValueError("Producto no encontrado")
+        if version is not None and actual != version:
+            raise ConflictoDeVersion(producto_id, version, actual)
+
+        existe = self.session.execute(
+            select(InventarioBodegaORM.cantidad_disponible).where(
+                InventarioBodegaORM.producto_id == producto_id,
+                InventarioBodegaORM.bodega_id == bodega_id,
+            )
+        ).first()
+        if existe is None:
+            raise ValueError("Bodega no encontrada para el producto")
+        raise ValueError("Stock insuficiente en la bodega")
+
 
 class SqlBodegaRepo(BodegaRepository):
     def __init__(self, session: Session) -> None:
@@ -247,6 +857,7 @@ class SqlBodegaRepo(BodegaRepository):
 
 
 class PostgresUnitOfWork(UnitOfWork):
+    # La sesión es estado de la instancia: una unidad de trabajo por petición, nunca compartida
     def __init__(self, session_factory: sessionmaker[Session]) -> None:
         self._session_factory = session_factory
         self.session: Optional[Session] = None
@@ -254,6 +865,8 @@ class PostgresUnitOfWork(UnitOfWork):
         self.bodegas: SqlBodegaRepo
 
     def __enter__(self) -> "PostgresUnitOfWork":
+        if self.session is not None:
+            raise RuntimeError("La unidad de trabajo ya está en uso")
         self.session = self._session_factory()
         self.productos = SqlProductoRepo(self.session)
         self.bodegas = SqlBodegaRepo(self.session)
@@ -269,6 +882,7 @@ class PostgresUnitOfWork(UnitOfWork):
                 self.session.commit()
         finally:
             self.session.close()
+            self.session = None
 
     def commit(self) -> None:
         if self.session:
@@ -279,18 +893,23 @@ class PostgresUnitOfWork(UnitOfWork):
             self.session.rollback()
 
 
-def build_uow_from_env() -> UnitOfWork | None:
+def db_url_from_env() -> str:
     DB_USER = os.getenv("DB_USER", "postgres")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
     DB_HOST = os.getenv("DB_HOST", "34.58.178.152")
     DB_PORT = os.getenv("DB_PORT", "5432")
     DB_NAME = os.getenv("DB_NAME", "postgres")
-    db_url = f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    return f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+
+def build_uow_factory_from_env() -> Callable[[], UnitOfWork] | None:
+    """Fábrica de unidades de trabajo: cada petición recibe la suya (y su propia sesión)."""
+    db_url = db_url_from_env()
 
     print(f"Connecting to {db_url}")
 
     if not db_url:
         return None
 
-    SessionFactory = create_session_factory(db_url)
-    return PostgresUnitOfWork(SessionFactory)
\ No newline at end of file
+    SessionFactory = create_session_factory(db_url, **opciones_pool_desde_env())
+    return lambda: PostgresUnitOfWork(SessionFactory)
\ No newline at end of file
@@ -1,9 +1,17 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+import os
+
+from anyio import to_thread
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from .api.routes import router as inventario_router
+from .api.routes import EXPOSE_HEADERS, router as inventario_router
+from .infrastructure.cache import PROMETHEUS_AVAILABLE
+from .infrastructure.postgres import clasificar_timeout
 
 
 def create_app() -> FastAPI:
@@ -15,12 +23,39 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=EXPOSE_HEADERS,
     )
 
+    @app.on_event("startup")
+    async def on_startup():
+        # Los endpoints son síncronos: cada petición concurrente ocupa un hilo del threadpool
+        # (40 por defecto en anyio). Las que no llegan a la base, como los aciertos de la caché,
+        # no esperan conexión, así que conviene más hilos que conexiones en el pool.
+        to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("INVENTARIO_THREADPOOL", "100"))
+
+    @app.exception_handler(PoolTimeoutError)
+    @app.exception_handler(OperationalError)
+    async def base_no_disponible(request: Request, exc: Exception):
+        # Pool agotado o consulta cancelada por statement_timeout: el cliente puede reintentar
+        tipo = clasificar_timeout(exc)
+        detalle = {
+            "pool": "No hay conexiones libres a la base de datos",
+            "sentencia": "La consulta superó el tiempo máximo",
+        }.get(tipo, "Base de datos no disponible")
+        return JSONResponse(status_code=503, content={"detail": detalle}, headers={"Retry-After": "1"})
+
     @app.get("/healthz")
     def healthz():
         return {"status": "ok"}
 
+    @app.get("/metrics")
+    def metrics():
+        """Endpoint de métricas Prometheus"""
+        if not PROMETHEUS_AVAILABLE:
+            return {"error": "Prometheus no disponible"}
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
     app.include_router(inventario_router)
     return app
 
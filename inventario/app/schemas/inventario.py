@@ -53,6 +53,7 @@ class ProductoInventarioSchema(BaseModel):
     proveedor: str
     categoria: str
     valorUnitario: float = Field(alias="valor_unitario")
+    version: int = 0
 
     model_config = ConfigDict(
         from_attributes=True,
@@ -63,6 +64,40 @@ class ProductoInventarioSchema(BaseModel):
 class AjusteStockRequest(BaseModel):
     bodegaId: int
     delta: int
+    # Si se envía, el ajuste solo se aplica si el producto sigue en esa versión (409 si no)
+    version: Optional[int] = None
+
+
+class AjusteLoteItem(BaseModel):
+    productoId: int
+    bodegaId: int
+    delta: int
+    version: Optional[int] = None
+    # Id del movimiento en el escáner; reenviarlo no vuelve a aplicar el ajuste
+    idempotencyKey: Optional[str] = Field(default=None, min_length=1, max_length=200)
+
+
+class AjustesLoteRequest(BaseModel):
+    ajustes: List[AjusteLoteItem] = Field(min_length=1, max_length=10_000)
+
+
+class ResultadoAjusteSchema(BaseModel):
+    productoId: int
+    bodegaId: int
+    delta: int
+    estado: Literal["aplicado", "duplicado", "rechazado", "conflicto"]
+    idempotencyKey: Optional[str] = None
+    cantidadDisponible: Optional[int] = None
+    stockTotal: Optional[int] = None
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class AjustesLoteResponse(BaseModel):
+    aplicados: int
+    duplicados: int
+    rechazados: int
+    resultados: List[ResultadoAjusteSchema]
 
 
 class CrearProductoRequest(BaseModel):
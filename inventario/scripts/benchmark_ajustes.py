@@ -0,0 +1,193 @@
+"""
+Benchmark de ajustes de stock concurrentes (POST /inventario/productos/{id}/ajustar) en PostgreSQL.
+
+Uso (desde la carpeta inventario/):
+  python scripts/benchmark_ajustes.py                         # 1000 ajustadores en paralelo
+  python scripts/benchmark_ajustes.py --ajustadores 1000 --ajustes 5 --productos 20
+  python scripts/benchmark_ajustes.py --optimista             # con la versión leída y reintento en 409
+
+Cada ajustador es un hilo con su propia unidad de trabajo que llama a handle_ajustar_stock sobre
+productos y bodegas al azar (pocos productos: muchos ajustes compiten por la misma fila). Al final
+se compara cada cantidad con la inicial más la suma de los ajustes aceptados, stock_total con la
+suma de sus bodegas y version con el número de ajustes del producto. El script termina con código
+1 si se perdió algún ajuste.
+
+Requiere: las dependencias de requirements.txt. ¡Borra y recrea las tablas de inventario en la base!
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from app.application.commands import AjustarStockCommand  # noqa: E402
+from app.application.handlers import handle_ajustar_stock  # noqa: E402
+from app.domain.models import ConflictoDeVersion  # noqa: E402
+from app.infrastructure.postgres import (  # noqa: E402
+    Base,
+    BodegaORM,
+    InventarioBodegaORM,
+    PostgresUnitOfWork,
+    ProductoORM,
+    actualizar_esquema,
+    create_sql_engine,
+    db_url_from_env,
+)
+
+BODEGAS = [(1, "Bodega Principal"), (2, "Bodega Norte"), (3, "Bodega Sur")]
+STOCK_INICIAL = 100_000
+
+
+def poblar(engine, productos: int) -> None:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    actualizar_esquema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(BodegaORM), [{"id": i, "nombre": n, "direccion": ""} for i, n in BODEGAS])
+        conn.execute(insert(ProductoORM), [
+            {"id": i, "nombre": f"Producto {i}", "lote": f"L{i:04d}", "sku": f"SKU-{i:04d}", "stock_minimo": 10,
+             "stock_total": STOCK_INICIAL * len(BODEGAS), "version": 1,
+             "fecha_ultima_actualizacion": datetime.utcnow()}
+            for i in range(1, productos + 1)
+        ])
+        conn.execute(insert(InventarioBodegaORM), [
+            {"producto_id": i, "bodega_id": b, "cantidad_disponible": STOCK_INICIAL, "pasillo": "A", "estante": "A-01"}
+            for i in range(1, productos + 1) for b, _ in BODEGAS
+        ])
+
+
+def ejecutar(session_factory, args) -> tuple[Counter, Counter, list[float], int, list[Exception]]:
+    """Lanza los ajustadores a la vez; devuelve deltas aceptados, ajustes por producto, latencias y conflictos."""
+    deltas: Counter = Counter()
+    por_producto: Counter = Counter()
+    latencias: list[float] = []
+    errores: list[Exception] = []
+    conflictos = 0
+    candado = threading.Lock()
+    inicio = threading.Barrier(args.ajustadores)
+
+    def ajustador(semilla: int) -> None:
+        nonlocal conflictos
+        azar = random.Random(semilla)
+        propios: Counter = Counter()
+        tiempos, reintentos = [], 0
+        inicio.wait()
+        try:
+            for _ in range(args.ajustes):
+                producto_id = azar.randint(1, args.productos)
+                bodega_id = azar.choice(BODEGAS)[0]
+                delta = azar.choice([-3, -2, -1, 1, 2, 3])
+                t0 = time.perf_counter()
+                while True:
+                    version = None
+                    if args.optimista:
+                        with PostgresUnitOfWork(session_factory) as uow:
+                            version = uow.productos.get(producto_id).version
+                    try:
+                        handle_ajustar_stock(
+                            PostgresUnitOfWork(session_factory),
+                            AjustarStockCommand(producto_id, bodega_id, delta, version=version),
+                        )
+                        break
+                    except ConflictoDeVersion:
+                        reintentos += 1
+                tiempos.append((time.perf_counter() - t0) * 1000)
+                propios[(producto_id, bodega_id)] += delta
+                propios[producto_id] += 1
+        except Exception as e:
+            with candado:
+                errores.append(e)
+        with candado:
+            for clave, valor in propios.items():
+                (por_producto if isinstance(clave, int) else deltas)[clave] += valor
+            latencias.extend(tiempos)
+            conflictos += reintentos
+
+    threads = [threading.Thread(target=ajustador, args=(i,)) for i in range(args.ajustadores)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return deltas, por_producto, latencias, conflictos, errores
+
+
+def verificar(engine, deltas: Counter, por_producto: Counter) -> int:
+    """Cuenta las filas cuyo valor final no explica la suma de los ajustes aceptados."""
+    perdidos = 0
+    with Session(engine) as session:
+        for producto_id, bodega_id, cantidad in session.execute(
+            select(InventarioBodegaORM.producto_id, InventarioBodegaORM.bodega_id, InventarioBodegaORM.cantidad_disponible)
+        ):
+            if cantidad != STOCK_INICIAL + deltas[(producto_id, bodega_id)]:
+                perdidos += 1
+                print(f"  producto {producto_id} bodega {bodega_id}: {cantidad} "
+                      f"(esperado {STOCK_INICIAL + deltas[(producto_id, bodega_id)]})")
+
+        for producto_id, total, version, suma in session.execute(
+            select(ProductoORM.id, ProductoORM.stock_total, ProductoORM.version,
+                   select(func.sum(InventarioBodegaORM.cantidad_disponible))
+                   .where(InventarioBodegaORM.producto_id == ProductoORM.id).scalar_subquery())
+        ):
+            if total != suma or version != 1 + por_producto[producto_id]:
+                perdidos += 1
+                print(f"  producto {producto_id}: stock_total {total} (bodegas {suma}), "
+                      f"version {version} (esperada {1 + por_producto[producto_id]})")
+    return perdidos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de ajustes de stock concurrentes")
+    parser.add_argument("--ajustadores", type=int, default=1000, help="Hilos ajustando a la vez (default: 1000)")
+    parser.add_argument("--ajustes", type=int, default=5, help="Ajustes por hilo (default: 5)")
+    parser.add_argument("--productos", type=int, default=20, help="Productos sobre los que se reparten (default: 20)")
+    parser.add_argument("--pool-size", type=int, default=20, help="Conexiones del pool (default: 20)")
+    parser.add_argument("--max-overflow", type=int, default=30, help="Conexiones extra del pool (default: 30)")
+    parser.add_argument("--optimista", action="store_true",
+                        help="Leer la versión antes de cada ajuste y reintentar si otro la cambió")
+    args = parser.parse_args()
+
+    engine = create_sql_engine(db_url_from_env(), pool_size=args.pool_size, max_overflow=args.max_overflow,
+                               pool_timeout=120)
+    session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=Session)
+    poblar(engine, args.productos)
+
+    total = args.ajustadores * args.ajustes
+    print(f"{args.ajustadores} ajustadores x {args.ajustes} ajustes sobre {args.productos} productos "
+          f"({'con' if args.optimista else 'sin'} versión esperada)...")
+    t0 = time.perf_counter()
+    deltas, por_producto, latencias, conflictos, errores = ejecutar(session_factory, args)
+    duracion = time.perf_counter() - t0
+
+    aceptados = sum(por_producto.values())
+    print(f"ajustes aceptados: {aceptados}/{total} en {duracion:.1f}s ({aceptados / duracion:.0f} ajustes/s)")
+    if latencias:
+        p95 = statistics.quantiles(latencias, n=20)[-1] if len(latencias) > 1 else latencias[0]
+        print(f"latencia por ajuste: p50 {statistics.median(latencias):.1f} ms, p95 {p95:.1f} ms")
+    if args.optimista:
+        print(f"conflictos de versión reintentados: {conflictos}")
+    for e in errores[:5]:
+        print(f"  error: {e!r}")
+
+    perdidos = verificar(engine, deltas, por_producto)
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+    if perdidos or errores:
+        print(f"\n{perdidos} fila(s) con ajustes perdidos, {len(errores)} ajustador(es) con error")
+        sys.exit(1)
+    print("\nNingún ajuste perdido: cantidades, stock_total y version coinciden con los ajustes aceptados")
+
+
+if __name__ == '__main__':
+    main()
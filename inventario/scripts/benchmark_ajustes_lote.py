@@ -0,0 +1,122 @@
+"""
+Benchmark de la conciliación de movimientos de escáner: uno por uno vs POST /inventario/ajustes:batch.
+
+Uso (desde la carpeta inventario/):
+  python scripts/benchmark_ajustes_lote.py                       # 10000 movimientos sobre 1000 productos
+  python scripts/benchmark_ajustes_lote.py --movimientos 50000 --tamano-lote 5000 --uno-por-uno 2000
+
+Se generan movimientos con clave de idempotencia y se aplican:
+  1. los primeros --uno-por-uno con handle_ajustar_stock (una unidad de trabajo por movimiento,
+     como hoy llama el escáner a /ajustar); el tiempo se extrapola al total,
+  2. todos con handle_ajustar_stock_lote en lotes de --tamano-lote,
+  3. los mismos lotes otra vez, como un reintento del escáner: todo debe volver como duplicado.
+Al final se comparan las cantidades con la suma de los movimientos. El script termina con código
+1 si algún movimiento se aplicó dos veces o se perdió.
+
+Requiere: las dependencias de requirements.txt. ¡Borra y recrea las tablas de inventario en la base!
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from app.application.commands import AjustarStockCommand, AjustarStockLoteCommand  # noqa: E402
+from app.application.handlers import handle_ajustar_stock, handle_ajustar_stock_lote  # noqa: E402
+from app.domain.models import EstadoAjuste  # noqa: E402
+from app.infrastructure.postgres import (  # noqa: E402
+    Base,
+    InventarioBodegaORM,
+    PostgresUnitOfWork,
+    create_sql_engine,
+    db_url_from_env,
+)
+from benchmark_ajustes import BODEGAS, STOCK_INICIAL, poblar  # noqa: E402
+
+
+def movimientos(total: int, productos: int) -> list[AjustarStockCommand]:
+    azar = random.Random(7)
+    return [
+        AjustarStockCommand(
+            producto_id=azar.randint(1, productos),
+            bodega_id=azar.choice(BODEGAS)[0],
+            delta=azar.choice([-3, -2, -1, 1, 2, 3]),
+            clave_idempotencia=f"escaner-{i:08d}",
+        )
+        for i in range(total)
+    ]
+
+
+def aplicar_en_lotes(session_factory, lista: list[AjustarStockCommand], tamano: int) -> tuple[float, Counter]:
+    estados: Counter = Counter()
+    inicio = time.perf_counter()
+    for desde in range(0, len(lista), tamano):
+        resultados = handle_ajustar_stock_lote(
+            PostgresUnitOfWork(session_factory), AjustarStockLoteCommand(lista[desde:desde + tamano])
+        )
+        estados.update(r.estado for r in resultados)
+    return time.perf_counter() - inicio, estados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de ajustes de stock por lotes")
+    parser.add_argument("--movimientos", type=int, default=10_000, help="Movimientos a conciliar (default: 10000)")
+    parser.add_argument("--productos", type=int, default=1000, help="Productos distintos (default: 1000)")
+    parser.add_argument("--tamano-lote", type=int, default=5000, help="Movimientos por lote (default: 5000)")
+    parser.add_argument("--uno-por-uno", type=int, default=1000,
+                        help="Movimientos que se miden uno por uno para extrapolar (default: 1000)")
+    args = parser.parse_args()
+
+    engine = create_sql_engine(db_url_from_env())
+    session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=Session)
+    lista = movimientos(args.movimientos, args.productos)
+
+    poblar(engine, args.productos)
+    muestra = lista[:args.uno_por_uno]
+    inicio = time.perf_counter()
+    for cmd in muestra:
+        handle_ajustar_stock(PostgresUnitOfWork(session_factory), cmd)
+    uno_por_uno = (time.perf_counter() - inicio) / max(len(muestra), 1) * len(lista)
+    print(f"uno por uno: {uno_por_uno:.1f}s estimados para {len(lista)} movimientos "
+          f"({len(muestra)} medidos)")
+
+    # Los lotes parten de tablas nuevas para comparar el mismo trabajo
+    poblar(engine, args.productos)
+    duracion, estados = aplicar_en_lotes(session_factory, lista, args.tamano_lote)
+    print(f"por lotes de {args.tamano_lote}: {duracion:.1f}s ({len(lista) / duracion:.0f} movimientos/s, "
+          f"{uno_por_uno / duracion:.0f}x más rápido) -> {dict((e.value, n) for e, n in estados.items())}")
+
+    reintento, repetidos = aplicar_en_lotes(session_factory, lista, args.tamano_lote)
+    print(f"reintento de los mismos lotes: {reintento:.1f}s -> {dict((e.value, n) for e, n in repetidos.items())}")
+
+    # Con STOCK_INICIAL alto ningún movimiento se rechaza: todos deben estar aplicados una vez
+    esperado: Counter = Counter()
+    for cmd in lista:
+        esperado[(cmd.producto_id, cmd.bodega_id)] += cmd.delta
+    with Session(engine) as session:
+        distintas = [
+            (p, b, c) for p, b, c in session.execute(
+                select(InventarioBodegaORM.producto_id, InventarioBodegaORM.bodega_id, InventarioBodegaORM.cantidad_disponible)
+            )
+            if c != STOCK_INICIAL + esperado[(p, b)]
+        ]
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+    fallos = bool(distintas) or repetidos[EstadoAjuste.duplicado] != len(lista) or estados[EstadoAjuste.aplicado] != len(lista)
+    if fallos:
+        print(f"\n{len(distintas)} bodega(s) con cantidades que no cuadran con los movimientos")
+        sys.exit(1)
+    print("\nCada movimiento se aplicó exactamente una vez")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark de la búsqueda del inventario (GET /inventario/productos?q=...&limit=...) con 500k SKUs.
+
+Uso (desde la carpeta inventario/):
+  python scripts/benchmark_busqueda.py                          # PostgreSQL de DB_HOST/DB_NAME y memoria
+  python scripts/benchmark_busqueda.py --rows 500000 --limit 50 --repeat 40 --max-p95-ms 50
+  python scripts/benchmark_busqueda.py --solo-memoria
+
+Cada escenario simula lo que escribe el usuario en la pantalla de inventario (prefijos, códigos,
+proveedores) y mide repo.buscar(q, limit) en ambos repositorios: p50 y p95 de --repeat llamadas,
+más el tiempo de la segunda página con el cursor. El script termina con código 1 si algún p95
+supera --max-p95-ms.
+
+Requiere: las dependencias de requirements.txt. ¡Borra y recrea las tablas de inventario en la base!
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.domain.models import BodegaDetalle, ProductoInventario  # noqa: E402
+from app.infrastructure.memory_repo import InMemoryProductoRepo  # noqa: E402
+from app.infrastructure.postgres import (  # noqa: E402
+    Base,
+    BodegaORM,
+    InventarioBodegaORM,
+    ProductoORM,
+    SqlProductoRepo,
+    create_sql_engine,
+    actualizar_esquema,
+    db_url_from_env,
+)
+
+BASE_NAMES = [
+    "Paracetamol", "Ibuprofeno", "Amoxicilina", "Omeprazol", "Metformina",
+    "Aspirina", "Cetirizina", "Loratadina", "Diclofenaco", "Naproxeno",
+    "Captopril", "Enalapril", "Simvastatina", "Atorvastatina", "Fluconazol",
+]
+FORMS = ["tabletas", "capsulas", "jarabe", "solucion", "polvo"]
+CATEGORIES = ["Analgésicos", "Antibióticos", "Antiinflamatorios", "Antihipertensivos", "Antidiabeticos",
+              "Antialergicos", "Gastrointestinales"]
+PROVIDERS = ["Laboratorios Pharma Plus", "SaludGen S.A.", "BioMedica Ltda.", "Cuidado Salud S.A.",
+             "Distribuciones Medicas"]
+BODEGAS = [(1, "Bodega Principal"), (2, "Bodega Norte"), (3, "Bodega Sur")]
+LOTE_INSERCION = 10_000
+
+ESCENARIOS = [
+    ("1 letra", "p"),
+    ("prefijo corto", "par"),
+    ("nombre completo", "paracetamol"),
+    ("nombre + dosis", "ibuprofeno 400"),
+    ("nombre + forma", "omeprazol jarabe"),
+    ("sku exacto", None),
+    ("prefijo de sku", None),
+    ("lote", None),
+    ("proveedor", "biomedica"),
+    ("categoría", "antialergicos"),
+    ("sin resultados", "zzzz"),
+]
+
+
+def generar(rows: int) -> list[dict]:
+    random.seed(7)
+    year = datetime.utcnow().year
+    filas = []
+    for i in range(1, rows + 1):
+        base = random.choice(BASE_NAMES)
+        filas.append({
+            "id": i,
+            "nombre": f"{base} {random.choice([100, 200, 400, 500, 600])}mg {random.choice(FORMS)}",
+            "lote": f"{''.join(random.choices(string.ascii_uppercase, k=2))}{year}{i:06d}",
+            "sku": f"{base[:3].upper()}-{i:07d}",
+            "stock_minimo": random.randint(0, 100),
+            "proveedor": random.choice(PROVIDERS),
+            "categoria": random.choice(CATEGORIES),
+            "valor_unitario": round(random.uniform(0.05, 50.0), 2),
+            "fecha_ultima_actualizacion": datetime.utcnow(),
+            "stock_total": 0,
+        })
+    return filas
+
+
+def consultas(filas: list[dict]) -> list[tuple[str, list[str]]]:
+    """Cada escenario con --repeat variantes de q (códigos tomados al azar del catálogo)."""
+    muestra = random.sample(filas, 200)
+    resultado = []
+    for nombre, q in ESCENARIOS:
+        if nombre == "sku exacto":
+            valores = [f["sku"] for f in muestra]
+        elif nombre == "prefijo de sku":
+            valores = [f["sku"][:-2] for f in muestra]
+        elif nombre == "lote":
+            valores = [f["lote"] for f in muestra]
+        else:
+            valores = [q]
+        resultado.append((nombre, valores))
+    return resultado
+
+
+def poblar_postgres(engine, filas: list[dict]) -> float:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    actualizar_esquema(engine)
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(BodegaORM), [{"id": i, "nombre": n, "direccion": ""} for i, n in BODEGAS])
+        for desde in range(0, len(filas), LOTE_INSERCION):
+            lote = filas[desde:desde + LOTE_INSERCION]
+            conn.execute(insert(ProductoORM), lote)
+            conn.execute(insert(InventarioBodegaORM), [
+                {"producto_id": f["id"], "bodega_id": b, "cantidad_disponible": random.randint(0, 1000),
+                 "pasillo": "A", "estante": "A-01"}
+                for f in lote for b in (1, 2 + f["id"] % 2)
+            ])
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM ANALYZE")
+    return time.perf_counter() - inicio
+
+
+def poblar_memoria(filas: list[dict]) -> tuple[InMemoryProductoRepo, float]:
+    inicio = time.perf_counter()
+    productos = [
+        ProductoInventario(
+            id=f["id"], nombre=f["nombre"], lote=f["lote"], sku=f["sku"], stock_total=0,
+            stock_minimo=f["stock_minimo"], proveedor=f["proveedor"], categoria=f["categoria"],
+            bodegas=[BodegaDetalle(id=1, nombre="Bodega Principal")],
+        )
+        for f in filas
+    ]
+    repo = InMemoryProductoRepo(items=productos)
+    return repo, time.perf_counter() - inicio
+
+
+def medir(nombre_backend: str, repo, escenarios, limit: int, repeat: int, max_p95: float, despues=None) -> bool:
+    print(f"\n{nombre_backend}")
+    print(f"{'escenario':<18} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p. 2 (ms)':>10} {'filas':>6}")
+    ok = True
+    for nombre, valores in escenarios:
+        tiempos, segunda, filas = [], [], 0
+        for i in range(repeat):
+            q = valores[i % len(valores)]
+            inicio = time.perf_counter()
+            pagina = repo.buscar(q, limit=limit)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            filas = len(pagina.items)
+            if pagina.siguiente_cursor:
+                inicio = time.perf_counter()
+                repo.buscar(q, limit=limit, cursor=pagina.siguiente_cursor)
+                segunda.append((time.perf_counter() - inicio) * 1000)
+            if despues:
+                despues()
+
+        p95 = statistics.quantiles(tiempos, n=20)[-1] if len(tiempos) > 1 else tiempos[0]
+        ok &= p95 <= max_p95
+        p2 = statistics.median(segunda) if segunda else float("nan")
+        print(f"{nombre:<18} {statistics.median(tiempos):>9.1f} {p95:>9.1f} {p2:>10.1f} {filas:>6}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda del inventario")
+    parser.add_argument("--rows", type=int, default=500_000, help="SKUs a generar (default: 500000)")
+    parser.add_argument("--limit", type=int, default=50, help="Tamaño de página (default: 50)")
+    parser.add_argument("--repeat", type=int, default=40, help="Llamadas por escenario (default: 40)")
+    parser.add_argument("--max-p95-ms", type=float, default=50.0,
+                        help="Latencia p95 máxima por escenario en milisegundos (default: 50)")
+    parser.add_argument("--solo-memoria", action="store_true", help="No usar PostgreSQL")
+    parser.add_argument("--conservar", action="store_true",
+                        help="No borrar las tablas de PostgreSQL al terminar (para revisar planes con EXPLAIN)")
+    args = parser.parse_args()
+
+    filas = generar(args.rows)
+    escenarios = consultas(filas)
+    fallos = 0
+
+    if not args.solo_memoria:
+        engine = create_sql_engine(db_url_from_env())
+        print(f"postgresql: cargando {args.rows} SKUs...")
+        carga = poblar_postgres(engine, filas)
+        print(f"carga: {carga:.1f}s")
+        with Session(engine) as session:
+            repo = SqlProductoRepo(session)
+            fallos += not medir("postgresql", repo, escenarios, args.limit, args.repeat, args.max_p95_ms,
+                                despues=session.expunge_all)
+        if not args.conservar:
+            Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    print(f"\nmemoria: indexando {args.rows} SKUs...")
+    repo, carga = poblar_memoria(filas)
+    print(f"indexación: {carga:.1f}s")
+    fallos += not medir("memoria", repo, escenarios, args.limit, args.repeat, args.max_p95_ms)
+
+    if fallos:
+        print(f"\n{fallos} repositorio(s) con escenarios por encima de p95 {args.max_p95_ms} ms")
+        sys.exit(1)
+    print(f"\nTodos los escenarios con p95 por debajo de {args.max_p95_ms} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de la caché de lecturas del tablero de inventario contra PostgreSQL.
+
+Uso (desde la carpeta inventario/):
+  python scripts/benchmark_cache.py                       # 50 tableros, 60 refrescos
+  python scripts/benchmark_cache.py --tableros 200 --refrescos 120 --ajustes-por-refresco 5
+
+Simula tableros que cada pocos segundos piden la primera página de /productos y el detalle de
+algunos productos, mientras el escáner ajusta stock de vez en cuando. Se ejecuta dos veces, con la
+caché apagada y encendida, contando las sentencias que llegan a la base (evento
+before_cursor_execute de SQLAlchemy). Después de cada ajuste se comprueba que el tablero vea el
+stock nuevo. El script termina con código 1 si alguna lectura devolvió un valor viejo.
+
+Requiere: las dependencias de requirements.txt. ¡Borra y recrea las tablas de inventario en la base!
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from app.application.commands import AjustarStockCommand  # noqa: E402
+from app.application.handlers import (  # noqa: E402
+    handle_ajustar_stock,
+    handle_listar_productos,
+    handle_obtener_producto,
+)
+from app.application.queries import ListarProductosQuery, ObtenerProductoQuery  # noqa: E402
+from app.infrastructure.cache import CacheProductos  # noqa: E402
+from app.infrastructure.postgres import Base, PostgresUnitOfWork, create_sql_engine, db_url_from_env  # noqa: E402
+from benchmark_ajustes import BODEGAS, poblar  # noqa: E402
+
+
+def simular(session_factory, cache: CacheProductos, args) -> tuple[float, int]:
+    """Devuelve la duración y las lecturas que vieron un stock distinto del recién ajustado."""
+    azar = random.Random(11)
+    viejas = 0
+    inicio = time.perf_counter()
+    for _ in range(args.refrescos):
+        ajustados = {}
+        for _ in range(args.ajustes_por_refresco):
+            producto_id = azar.randint(1, args.productos)
+            p = handle_ajustar_stock(
+                PostgresUnitOfWork(session_factory),
+                AjustarStockCommand(producto_id, azar.choice(BODEGAS)[0], azar.choice([-1, 1])),
+                cache,
+            )
+            ajustados[producto_id] = p.stock_total
+
+        for _ in range(args.tableros):
+            pagina = handle_listar_productos(
+                PostgresUnitOfWork(session_factory), ListarProductosQuery(limit=args.tamano_pagina), cache
+            )
+            detalle = [azar.randint(1, args.productos) for _ in range(args.detalles)] + list(ajustados)
+            for producto_id in detalle:
+                p = handle_obtener_producto(
+                    PostgresUnitOfWork(session_factory), ObtenerProductoQuery(producto_id=producto_id), cache
+                )
+                if producto_id in ajustados and p.stock_total != ajustados[producto_id]:
+                    viejas += 1
+            viejas += sum(1 for p in pagina.items if p.id in ajustados and p.stock_total != ajustados[p.id])
+    return time.perf_counter() - inicio, viejas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la caché de lecturas de inventario")
+    parser.add_argument("--tableros", type=int, default=50, help="Tableros refrescando (default: 50)")
+    parser.add_argument("--refrescos", type=int, default=60, help="Refrescos de cada tablero (default: 60)")
+    parser.add_argument("--productos", type=int, default=500, help="Productos en el catálogo (default: 500)")
+    parser.add_argument("--tamano-pagina", type=int, default=50, help="Productos por página (default: 50)")
+    parser.add_argument("--detalles", type=int, default=5, help="Detalles por refresco (default: 5)")
+    parser.add_argument("--ajustes-por-refresco", type=int, default=2,
+                        help="Ajustes del escáner entre refrescos (default: 2)")
+    args = parser.parse_args()
+
+    engine = create_sql_engine(db_url_from_env())
+    session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=Session)
+    sentencias = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def contar(*_):
+        nonlocal sentencias
+        sentencias += 1
+
+    resultados = {}
+    for nombre, cache in (("sin caché", CacheProductos(activa=False)), ("con caché", CacheProductos())):
+        poblar(engine, args.productos)
+        sentencias = 0
+        duracion, viejas = simular(session_factory, cache, args)
+        resultados[nombre] = (sentencias, duracion, viejas)
+        stats = cache.estadisticas()
+        print(f"{nombre}: {sentencias} sentencias en {duracion:.1f}s, hit ratio {stats['hitRatio']}, "
+              f"{stats['invalidaciones']} invalidaciones, {viejas} lecturas viejas")
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+    sin, con = resultados["sin caché"], resultados["con caché"]
+    print(f"\nsentencias a la base: -{100 * (1 - con[0] / sin[0]):.1f}%, tiempo: {sin[1] / con[1]:.1f}x más rápido")
+    if con[2] or sin[2]:
+        print("Hubo lecturas con stock viejo después de un ajuste")
+        sys.exit(1)
+    print("Todas las lecturas posteriores a un ajuste vieron el stock nuevo")
+
+
+if __name__ == '__main__':
+    main()
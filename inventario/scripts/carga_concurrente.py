@@ -0,0 +1,162 @@
+"""
+Prueba de carga del servicio de inventario con hasta 200 peticiones concurrentes contra PostgreSQL.
+
+Uso (desde la carpeta inventario/):
+  python scripts/carga_concurrente.py                             # niveles 1, 25, 50, 100 y 200
+  python scripts/carga_concurrente.py --niveles 50,200 --peticiones 20
+  INVENTARIO_DB_POOL_SIZE=40 INVENTARIO_DB_MAX_OVERFLOW=0 python scripts/carga_concurrente.py
+
+Levanta la aplicación real con uvicorn en este proceso (un pod) y, en cada nivel, lanza a la vez
+tantos clientes como indica el nivel. Cada cliente hace --peticiones peticiones sobre productos al
+azar: lecturas de /productos/{id} con Cache-Control: no-cache (para medir la base, no la caché) y
+un ajuste de ±1 cada --ajuste-cada lecturas. Se comprueba que cada lectura devuelva el producto
+pedido y, al final, que stock_total y las bodegas coincidan con la suma de los ajustes aceptados.
+El script termina con código 1 si alguna respuesta fue de otro producto, algún ajuste se perdió o
+hubo errores distintos de 503 (pool agotado).
+
+El pool se configura con las variables INVENTARIO_DB_* y los hilos con INVENTARIO_THREADPOOL.
+
+Requiere: las dependencias de requirements.txt. ¡Borra y recrea las tablas de inventario en la base!
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("INVENTARIO_CACHE", "0")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.infrastructure.postgres import (  # noqa: E402
+    Base,
+    InventarioBodegaORM,
+    ProductoORM,
+    create_sql_engine,
+    db_url_from_env,
+    opciones_pool_desde_env,
+)
+from benchmark_ajustes import BODEGAS, STOCK_INICIAL, poblar  # noqa: E402
+
+PUERTO = 8765
+
+
+def levantar_servidor() -> uvicorn.Server:
+    from app.main import app
+
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PUERTO, log_level="warning"))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+    return servidor
+
+
+async def nivel(concurrencia: int, args, deltas: Counter) -> dict:
+    """Lanza `concurrencia` clientes a la vez; devuelve throughput, latencias y errores."""
+    latencias: list[float] = []
+    estados: Counter = Counter()
+    cruzadas = 0
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO}", limits=limites, timeout=60) as client:
+        async def cliente(semilla: int) -> None:
+            nonlocal cruzadas
+            azar = random.Random(semilla)
+            for i in range(args.peticiones):
+                producto_id = azar.randint(1, args.productos)
+                t0 = time.perf_counter()
+                if i % args.ajuste_cada == args.ajuste_cada - 1:
+                    bodega_id, delta = azar.choice(BODEGAS)[0], azar.choice([-1, 1])
+                    r = await client.post(f"/inventario/productos/{producto_id}/ajustar",
+                                          json={"bodegaId": bodega_id, "delta": delta})
+                    if r.status_code == 200:
+                        deltas[(producto_id, bodega_id)] += delta
+                else:
+                    r = await client.get(f"/inventario/productos/{producto_id}",
+                                         headers={"Cache-Control": "no-cache"})
+                    if r.status_code == 200 and r.json()["id"] != producto_id:
+                        cruzadas += 1
+                latencias.append((time.perf_counter() - t0) * 1000)
+                estados[r.status_code] += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(concurrencia * 1000 + i) for i in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+
+    return {
+        "rps": len(latencias) / duracion,
+        "p50": statistics.median(latencias),
+        "p95": statistics.quantiles(latencias, n=20)[-1],
+        "estados": estados,
+        "cruzadas": cruzadas,
+    }
+
+
+def verificar(engine, deltas: Counter) -> int:
+    """Filas cuyo valor final no explica la suma de los ajustes aceptados."""
+    perdidos = 0
+    with Session(engine) as session:
+        for producto_id, bodega_id, cantidad in session.execute(
+            select(InventarioBodegaORM.producto_id, InventarioBodegaORM.bodega_id, InventarioBodegaORM.cantidad_disponible)
+        ):
+            if cantidad != STOCK_INICIAL + deltas[(producto_id, bodega_id)]:
+                perdidos += 1
+        for total, suma in session.execute(
+            select(ProductoORM.stock_total,
+                   select(func.sum(InventarioBodegaORM.cantidad_disponible))
+                   .where(InventarioBodegaORM.producto_id == ProductoORM.id).scalar_subquery())
+        ):
+            if total != suma:
+                perdidos += 1
+    return perdidos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga concurrente de inventario")
+    parser.add_argument("--niveles", default="1,25,50,100,200", help="Concurrencias a probar (default: 1,25,50,100,200)")
+    parser.add_argument("--peticiones", type=int, default=40, help="Peticiones por cliente (default: 40)")
+    parser.add_argument("--productos", type=int, default=1000, help="Productos en la base (default: 1000)")
+    parser.add_argument("--ajuste-cada", type=int, default=5, help="Un ajuste cada N peticiones (default: 5)")
+    args = parser.parse_args()
+
+    engine = create_sql_engine(db_url_from_env())
+    poblar(engine, args.productos)
+    servidor = levantar_servidor()
+    pool = opciones_pool_desde_env()
+    print(f"pool_size={pool['pool_size']} max_overflow={pool['max_overflow']} "
+          f"statement_timeout={pool['statement_timeout_ms']}ms threadpool={os.getenv('INVENTARIO_THREADPOOL', '100')}")
+
+    deltas: Counter = Counter()
+    cruzadas, errores, base = 0, 0, None
+    for concurrencia in [int(n) for n in args.niveles.split(",")]:
+        r = asyncio.run(nivel(concurrencia, args, deltas))
+        base = base or r["rps"]
+        cruzadas += r["cruzadas"]
+        errores += sum(n for estado, n in r["estados"].items() if estado not in (200, 400, 503))
+        print(f"{concurrencia:>4} concurrentes: {r['rps']:7.0f} req/s ({r['rps'] / base:4.1f}x), "
+              f"p50 {r['p50']:6.1f} ms, p95 {r['p95']:6.1f} ms, respuestas {dict(r['estados'])}")
+
+    servidor.should_exit = True
+    perdidos = verificar(engine, deltas)
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+    if cruzadas or perdidos or errores:
+        print(f"\n{cruzadas} respuesta(s) de otro producto, {perdidos} fila(s) con ajustes perdidos, "
+              f"{errores} error(es)")
+        sys.exit(1)
+    print("\nCada respuesta correspondió a su petición y ningún ajuste se perdió")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.routes import get_cache, get_uow
+from app.application.commands import AjustarStockCommand, AjustarStockLoteCommand
+from app.application.handlers import handle_ajustar_stock, handle_ajustar_stock_lote
+from app.domain.models import AjusteStock, BodegaDetalle, ConflictoDeVersion, EstadoAjuste, ProductoInventario
+from app.infrastructure.memory_repo import InMemoryProductoRepo, InMemoryUnitOfWork
+from app.infrastructure.postgres import (
+    Base,
+    BodegaORM,
+    PostgresUnitOfWork,
+    ProductoORM,
+    SqlProductoRepo,
+    actualizar_esquema,
+    create_sql_engine,
+    db_url_from_env,
+)
+from app.main import app
+
+
+def _producto(id=None, cantidades=(100, 50)):
+    return ProductoInventario(
+        id=id,
+        nombre="Paracetamol 500mg",
+        lote="PT2024001",
+        sku="PAR500-001",
+        stock_total=sum(cantidades),
+        stock_minimo=20,
+        bodegas=[
+            BodegaDetalle(id=9001, nombre="Bodega Principal", cantidad_disponible=cantidades[0], pasillo="A", estante="A-1"),
+            BodegaDetalle(id=9002, nombre="Bodega Norte", cantidad_disponible=cantidades[1], pasillo="B", estante="B-1"),
+        ],
+    )
+
+
+def _cantidades(producto):
+    return {b.id: b.cantidad_disponible for b in producto.bodegas}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_sql_engine(db_url_from_env())
+    Base.metadata.create_all(engine)
+    actualizar_esquema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(params=["memoria", "sqlite", "postgres"])
+def repo(request):
+    if request.param == "memoria":
+        yield InMemoryProductoRepo(items=[_producto(id=1)])
+        return
+
+    if request.param == "sqlite":
+        engine = create_sql_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        conn = engine.connect()
+    else:
+        # Todo ocurre dentro de una transacción que se revierte al final
+        conn = request.getfixturevalue("engine").connect()
+    trans = conn.begin()
+    session = Session(bind=conn, join_transaction_mode="create_savepoint")
+    repo = SqlProductoRepo(session)
+    repo.save(_producto())
+    yield repo
+    session.close()
+    trans.rollback()
+    conn.close()
+
+
+def _id(repo):
+    return repo.list()[0].id
+
+
+def test_ajuste_suma_delta_en_bodega_y_stock_total(repo):
+    producto_id = _id(repo)
+    version = repo.get(producto_id).version
+
+    producto = repo.ajustar_stock(producto_id, 9001, -30)
+    assert _cantidades(producto) == {9001: 70, 9002: 50}
+    assert producto.stock_total == 120
+    assert producto.version == version + 1
+
+    producto = repo.ajustar_stock(producto_id, 9002, 5)
+    assert _cantidades(producto) == {9001: 70, 9002: 55}
+    assert repo.get(producto_id).stock_total == 125
+
+
+def test_ajuste_con_version_esperada(repo):
+    producto_id = _id(repo)
+    version = repo.get(producto_id).version
+
+    repo.ajustar_stock(producto_id, 9001, 1, version=version)
+    # Quien leyó la versión anterior no puede ajustar sobre ella
+    with pytest.raises(ConflictoDeVersion) as error:
+        repo.ajustar_stock(producto_id, 9001, 1, version=version)
+
+    assert error.value.version_actual == version + 1
+    assert repo.get(producto_id).stock_total == 151
+
+
+@pytest.mark.parametrize("producto, bodega, delta, mensaje", [
+    (None, 9001, -101, "Stock insuficiente en la bodega"),
+    (None, 9999, 1, "Bodega no encontrada para el producto"),
+    (424242, 9001, 1, "Producto no encontrado"),
+])
+def test_ajuste_rechazado_no_modifica_el_producto(repo, producto, bodega, delta, mensaje):
+    producto_id = _id(repo)
+    antes = repo.get(producto_id)
+
+    with pytest.raises(ValueError, match=mensaje):
+        repo.ajustar_stock(producto or producto_id, bodega, delta)
+
+    despues = repo.get(producto_id, refrescar=True) if isinstance(repo, SqlProductoRepo) else repo.get(producto_id)
+    assert _cantidades(despues) == {9001: 100, 9002: 50}
+    assert (despues.stock_total, despues.version) == (150, antes.version)
+
+
+@pytest.mark.parametrize("repo", ["sqlite", "postgres"], indirect=True)
+def test_save_actualiza_inventario_en_su_lugar(repo):
+    producto = repo.get(_id(repo))
+    producto.bodegas[0].cantidad_disponible = 10
+    del producto.bodegas[1]
+    repo.save(producto)
+
+    guardado = repo.get(producto.id, refrescar=True)
+    assert _cantidades(guardado) == {9001: 10}
+    assert guardado.stock_total == 10
+
+
+def test_save_con_version_vieja_es_conflicto(repo):
+    producto_id = _id(repo)
+    viejo = repo.get(producto_id)
+    version = viejo.version
+    repo.ajustar_stock(producto_id, 9001, 1)
+
+    copia = _producto(id=producto_id)
+    copia.version = version
+    with pytest.raises(ConflictoDeVersion):
+        repo.save(copia)
+
+
+def _ajustar_en_paralelo(uow_factory, producto_id, hilos, ajustes):
+    """Cada hilo alterna +2 y -1 en las dos bodegas; devuelve los errores inesperados."""
+    errores = []
+    inicio = threading.Barrier(hilos)
+
+    def ajustador():
+        inicio.wait()
+        try:
+            for i in range(ajustes):
+                bodega = 9001 if i % 2 else 9002
+                handle_ajustar_stock(uow_factory(), AjustarStockCommand(producto_id, bodega, 2 if i % 2 else -1))
+        except Exception as e:  # pragma: no cover - se reporta en la aserción
+            errores.append(e)
+
+    threads = [threading.Thread(target=ajustador) for _ in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errores
+
+
+def test_ajustes_concurrentes_en_memoria_no_se_pierden():
+    repo = InMemoryProductoRepo(items=[_producto(id=1, cantidades=(100, 1000))])
+
+    errores = _ajustar_en_paralelo(lambda: InMemoryUnitOfWork(repo), 1, hilos=50, ajustes=20)
+
+    assert errores == []
+    producto = repo.get(1)
+    assert _cantidades(producto) == {9001: 100 + 50 * 10 * 2, 9002: 1000 - 50 * 10}
+    assert producto.stock_total == sum(_cantidades(producto).values())
+    assert producto.version == 50 * 20
+
+
+@pytest.fixture
+def producto_postgres(engine):
+    """Producto guardado de verdad (los hilos usan sus propias conexiones); se borra al final."""
+    SessionFactory = sessionmaker(bind=engine, expire_on_commit=False)
+    with SessionFactory.begin() as session:
+        session.merge(BodegaORM(id=9001, nombre="Bodega Principal"))
+        session.merge(BodegaORM(id=9002, nombre="Bodega Norte"))
+        producto = _producto(cantidades=(100, 1000))
+        SqlProductoRepo(session).save(producto)
+
+    yield SessionFactory, producto
+
+    with SessionFactory.begin() as session:
+        session.execute(delete(ProductoORM).where(ProductoORM.id == producto.id))
+        session.execute(delete(BodegaORM).where(BodegaORM.id.in_([9001, 9002])))
+
+
+def test_ajustes_concurrentes_en_postgres_no_se_pierden(producto_postgres):
+    SessionFactory, producto = producto_postgres
+
+    errores = _ajustar_en_paralelo(lambda: PostgresUnitOfWork(SessionFactory), producto.id, hilos=20, ajustes=10)
+
+    assert errores == []
+    with SessionFactory() as session:
+        final = SqlProductoRepo(session).get(producto.id)
+        total = session.get(ProductoORM, producto.id).stock_total
+    assert _cantidades(final) == {9001: 100 + 20 * 5 * 2, 9002: 1000 - 20 * 5}
+    assert total == final.stock_total == sum(_cantidades(final).values())
+    assert final.version == producto.version + 20 * 10
+
+
+def _estados(resultados):
+    return [r.estado.value for r in resultados]
+
+
+def test_lote_aplica_en_orden_con_resultado_por_ajuste(repo):
+    producto_id = _id(repo)
+    version = repo.get(producto_id).version
+
+    resultados = repo.ajustar_stock_lote([
+        AjusteStock(producto_id, 9001, -60),
+        AjusteStock(producto_id, 9001, -60),  # ya solo quedan 40
+        AjusteStock(producto_id, 9002, 10, version=version + 1),
+        AjusteStock(producto_id, 9002, 10, version=version),
+        AjusteStock(producto_id, 9999, 1),
+        AjusteStock(424242, 9001, 1),
+        AjusteStock(producto_id, 9001, 5),
+    ])
+
+    assert _estados(resultados) == ["aplicado", "rechazado", "aplicado", "conflicto", "rechazado", "rechazado", "aplicado"]
+    assert [r.error for r in resultados if r.estado == EstadoAjuste.rechazado] == [
+        "Stock insuficiente en la bodega", "Bodega no encontrada para el producto", "Producto no encontrado",
+    ]
+    assert [(r.cantidad_disponible, r.stock_total, r.version) for r in resultados if r.estado == EstadoAjuste.aplicado] == [
+        (40, 90, version + 1), (60, 100, version + 2), (45, 105, version + 3),
+    ]
+
+    producto = repo.get(producto_id, refrescar=True) if isinstance(repo, SqlProductoRepo) else repo.get(producto_id)
+    assert _cantidades(producto) == {9001: 45, 9002: 60}
+    assert (producto.stock_total, producto.version) == (105, version + 3)
+
+
+def test_lote_con_claves_repetidas_no_se_aplica_dos_veces(repo):
+    producto_id = _id(repo)
+    lote = [AjusteStock(producto_id, 9001, -10, clave="scan-1"), AjusteStock(producto_id, 9002, 5, clave="scan-2")]
+
+    primero = repo.ajustar_stock_lote(lote + [AjusteStock(producto_id, 9001, -10, clave="scan-1")])
+    reintento = repo.ajustar_stock_lote(lote)
+
+    assert _estados(primero) == ["aplicado", "aplicado", "duplicado"]
+    assert _estados(reintento) == ["duplicado", "duplicado"]
+    # El duplicado devuelve lo que se respondió la primera vez
+    assert [(r.cantidad_disponible, r.stock_total) for r in reintento] == [(90, 140), (55, 145)]
+    assert repo.get(producto_id).stock_total == 145
+
+
+def test_lote_rechazado_se_puede_reintentar_con_la_misma_clave(repo):
+    producto_id = _id(repo)
+
+    assert _estados(repo.ajustar_stock_lote([AjusteStock(producto_id, 9001, -500, clave="scan-9")])) == ["rechazado"]
+    repo.ajustar_stock(producto_id, 9001, 400)
+    assert _estados(repo.ajustar_stock_lote([AjusteStock(producto_id, 9001, -500, clave="scan-9")])) == ["aplicado"]
+
+
+def test_lotes_reenviados_en_paralelo_se_aplican_una_vez(producto_postgres):
+    SessionFactory, producto = producto_postgres
+    lote = AjustarStockLoteCommand([
+        AjustarStockCommand(producto.id, 9001 if i % 2 else 9002, 1, clave_idempotencia=f"scan-{i}") for i in range(200)
+    ])
+    estados, inicio = [], threading.Barrier(8)
+
+    def escaner():
+        inicio.wait()
+        estados.extend(_estados(handle_ajustar_stock_lote(PostgresUnitOfWork(SessionFactory), lote)))
+
+    threads = [threading.Thread(target=escaner) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert estados.count("aplicado") == 200 and estados.count("duplicado") == 7 * 200
+    with SessionFactory() as session:
+        final = SqlProductoRepo(session).get(producto.id)
+    assert _cantidades(final) == {9001: 200, 9002: 1100}
+    assert final.version == producto.version + 200
+
+
+def test_endpoint_ajustar_con_version():
+    repo = InMemoryProductoRepo(items=[_producto(id=1)])
+    app.dependency_overrides[get_uow] = lambda: InMemoryUnitOfWork(repo)
+    app.dependency_overrides[get_cache] = lambda: None
+    try:
+        client = TestClient(app)
+        version = client.get("/inventario/productos/1").json()["version"]
+
+        r = client.post("/inventario/productos/1/ajustar", json={"bodegaId": 9001, "delta": -10, "version": version})
+        assert r.status_code == 200
+        assert (r.json()["stock_total"], r.json()["version"]) == (140, version + 1)
+
+        r = client.post("/inventario/productos/1/ajustar", json={"bodegaId": 9001, "delta": -10, "version": version})
+        assert r.status_code == 409
+
+        r = client.post("/inventario/productos/1/ajustar", json={"bodegaId": 9001, "delta": -1000})
+        assert r.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_endpoint_ajustes_batch():
+    repo = InMemoryProductoRepo(items=[_producto(id=1)])
+    app.dependency_overrides[get_uow] = lambda: InMemoryUnitOfWork(repo)
+    app.dependency_overrides[get_cache] = lambda: None
+    try:
+        client = TestClient(app)
+        body = {"ajustes": [
+            {"productoId": 1, "bodegaId": 9001, "delta": -5, "idempotencyKey": "scan-1"},
+            {"productoId": 1, "bodegaId": 9002, "delta": -500, "idempotencyKey": "scan-2"},
+        ]}
+
+        r = client.post("/inventario/ajustes:batch", json=body)
+        assert r.status_code == 200
+        data = r.json()
+        assert (data["aplicados"], data["duplicados"], data["rechazados"]) == (1, 0, 1)
+        assert data["resultados"][0]["cantidadDisponible"] == 95
+        assert data["resultados"][1]["error"] == "Stock insuficiente en la bodega"
+
+        data = client.post("/inventario/ajustes:batch", json=body).json()
+        assert (data["aplicados"], data["duplicados"], data["rechazados"]) == (0, 1, 1)
+        assert repo.get(1).stock_total == 145
+
+        assert client.post("/inventario/ajustes:batch", json={"ajustes": []}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
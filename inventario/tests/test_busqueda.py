@@ -0,0 +1,184 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api.routes import get_cache, get_uow
+from app.domain.models import ProductoInventario
+from app.infrastructure import busqueda
+from app.infrastructure.memory_repo import InMemoryProductoRepo, InMemoryUnitOfWork
+from app.infrastructure.postgres import (
+    Base,
+    SqlProductoRepo,
+    create_sql_engine,
+    actualizar_esquema,
+    db_url_from_env,
+)
+from app.main import app
+
+
+CATALOGO = [
+    # nombre, lote, sku, proveedor, categoria
+    ("Paracetamol 500mg", "PT2024001", "PAR500-001", "Laboratorios Pharma Plus", "Analgésicos"),
+    ("Paracetamol jarabe", "PT2024002", "PAR120-002", "SaludGen S.A.", "Analgésicos"),
+    ("Ibuprofeno 600mg", "IB2024001", "IBU600-001", "Laboratorios Pharma Plus", "Antiinflamatorios"),
+    ("Vacuna COVID-19", "VC2024001", "VAC-CV19-001", "Distribuidora Médica Central", "Vacunas"),
+    ("Amoxicilina 500mg", "AM2024001", "AMX500-001", "BioMedica Ltda.", "Antibióticos"),
+    ("Suero pharmaton", "SP2024001", "SUE-001", "Cuidado Salud S.A.", "Vitaminas"),
+]
+
+
+def _productos(id_inicial=None):
+    return [
+        ProductoInventario(
+            id=None if id_inicial is None else id_inicial + i,
+            nombre=nombre,
+            lote=lote,
+            sku=sku,
+            stock_total=10,
+            stock_minimo=1,
+            bodegas=[],
+            proveedor=proveedor,
+            categoria=categoria,
+        )
+        for i, (nombre, lote, sku, proveedor, categoria) in enumerate(CATALOGO)
+    ]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_sql_engine(db_url_from_env())
+    Base.metadata.create_all(engine)
+    actualizar_esquema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(params=["memoria", "postgres"])
+def repo(request):
+    if request.param == "memoria":
+        yield InMemoryProductoRepo(items=_productos(id_inicial=1))
+        return
+
+    # Todo ocurre dentro de una transacción que se revierte al final
+    conn = request.getfixturevalue("engine").connect()
+    trans = conn.begin()
+    session = Session(bind=conn, join_transaction_mode="create_savepoint")
+    repo = SqlProductoRepo(session)
+    for p in _productos():
+        repo.save(p)
+    session.flush()
+    yield repo
+    session.close()
+    trans.rollback()
+    conn.close()
+
+
+def _skus(repo, q=None, **kwargs):
+    return [p.sku for p in repo.buscar(q, **kwargs).items]
+
+
+@pytest.mark.parametrize("q, esperados", [
+    ("para", ["PAR500-001", "PAR120-002"]),
+    ("paracetamol 500", ["PAR500-001"]),
+    ("PARACETAMOL   jarabe", ["PAR120-002"]),
+    ("analgesicos", ["PAR500-001", "PAR120-002"]),
+    ("médica", ["VAC-CV19-001"]),
+    ("biomedica", ["AMX500-001"]),
+    ("cv19", ["VAC-CV19-001"]),
+    ("vac-cv", ["VAC-CV19-001"]),
+    ("ib2024", ["IBU600-001"]),
+    ("nada", []),
+    ("-*:&|!", ["PAR500-001", "PAR120-002", "IBU600-001", "VAC-CV19-001", "AMX500-001", "SUE-001"]),
+])
+def test_busqueda_por_prefijo_en_los_cinco_campos(repo, q, esperados):
+    assert _skus(repo, q) == esperados
+
+
+def test_relevancia_codigo_nombre_y_proveedor(repo):
+    # SUE-001 coincide por nombre, los demás solo por proveedor
+    assert _skus(repo, "pharma") == ["SUE-001", "PAR500-001", "IBU600-001"]
+    # "001" aparece en sku o lote de todos
+    assert _skus(repo, "001")[:2] == ["PAR500-001", "IBU600-001"]
+    assert _skus(repo, "500") == ["PAR500-001", "AMX500-001"]
+
+
+def test_paginacion_con_cursor_recorre_todos_los_resultados(repo):
+    vistos, cursor = [], None
+    while True:
+        pagina = repo.buscar("pharma", limit=2, cursor=cursor)
+        vistos.extend(p.sku for p in pagina.items)
+        cursor = pagina.siguiente_cursor
+        if not cursor:
+            break
+
+    assert vistos == _skus(repo, "pharma")
+
+
+@pytest.mark.parametrize("ventana", [1, 2, 1000])
+def test_paginas_iguales_con_ventana_o_indice(repo, monkeypatch, ventana):
+    # Con ventanas pequeñas las páginas salen del índice invertido / GIN en lugar del recorrido por id
+    monkeypatch.setattr(busqueda, "VENTANA", ventana)
+    for q in ["pharma", "001", "a", "s"]:
+        vistos, cursor = [], None
+        while True:
+            pagina = repo.buscar(q, limit=2, cursor=cursor)
+            vistos.extend(p.sku for p in pagina.items)
+            cursor = pagina.siguiente_cursor
+            if not cursor:
+                break
+        assert vistos == _skus(repo, q)
+
+
+def test_paginacion_sin_busqueda_por_id(repo):
+    pagina = repo.buscar(limit=4)
+    assert len(pagina.items) == 4
+    resto = repo.buscar(limit=4, cursor=pagina.siguiente_cursor)
+    assert [p.sku for p in pagina.items + resto.items] == [c[2] for c in CATALOGO]
+    assert resto.siguiente_cursor is None
+
+
+def test_cursor_invalido(repo):
+    with pytest.raises(ValueError):
+        repo.buscar("para", cursor="no-es-un-cursor")
+    # Un cursor de un listado sin búsqueda no sirve para una búsqueda
+    with pytest.raises(ValueError):
+        repo.buscar("para", cursor=busqueda.encode_cursor(None, 1))
+
+
+def test_busqueda_sigue_los_cambios_del_producto(repo):
+    producto = repo.buscar("ibuprofeno").items[0]
+    producto.nombre = "Naproxeno 250mg"
+    repo.save(producto)
+
+    assert _skus(repo, "ibuprofeno") == []
+    assert _skus(repo, "naprox") == ["IBU600-001"]
+
+
+def test_indice_invertido_quita_palabras_sin_productos():
+    indice = busqueda.IndiceInvertido()
+    indice.indexar(1, {"nombre": "Paracetamol", "sku": "PAR-1"})
+    indice.indexar(1, {"nombre": "Ibuprofeno", "sku": "IBU-1"})
+
+    assert indice.buscar(["para"]) == {}
+    assert indice.buscar(["ibu"]) == {1: 3}
+    indice.quitar(1)
+    assert not any(indice._vocabulario.values()) and not any(indice._nuevas.values())
+    assert indice.ids == []
+
+
+def test_endpoint_pagina_con_link():
+    repo = InMemoryProductoRepo(items=_productos(id_inicial=1))
+    app.dependency_overrides[get_uow] = lambda: InMemoryUnitOfWork(repo)
+    app.dependency_overrides[get_cache] = lambda: None
+    try:
+        client = TestClient(app)
+        response = client.get("/inventario/productos", params={"q": "pharma", "limit": 2})
+        assert [p["sku"] for p in response.json()] == ["SUE-001", "PAR500-001"]
+
+        siguiente = client.get(response.links["next"]["url"])
+        assert [p["sku"] for p in siguiente.json()] == ["IBU600-001"]
+        assert "X-Next-Cursor" not in siguiente.headers
+
+        assert client.get("/inventario/productos", params={"q": "pharma", "cursor": "x"}).status_code == 400
+    finally:
+        app.dependency_overrides.clear()
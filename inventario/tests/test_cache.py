@@ -0,0 +1,277 @@
+import threading
+from collections import defaultdict
+
+from fastapi.testclient import TestClient
+
+from app.api.routes import get_cache, get_uow
+from app.application.commands import AjustarStockCommand, AjustarStockLoteCommand, CrearProductoCommand
+from app.application.handlers import (
+    handle_ajustar_stock,
+    handle_ajustar_stock_lote,
+    handle_crear_producto,
+    handle_listar_productos,
+    handle_obtener_producto,
+)
+from app.application.queries import ListarProductosQuery, ObtenerProductoQuery
+from app.domain.models import BodegaDetalle, ProductoInventario
+from app.infrastructure.cache import CacheProductos
+from app.infrastructure.memory_repo import InMemoryProductoRepo, InMemoryUnitOfWork
+from app.main import app
+
+
+def _productos(n=6):
+    return [
+        ProductoInventario(
+            id=i,
+            nombre=f"Producto {i}",
+            lote=f"L{i:03d}",
+            sku=f"SKU-{i:03d}",
+            stock_total=100,
+            stock_minimo=10,
+            bodegas=[BodegaDetalle(id=1, nombre="Bodega Principal", cantidad_disponible=100)],
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+class RepoContado(InMemoryProductoRepo):
+    """Repo en memoria que cuenta las lecturas que llegan a la "base"."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lecturas = 0
+
+    def get(self, producto_id, *args, **kwargs):
+        self.lecturas += 1
+        return super().get(producto_id, *args, **kwargs)
+
+    def buscar(self, *args, **kwargs):
+        self.lecturas += 1
+        return super().buscar(*args, **kwargs)
+
+
+def _listar(repo, cache, limit=2, cursor=None, usar_cache=True):
+    query = ListarProductosQuery(limit=limit, cursor=cursor, usar_cache=usar_cache)
+    return handle_listar_productos(InMemoryUnitOfWork(repo), query, cache)
+
+
+def _obtener(repo, cache, producto_id, usar_cache=True):
+    query = ObtenerProductoQuery(producto_id=producto_id, usar_cache=usar_cache)
+    return handle_obtener_producto(InMemoryUnitOfWork(repo), query, cache)
+
+
+def test_lecturas_repetidas_no_llegan_a_la_base():
+    repo, cache = RepoContado(items=_productos()), CacheProductos()
+
+    for _ in range(10):
+        assert [p.id for p in _listar(repo, cache).items] == [1, 2]
+        assert _obtener(repo, cache, 3).id == 3
+
+    assert repo.lecturas == 2
+    stats = cache.estadisticas()
+    assert (stats["local"], stats["fallo"], stats["hitRatio"]) == (18, 2, 0.9)
+
+
+def test_ajuste_invalida_el_producto_y_solo_las_paginas_que_lo_contienen():
+    repo, cache = RepoContado(items=_productos()), CacheProductos()
+    primera = _listar(repo, cache)
+    _listar(repo, cache, cursor=primera.siguiente_cursor)
+    _obtener(repo, cache, 1)
+    _obtener(repo, cache, 4)
+    assert repo.lecturas == 4
+
+    handle_ajustar_stock(InMemoryUnitOfWork(repo), AjustarStockCommand(1, 1, -5), cache)
+
+    assert _obtener(repo, cache, 1).stock_total == 95
+    assert [p.stock_total for p in _listar(repo, cache).items] == [95, 100]
+    assert repo.lecturas == 6
+    # La segunda página y el producto 4 no tienen el producto 1: siguen en la caché
+    _listar(repo, cache, cursor=primera.siguiente_cursor)
+    _obtener(repo, cache, 4)
+    assert repo.lecturas == 6
+
+
+def test_lote_invalida_los_productos_aplicados():
+    repo, cache = RepoContado(items=_productos()), CacheProductos()
+    for producto_id in (1, 2, 3):
+        _obtener(repo, cache, producto_id)
+
+    handle_ajustar_stock_lote(
+        InMemoryUnitOfWork(repo),
+        AjustarStockLoteCommand([AjustarStockCommand(1, 1, -1), AjustarStockCommand(2, 1, -1000)]),
+        cache,
+    )
+
+    lecturas = repo.lecturas
+    for producto_id in (1, 2, 3):
+        _obtener(repo, cache, producto_id)
+    # Solo se invalidó el producto 1: el ajuste del 2 se rechazó
+    assert repo.lecturas == lecturas + 1
+
+
+def test_crear_producto_invalida_las_paginas():
+    repo, cache = RepoContado(items=_productos(2)), CacheProductos()
+    assert len(_listar(repo, cache, limit=10).items) == 2
+    _obtener(repo, cache, 1)
+
+    handle_crear_producto(
+        InMemoryUnitOfWork(repo),
+        CrearProductoCommand("Nuevo", "L999", "SKU-999", 1, "Proveedor", "Categoria", 1.0, []),
+        cache,
+    )
+
+    assert len(_listar(repo, cache, limit=10).items) == 3
+    lecturas = repo.lecturas
+    _obtener(repo, cache, 1)
+    assert repo.lecturas == lecturas
+
+
+def test_interruptor_y_lectura_sin_cache():
+    repo = RepoContado(items=_productos())
+    apagada = CacheProductos(activa=False)
+    for _ in range(3):
+        _obtener(repo, apagada, 1)
+    assert repo.lecturas == 3 and apagada.estadisticas()["entradas"] == 0
+
+    cache = CacheProductos()
+    _obtener(repo, cache, 1)
+    _obtener(repo, cache, 1, usar_cache=False)
+    _obtener(repo, cache, 1)
+    assert repo.lecturas == 5
+    assert cache.estadisticas()["omitido"] == 1
+
+
+def test_lru_y_ttl():
+    repo = RepoContado(items=_productos())
+    cache = CacheProductos(max_entradas=2)
+    for producto_id in (1, 2, 1, 3):
+        _obtener(repo, cache, producto_id)
+    # El 2 fue el menos usado
+    _obtener(repo, cache, 1)
+    _obtener(repo, cache, 2)
+    assert repo.lecturas == 4
+
+    vencida = CacheProductos(ttl=0)
+    _obtener(repo, vencida, 1)
+    _obtener(repo, vencida, 1)
+    assert repo.lecturas == 6
+
+
+def test_lectura_concurrente_con_invalidacion_no_guarda_valor_viejo():
+    repo, cache = InMemoryProductoRepo(items=_productos()), CacheProductos()
+    leyendo, ajustado = threading.Event(), threading.Event()
+
+    def cargar_lento():
+        viejo = repo.get(1).stock_total
+        leyendo.set()
+        ajustado.wait()
+        return ProductoInventario(**{**repo.get(1).__dict__, "stock_total": viejo})
+
+    lector = threading.Thread(target=cache.producto, args=(1, cargar_lento))
+    lector.start()
+    leyendo.wait()
+    handle_ajustar_stock(InMemoryUnitOfWork(repo), AjustarStockCommand(1, 1, -5), cache)
+    ajustado.set()
+    lector.join()
+
+    assert cache.producto(1, lambda: repo.get(1)).stock_total == 95
+
+
+class RedisFalso:
+    """Lo justo de redis.Redis para dos réplicas que comparten datos y canal."""
+
+    def __init__(self, compartido=None):
+        self.datos = compartido["datos"] if compartido else {}
+        self.suscriptores = compartido["suscriptores"] if compartido else defaultdict(list)
+
+    def compartido(self):
+        return {"datos": self.datos, "suscriptores": self.suscriptores}
+
+    def get(self, clave):
+        return self.datos.get(clave)
+
+    def set(self, clave, valor, ex=None):
+        self.datos[clave] = valor
+
+    def sadd(self, clave, *valores):
+        self.datos.setdefault(clave, set()).update(valores)
+
+    def smembers(self, clave):
+        return set(self.datos.get(clave, set()))
+
+    def expire(self, clave, segundos):
+        pass
+
+    def delete(self, *claves):
+        for clave in claves:
+            self.datos.pop(clave, None)
+
+    def publish(self, canal, mensaje):
+        for funcion in list(self.suscriptores[canal]):
+            funcion({"data": mensaje})
+
+    def pipeline(self):
+        redis, resultados = self, []
+
+        class Pipeline:
+            def __getattr__(self, nombre):
+                return lambda *a, **kw: resultados.append(getattr(redis, nombre)(*a, **kw))
+
+            def execute(self):
+                return list(resultados)
+
+        return Pipeline()
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        redis = self
+
+        class PubSub:
+            def subscribe(self, **canales):
+                for canal, funcion in canales.items():
+                    redis.suscriptores[canal].append(funcion)
+
+            def run_in_thread(self, sleep_time=0, daemon=False):
+                return type("Hilo", (), {"stop": lambda self: None})()
+
+        return PubSub()
+
+
+def test_replicas_comparten_redis_e_invalidaciones():
+    repo = RepoContado(items=_productos())
+    redis_a = RedisFalso()
+    replica_a = CacheProductos(redis_client=redis_a)
+    replica_b = CacheProductos(redis_client=RedisFalso(redis_a.compartido()))
+
+    _listar(repo, replica_a)
+    _obtener(repo, replica_a, 1)
+    # La otra réplica encuentra ambos en Redis
+    assert [p.id for p in _listar(repo, replica_b).items] == [1, 2]
+    assert _obtener(repo, replica_b, 1).id == 1
+    assert repo.lecturas == 2 and replica_b.estadisticas()["redis"] == 2
+
+    # Un ajuste atendido por la réplica A invalida Redis y el LRU de la réplica B
+    handle_ajustar_stock(InMemoryUnitOfWork(repo), AjustarStockCommand(1, 1, -5), replica_a)
+    assert replica_b.estadisticas()["entradas"] == 0
+    assert _obtener(repo, replica_b, 1).stock_total == 95
+    assert [p.stock_total for p in _listar(repo, replica_b).items] == [95, 100]
+    assert repo.lecturas == 4
+
+
+def test_endpoint_no_cache_y_estadisticas():
+    repo, cache = RepoContado(items=_productos()), CacheProductos()
+    app.dependency_overrides[get_uow] = lambda: InMemoryUnitOfWork(repo)
+    app.dependency_overrides[get_cache] = lambda: cache
+    try:
+        client = TestClient(app)
+        for _ in range(3):
+            assert client.get("/inventario/productos/1").status_code == 200
+        client.get("/inventario/productos/1", headers={"Cache-Control": "no-cache"})
+        assert repo.lecturas == 2
+
+        client.post("/inventario/productos/1/ajustar", json={"bodegaId": 1, "delta": -5})
+        assert client.get("/inventario/productos/1").json()["stock_total"] == 95
+
+        stats = client.get("/inventario/cache").json()
+        assert (stats["local"], stats["omitido"], stats["invalidaciones"]) == (2, 1, 1)
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+
+from app.api.routes import get_cache, get_uow
+from app.domain.models import BodegaDetalle, ProductoInventario
+from app.infrastructure.postgres import (
+    Base,
+    BodegaORM,
+    PostgresUnitOfWork,
+    ProductoORM,
+    SqlProductoRepo,
+    actualizar_esquema,
+    clasificar_timeout,
+    create_sql_engine,
+    db_url_from_env,
+    estadisticas_pool,
+    opciones_pool_desde_env,
+)
+from app.main import app
+
+
+def test_opciones_pool_desde_env(monkeypatch):
+    monkeypatch.setenv("INVENTARIO_DB_POOL_SIZE", "40")
+    monkeypatch.setenv("INVENTARIO_DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("INVENTARIO_DB_STATEMENT_TIMEOUT_MS", "250")
+
+    opciones = opciones_pool_desde_env()
+    assert (opciones["pool_size"], opciones["max_overflow"], opciones["statement_timeout_ms"]) == (40, 0, 250)
+    assert opciones["pool_timeout"] == 5
+
+
+def test_get_uow_da_una_unidad_de_trabajo_por_peticion():
+    assert get_uow() is not get_uow()
+
+
+def test_unidad_de_trabajo_en_uso_no_se_reutiliza():
+    engine = create_sql_engine("sqlite://")
+    uow = PostgresUnitOfWork(sessionmaker(bind=engine))
+    with uow:
+        with pytest.raises(RuntimeError):
+            uow.__enter__()
+    # Terminada, se puede volver a usar con una sesión nueva
+    with uow:
+        assert uow.session is not None
+    assert uow.session is None
+
+
+def test_statement_timeout_cancela_la_consulta():
+    engine = create_sql_engine(db_url_from_env(), statement_timeout_ms=50)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError) as error:
+                conn.execute(text("SELECT pg_sleep(1)"))
+        assert clasificar_timeout(error.value) == "sentencia"
+    finally:
+        engine.dispose()
+
+
+def test_pool_agotado_y_saturacion():
+    engine = create_sql_engine(db_url_from_env(), pool_size=1, max_overflow=0, pool_timeout=0.1)
+    try:
+        with engine.connect():
+            stats = estadisticas_pool(engine)
+            assert (stats["enUso"], stats["saturacion"]) == (1, 1.0)
+            with pytest.raises(PoolTimeoutError) as error:
+                engine.connect()
+            assert clasificar_timeout(error.value) == "pool"
+        assert estadisticas_pool(engine)["enUso"] == 0
+    finally:
+        engine.dispose()
+
+
+def test_endpoint_responde_503_con_pool_agotado():
+    engine = create_sql_engine(db_url_from_env(), pool_size=1, max_overflow=0, pool_timeout=0.1)
+    SessionFactory = sessionmaker(bind=engine)
+    app.dependency_overrides[get_uow] = lambda: PostgresUnitOfWork(SessionFactory)
+    app.dependency_overrides[get_cache] = lambda: None
+    try:
+        with engine.connect():
+            r = TestClient(app).get("/inventario/productos/1")
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == "1"
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+@pytest.fixture
+def productos_postgres():
+    """Productos guardados de verdad (cada petición usa su conexión); se borran al final."""
+    engine = create_sql_engine(db_url_from_env(), pool_size=10, max_overflow=0)
+    Base.metadata.create_all(engine)
+    actualizar_esquema(engine)
+    SessionFactory = sessionmaker(bind=engine, expire_on_commit=False)
+    with SessionFactory.begin() as session:
+        session.merge(BodegaORM(id=9001, nombre="Bodega Principal"))
+        repo = SqlProductoRepo(session)
+        productos = [
+            ProductoInventario(
+                id=None,
+                nombre=f"Producto carga {i}",
+                lote=f"LC{i:03d}",
+                sku=f"CARGA-{i:03d}",
+                stock_total=1000 + i,
+                stock_minimo=1,
+                bodegas=[BodegaDetalle(id=9001, nombre="Bodega Principal", cantidad_disponible=1000 + i)],
+            )
+            for i in range(20)
+        ]
+        for p in productos:
+            repo.save(p)
+
+    yield SessionFactory, productos
+
+    with SessionFactory.begin() as session:
+        session.execute(delete(ProductoORM).where(ProductoORM.id.in_([p.id for p in productos])))
+        session.execute(delete(BodegaORM).where(BodegaORM.id == 9001))
+    engine.dispose()
+
+
+def test_peticiones_concurrentes_no_comparten_sesion(productos_postgres):
+    SessionFactory, productos = productos_postgres
+    app.dependency_overrides[get_uow] = lambda: PostgresUnitOfWork(SessionFactory)
+    app.dependency_overrides[get_cache] = lambda: None
+    client = TestClient(app)
+    barrera = threading.Barrier(20)
+
+    def pedir(producto):
+        barrera.wait()
+        vistos = []
+        for _ in range(5):
+            data = client.get(f"/inventario/productos/{producto.id}").json()
+            vistos.append((data["id"], data["sku"], data["stock_total"]))
+        return producto, vistos
+
+    try:
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            resultados = list(executor.map(pedir, productos))
+    finally:
+        app.dependency_overrides.clear()
+
+    for producto, vistos in resultados:
+        assert set(vistos) == {(producto.id, producto.sku, producto.stock_total)}
@@ -1,10 +1,14 @@
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from app.services.crud import init_db
+from app.services import importaciones
+from app.services.proveedores_client import proveedores_client, PROMETHEUS_AVAILABLE
 from app.routes import routes
+from app.utils import pagination
+from app.utils.jwks import jwks_client
 from app.routes.routes import router
 
 app = FastAPI( title="API de Productos",
@@ -19,6 +23,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=pagination.EXPOSE_HEADERS,
 )
 
 
@@ -30,9 +35,19 @@ async def on_startup():
         print("📊 Inicializando base de datos...")
         init_db()
         print("✅ Base de datos inicializada correctamente")
+        # Reanudar importaciones interrumpidas por un reinicio
+        importaciones.iniciar()
     except Exception as e:
         print(f"❌ Error al inicializar BD: {str(e)}")
         raise e
+    # Claves públicas del servicio de seguridad para verificar RS256 (solo con JWKS_URL)
+    jwks_client.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    importaciones.detener()
+    await proveedores_client.close()
+    jwks_client.stop()
 
 # Handler global para 422
 @app.exception_handler(RequestValidationError)
@@ -50,3 +65,11 @@ app.include_router(routes.router)
 @app.get("/")
 def read_root():
     return {"Hello": "Products Service"}
+
+@app.get("/metrics")
+def metrics():
+    """Endpoint de métricas Prometheus"""
+    if not PROMETHEUS_AVAILABLE:
+        return {"error": "Prometheus no disponible"}
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
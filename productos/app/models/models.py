@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Float, Integer, String, Date, func
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, Float, Index, Integer, String, Date, func
 from app.models.database import Base
 
 
@@ -19,4 +21,42 @@ class Producto(Base):
     temperaturaMin = Column(Float, nullable=True)
     temperaturaMax = Column(Float, nullable=True)
     fechaCreacion = Column(Date, nullable=False, server_default=func.now())
-    #fechaCreacion = Column(Date, nullable=False, default=func.now())
\ No newline at end of file
+    #fechaCreacion = Column(Date, nullable=False, default=func.now())
+
+    # Filtros y ordenamientos de GET /productos/: cada índice termina en id para la paginación por
+    # keyset. Los índices de texto (FTS, trigramas) dependen del motor y están en services/busqueda.py
+    __table_args__ = (
+        Index("ix_productos_proveedor_id", "proveedor", "id"),
+        Index("ix_productos_pais_id", "paisOrigen", "id"),
+        Index("ix_productos_tipo_id", "tipoAlmacenamiento", "id"),
+        Index("ix_productos_temperatura", "temperaturaMin", "temperaturaMax"),
+        Index("ix_productos_nombre_id", "nombre", "id"),
+        Index("ix_productos_precio_id", "precioUnidad", "id"),
+        Index("ix_productos_fecha_id", "fechaCreacion", "id"),
+    )
+
+
+class ImportJob(Base):
+    """Importación asíncrona de productos; ultimaFila es el checkpoint para reanudarla."""
+    __tablename__ = 'import_jobs'
+
+    id = Column(String(36), primary_key=True)
+    archivo = Column(String(255), nullable=False)
+    ruta = Column(String(500), nullable=False)
+    estado = Column(String(20), nullable=False, index=True)
+    procesados = Column(Integer, nullable=False, default=0)
+    creados = Column(Integer, nullable=False, default=0)
+    duplicados = Column(Integer, nullable=False, default=0)
+    rechazados = Column(Integer, nullable=False, default=0)
+    ultimaFila = Column(Integer, nullable=False, default=0)
+    duracionSegundos = Column(Float, nullable=False, default=0.0)
+    errores = Column(JSON, nullable=False, default=list)
+    mensaje = Column(String(1000), nullable=True)
+    propietario = Column(String(255), nullable=True)
+    fechaCreacion = Column(DateTime, nullable=False, default=datetime.utcnow)
+    actualizado = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finalizado = Column(DateTime, nullable=True)
+
+    @property
+    def filasPorSegundo(self):
+        return round(self.procesados / self.duracionSegundos, 1) if self.duracionSegundos else None
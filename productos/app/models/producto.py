@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime, date
 
 
@@ -42,6 +42,38 @@ class ProductoOut(ProductoBase):
         orm_mode = True
 
 
+class ProductoFiltro(BaseModel):
+    """Parámetros de búsqueda de GET /productos/ (ver services/busqueda.py)."""
+    q: Optional[str] = None
+    nombre: Optional[str] = None
+    proveedor: Optional[str] = None
+    paisOrigen: Optional[str] = None
+    tipoAlmacenamiento: Optional[str] = None
+    temperaturaMin: Optional[float] = None
+    temperaturaMax: Optional[float] = None
+    orden: str = "id"
+
+
+class ImportJobOut(BaseModel):
+    id: str
+    archivo: str
+    estado: str
+    procesados: int
+    creados: int
+    duplicados: int
+    rechazados: int
+    ultimaFila: int
+    filasPorSegundo: Optional[float] = None
+    errores: List[Dict[str, Any]] = []
+    mensaje: Optional[str] = None
+    fechaCreacion: datetime
+    actualizado: datetime
+    finalizado: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Token schemas
 class Token(BaseModel):
     access_token: str
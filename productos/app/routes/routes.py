@@ -1,14 +1,16 @@
-from fastapi import UploadFile, File,APIRouter, Depends, HTTPException
+from fastapi import UploadFile, File,APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from ..services import crud
-from ..models.producto import ProductoBase, ProductoCreate, ProductoUpdate, ProductoOut
+from ..models.producto import ProductoBase, ProductoCreate, ProductoUpdate, ProductoOut, ProductoFiltro, ImportJobOut
 from ..models.database import get_db
 from ..utils.auth import get_current_user
+from ..utils import pagination
 
-from ..services import crud
+from ..services import busqueda, crud, importaciones, ingesta
 from ..models.producto import ProductoCreate
 
 router = APIRouter()
@@ -18,8 +20,8 @@ def get_paises( ):
     return  crud.get_paises()
 
 @router.get("/proveedores")
-def get_proveedores( ):
-    return  crud.get_proveedores()
+async def get_proveedores( ):
+    return  await crud.get_proveedores()
 
 
 @router.get("/uom")
@@ -35,10 +37,31 @@ def get_uom( ):
 async def upload_productos_excel( file: UploadFile = File(...),  db: Session = Depends(get_db)):
     return await crud.get_productos_creados(file, db)
 
+@router.post("/import_jobs", response_model=ImportJobOut, status_code=202)
+async def create_import_job(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    if not file.filename.lower().endswith(ingesta.EXTENSIONES):
+        raise HTTPException(status_code=400, detail="El archivo debe ser un Excel (.xlsx o .xls) o un CSV (.csv)")
+    job = await run_in_threadpool(importaciones.crear_job, db, file.file, file.filename)
+    importaciones.encolar(job.id)
+    return job
+
+@router.get("/import_jobs/{job_id}", response_model=ImportJobOut)
+def get_import_job(job_id: str, db: Session = Depends(get_db)):
+    job = importaciones.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return job
+
 @router.get("/", response_model=List[ProductoOut])
 #def list_productos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), _user: dict = Depends(get_current_user)):
-def list_productos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_productos(db, skip=skip, limit=limit)
+def list_productos(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                   cursor: Optional[str] = None, count: bool = False, filtros: ProductoFiltro = Depends(),
+                   db: Session = Depends(get_db)):
+    productos = crud.get_productos(db, skip=skip, limit=limit, cursor=cursor, filtros=filtros)
+    pagination.agregar_encabezados(request, response, productos, limit,
+                                   crud.contar_productos(db, filtros) if count else None,
+                                   orden=busqueda.campo_orden(filtros.orden))
+    return productos
 
 @router.post("/", response_model=ProductoOut, status_code=201)
 #def create_producto(producto: ProductoCreate, db: Session = Depends(get_db), _user: dict = Depends(get_current_user)):
@@ -0,0 +1,214 @@
+"""
+/**
+ * @file busqueda.py
+ * @brief Filtros, búsqueda de texto y ordenamiento del catálogo de productos en el servidor.
+ *
+ * - proveedor, paisOrigen, tipoAlmacenamiento: igualdad exacta (índices compuestos con id).
+ * - temperaturaMin / temperaturaMax: productos cuyo rango de almacenamiento cae dentro del rango pedido.
+ * - nombre: contiene el texto, sin distinguir mayúsculas (índice de trigramas en PostgreSQL si
+ *   la extensión pg_trgm está disponible).
+ * - q: cada término debe ser prefijo de una palabra de nombre, lote o numeroSerial.
+ *   PostgreSQL usa to_tsvector('simple', ...) con un índice GIN; SQLite, una tabla FTS5
+ *   sincronizada por triggers. Si SQLite no tiene FTS5 se recurre a LIKE.
+ * - orden: id, nombre, precioUnidad o fechaCreacion; con prefijo "-" es descendente.
+ *
+ * <p><b>Autor:</b> Equipo de Desarrollo Grupo 1</p>
+ * <p><b>Versión:</b> 1.0</p>
+ */
+"""
+import logging
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import event, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Query
+
+from app.models import models
+from app.models.producto import ProductoFiltro
+
+logger = logging.getLogger(__name__)
+
+Producto = models.Producto
+
+ORDENES = {
+    "id": None,
+    "nombre": Producto.nombre,
+    "precioUnidad": Producto.precioUnidad,
+    "fechaCreacion": Producto.fechaCreacion,
+}
+
+# Debe coincidir literalmente con la expresión del índice GIN para que PostgreSQL lo use.
+# translate() quita tildes como el tokenizador de FTS5 (unaccent no es IMMUTABLE y no sirve en índices)
+_CON_TILDE, _SIN_TILDE = "áàâäéèêëíìîïóòôöúùûüñçÁÀÂÄÉÈÊËÍÌÎÏÓÒÔÖÚÙÛÜÑÇ", "aaaaeeeeiiiioooouuuuncAAAAEEEEIIIIOOOOUUUUNC"
+VECTOR_POSTGRES = (f"to_tsvector('simple', translate(nombre || ' ' || lote || ' ' || \"numeroSerial\", "
+                   f"'{_CON_TILDE}', '{_SIN_TILDE}'))")
+
+_DDL_SQLITE = [
+    "CREATE VIRTUAL TABLE productos_fts USING fts5("
+    "nombre, lote, numeroSerial, content='productos', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER productos_fts_ai AFTER INSERT ON productos BEGIN "
+    "INSERT INTO productos_fts(rowid, nombre, lote, numeroSerial) "
+    "VALUES (new.id, new.nombre, new.lote, new.numeroSerial); END",
+    "CREATE TRIGGER productos_fts_ad AFTER DELETE ON productos BEGIN "
+    "INSERT INTO productos_fts(productos_fts, rowid, nombre, lote, numeroSerial) "
+    "VALUES ('delete', old.id, old.nombre, old.lote, old.numeroSerial); END",
+    "CREATE TRIGGER productos_fts_au AFTER UPDATE OF nombre, lote, numeroSerial ON productos BEGIN "
+    "INSERT INTO productos_fts(productos_fts, rowid, nombre, lote, numeroSerial) "
+    "VALUES ('delete', old.id, old.nombre, old.lote, old.numeroSerial); "
+    "INSERT INTO productos_fts(rowid, nombre, lote, numeroSerial) "
+    "VALUES (new.id, new.nombre, new.lote, new.numeroSerial); END",
+]
+
+_TERMINO = re.compile(r"[\w.-]+")
+
+
+def orden(valor: str) -> Tuple[Optional[object], bool]:
+    """
+    /**
+     * @brief Traduce el parámetro `orden` a (columna, descendente).
+     * @throws HTTPException 400 si la columna no admite ordenamiento.
+     */
+    """
+    descendente = valor.startswith("-")
+    nombre = valor.lstrip("-")
+    if nombre not in ORDENES:
+        raise HTTPException(status_code=400,
+                            detail=f"Orden no soportado: {valor}. Opciones: {', '.join(ORDENES)}")
+    return ORDENES[nombre], descendente
+
+
+def campo_orden(valor: str) -> Optional[str]:
+    columna, _ = orden(valor)
+    return columna.key if columna is not None else None
+
+
+def terminos(q: str) -> List[str]:
+    """Palabras de la búsqueda sin tildes ni caracteres de sintaxis; descarta las que quedan vacías."""
+    sin_tildes = "".join(c for c in unicodedata.normalize("NFKD", q.lower()) if not unicodedata.combining(c))
+    limpios = (t.strip(".-_") for t in _TERMINO.findall(sin_tildes))
+    return [t for t in limpios if t]
+
+
+def _escapar_like(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _tiene_fts_sqlite(query: Query) -> bool:
+    return query.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'")
+    ).first() is not None
+
+
+def _buscar(query: Query, palabras: List[str]) -> Query:
+    dialecto = query.session.get_bind().dialect.name
+    if dialecto == "postgresql":
+        consulta = " & ".join(f"{p}:*" for p in palabras)
+        # OFFSET 0 impide aplanar la subconsulta: sin estadísticas para prefijos el planificador
+        # prefiere recorrer la llave primaria evaluando to_tsvector fila por fila
+        coincidencias = select(Producto.id).where(
+            text(f"{VECTOR_POSTGRES} @@ to_tsquery('simple', :consulta)").bindparams(consulta=consulta)
+        ).offset(0)
+        return query.filter(Producto.id.in_(coincidencias))
+
+    if dialecto == "sqlite" and _tiene_fts_sqlite(query):
+        consulta = " ".join('"{}"*'.format(p.replace('"', '""')) for p in palabras)
+        coincidencias = select(text("rowid")).select_from(text("productos_fts")) \
+            .where(text("productos_fts MATCH :consulta").bindparams(consulta=consulta))
+        return query.filter(Producto.id.in_(coincidencias))
+
+    for p in palabras:
+        prefijo = _escapar_like(p)
+        query = query.filter(or_(
+            Producto.nombre.ilike(f"{prefijo}%", escape="\\"),
+            Producto.nombre.ilike(f"% {prefijo}%", escape="\\"),
+            Producto.lote.ilike(f"{prefijo}%", escape="\\"),
+            Producto.numeroSerial.ilike(f"{prefijo}%", escape="\\"),
+        ))
+    return query
+
+
+def filtrar(query: Query, filtros: ProductoFiltro) -> Query:
+    """
+    /**
+     * @brief Aplica a la consulta los filtros y la búsqueda de texto pedidos.
+     * @param query Consulta sobre Producto.
+     * @param filtros Parámetros recibidos en GET /productos/.
+     * @return Consulta filtrada, sin ordenar.
+     */
+    """
+    for campo in ("proveedor", "paisOrigen", "tipoAlmacenamiento"):
+        valor = getattr(filtros, campo)
+        if valor:
+            query = query.filter(getattr(Producto, campo) == valor)
+
+    if filtros.temperaturaMin is not None:
+        query = query.filter(Producto.temperaturaMin >= filtros.temperaturaMin)
+    if filtros.temperaturaMax is not None:
+        query = query.filter(Producto.temperaturaMax <= filtros.temperaturaMax)
+
+    if filtros.nombre and filtros.nombre.strip():
+        query = query.filter(Producto.nombre.ilike(f"%{_escapar_like(filtros.nombre.strip())}%", escape="\\"))
+
+    if filtros.q:
+        palabras = terminos(filtros.q)
+        if palabras:
+            query = _buscar(query, palabras)
+    return query
+
+
+def _indices_postgres(conn) -> None:
+    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_productos_busqueda ON productos USING GIN ({VECTOR_POSTGRES})")
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_productos_nombre_trgm ON productos USING GIN (nombre gin_trgm_ops)"
+            )
+    except DBAPIError as e:
+        logger.warning(f"⚠️ pg_trgm no disponible; el filtro por nombre no tendrá índice: {e.orig}")
+
+
+def _indices_sqlite(conn) -> None:
+    if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'productos_fts'").first():
+        return
+    try:
+        with conn.begin_nested():
+            for sentencia in _DDL_SQLITE:
+                conn.exec_driver_sql(sentencia)
+            conn.exec_driver_sql("INSERT INTO productos_fts(productos_fts) VALUES ('rebuild')")
+    except DBAPIError as e:
+        logger.warning(f"⚠️ FTS5 no disponible; la búsqueda usará LIKE: {e.orig}")
+
+
+def crear_indices(bind) -> None:
+    """
+    /**
+     * @brief Crea los índices de búsqueda que falten; se puede ejecutar en cada arranque.
+     * @param bind Engine o Connection.
+     */
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return crear_indices(conn)
+
+    for indice in Producto.__table__.indexes:
+        indice.create(bind=bind, checkfirst=True)
+    if bind.dialect.name == "postgresql":
+        _indices_postgres(bind)
+    elif bind.dialect.name == "sqlite":
+        _indices_sqlite(bind)
+
+
+@event.listens_for(Producto.__table__, "after_create")
+def _al_crear_tabla(tabla, conn, **kw):
+    crear_indices(conn)
+
+
+@event.listens_for(Producto.__table__, "after_drop")
+def _al_borrar_tabla(tabla, conn, **kw):
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("DROP TABLE IF EXISTS productos_fts")
@@ -12,15 +12,12 @@
  * - SQLAlchemy ORM
  * - Passlib (bcrypt)
  * - JOSE (JWT)
- * - Pandas
  *
  * <p><b>Autor:</b> Equipo de Desarrollo Grupo 1</p>
  * <p><b>Versión:</b> 1.0</p>
  * <p><b>Fecha:</b> 2025-10-15</p>
  */
 """
-import os
-import requests
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
@@ -29,14 +26,17 @@ from pydantic import ValidationError
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.models import models, producto
+from app.services import busqueda, ingesta
+from app.services.proveedores_client import proveedores_client
+from app.utils import pagination
 from app.models.database import Base, engine, get_db
 from config.config import DATABASE_URL, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
-import pandas as pd 
 
 # Configuración de encriptación
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -50,6 +50,7 @@ def init_db():
         print("🔧 Creando tablas en la base de datos...")
         print(f"📊 URL de BD: {DATABASE_URL}")
         Base.metadata.create_all(bind=engine)
+        busqueda.crear_indices(engine)
         print("✅ Tablas creadas correctamente")
         
         # Verificar que las tablas existen
@@ -110,16 +111,30 @@ def get_producto_by_serial(db: Session, numeroSerial: str) -> Optional[models.Pr
     return db.query(models.Producto).filter(models.Producto.numeroSerial == numeroSerial).first()
 
 
-def get_productos(db: Session, skip: int = 0, limit: int = 100) -> List[models.Producto]:
+def get_productos(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                  filtros: Optional[producto.ProductoFiltro] = None) -> List[models.Producto]:
     """
     /**
-     * @brief Obtiene un producto por su ID.
+     * @brief Obtiene una página de productos, filtrada y ordenada en la base de datos.
      * @param db Sesión de base de datos.
-     * @param producto_id Identificador del producto.
-     * @return Producto encontrado o None si no existe.
+     * @param skip y limit para paginación; cursor (X-Next-Cursor) para paginación por keyset.
+     * @param filtros Filtros, búsqueda y orden (ver busqueda.py); None lista todo por id.
+     * @return Productos de la página.
      */
     """
-    return db.query(models.Producto).offset(skip).limit(limit).all()
+    query = db.query(models.Producto)
+    columna, descendente = None, False
+    if filtros is not None:
+        query = busqueda.filtrar(query, filtros)
+        columna, descendente = busqueda.orden(filtros.orden)
+    return pagination.paginar(query, models.Producto.id, skip, limit, cursor, columna, descendente).all()
+
+
+def contar_productos(db: Session, filtros: Optional[producto.ProductoFiltro] = None) -> Tuple[int, bool]:
+    query = db.query(models.Producto)
+    if filtros is not None:
+        query = busqueda.filtrar(query, filtros)
+    return pagination.contar(query)
 
 
 from typing import List
@@ -171,32 +186,18 @@ def get_uom() -> List[str]:
     # Ordena la lista alfabéticamente ignorando mayúsculas y tildes
     return sorted(uoms, key=lambda p: p.lower())
 
-def get_proveedores():
+async def get_proveedores() -> List[str]:
     """
-    Obtiene la lista de proveedores desde un servicio externo configurado por variable de entorno.
-    Retorna los nombres ordenados alfabéticamente.
+    /**
+     * @brief Obtiene los nombres de proveedores desde el servicio de proveedores.
+     *
+     * Usa el cliente compartido de app.services.proveedores_client (caché con
+     * stale-while-revalidate, paginación completa y circuit breaker).
+     *
+     * @return List[str] Nombres ordenados alfabéticamente.
+     */
     """
-    base_url = os.getenv("PROVEEDOR_API_BASE_URL", "http://136.112.245.46:8003/")
-    url = f"{base_url.rstrip('/')}/proveedores/?skip=0&limit=100"
-
-    print(f"url de proveedores: {url}")
-
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        # Crear la lista con los nombres de los proveedores
-        proveedores = [p["nombre"] for p in data if "nombre" in p]
-
-        # Ordenar alfabéticamente (ignorando mayúsculas/minúsculas)
-        proveedores = sorted(proveedores, key=lambda x: x.lower())
-
-        return proveedores
-
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Error al obtener proveedores desde {url}: {e}")
-        return []
+    return await proveedores_client.get_nombres()
 
 
 
@@ -215,68 +216,33 @@ def get_tipo_almacenamiento() -> List[str]:
 async def get_productos_creados(file: UploadFile = File(...),  db: Session = Depends(get_db)):
     """
     /**
-     * @brief Carga masiva de productos desde un archivo Excel.
-     * @param file Archivo Excel (.xlsx o .xls) con los datos de productos.
+     * @brief Carga masiva de productos desde un archivo Excel o CSV.
+     *
+     * El archivo se procesa por bloques con app.services.ingesta: los numeroSerial ya
+     * existentes o repetidos se omiten y las filas inválidas se reportan sin abortar la carga.
+     *
+     * @param file Archivo Excel (.xlsx o .xls) o CSV (.csv) con los datos de productos.
      * @param db Sesión de base de datos.
-     * @return dict Mensaje con la cantidad de productos creados.
+     * @return dict Resumen de la carga: creados, duplicados, rechazados, errores por fila y filas por segundo.
      * @throws HTTPException Si el archivo no es válido o ocurre un error de procesamiento.
      */
     """
 
     # Validar extensión
-    if not file.filename.endswith((".xlsx", ".xls")):
-        raise HTTPException(status_code=400, detail="El archivo debe ser un Excel (.xlsx o .xls)")
+    if not file.filename.lower().endswith(ingesta.EXTENSIONES):
+        raise HTTPException(status_code=400, detail="El archivo debe ser un Excel (.xlsx o .xls) o un CSV (.csv)")
 
     try:
-        # Leer el archivo Excel con pandas
-        contents = await file.read()
-        df = pd.read_excel(contents)
-
-        # Validar columnas obligatorias
-        columnas_requeridas = [
-            "nombre", "lote", "numeroSerial", "proveedor",
-            "precioUnidad", "precioTotal", "paisOrigen",
-            "uom", "cantidad", "tipoAlmacenamiento",
-            "temperaturaMin", "temperaturaMax"
-        ]
-
-        for col in columnas_requeridas:
-            if col not in df.columns:
-                raise HTTPException(status_code=400, detail=f"Columna faltante en el Excel: {col}")
-
-        productos_creados = []
-        for _, row in df.iterrows():
-            # Evitar duplicados por numeroSerial
-            if get_producto_by_serial(db, str(row["numeroSerial"])):
-                continue  # puedes cambiar por raise si prefieres abortar
-
-            producto_data = models.Producto(
-                nombre=row["nombre"],
-                lote=row["lote"],
-                numeroSerial=str(row["numeroSerial"]),
-                proveedor=row["proveedor"],
-                precioUnidad=float(row["precioUnidad"]),
-                precioTotal=float(row["precioTotal"]),
-                paisOrigen=row["paisOrigen"],
-                uom=row["uom"],
-                cantidad=int(row["cantidad"]),
-                tipoAlmacenamiento=row["tipoAlmacenamiento"],
-                temperaturaMin=float(row["temperaturaMin"]) if not pd.isna(row["temperaturaMin"]) else None,
-                temperaturaMax=float(row["temperaturaMax"]) if not pd.isna(row["temperaturaMax"]) else None
-            )
-
-            nuevo_producto = create_producto(db, producto_data)
-            productos_creados.append(nuevo_producto)
-
-        return {"mensaje": f"{len(productos_creados)} productos cargados exitosamente."}
+        # La lectura y las inserciones son bloqueantes: se ejecutan fuera del event loop
+        return await run_in_threadpool(ingesta.importar_productos, file.file, file.filename, db)
 
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error procesando el archivo: {str(e)}")
 
 
-
-
-
 def create_producto(db: Session, producto) -> models.Producto:
     """
     /**
@@ -0,0 +1,312 @@
+"""
+/**
+ * @file importaciones.py
+ * @brief Importaciones asíncronas de productos con progreso consultable y reanudación.
+ *
+ * El archivo se guarda en IMPORT_JOBS_DIR y se registra un ImportJob; la respuesta vuelve de
+ * inmediato con el id del job. Un pool de IMPORT_DB_WRITERS hilos ejecuta los jobs: cada hilo
+ * lee los bloques del archivo, delega la validación (CPU) a un pool de IMPORT_PARSE_WORKERS
+ * procesos e inserta los bloques en orden. Cada bloque se confirma en la misma transacción que
+ * actualiza el progreso y el checkpoint (ultimaFila) del job, de modo que un job interrumpido
+ * se reanuda desde el último bloque confirmado sin duplicar conteos.
+ *
+ * Un job en estado pendiente o en_proceso cuyo propietario no lo actualiza en
+ * IMPORT_JOB_LEASE_SECONDS se considera abandonado y cualquier pod puede reclamarlo. El
+ * propietario renueva el lease con un latido independiente de los bloques, y cada escritura del
+ * job (progreso y estado final) se condiciona a seguir siendo el propietario: si otro pod lo
+ * reclamó, el bloque en curso se deshace y este pod abandona el job.
+ *
+ * <p><b>Autor:</b> Equipo de Desarrollo Grupo 1</p>
+ * <p><b>Versión:</b> 1.0</p>
+ */
+"""
+import multiprocessing
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional, Set
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.models.database import SessionLocal
+from app.services import ingesta
+from config.config import (
+    IMPORT_DB_WRITERS, IMPORT_JOB_LEASE_SECONDS, IMPORT_JOBS_DIR, IMPORT_PARSE_WORKERS, UPLOAD_CHUNK_SIZE
+)
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+ACTIVOS = (PENDIENTE, EN_PROCESO)
+
+PROPIETARIO = f"{socket.gethostname()}:{os.getpid()}"
+
+_escritores: Optional[ThreadPoolExecutor] = None
+_parseadores: Optional[ProcessPoolExecutor] = None
+_en_ejecucion: Set[str] = set()
+_lock = threading.Lock()
+_detener = threading.Event()
+
+
+def _ejecutores():
+    global _escritores, _parseadores
+    with _lock:
+        if _escritores is None:
+            _escritores = ThreadPoolExecutor(max_workers=IMPORT_DB_WRITERS, thread_name_prefix="import-writer")
+        if _parseadores is None and IMPORT_PARSE_WORKERS > 0:
+            # spawn: el proceso padre tiene hilos (uvicorn, escritores) y fork no es seguro con ellos
+            _parseadores = ProcessPoolExecutor(max_workers=IMPORT_PARSE_WORKERS,
+                                               mp_context=multiprocessing.get_context("spawn"))
+    return _escritores, _parseadores
+
+
+def crear_job(db: Session, fuente: BinaryIO, filename: str) -> models.ImportJob:
+    """
+    /**
+     * @brief Guarda el archivo en disco y registra un job pendiente.
+     * @param db Sesión de base de datos.
+     * @param fuente Archivo binario recibido.
+     * @param filename Nombre original del archivo.
+     * @return ImportJob creado.
+     */
+    """
+    job_id = str(uuid.uuid4())
+    os.makedirs(IMPORT_JOBS_DIR, exist_ok=True)
+    ruta = os.path.join(IMPORT_JOBS_DIR, job_id + os.path.splitext(filename)[1].lower())
+    with open(ruta, "wb") as destino:
+        shutil.copyfileobj(fuente, destino, length=1024 * 1024)
+
+    job = models.ImportJob(id=job_id, archivo=filename, ruta=ruta, estado=PENDIENTE, errores=[])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: str) -> Optional[models.ImportJob]:
+    return db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+
+
+def encolar(job_id: str) -> None:
+    """
+    /**
+     * @brief Programa la ejecución de un job en el pool de escritores.
+     */
+    """
+    escritores, _ = _ejecutores()
+    escritores.submit(ejecutar_job, job_id)
+
+
+def _reclamar(db: Session, job_id: str) -> bool:
+    """
+    /**
+     * @brief Toma el job de forma atómica si está libre, abandonado o es de este proceso.
+     * @return True si este proceso quedó como propietario.
+     */
+    """
+    ahora = datetime.utcnow()
+    Job = models.ImportJob
+    resultado = db.execute(
+        update(Job)
+        .where(
+            Job.id == job_id,
+            Job.estado.in_(ACTIVOS),
+            or_(
+                Job.propietario.is_(None),
+                Job.propietario == PROPIETARIO,
+                Job.actualizado < ahora - timedelta(seconds=IMPORT_JOB_LEASE_SECONDS),
+            ),
+        )
+        .values(propietario=PROPIETARIO, estado=EN_PROCESO, actualizado=ahora)
+    )
+    db.commit()
+    return resultado.rowcount == 1
+
+
+def _validar(parseadores: Optional[ProcessPoolExecutor], bloque) -> Future:
+    if parseadores is None:
+        futuro = Future()
+        futuro.set_result(ingesta.validar_bloque(bloque))
+        return futuro
+    return parseadores.submit(ingesta.validar_bloque, bloque)
+
+
+class LeasePerdido(Exception):
+    """Otro pod reclamó el job mientras este lo procesaba."""
+
+
+def _actualizar_propio(db: Session, job_id: str, **valores) -> None:
+    """
+    /**
+     * @brief UPDATE del job condicionado a que este proceso siga siendo su propietario.
+     * @throws LeasePerdido Si el job ya es de otro pod; la transacción en curso se deshace.
+     */
+    """
+    Job = models.ImportJob
+    resultado = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.propietario == PROPIETARIO)
+        .values(actualizado=datetime.utcnow(), **valores)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == 0:
+        db.rollback()
+        raise LeasePerdido(job_id)
+
+
+def _latido(job_id: str, detener: threading.Event) -> None:
+    """Renueva el lease mientras el job corre, aunque un bloque tarde más que IMPORT_JOB_LEASE_SECONDS."""
+    while not detener.wait(IMPORT_JOB_LEASE_SECONDS / 3):
+        try:
+            with SessionLocal() as db:
+                _actualizar_propio(db, job_id)
+                db.commit()
+        except LeasePerdido:
+            return
+        except Exception as e:
+            print(f"⚠️ Error renovando el lease del job {job_id}: {e}")
+
+
+def _guardar(db: Session, job: models.ImportJob, ultima_fila: int, futuro: Future, desde: float) -> float:
+    """
+    /**
+     * @brief Inserta un bloque y actualiza el progreso y el checkpoint en la misma transacción.
+     * @return Instante de la confirmación, base para medir el siguiente bloque.
+     * @throws LeasePerdido Si otro pod reclamó el job; el bloque no se confirma.
+     */
+    """
+    resultado = ingesta.guardar_bloque(db, *futuro.result())
+    ahora = time.perf_counter()
+
+    Job = models.ImportJob
+    valores = dict(
+        procesados=Job.procesados + resultado["procesados"],
+        creados=Job.creados + resultado["creados"],
+        duplicados=Job.duplicados + resultado["duplicados"],
+        rechazados=Job.rechazados + resultado["rechazados"],
+        ultimaFila=ultima_fila,
+        duracionSegundos=Job.duracionSegundos + (ahora - desde),
+    )
+    if len(job.errores) < ingesta.MAX_ERRORES_REPORTADOS:
+        valores["errores"] = job.errores + resultado["errores"][:ingesta.MAX_ERRORES_REPORTADOS - len(job.errores)]
+    _actualizar_propio(db, job.id, **valores)
+    db.commit()
+    return ahora
+
+
+def ejecutar_job(job_id: str) -> None:
+    """
+    /**
+     * @brief Ejecuta (o reanuda desde ultimaFila) un job de importación.
+     *
+     * Mantiene hasta IMPORT_PARSE_WORKERS + 1 bloques en validación mientras inserta el más antiguo.
+     */
+    """
+    with _lock:
+        if job_id in _en_ejecucion:
+            return
+        _en_ejecucion.add(job_id)
+
+    db = SessionLocal()
+    fin_latido = threading.Event()
+    try:
+        if not _reclamar(db, job_id):
+            return
+        threading.Thread(target=_latido, args=(job_id, fin_latido), name=f"import-lease-{job_id[:8]}",
+                         daemon=True).start()
+        job = get_job(db, job_id)
+        _, parseadores = _ejecutores()
+        profundidad = IMPORT_PARSE_WORKERS + 1
+        desde = time.perf_counter()
+
+        try:
+            with open(job.ruta, "rb") as fuente:
+                pendientes = deque()
+                for bloque in ingesta.iterar_bloques(fuente, job.archivo, UPLOAD_CHUNK_SIZE, job.ultimaFila):
+                    pendientes.append((int(bloque["fila"].iloc[-1]), _validar(parseadores, bloque)))
+                    if len(pendientes) >= profundidad:
+                        desde = _guardar(db, job, *pendientes.popleft(), desde)
+                while pendientes:
+                    desde = _guardar(db, job, *pendientes.popleft(), desde)
+
+            final = dict(estado=COMPLETADO, mensaje=f"{job.creados} productos cargados exitosamente.")
+        except LeasePerdido:
+            raise
+        except Exception as e:
+            db.rollback()
+            final = dict(estado=FALLIDO,
+                         mensaje=f"Error procesando el archivo: {getattr(e, 'detail', None) or str(e)}"[:1000])
+
+        _actualizar_propio(db, job_id, finalizado=datetime.utcnow(), **final)
+        db.commit()
+        if os.path.exists(job.ruta):
+            os.remove(job.ruta)
+    except LeasePerdido:
+        # El nuevo propietario sigue desde el último bloque confirmado y se encarga del archivo
+        print(f"⚠️ El job {job_id} fue reclamado por otro pod; se abandona")
+    finally:
+        fin_latido.set()
+        db.close()
+        with _lock:
+            _en_ejecucion.discard(job_id)
+
+
+def reanudar_jobs() -> int:
+    """
+    /**
+     * @brief Encola los jobs activos abandonados (o propios tras un reinicio).
+     * @return Número de jobs encolados.
+     */
+    """
+    limite = datetime.utcnow() - timedelta(seconds=IMPORT_JOB_LEASE_SECONDS)
+    Job = models.ImportJob
+    with SessionLocal() as db:
+        ids = [j for (j,) in db.query(Job.id).filter(
+            Job.estado.in_(ACTIVOS),
+            or_(Job.propietario.is_(None), Job.propietario == PROPIETARIO, Job.actualizado < limite),
+        )]
+    with _lock:
+        ids = [j for j in ids if j not in _en_ejecucion]
+    for job_id in ids:
+        encolar(job_id)
+    return len(ids)
+
+
+def _vigilar() -> None:
+    while not _detener.wait(IMPORT_JOB_LEASE_SECONDS / 2):
+        try:
+            reanudar_jobs()
+        except Exception as e:
+            print(f"⚠️ Error revisando jobs de importación: {e}")
+
+
+def iniciar() -> None:
+    """
+    /**
+     * @brief Reanuda los jobs pendientes y arranca la revisión periódica de jobs abandonados.
+     */
+    """
+    _detener.clear()
+    reanudar_jobs()
+    threading.Thread(target=_vigilar, name="import-jobs-watchdog", daemon=True).start()
+
+
+def detener() -> None:
+    global _escritores, _parseadores
+    _detener.set()
+    with _lock:
+        escritores, parseadores = _escritores, _parseadores
+        _escritores = _parseadores = None
+    if escritores:
+        escritores.shutdown(wait=False, cancel_futures=True)
+    if parseadores:
+        parseadores.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,300 @@
+"""
+/**
+ * @file ingesta.py
+ * @brief Carga masiva de productos por bloques desde archivos Excel o CSV.
+ *
+ * El archivo se recorre fila a fila (python-calamine, openpyxl en modo read-only o el módulo csv),
+ * cada bloque se valida de forma vectorizada con pandas, los numeroSerial existentes
+ * se consultan en una sola sentencia por bloque y las filas válidas se insertan con
+ * un único INSERT multi-fila ... ON CONFLICT DO NOTHING.
+ *
+ * <p><b>Autor:</b> Equipo de Desarrollo Grupo 1</p>
+ * <p><b>Versión:</b> 1.0</p>
+ */
+"""
+import csv
+import io
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models import models
+from config.config import UPLOAD_CHUNK_SIZE
+
+try:
+    # Lector en Rust, ~15x más rápido que openpyxl; si no está instalado se usa openpyxl read-only
+    from python_calamine import CalamineWorkbook
+except ImportError:  # pragma: no cover
+    CalamineWorkbook = None
+
+EXTENSIONES = (".xlsx", ".xls", ".csv")
+
+COLUMNAS_REQUERIDAS = [
+    "nombre", "lote", "numeroSerial", "proveedor",
+    "precioUnidad", "precioTotal", "paisOrigen",
+    "uom", "cantidad", "tipoAlmacenamiento",
+    "temperaturaMin", "temperaturaMax"
+]
+COLUMNAS_TEXTO = ["nombre", "lote", "numeroSerial", "proveedor", "paisOrigen", "uom", "tipoAlmacenamiento"]
+COLUMNAS_DECIMALES = ["precioUnidad", "precioTotal"]
+COLUMNAS_OPCIONALES = ["temperaturaMin", "temperaturaMax"]
+
+# Límite de errores detallados en la respuesta; el conteo de rechazados siempre es exacto
+MAX_ERRORES_REPORTADOS = 1000
+
+
+def _a_texto(valor: Any) -> str:
+    """
+    /**
+     * @brief Normaliza una celda a texto; los números enteros leídos como float pierden el ".0".
+     */
+    """
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _leer_filas(fuente: BinaryIO, filename: str) -> Iterator[Tuple[int, tuple]]:
+    """
+    /**
+     * @brief Recorre el archivo fila a fila sin cargarlo completo en memoria.
+     * @return Iterador de (número de fila en el archivo, valores); la primera es el encabezado.
+     */
+    """
+    nombre = filename.lower()
+    if nombre.endswith(".csv"):
+        texto = io.TextIOWrapper(fuente, encoding="utf-8-sig", newline="")
+        try:
+            yield from enumerate((tuple(f) for f in csv.reader(texto)), start=1)
+        finally:
+            texto.detach()
+    elif CalamineWorkbook is not None:
+        hoja = CalamineWorkbook.from_filelike(fuente).get_sheet_by_index(0)
+        yield from enumerate(hoja.iter_rows(), start=1)
+    elif nombre.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(fuente, read_only=True, data_only=True)
+        try:
+            yield from enumerate(libro.active.iter_rows(values_only=True), start=1)
+        finally:
+            libro.close()
+    else:
+        # El formato .xls no admite lectura en streaming; se conserva la lectura con pandas
+        df = pd.read_excel(fuente, dtype=object)
+        yield 1, tuple(df.columns)
+        yield from enumerate(df.itertuples(index=False, name=None), start=2)
+
+
+def iterar_bloques(fuente: BinaryIO, filename: str, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                   desde_fila: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    /**
+     * @brief Agrupa las filas del archivo en DataFrames de a lo sumo chunk_size filas.
+     * @param fuente Archivo binario posicionado al inicio.
+     * @param filename Nombre original, usado para detectar el formato.
+     * @param chunk_size Filas por bloque.
+     * @param desde_fila Omite las filas con número menor o igual (reanudación desde un checkpoint).
+     * @return Iterador de DataFrames con las columnas requeridas y la columna "fila".
+     * @throws HTTPException 400 si el archivo no tiene encabezado o falta una columna obligatoria.
+     */
+    """
+    filas = _leer_filas(fuente, filename)
+    try:
+        _, encabezado = next(filas)
+    except StopIteration:
+        raise HTTPException(status_code=400, detail="El archivo está vacío")
+
+    encabezado = [_a_texto(c) for c in encabezado]
+    for col in COLUMNAS_REQUERIDAS:
+        if col not in encabezado:
+            raise HTTPException(status_code=400, detail=f"Columna faltante en el Excel: {col}")
+    posiciones = [encabezado.index(col) for col in COLUMNAS_REQUERIDAS]
+
+    bloque: List[list] = []
+    for numero, valores in filas:
+        if numero <= desde_fila or all(v is None or _a_texto(v) == "" for v in valores):
+            continue
+        fila = [valores[p] if p < len(valores) else None for p in posiciones]
+        fila.append(numero)
+        bloque.append(fila)
+        if len(bloque) >= chunk_size:
+            yield pd.DataFrame(bloque, columns=COLUMNAS_REQUERIDAS + ["fila"], dtype=object)
+            bloque = []
+    if bloque:
+        yield pd.DataFrame(bloque, columns=COLUMNAS_REQUERIDAS + ["fila"], dtype=object)
+
+
+def validar_bloque(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    /**
+     * @brief Valida y convierte un bloque de filas con operaciones vectorizadas.
+     * @param df Bloque producido por iterar_bloques.
+     * @return (DataFrame con las filas válidas ya tipadas, lista de errores por fila).
+     */
+    """
+    limpio = pd.DataFrame({"fila": df["fila"]})
+    mensajes: Dict[str, pd.Series] = {}
+
+    for col in COLUMNAS_TEXTO:
+        texto = df[col].map(_a_texto)
+        largo_max = models.Producto.__table__.c[col].type.length
+        limpio[col] = texto
+        mensajes[f"{col}: campo obligatorio"] = texto.eq("")
+        mensajes[f"{col}: supera {largo_max} caracteres"] = texto.str.len() > largo_max
+
+    for col in COLUMNAS_DECIMALES:
+        numero = pd.to_numeric(df[col], errors="coerce")
+        limpio[col] = numero
+        mensajes[f"{col}: valor numérico inválido"] = numero.isna()
+
+    cantidad = pd.to_numeric(df["cantidad"], errors="coerce")
+    limpio["cantidad"] = cantidad
+    mensajes["cantidad: debe ser un número entero"] = cantidad.isna() | (cantidad % 1 != 0)
+
+    for col in COLUMNAS_OPCIONALES:
+        vacio = df[col].map(_a_texto).eq("")
+        numero = pd.to_numeric(df[col], errors="coerce")
+        limpio[col] = numero
+        mensajes[f"{col}: valor numérico inválido"] = numero.isna() & ~vacio
+
+    invalidas = pd.DataFrame(mensajes)
+    hay_error = invalidas.any(axis=1)
+
+    errores = []
+    for idx in hay_error[hay_error].index:
+        errores.append({
+            "fila": int(limpio.at[idx, "fila"]),
+            "numeroSerial": limpio.at[idx, "numeroSerial"] or None,
+            "errores": [m for m, falla in invalidas.loc[idx].items() if falla],
+        })
+
+    validas = limpio[~hay_error].copy()
+    validas["cantidad"] = validas["cantidad"].astype("int64")
+    return validas, errores
+
+
+def _registros(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    columnas = COLUMNAS_REQUERIDAS
+    registros = df[columnas].astype(object).where(df[columnas].notna(), None).to_dict("records")
+    for r in registros:
+        r["precioUnidad"] = float(r["precioUnidad"])
+        r["precioTotal"] = float(r["precioTotal"])
+        r["cantidad"] = int(r["cantidad"])
+        for col in COLUMNAS_OPCIONALES:
+            if r[col] is not None:
+                r[col] = float(r[col])
+    return registros
+
+
+def _sentencia_insert(db: Session):
+    """
+    /**
+     * @brief Construye el INSERT; en PostgreSQL y SQLite ignora conflictos por numeroSerial
+     * y devuelve los seriales efectivamente insertados.
+     *
+     * Se ejecuta con una lista de parámetros: SQLAlchemy agrupa las filas en sentencias
+     * INSERT ... VALUES multi-fila ("insertmanyvalues") y reutiliza la sentencia compilada.
+     */
+    """
+    tabla = models.Producto.__table__
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        sentencia = pg_insert(tabla).on_conflict_do_nothing(index_elements=["numeroSerial"])
+    elif dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        sentencia = sqlite_insert(tabla).on_conflict_do_nothing(index_elements=["numeroSerial"])
+    else:
+        return insert(tabla)
+    return sentencia.returning(tabla.c.numeroSerial)
+
+
+def insertar_bloque(db: Session, df: pd.DataFrame) -> int:
+    """
+    /**
+     * @brief Inserta las filas válidas de un bloque sin confirmar la transacción.
+     * @return Número de filas efectivamente insertadas.
+     */
+    """
+    sentencia = _sentencia_insert(db)
+    resultado = db.execute(sentencia, _registros(df))
+    return len(resultado.all()) if resultado.returns_rows else resultado.rowcount
+
+
+def guardar_bloque(db: Session, validas: pd.DataFrame, errores: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    /**
+     * @brief Descarta duplicados e inserta un bloque ya validado, sin confirmar la transacción.
+     * @param validas Filas válidas devueltas por validar_bloque.
+     * @param errores Errores devueltos por validar_bloque.
+     * @return dict con procesados, creados, duplicados, rechazados y errores del bloque.
+     */
+    """
+    procesados = len(validas) + len(errores)
+
+    repetidas = validas["numeroSerial"].duplicated(keep="first")
+    validas = validas[~repetidas]
+    duplicados = int(repetidas.sum())
+
+    if not validas.empty:
+        existentes = set(db.execute(
+            select(models.Producto.numeroSerial)
+            .where(models.Producto.numeroSerial.in_(validas["numeroSerial"].tolist()))
+        ).scalars())
+        ya_existe = validas["numeroSerial"].isin(existentes)
+        duplicados += int(ya_existe.sum())
+        validas = validas[~ya_existe]
+
+    creados = insertar_bloque(db, validas) if not validas.empty else 0
+    # Filas que otro proceso insertó entre la consulta previa y el INSERT
+    duplicados += len(validas) - creados
+
+    return {
+        "procesados": procesados,
+        "creados": creados,
+        "duplicados": duplicados,
+        "rechazados": len(errores),
+        "errores": errores,
+    }
+
+
+def importar_productos(fuente: BinaryIO, filename: str, db: Session,
+                       chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    /**
+     * @brief Importa un archivo completo de productos bloque a bloque.
+     * @param fuente Archivo binario (.xlsx, .xls o .csv).
+     * @param filename Nombre original del archivo.
+     * @param db Sesión de base de datos.
+     * @param chunk_size Filas por bloque; por defecto UPLOAD_CHUNK_SIZE.
+     * @return dict con el resumen de la carga, errores por fila y filas por segundo.
+     */
+    """
+    inicio = time.perf_counter()
+    resumen = {"procesados": 0, "creados": 0, "duplicados": 0, "rechazados": 0}
+    errores: List[Dict[str, Any]] = []
+
+    fuente.seek(0)
+    for bloque in iterar_bloques(fuente, filename, chunk_size or UPLOAD_CHUNK_SIZE):
+        resultado = guardar_bloque(db, *validar_bloque(bloque))
+        db.commit()
+        for clave in resumen:
+            resumen[clave] += resultado[clave]
+        errores.extend(resultado["errores"][:MAX_ERRORES_REPORTADOS - len(errores)])
+
+    duracion = time.perf_counter() - inicio
+    return {
+        "mensaje": f"{resumen['creados']} productos cargados exitosamente.",
+        **resumen,
+        "errores": errores,
+        "erroresTruncados": resumen["rechazados"] > len(errores),
+        "duracionSegundos": round(duracion, 3),
+        "filasPorSegundo": round(resumen["procesados"] / duracion, 1) if duracion > 0 else None,
+    }
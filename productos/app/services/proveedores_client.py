@@ -0,0 +1,198 @@
+"""
+/**
+ * @file proveedores_client.py
+ * @brief Cliente compartido hacia el servicio de proveedores con caché y circuit breaker.
+ *
+ * - Un único httpx.AsyncClient con pool de conexiones keep-alive para todo el proceso.
+ * - Caché TTL con stale-while-revalidate: dentro de PROVEEDORES_CACHE_TTL se responde desde
+ *   memoria; hasta PROVEEDORES_STALE_TTL se responde la copia vieja y se refresca en segundo plano.
+ * - Paginación completa del listado de proveedores: sigue X-Next-Cursor cuando el servicio lo
+ *   envía y, si no, avanza con skip.
+ * - Circuit breaker: tras PROVEEDORES_CB_FALLOS fallos seguidos no se llama al servicio durante
+ *   PROVEEDORES_CB_SEGUNDOS y se sirve la última lista buena.
+ *
+ * <p><b>Autor:</b> Equipo de Desarrollo Grupo 1</p>
+ * <p><b>Versión:</b> 1.0</p>
+ */
+"""
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from config.config import (
+    PROVEEDOR_API_BASE_URL, PROVEEDORES_CACHE_TTL, PROVEEDORES_CB_FALLOS, PROVEEDORES_CB_SEGUNDOS,
+    PROVEEDORES_PAGE_SIZE, PROVEEDORES_STALE_TTL, PROVEEDORES_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Métricas Prometheus
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+    PROMETHEUS_AVAILABLE = True
+
+    proveedores_cache_total = Counter(
+        'productos_proveedores_cache_total',
+        'Consultas a la caché de proveedores por resultado',
+        ['resultado']
+    )
+
+    proveedores_upstream_seconds = Histogram(
+        'productos_proveedores_upstream_seconds',
+        'Latencia de cada página pedida al servicio de proveedores',
+        ['resultado']
+    )
+
+    proveedores_circuit_open = Gauge(
+        'productos_proveedores_circuit_open',
+        'Estado del circuit breaker hacia proveedores (1=abierto, 0=cerrado)'
+    )
+
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    logger.warning("Prometheus no disponible. Métricas deshabilitadas.")
+
+# Tope de páginas por refresco, por si el servicio ignora skip y devuelve siempre la misma página
+_MAX_PAGINAS = 1000
+
+
+class CircuitoAbiertoError(Exception):
+    """El circuit breaker está abierto y no se llamó al servicio de proveedores."""
+
+
+class ProveedoresClient:
+    """Lista de nombres de proveedores cacheada frente al servicio de proveedores."""
+
+    def __init__(self, base_url: str = PROVEEDOR_API_BASE_URL, ttl: float = PROVEEDORES_CACHE_TTL,
+                 stale_ttl: float = PROVEEDORES_STALE_TTL, page_size: int = PROVEEDORES_PAGE_SIZE,
+                 timeout: float = PROVEEDORES_TIMEOUT, fallos_umbral: int = PROVEEDORES_CB_FALLOS,
+                 segundos_abierto: float = PROVEEDORES_CB_SEGUNDOS,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.page_size = page_size
+        self.timeout = timeout
+        self.fallos_umbral = fallos_umbral
+        self.segundos_abierto = segundos_abierto
+        self._transport = transport
+
+        self._cliente: Optional[httpx.AsyncClient] = None
+        self._snapshot: Optional[List[str]] = None
+        self._obtenido_en = 0.0
+        self._refresco: Optional[asyncio.Task] = None
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._cliente is None or self._cliente.is_closed:
+            self._cliente = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self._transport,
+            )
+        return self._cliente
+
+    async def close(self) -> None:
+        if self._refresco and not self._refresco.done():
+            self._refresco.cancel()
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+    def circuito_abierto(self) -> bool:
+        return time.monotonic() < self._abierto_hasta
+
+    async def _pagina(self, skip: int, cursor: Optional[str]) -> Tuple[list, Optional[str]]:
+        inicio = time.perf_counter()
+        resultado = "error"
+        params = {"cursor": cursor} if cursor else {"skip": skip}
+        try:
+            response = await self._http().get("/proveedores/", params={**params, "limit": self.page_size})
+            response.raise_for_status()
+            resultado = "ok"
+            return response.json(), response.headers.get("X-Next-Cursor")
+        finally:
+            if PROMETHEUS_AVAILABLE:
+                proveedores_upstream_seconds.labels(resultado=resultado).observe(time.perf_counter() - inicio)
+
+    async def _descargar(self) -> List[str]:
+        """Descarga todas las páginas y devuelve los nombres ordenados alfabéticamente."""
+        if self.circuito_abierto():
+            raise CircuitoAbiertoError()
+        try:
+            nombres: List[str] = []
+            cursor = None
+            for n in range(_MAX_PAGINAS):
+                pagina, cursor = await self._pagina(n * self.page_size, cursor)
+                nombres.extend(p["nombre"] for p in pagina if "nombre" in p)
+                if len(pagina) < self.page_size:
+                    break
+        except Exception:
+            self._fallos += 1
+            if self._fallos >= self.fallos_umbral:
+                self._abierto_hasta = time.monotonic() + self.segundos_abierto
+                if PROMETHEUS_AVAILABLE:
+                    proveedores_circuit_open.set(1)
+            raise
+
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        if PROMETHEUS_AVAILABLE:
+            proveedores_circuit_open.set(0)
+        self._snapshot = sorted(nombres, key=lambda x: x.lower())
+        self._obtenido_en = time.monotonic()
+        return self._snapshot
+
+    def _refrescar(self) -> asyncio.Task:
+        """Devuelve el refresco en curso o inicia uno; las peticiones concurrentes lo comparten."""
+        if self._refresco is None or self._refresco.done():
+            self._refresco = asyncio.get_running_loop().create_task(self._descargar())
+            self._refresco.add_done_callback(self._registrar_fallo)
+        return self._refresco
+
+    @staticmethod
+    def _registrar_fallo(tarea: asyncio.Task) -> None:
+        if not tarea.cancelled() and tarea.exception() is not None:
+            error = tarea.exception()
+            if not isinstance(error, CircuitoAbiertoError):
+                logger.warning(f"⚠️ Error al obtener proveedores: {error}")
+
+    async def get_nombres(self) -> List[str]:
+        """
+        /**
+         * @brief Devuelve los nombres de proveedores ordenados alfabéticamente.
+         * @return Lista desde caché, refrescada o, si el servicio falla, la última lista buena.
+         * @throws HTTPException 503 si el servicio falla y nunca se obtuvo una lista.
+         */
+        """
+        edad = time.monotonic() - self._obtenido_en
+        if self._snapshot is not None and edad < self.ttl:
+            self._contar("hit")
+            return self._snapshot
+        if self._snapshot is not None and edad < self.stale_ttl:
+            self._contar("stale")
+            self._refrescar()
+            return self._snapshot
+
+        self._contar("miss")
+        try:
+            return await asyncio.shield(self._refrescar())
+        except Exception:
+            if self._snapshot is not None:
+                self._contar("fallback")
+                return self._snapshot
+            raise HTTPException(status_code=503, detail="Servicio de proveedores no disponible")
+
+    @staticmethod
+    def _contar(resultado: str) -> None:
+        if PROMETHEUS_AVAILABLE:
+            proveedores_cache_total.labels(resultado=resultado).inc()
+
+
+proveedores_client = ProveedoresClient()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -10,3 +11,36 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 # Configuración de JWT
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+
+# Verificación RS256 con las claves públicas del servicio de seguridad (app/utils/jwks.py).
+# Sin JWKS_URL solo se aceptan tokens HS256 firmados con SECRET_KEY
+JWKS_URL = os.getenv("JWKS_URL", "")
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "300"))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "10"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "3"))
+JWT_ISSUER = os.getenv("JWT_ISSUER", "experimento-seguridad")
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "api-users")
+JWT_LEEWAY_SECONDS = int(os.getenv("JWT_LEEWAY_SECONDS", "60"))
+
+# Carga masiva de productos: filas por bloque leído e insertado en una sola sentencia
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", "2000"))
+
+# Importaciones asíncronas (POST /productos/import_jobs)
+# IMPORT_JOBS_DIR debe ser un volumen compartido entre pods para poder reanudar jobs de otro pod
+IMPORT_JOBS_DIR = os.getenv("IMPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "productos_import_jobs"))
+IMPORT_PARSE_WORKERS = int(os.getenv("IMPORT_PARSE_WORKERS", "2"))
+IMPORT_DB_WRITERS = int(os.getenv("IMPORT_DB_WRITERS", "2"))
+IMPORT_JOB_LEASE_SECONDS = int(os.getenv("IMPORT_JOB_LEASE_SECONDS", "60"))
+
+# Cliente hacia el servicio de proveedores (GET /productos/proveedores)
+PROVEEDOR_API_BASE_URL = os.getenv("PROVEEDOR_API_BASE_URL", "http://136.112.245.46:8003/")
+PROVEEDORES_CACHE_TTL = float(os.getenv("PROVEEDORES_CACHE_TTL", "60"))
+PROVEEDORES_STALE_TTL = float(os.getenv("PROVEEDORES_STALE_TTL", "600"))
+PROVEEDORES_PAGE_SIZE = int(os.getenv("PROVEEDORES_PAGE_SIZE", "100"))
+PROVEEDORES_TIMEOUT = float(os.getenv("PROVEEDORES_TIMEOUT", "3"))
+PROVEEDORES_CB_FALLOS = int(os.getenv("PROVEEDORES_CB_FALLOS", "3"))
+PROVEEDORES_CB_SEGUNDOS = float(os.getenv("PROVEEDORES_CB_SEGUNDOS", "30"))
+
+# Paginación de listados (app/utils/pagination.py)
+PAGINATION_COUNT_TTL = float(os.getenv("PAGINATION_COUNT_TTL", "30"))
+PAGINATION_EXACT_COUNT_MAX = int(os.getenv("PAGINATION_EXACT_COUNT_MAX", "100000"))
@@ -0,0 +1,130 @@
+from datetime import date
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import models
+from app.models.database import get_db
+from app.models.producto import ProductoFiltro
+from app.routes.routes import router
+from app.services import busqueda, crud
+
+CATALOGO = [
+    # nombre, lote, serial, proveedor, pais, tipo, tMin, tMax, precio
+    ("Acetaminofén 500mg", "L0100", "SN-0001", "Genfar", "Colombia", "ambiente", 15, 30, 1.5),
+    ("Ibuprofeno 400mg", "L0101", "SN-0002", "Genfar", "Colombia", "ambiente", 15, 30, 2.0),
+    ("Insulina glargina", "F2200", "SN-0100", "Novo", "Dinamarca", "controlado", 2, 8, 45.0),
+    ("Vacuna influenza", "F2201", "SN-0101", "Sanofi", "Francia", "controlado", 2, 8, 30.0),
+    ("Alcohol antiséptico", "H9000", "HZ-0001", "Quimicos SA", "Colombia", "hazmat", 10, 25, 4.0),
+    ("Acetilcisteína 600mg", "L0102", "SN-0003", "Sanofi", "Francia", "ambiente", 15, 30, 8.5),
+]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add_all([
+            models.Producto(
+                nombre=n, lote=l, numeroSerial=s, proveedor=p, paisOrigen=pa, tipoAlmacenamiento=t,
+                temperaturaMin=tmin, temperaturaMax=tmax, precioUnidad=precio, precioTotal=precio,
+                uom="unidad", cantidad=1, fechaCreacion=date.today(),
+            ) for n, l, s, p, pa, t, tmin, tmax, precio in CATALOGO
+        ])
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(router, prefix="/productos")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def _seriales(db, **filtros):
+    return [p.numeroSerial for p in crud.get_productos(db, filtros=ProductoFiltro(**filtros))]
+
+
+def test_create_all_crea_tabla_fts(db):
+    assert db.execute(text("SELECT count(*) FROM productos_fts")).scalar() == len(CATALOGO)
+
+
+def test_filtros_exactos_y_rango_de_temperatura(db):
+    assert _seriales(db, proveedor="Genfar") == ["SN-0001", "SN-0002"]
+    assert _seriales(db, paisOrigen="Francia", tipoAlmacenamiento="controlado") == ["SN-0101"]
+    assert _seriales(db, temperaturaMin=0, temperaturaMax=10) == ["SN-0100", "SN-0101"]
+
+
+def test_nombre_contiene_sin_mayusculas(db):
+    assert _seriales(db, nombre="MG") == ["SN-0001", "SN-0002", "SN-0003"]
+    assert _seriales(db, nombre="100%") == []
+
+
+@pytest.mark.parametrize("q, esperados", [
+    ("aceta", ["SN-0001"]),
+    ("acet", ["SN-0001", "SN-0003"]),
+    ("acetaminofen", ["SN-0001"]),
+    ("sn-010", ["SN-0100", "SN-0101"]),
+    ("f22 vacuna", ["SN-0101"]),
+    ("l010 ibu", ["SN-0002"]),
+    ("\"*)(", ["SN-0001", "SN-0002", "SN-0100", "SN-0101", "HZ-0001", "SN-0003"]),
+])
+def test_busqueda_por_prefijo_en_nombre_lote_y_serial(db, q, esperados):
+    assert _seriales(db, q=q) == esperados
+
+
+def test_busqueda_sigue_los_cambios_de_la_tabla(db):
+    producto = crud.get_producto_by_serial(db, "HZ-0001")
+    producto.nombre = "Peróxido de hidrógeno"
+    db.commit()
+
+    assert _seriales(db, q="alcohol") == []
+    assert _seriales(db, q="perox") == ["HZ-0001"]
+
+
+def test_busqueda_sin_fts_usa_like(db):
+    db.execute(text("DROP TABLE productos_fts"))
+    db.commit()
+
+    assert _seriales(db, q="acet") == ["SN-0001", "SN-0003"]
+    assert _seriales(db, q="glarg") == ["SN-0100"]
+
+
+def test_orden_descendente_con_cursor(client):
+    precios, url = [], "/productos/?orden=-precioUnidad&limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        precios.extend(p["precioUnidad"] for p in response.json())
+        url = response.links.get("next", {}).get("url")
+
+    assert precios == sorted((c[-1] for c in CATALOGO), reverse=True)
+
+
+def test_orden_por_nombre_con_filtros_y_conteo(client):
+    response = client.get("/productos/", params={"tipoAlmacenamiento": "ambiente", "orden": "nombre",
+                                                 "limit": 2, "count": "true"})
+
+    assert [p["nombre"] for p in response.json()] == ["Acetaminofén 500mg", "Acetilcisteína 600mg"]
+    assert response.headers["X-Total-Count"] == "3"
+
+    siguiente = client.get(response.links["next"]["url"])
+    assert [p["nombre"] for p in siguiente.json()] == ["Ibuprofeno 400mg"]
+
+
+def test_orden_no_soportado():
+    with pytest.raises(HTTPException) as exc:
+        busqueda.orden("contrasena")
+    assert exc.value.status_code == 400
+
+
+def test_orden_no_soportado_en_el_endpoint(client):
+    assert client.get("/productos/", params={"orden": "uom"}).status_code == 400
@@ -0,0 +1,132 @@
+import os
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import models
+from app.services import importaciones
+
+
+def _csv(seriales):
+    df = pd.DataFrame([{
+        "nombre": "P1", "lote": "L1", "numeroSerial": s, "proveedor": "Prov1",
+        "precioUnidad": 10, "precioTotal": 100, "paisOrigen": "Colombia", "uom": "unidad",
+        "cantidad": 5, "tipoAlmacenamiento": "ambiente", "temperaturaMin": 2, "temperaturaMax": 8,
+    } for s in seriales])
+    return BytesIO(df.to_csv(index=False).encode("utf-8"))
+
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(importaciones, "SessionLocal", Session)
+    monkeypatch.setattr(importaciones, "IMPORT_JOBS_DIR", str(tmp_path))
+    monkeypatch.setattr(importaciones, "IMPORT_PARSE_WORKERS", 0)
+    monkeypatch.setattr(importaciones, "UPLOAD_CHUNK_SIZE", 4)
+    yield Session
+    importaciones.detener()
+
+
+def test_crear_job_guarda_archivo(Session, tmp_path):
+    with Session() as db:
+        job = importaciones.crear_job(db, _csv(["S1"]), "productos.csv")
+
+        assert job.estado == importaciones.PENDIENTE
+        assert job.ruta.startswith(str(tmp_path))
+        assert os.path.exists(job.ruta)
+        assert job.procesados == 0
+
+
+def test_ejecutar_job_completo(Session):
+    with Session() as db:
+        job_id = importaciones.crear_job(db, _csv([f"S{i}" for i in range(10)] + ["S1"]), "productos.csv").id
+
+    importaciones.ejecutar_job(job_id)
+
+    with Session() as db:
+        job = importaciones.get_job(db, job_id)
+        assert job.estado == importaciones.COMPLETADO
+        assert (job.procesados, job.creados, job.duplicados) == (11, 10, 1)
+        assert job.ultimaFila == 12
+        assert job.filasPorSegundo > 0
+        assert not os.path.exists(job.ruta)
+        assert db.query(models.Producto).count() == 10
+
+
+def test_ejecutar_job_reanuda_desde_checkpoint(Session):
+    with Session() as db:
+        job = importaciones.crear_job(db, _csv([f"S{i}" for i in range(10)]), "productos.csv")
+        # Simula un pod que confirmó el primer bloque (filas 2-5) y murió
+        job.estado, job.propietario = importaciones.EN_PROCESO, "otro-pod:1"
+        job.procesados = job.creados = 4
+        job.ultimaFila = 5
+        job.actualizado = datetime.utcnow() - timedelta(hours=1)
+        db.commit()
+        job_id = job.id
+
+    assert importaciones.reanudar_jobs() == 1
+    importaciones._escritores.shutdown(wait=True)
+
+    with Session() as db:
+        job = importaciones.get_job(db, job_id)
+        assert job.estado == importaciones.COMPLETADO
+        assert (job.procesados, job.creados) == (10, 10)
+        assert db.query(models.Producto).count() == 6
+
+
+def test_job_de_otro_pod_activo_no_se_reclama(Session):
+    with Session() as db:
+        job = importaciones.crear_job(db, _csv(["S1"]), "productos.csv")
+        job.estado, job.propietario = importaciones.EN_PROCESO, "otro-pod:1"
+        db.commit()
+
+        assert importaciones.reanudar_jobs() == 0
+        assert not importaciones._reclamar(db, job.id)
+
+
+def test_ejecutar_job_con_pool_de_procesos(Session, monkeypatch):
+    monkeypatch.setattr(importaciones, "IMPORT_PARSE_WORKERS", 1)
+    with Session() as db:
+        job_id = importaciones.crear_job(db, _csv([f"S{i}" for i in range(10)] + [""]), "productos.csv").id
+
+    importaciones.ejecutar_job(job_id)
+
+    with Session() as db:
+        job = importaciones.get_job(db, job_id)
+        assert job.estado == importaciones.COMPLETADO
+        assert (job.creados, job.rechazados) == (10, 1)
+        assert job.errores[0]["fila"] == 12
+
+
+def test_job_reclamado_por_otro_pod_se_abandona(Session, monkeypatch):
+    with Session() as db:
+        job_id = importaciones.crear_job(db, _csv([f"S{i}" for i in range(10)]), "productos.csv").id
+
+    guardar_bloque = importaciones.ingesta.guardar_bloque
+    llamadas = []
+
+    def guardar_y_perder_lease(db, *args):
+        llamadas.append(1)
+        if len(llamadas) == 2:
+            # Otro pod reclama el job mientras este inserta el segundo bloque
+            db.query(models.ImportJob).filter(models.ImportJob.id == job_id).update(
+                {"propietario": "otro-pod:1"}, synchronize_session=False)
+            db.commit()
+        return guardar_bloque(db, *args)
+
+    monkeypatch.setattr(importaciones.ingesta, "guardar_bloque", guardar_y_perder_lease)
+    importaciones.ejecutar_job(job_id)
+
+    with Session() as db:
+        job = importaciones.get_job(db, job_id)
+        assert job.estado == importaciones.EN_PROCESO and job.propietario == "otro-pod:1"
+        assert (job.procesados, job.ultimaFila) == (4, 5)  # el bloque en curso no se confirmó
+        assert db.query(models.Producto).count() == 4
+        assert os.path.exists(job.ruta)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import time
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import JWTError, jwk, jwt
+
+from app.utils.jwks import JWKSClient, _intervalo
+
+
+def _par_de_claves(kid):
+    privada = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem_privada = privada.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                        serialization.NoEncryption()).decode()
+    pem_publica = privada.public_key().public_bytes(serialization.Encoding.PEM,
+                                                    serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    publica = jwk.construct(pem_publica, algorithm="RS256").to_dict()
+    publica.update({"kid": kid, "use": "sig"})
+    return pem_privada, publica
+
+
+class FakeSeguridad:
+    """/.well-known/jwks.json con ETag y Cache-Control, como el servicio de seguridad."""
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self.privadas = {}
+        self.publicas = []
+        self.llamadas = 0
+        self.no_modificados = 0
+        self.caido = False
+
+    def rotar(self, kid):
+        privada, publica = _par_de_claves(kid)
+        self.privadas[kid] = privada
+        self.publicas.append(publica)
+
+    def token(self, kid, **claims):
+        datos = {"sub": "user@test.com", "iss": "experimento-seguridad", "aud": "api-users",
+                 "exp": int(time.time()) + 300}
+        datos.update(claims)
+        return jwt.encode(datos, self.privadas[kid], algorithm="RS256", headers={"kid": kid})
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.llamadas += 1
+        if self.caido:
+            return httpx.Response(503)
+        cuerpo = json.dumps({"keys": self.publicas}).encode()
+        etag = '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}"}
+        if request.headers.get("If-None-Match") == etag:
+            self.no_modificados += 1
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, content=cuerpo, headers=headers)
+
+
+def _cliente(servicio, **kwargs):
+    opciones = dict(url="http://seguridad/.well-known/jwks.json", refresh_seconds=300,
+                    min_refresh_seconds=10, issuer="experimento-seguridad", audience="api-users", leeway=0)
+    opciones.update(kwargs)
+    return JWKSClient(transport=httpx.MockTransport(servicio), **opciones)
+
+
+def test_verifica_localmente_sin_red_por_request():
+    servicio = FakeSeguridad()
+    servicio.rotar("key-1")
+    cliente = _cliente(servicio)
+
+    token = servicio.token("key-1")
+    for _ in range(50):
+        assert cliente.verify(token)["sub"] == "user@test.com"
+
+    assert servicio.llamadas == 1  # la primera verificación descarga el JWKS; el resto es local
+
+
+def test_revalida_con_etag_y_conserva_las_claves():
+    servicio = FakeSeguridad()
+    servicio.rotar("key-1")
+    cliente = _cliente(servicio)
+
+    assert cliente.refresh()
+    assert cliente.refresh()
+    assert servicio.no_modificados == 1
+    assert cliente.kids == ["key-1"]
+
+    servicio.caido = True
+    assert not cliente.refresh()
+    assert cliente.verify(servicio.token("key-1"))["sub"] == "user@test.com"
+
+
+def test_rotacion_sin_reinicio_y_kids_desconocidos_limitados():
+    servicio = FakeSeguridad()
+    servicio.rotar("key-1")
+    cliente = _cliente(servicio)
+    assert cliente.refresh()
+
+    # Token firmado con la clave recién rotada: un kid desconocido fuerza una descarga
+    servicio.rotar("key-2")
+    cliente._ultima_descarga -= 10
+    assert cliente.verify(servicio.token("key-2"))["sub"] == "user@test.com"
+    assert servicio.llamadas == 2
+
+    # Kids inventados no generan una llamada por request
+    falso = jwt.encode({"sub": "x"}, servicio.privadas["key-1"], algorithm="RS256", headers={"kid": "key-x"})
+    for _ in range(20):
+        with pytest.raises(JWTError):
+            cliente.verify(falso)
+    assert servicio.llamadas == 2
+
+
+def test_rechaza_emisor_audiencia_y_firma_invalidos():
+    servicio = FakeSeguridad()
+    servicio.rotar("key-1")
+    otro = FakeSeguridad()
+    otro.rotar("key-1")
+    cliente = _cliente(servicio)
+
+    with pytest.raises(JWTError):
+        cliente.verify(servicio.token("key-1", iss="otro"))
+    with pytest.raises(JWTError):
+        cliente.verify(servicio.token("key-1", aud="otra-api"))
+    with pytest.raises(JWTError):
+        cliente.verify(otro.token("key-1"))
+
+
+def test_intervalo_respeta_max_age():
+    assert _intervalo("public, max-age=60", 300, 10) == 60
+    assert _intervalo("public, max-age=3600", 300, 10) == 300
+    assert _intervalo("no-cache", 300, 10) == 10
+    assert _intervalo(None, 300, 10) == 300
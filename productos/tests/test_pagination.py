@@ -0,0 +1,100 @@
+from datetime import date
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import models
+from app.models.database import get_db
+from app.routes.routes import router
+from app.services import crud
+from app.utils import pagination
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add_all([
+            models.Producto(
+                nombre=f"P{i}", lote="L1", numeroSerial=f"S{i}", proveedor="Prov1", precioUnidad=1,
+                precioTotal=1, paisOrigen="Colombia", uom="unidad", cantidad=1,
+                tipoAlmacenamiento="ambiente", temperaturaMin=2, temperaturaMax=8, fechaCreacion=date.today(),
+            ) for i in range(25)
+        ])
+        session.commit()
+        pagination.limpiar_conteos()
+        yield session
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(router, prefix="/productos")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def test_cursor_ida_y_vuelta():
+    cursor = pagination.encode_cursor(1234)
+    assert "=" not in cursor
+    assert pagination.decode_cursor(cursor) == 1234
+
+
+@pytest.mark.parametrize("cursor", ["no-es-un-cursor", "e30", "!!!"])
+def test_cursor_invalido(cursor):
+    with pytest.raises(HTTPException) as exc:
+        pagination.decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_get_productos_recorre_con_cursor(db):
+    vistos, cursor = [], None
+    while True:
+        pagina = crud.get_productos(db, limit=10, cursor=cursor)
+        vistos.extend(p.numeroSerial for p in pagina)
+        if len(pagina) < 10:
+            break
+        cursor = pagination.encode_cursor(pagina[-1].id)
+
+    assert vistos == [f"S{i}" for i in range(25)]
+
+
+def test_listado_devuelve_encabezados(client):
+    response = client.get("/productos/", params={"limit": 10, "count": "true"})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    assert response.headers["X-Total-Count"] == "25"
+    assert response.headers["X-Total-Count-Estimated"] == "false"
+    assert f"cursor={response.headers['X-Next-Cursor']}" in response.headers["Link"]
+
+    ultima = client.get("/productos/", params={"limit": 10, "skip": 20})
+    assert len(ultima.json()) == 5
+    assert "X-Next-Cursor" not in ultima.headers
+    assert "X-Total-Count" not in ultima.headers
+
+
+def test_listado_sigue_link_next(client):
+    seriales, url = [], "/productos/?limit=10"
+    while url:
+        response = client.get(url)
+        seriales.extend(p["numeroSerial"] for p in response.json())
+        url = response.links.get("next", {}).get("url")
+
+    assert seriales == [f"S{i}" for i in range(25)]
+
+
+def test_conteo_se_sirve_desde_cache(db):
+    assert crud.contar_productos(db) == (25, False)
+    db.query(models.Producto).filter(models.Producto.numeroSerial == "S0").delete()
+    db.commit()
+    assert crud.contar_productos(db) == (25, False)
+
+    pagination.limpiar_conteos()
+    assert crud.contar_productos(db) == (24, False)
@@ -6,7 +6,11 @@ from fastapi import HTTPException, UploadFile
 from jose import jwt
 import pandas as pd
 from io import BytesIO
-from app.services import crud  # Ajusta el import al path real
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.models import models
+from app.services import crud, ingesta  # Ajusta el import al path real
 from config.config import SECRET_KEY, ALGORITHM
  
 
@@ -65,11 +69,12 @@ def test_get_producto(monkeypatch):
 def test_get_productos(monkeypatch):
     mock_db = MagicMock()
     mock_query = mock_db.query.return_value
-    mock_query.offset.return_value.limit.return_value.all.return_value = ["p1", "p2"]
+    mock_ordenada = mock_query.order_by.return_value
+    mock_ordenada.offset.return_value.limit.return_value.all.return_value = ["p1", "p2"]
 
     result = crud.get_productos(mock_db)
     assert len(result) == 2
-    mock_query.offset.assert_called_once_with(0)
+    mock_ordenada.offset.assert_called_once_with(0)
 
 
 def test_create_producto(monkeypatch):
@@ -113,22 +118,16 @@ def test_get_uom_ordered():
     assert "unidad" in uoms
 
 
-def test_get_proveedores_ordered(monkeypatch):
-    mock_data = [
-        {"id": 1, "nombre": "Laboratorios Pharma Plus"},
-        {"id": 2, "nombre": "Distribuidora Médica Central"},
-    ]
-
-    class MockResponse:
-        def json(self):
-            return mock_data
-        def raise_for_status(self): pass
+@pytest.mark.asyncio
+async def test_get_proveedores_ordered(monkeypatch):
+    mock_get_nombres = AsyncMock(return_value=["Distribuidora Médica Central", "Laboratorios Pharma Plus"])
+    monkeypatch.setattr(crud.proveedores_client, "get_nombres", mock_get_nombres)
 
-    with patch("app.services.crud.requests.get", return_value=MockResponse()):
-        proveedores = crud.get_proveedores()
+    proveedores = await crud.get_proveedores()
 
     assert proveedores == sorted(proveedores, key=lambda p: p.lower())
     assert "Laboratorios Pharma Plus" in proveedores
+    mock_get_nombres.assert_awaited_once()
 
 @patch("app.services.crud.get_tipo_almacenamiento")
 def test_get_tipo_almacenamiento_ordered(mock_get):
@@ -143,24 +142,47 @@ def test_get_tipo_almacenamiento_ordered(mock_get):
 # 🔹 PRUEBAS ASÍNCRONAS: CARGA DE EXCEL
 # -------------------------------
 
-@pytest.mark.asyncio
-async def test_get_productos_creados(monkeypatch):
-    # Crear DataFrame simulado
-    data = {
-        "nombre": ["P1"],
-        "lote": ["L1"],
-        "numeroSerial": ["S1"],
-        "proveedor": ["Prov1"],
-        "precioUnidad": [10],
-        "precioTotal": [100],
-        "paisOrigen": ["Colombia"],
-        "uom": ["unidad"],
-        "cantidad": [5],
-        "tipoAlmacenamiento": ["seco"],
-        "temperaturaMin": [2],
-        "temperaturaMax": [8],
+def _fila(serial, **cambios):
+    fila = {
+        "nombre": "P1",
+        "lote": "L1",
+        "numeroSerial": serial,
+        "proveedor": "Prov1",
+        "precioUnidad": 10,
+        "precioTotal": 100,
+        "paisOrigen": "Colombia",
+        "uom": "unidad",
+        "cantidad": 5,
+        "tipoAlmacenamiento": "seco",
+        "temperaturaMin": 2,
+        "temperaturaMax": 8,
     }
-    df = pd.DataFrame(data)
+    fila.update(cambios)
+    return fila
+
+
+@pytest.fixture
+def sqlite_db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_get_productos_creados(sqlite_db):
+    sqlite_db.add(models.Producto(**_fila("EXISTE"), fechaCreacion=datetime.utcnow().date()))
+    sqlite_db.commit()
+
+    df = pd.DataFrame([
+        _fila("S1"),
+        _fila("S2", temperaturaMin=None),
+        _fila("S1"),                          # repetido dentro del archivo
+        _fila("EXISTE"),                      # ya existe en la BD
+        _fila("S3", precioUnidad="abc"),      # precio inválido
+        _fila("", cantidad=1.5),              # serial vacío y cantidad no entera
+    ])
 
     # Guardar en bytes (como si fuera Excel)
     buffer = BytesIO()
@@ -170,13 +192,35 @@ async def test_get_productos_creados(monkeypatch):
 
     mock_file = UploadFile(filename="productos.xlsx", file=buffer)
 
-    mock_db = MagicMock()
-    monkeypatch.setattr(crud, "get_producto_by_serial", lambda db, s: None)
-    monkeypatch.setattr(crud, "create_producto", lambda db, p: p)
-
-    result = await crud.get_productos_creados(mock_file, mock_db)
+    result = await crud.get_productos_creados(mock_file, sqlite_db)
 
     assert "productos cargados exitosamente" in result["mensaje"]
+    assert result["procesados"] == 6
+    assert result["creados"] == 2
+    assert result["duplicados"] == 2
+    assert result["rechazados"] == 2
+    assert [e["fila"] for e in result["errores"]] == [6, 7]
+    assert result["errores"][0]["errores"] == ["precioUnidad: valor numérico inválido"]
+    assert "cantidad: debe ser un número entero" in result["errores"][1]["errores"]
+    assert result["filasPorSegundo"] > 0
+
+    seriales = {s for (s,) in sqlite_db.query(models.Producto.numeroSerial).all()}
+    assert seriales == {"EXISTE", "S1", "S2"}
+    temp_min = sqlite_db.query(models.Producto.temperaturaMin).filter_by(numeroSerial="S2").scalar()
+    assert temp_min is None
+
+
+@pytest.mark.asyncio
+async def test_get_productos_creados_csv_por_bloques(sqlite_db):
+    df = pd.DataFrame([_fila(f"S{i}") for i in range(25)])
+    buffer = BytesIO(df.to_csv(index=False).encode("utf-8"))
+
+    result = ingesta.importar_productos(buffer, "productos.csv", sqlite_db, chunk_size=10)
+
+    assert result["procesados"] == 25
+    assert result["creados"] == 25
+    assert result["rechazados"] == 0
+    assert sqlite_db.query(models.Producto).count() == 25
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services.proveedores_client import ProveedoresClient
+
+
+class FakeProveedores:
+    """Servicio de proveedores simulado con paginación skip/limit."""
+
+    def __init__(self, total=5):
+        self.proveedores = [{"id": i, "nombre": f"Proveedor {chr(ord('E') - i)}"} for i in range(total)]
+        self.llamadas = 0
+        self.caido = False
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.llamadas += 1
+        if self.caido:
+            return httpx.Response(503)
+        skip = int(request.url.params["skip"])
+        limit = int(request.url.params["limit"])
+        return httpx.Response(200, json=self.proveedores[skip:skip + limit])
+
+
+def _cliente(servicio, **kwargs):
+    opciones = dict(base_url="http://proveedores", ttl=60, stale_ttl=600, page_size=2,
+                    fallos_umbral=2, segundos_abierto=30)
+    opciones.update(kwargs)
+    return ProveedoresClient(transport=httpx.MockTransport(servicio), **opciones)
+
+
+@pytest.mark.asyncio
+async def test_pagina_todo_el_listado_y_ordena():
+    servicio = FakeProveedores(total=5)
+    cliente = _cliente(servicio)
+
+    nombres = await cliente.get_nombres()
+
+    assert nombres == ["Proveedor A", "Proveedor B", "Proveedor C", "Proveedor D", "Proveedor E"]
+    assert servicio.llamadas == 3
+    await cliente.close()
+
+
+class FakeProveedoresConCursor(FakeProveedores):
+    """Servicio de proveedores que pagina con X-Next-Cursor."""
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.llamadas += 1
+        assert "skip" not in request.url.params or self.llamadas == 1
+        desde = int(request.url.params.get("cursor", "0"))
+        limit = int(request.url.params["limit"])
+        pagina = self.proveedores[desde:desde + limit]
+        headers = {"X-Next-Cursor": str(desde + limit)} if len(pagina) == limit else {}
+        return httpx.Response(200, json=pagina, headers=headers)
+
+
+@pytest.mark.asyncio
+async def test_sigue_el_cursor_del_servicio():
+    servicio = FakeProveedoresConCursor(total=5)
+    cliente = _cliente(servicio)
+
+    nombres = await cliente.get_nombres()
+
+    assert nombres == ["Proveedor A", "Proveedor B", "Proveedor C", "Proveedor D", "Proveedor E"]
+    assert servicio.llamadas == 3
+    await cliente.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_no_llama_al_servicio():
+    servicio = FakeProveedores()
+    cliente = _cliente(servicio)
+
+    await cliente.get_nombres()
+    llamadas = servicio.llamadas
+    await cliente.get_nombres()
+
+    assert servicio.llamadas == llamadas
+    await cliente.close()
+
+
+@pytest.mark.asyncio
+async def test_peticiones_concurrentes_comparten_un_refresco():
+    servicio = FakeProveedores(total=1)
+    cliente = _cliente(servicio)
+
+    resultados = await asyncio.gather(*(cliente.get_nombres() for _ in range(10)))
+
+    assert all(r == ["Proveedor E"] for r in resultados)
+    assert servicio.llamadas == 1
+    await cliente.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    servicio = FakeProveedores(total=1)
+    cliente = _cliente(servicio, ttl=0, stale_ttl=600)
+
+    assert await cliente.get_nombres() == ["Proveedor E"]
+    servicio.proveedores = [{"id": 9, "nombre": "Proveedor Z"}]
+
+    # Responde la copia vieja y refresca en segundo plano
+    assert await cliente.get_nombres() == ["Proveedor E"]
+    await cliente._refresco
+    assert cliente._snapshot == ["Proveedor Z"]
+    await cliente.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_sirve_ultima_lista_buena():
+    servicio = FakeProveedores(total=1)
+    cliente = _cliente(servicio, ttl=0, stale_ttl=0)
+    assert await cliente.get_nombres() == ["Proveedor E"]
+
+    servicio.caido = True
+    assert await cliente.get_nombres() == ["Proveedor E"]
+    assert await cliente.get_nombres() == ["Proveedor E"]
+    assert cliente.circuito_abierto()
+
+    llamadas = servicio.llamadas
+    assert await cliente.get_nombres() == ["Proveedor E"]
+    assert servicio.llamadas == llamadas
+    await cliente.close()
+
+
+@pytest.mark.asyncio
+async def test_sin_lista_previa_responde_503():
+    servicio = FakeProveedores()
+    servicio.caido = True
+    cliente = _cliente(servicio)
+
+    with pytest.raises(HTTPException) as exc:
+        await cliente.get_nombres()
+    assert exc.value.status_code == 503
+    await cliente.close()
@@ -1,12 +1,13 @@
-from fastapi import UploadFile, File,APIRouter, Depends, HTTPException
+from fastapi import UploadFile, File,APIRouter, Depends, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from ..services import crud
 from ..models.proveedor import ProveedorBase, ProveedorCreate, ProveedorUpdate, ProveedorOut
 from ..models.database import get_db
 from ..utils.auth import get_current_user
+from ..utils import pagination
 
 from ..services import crud
 from ..models.database import get_db
@@ -16,8 +17,12 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[ProveedorOut])
-def get_proveedores(skip: int = 0, limit: int = 100, db: Session = Depends(get_db) ):
-    return  crud.get_proveedores(db, skip=skip, limit=limit)
+def get_proveedores(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                    cursor: Optional[str] = None, count: bool = False, db: Session = Depends(get_db) ):
+    proveedores = crud.get_proveedores(db, skip=skip, limit=limit, cursor=cursor)
+    pagination.agregar_encabezados(request, response, proveedores, limit,
+                                   crud.contar_proveedores(db) if count else None)
+    return proveedores
 
 
 @router.post("/", response_model=ProveedorOut, status_code=201)
@@ -32,7 +32,8 @@ from app.models.database import Base, engine
 from config.config import DATABASE_URL, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from sqlalchemy.orm import Session
 from app.models import models
-from typing import List, Optional
+from app.utils import pagination
+from typing import List, Optional, Tuple
 from datetime import datetime
 import pandas as pd
 
@@ -80,16 +81,20 @@ def get_proveedor(db: Session, proveedor_id: int) -> Optional[models.Proveedor]:
 
 
 
-def get_proveedores(db: Session, skip: int = 0, limit: int = 100) -> List[models.Proveedor]:
+def get_proveedores(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[models.Proveedor]:
     """
     /**
-     * @brief Obtiene la lista de proveedores.
+     * @brief Obtiene una página de proveedores ordenada por id.
      * @param db Sesión de base de datos.
-     * @param skipy limit para paginacion.
-     * @return Proveedores encontrados o None si no existe.
+     * @param skipy limit para paginacion; cursor (X-Next-Cursor) para paginación por keyset.
+     * @return Proveedores de la página.
      */
     """
-    return db.query(models.Proveedor).offset(skip).limit(limit).all()
+    return pagination.paginar(db.query(models.Proveedor), models.Proveedor.id, skip, limit, cursor).all()
+
+
+def contar_proveedores(db: Session) -> Tuple[int, bool]:
+    return pagination.contar(db.query(models.Proveedor))
 
 
 from typing import List
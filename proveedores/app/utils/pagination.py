@@ -0,0 +1,175 @@
+"""
+/**
+ * @file pagination.py
+ * @brief Paginación por keyset sobre el id con cursores opacos y conteos cacheados.
+ *
+ * Los listados se ordenan por id y, cuando el cliente envía `cursor`, se filtran con
+ * `id > último id` en lugar de OFFSET, de modo que el costo de una página no depende de su
+ * profundidad. `skip` se mantiene para los clientes existentes. Un listado ordenado por otra
+ * columna usa el par (columna, id) como llave: `(columna, id) > (último valor, último id)`.
+ *
+ * Todos los servicios responden igual: el cuerpo sigue siendo la lista de elementos y la
+ * paginación viaja en encabezados:
+ * - X-Next-Cursor: cursor de la página siguiente (ausente en la última página).
+ * - Link: la misma URL con `cursor`, rel="next".
+ * - X-Total-Count / X-Total-Count-Estimated: solo con `count=true`.
+ *
+ * El conteo se guarda PAGINATION_COUNT_TTL segundos por consulta. En PostgreSQL, si el
+ * estimado del planificador supera PAGINATION_EXACT_COUNT_MAX filas se devuelve ese estimado
+ * en lugar de un COUNT(*) completo.
+ *
+ * <p><b>Autor:</b> Equipo de Desarrollo Grupo 1</p>
+ * <p><b>Versión:</b> 1.0</p>
+ */
+"""
+import base64
+import binascii
+import json
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import Query
+
+from config.config import PAGINATION_COUNT_TTL, PAGINATION_EXACT_COUNT_MAX
+
+EXPOSE_HEADERS = ["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimated", "Link"]
+
+_MAX_CONTEOS = 1024
+_conteos: Dict[str, Tuple[float, int, bool]] = {}
+_lock = threading.Lock()
+
+
+def encode_cursor(ultimo_id: Any) -> str:
+    """
+    /**
+     * @brief Codifica el id del último elemento de una página como cursor opaco.
+     */
+    """
+    crudo = json.dumps({"id": ultimo_id}, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    """
+    /**
+     * @brief Recupera el id guardado en un cursor.
+     * @throws HTTPException 400 si el cursor no fue generado por encode_cursor.
+     */
+    """
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(crudo)["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _valor_de(columna, valor: Any) -> Any:
+    """Convierte un valor leído del cursor (JSON) al tipo de la columna."""
+    try:
+        if columna.type.python_type is date and isinstance(valor, str):
+            return date.fromisoformat(valor[:10])
+    except NotImplementedError:
+        pass
+    return valor
+
+
+def paginar(query: Query, columna, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+            orden=None, descendente: bool = False) -> Query:
+    """
+    /**
+     * @brief Ordena por `columna` y aplica el cursor (keyset) o, sin cursor, el OFFSET heredado.
+     * @param query Consulta base con los filtros del listado.
+     * @param columna Columna única y creciente (la llave primaria).
+     * @param cursor Cursor devuelto en X-Next-Cursor; si viene, `skip` se ignora.
+     * @param orden Columna NOT NULL por la que se ordena antes del id (None = solo id).
+     * @param descendente Invierte el orden de (orden, id).
+     */
+    """
+    llave = [orden, columna] if orden is not None else [columna]
+    query = query.order_by(*[c.desc() if descendente else c.asc() for c in llave])
+    if not cursor:
+        return query.offset(skip).limit(limit)
+
+    valor = decode_cursor(cursor)
+    if orden is None:
+        condicion = columna < valor if descendente else columna > valor
+    else:
+        if not isinstance(valor, list) or len(valor) != 2:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        par, ultimo = tuple_(orden, columna), tuple_(_valor_de(orden, valor[0]), valor[1])
+        condicion = par < ultimo if descendente else par > ultimo
+    return query.filter(condicion).limit(limit)
+
+
+def _estimado_postgres(query: Query, sql: str) -> int:
+    plan = query.session.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def contar(query: Query) -> Tuple[int, bool]:
+    """
+    /**
+     * @brief Cuenta las filas de la consulta base usando la caché de conteos.
+     * @return (total, estimado): estimado es True si el total viene del planificador.
+     */
+    """
+    query = query.order_by(None)
+    dialecto = query.session.get_bind().dialect
+    sql = str(query.statement.compile(dialect=dialecto, compile_kwargs={"literal_binds": True}))
+    ahora = time.monotonic()
+
+    with _lock:
+        guardado = _conteos.get(sql)
+    if guardado and guardado[0] > ahora:
+        return guardado[1], guardado[2]
+
+    total, estimado = None, False
+    if dialecto.name == "postgresql":
+        aproximado = _estimado_postgres(query, sql)
+        if aproximado > PAGINATION_EXACT_COUNT_MAX:
+            total, estimado = aproximado, True
+    if total is None:
+        total = query.count()
+
+    with _lock:
+        if len(_conteos) >= _MAX_CONTEOS:
+            _conteos.clear()
+        _conteos[sql] = (ahora + PAGINATION_COUNT_TTL, total, estimado)
+    return total, estimado
+
+
+def limpiar_conteos() -> None:
+    with _lock:
+        _conteos.clear()
+
+
+def agregar_encabezados(request: Request, response: Response, items: Sequence[Any], limit: int,
+                        conteo: Optional[Tuple[int, bool]] = None, campo: str = "id",
+                        orden: Optional[str] = None) -> None:
+    """
+    /**
+     * @brief Escribe X-Next-Cursor, Link y, si se pidió, X-Total-Count en la respuesta.
+     * @param items Página devuelta; sus elementos pueden ser modelos ORM o diccionarios.
+     * @param conteo Resultado de contar() o None si el cliente no pidió el total.
+     * @param campo Atributo que contiene la llave usada por paginar().
+     * @param orden Atributo de ordenamiento pasado a paginar(), si lo hubo.
+     */
+    """
+    if conteo is not None:
+        response.headers["X-Total-Count"] = str(conteo[0])
+        response.headers["X-Total-Count-Estimated"] = "true" if conteo[1] else "false"
+
+    if limit <= 0 or len(items) < limit:
+        return
+    ultimo = items[-1]
+    leer = ultimo.get if isinstance(ultimo, dict) else lambda atributo: getattr(ultimo, atributo)
+    cursor = encode_cursor([leer(orden), leer(campo)] if orden else leer(campo))
+    siguiente = request.url.remove_query_params("skip").include_query_params(cursor=cursor)
+    response.headers["X-Next-Cursor"] = cursor
+    response.headers["Link"] = f'<{siguiente}>; rel="next"'
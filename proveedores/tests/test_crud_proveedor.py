@@ -8,6 +8,7 @@ from app.models.models import Proveedor  # 👈 Importa el modelo explícitament
 from app.services import crud
 from app.models import models
 from app.models.proveedor import ProveedorUpdate
+from app.utils import pagination
 
 
 # ---------------------------------------------------------------------
@@ -89,6 +90,20 @@ def test_get_proveedores(test_db, proveedor_data):
     assert all(isinstance(p, models.Proveedor) for p in result)
 
 
+def test_get_proveedores_por_cursor(test_db, proveedor_data):
+    """El cursor continúa después del último id de la página anterior."""
+    for _ in range(3):
+        crud.create_proveedor(test_db, models.Proveedor(**proveedor_data))
+    primera = crud.get_proveedores(test_db, limit=2)
+    segunda = crud.get_proveedores(test_db, limit=2, cursor=pagination.encode_cursor(primera[-1].id))
+
+    assert [p.id for p in primera] == sorted(p.id for p in primera)
+    assert segunda[0].id > primera[-1].id
+    total, estimado = crud.contar_proveedores(test_db)
+    assert not estimado
+    assert total == test_db.query(models.Proveedor).count()
+
+
 def test_update_proveedor(test_db, proveedor_data):
     creado = crud.create_proveedor(test_db, models.Proveedor(**proveedor_data))
 
@@ -5,6 +5,8 @@ from fastapi.responses import JSONResponse
 
 from app.services.crud import init_db
 from app.routes import routes
+from app.utils import pagination
+from app.utils.jwks import jwks_client
 from app.routes.routes import router
 
 app = FastAPI( title="API de Rutas",
@@ -18,6 +20,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=pagination.EXPOSE_HEADERS,
 )
 
 
@@ -32,6 +35,12 @@ async def on_startup():
     except Exception as e:
         print(f"Error al inicializar BD: {str(e)}")
         raise e
+    # Claves públicas del servicio de seguridad para verificar RS256 (solo con JWKS_URL)
+    jwks_client.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    jwks_client.stop()
 
 # Handler global para 422
 @app.exception_handler(RequestValidationError)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.services import crud
 from app.models.databases import get_db
+from app.utils import pagination
 from app.models.schemas_rutas import (
     PedidoCreate, PedidoUpdate, PedidoOut,
     PuntoEntregaCreate, PuntoEntregaUpdate, PuntoEntregaOut,
@@ -15,8 +16,11 @@ router = APIRouter()
 # 📦 PEDIDOS
 # ===============================================================
 @router.get("/pedidos", response_model=List[PedidoOut])
-def get_pedidos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_pedidos(db, skip=skip, limit=limit)
+def get_pedidos(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                cursor: Optional[str] = None, count: bool = False, db: Session = Depends(get_db)):
+    pedidos = crud.get_pedidos(db, skip=skip, limit=limit, cursor=cursor)
+    pagination.agregar_encabezados(request, response, pedidos, limit, crud.contar_pedidos(db) if count else None)
+    return pedidos
 
 
 @router.post("/pedidos", response_model=PedidoOut, status_code=201)
@@ -53,8 +57,12 @@ def delete_pedido(pedido_id: int, db: Session = Depends(get_db)):
 # 🚚 PUNTOS DE ENTREGA
 # ===============================================================
 @router.get("/puntos-entrega", response_model=List[PuntoEntregaOut])
-def get_puntos_entrega(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_puntos_entrega(db, skip=skip, limit=limit)
+def get_puntos_entrega(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                       cursor: Optional[str] = None, count: bool = False, db: Session = Depends(get_db)):
+    puntos = crud.get_puntos_entrega(db, skip=skip, limit=limit, cursor=cursor)
+    pagination.agregar_encabezados(request, response, puntos, limit,
+                                   crud.contar_puntos_entrega(db) if count else None)
+    return puntos
 
 
 @router.post("/puntos-entrega", response_model=PuntoEntregaOut, status_code=201)
@@ -91,8 +99,12 @@ def delete_punto_entrega(punto_id: int, db: Session = Depends(get_db)):
 # 🚛 RUTAS DE ENTREGA
 # ===============================================================
 @router.get("/rutas-entrega", response_model=List[RutaEntregaOut])
-def get_rutas_entrega(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_rutas_entrega(db, skip=skip, limit=limit)
+def get_rutas_entrega(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                      cursor: Optional[str] = None, count: bool = False, db: Session = Depends(get_db)):
+    rutas = crud.get_rutas_entrega(db, skip=skip, limit=limit, cursor=cursor)
+    pagination.agregar_encabezados(request, response, rutas, limit,
+                                   crud.contar_rutas_entrega(db) if count else None)
+    return rutas
 
 
 @router.post("/rutas-entrega", response_model=RutaEntregaOut, status_code=201)
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from app.models import models
+from app.utils import pagination
 from sqlalchemy import create_engine
 from config.config import DATABASE_URL, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from sqlalchemy.orm import sessionmaker, Session
@@ -54,8 +55,12 @@ def get_pedido(db: Session, pedido_id: int) -> Optional[models.Pedido]:
     return db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
 
 
-def get_pedidos(db: Session, skip: int = 0, limit: int = 100) -> List[models.Pedido]:
-    return db.query(models.Pedido).offset(skip).limit(limit).all()
+def get_pedidos(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[models.Pedido]:
+    return pagination.paginar(db.query(models.Pedido), models.Pedido.id, skip, limit, cursor).all()
+
+
+def contar_pedidos(db: Session) -> Tuple[int, bool]:
+    return pagination.contar(db.query(models.Pedido))
 
 
 def create_pedido(db: Session, pedido) -> models.Pedido:
@@ -101,8 +106,13 @@ def get_punto_entrega(db: Session, punto_id: int) -> Optional[models.PuntoEntreg
     return db.query(models.PuntoEntrega).filter(models.PuntoEntrega.id == punto_id).first()
 
 
-def get_puntos_entrega(db: Session, skip: int = 0, limit: int = 100) -> List[models.PuntoEntrega]:
-    return db.query(models.PuntoEntrega).offset(skip).limit(limit).all()
+def get_puntos_entrega(db: Session, skip: int = 0, limit: int = 100,
+                       cursor: Optional[str] = None) -> List[models.PuntoEntrega]:
+    return pagination.paginar(db.query(models.PuntoEntrega), models.PuntoEntrega.id, skip, limit, cursor).all()
+
+
+def contar_puntos_entrega(db: Session) -> Tuple[int, bool]:
+    return pagination.contar(db.query(models.PuntoEntrega))
 
 
 def create_punto_entrega(db: Session, punto) -> models.PuntoEntrega:
@@ -142,8 +152,13 @@ def get_ruta_entrega(db: Session, ruta_id: int) -> Optional[models.RutaEntrega]:
     return db.query(models.RutaEntrega).filter(models.RutaEntrega.id == ruta_id).first()
 
 
-def get_rutas_entrega(db: Session, skip: int = 0, limit: int = 100) -> List[models.RutaEntrega]:
-    return db.query(models.RutaEntrega).offset(skip).limit(limit).all()
+def get_rutas_entrega(db: Session, skip: int = 0, limit: int = 100,
+                      cursor: Optional[str] = None) -> List[models.RutaEntrega]:
+    return pagination.paginar(db.query(models.RutaEntrega), models.RutaEntrega.id, skip, limit, cursor).all()
+
+
+def contar_rutas_entrega(db: Session) -> Tuple[int, bool]:
+    return pagination.contar(db.query(models.RutaEntrega))
 
 
 def create_ruta_entrega(db: Session, ruta) -> models.RutaEntrega:
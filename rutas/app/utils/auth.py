@@ -4,6 +4,7 @@ from passlib.context  import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from config.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.utils.jwks import ALGORITHM_RS256, jwks_client
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -29,7 +30,12 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # RS256 se verifica con las claves del JWKS (sin red por request); HS256 con SECRET_KEY
+        # mientras dure la migración. Cada camino acepta un único algoritmo.
+        if jwks_client.enabled and jwt.get_unverified_header(token).get("alg") == ALGORITHM_RS256:
+            payload = jwks_client.verify(token)
+        else:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -5,6 +5,8 @@ from fastapi.responses import JSONResponse
 
 from app.services.user_service import init_db
 from app.routes import user_routes
+from app.utils import pagination
+from app.utils.jwks import jwks_client
 
 app = FastAPI()
 
@@ -16,6 +18,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=pagination.EXPOSE_HEADERS,
 )
 
 @app.on_event("startup")
@@ -29,6 +32,12 @@ async def on_startup():
     except Exception as e:
         print(f"❌ Error al inicializar BD: {str(e)}")
         raise e
+    # Claves públicas del servicio de seguridad para verificar RS256 (solo con JWKS_URL)
+    jwks_client.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    jwks_client.stop()
 
 # Handler global para 422
 @app.exception_handler(RequestValidationError)
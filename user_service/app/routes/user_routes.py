@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.models.user import PlanVentaUpdate, User, UserCreate, UserUpdate, ClientCreate, PutClient
 from app.models.db_models import DBUser, PlanVenta, PlanVendedor, DBClient
 from app.models.database import get_db
-from typing import List
+from app.utils import pagination
+from typing import List, Optional
 from app.services.user_service import (
     create_user, 
     get_user, 
@@ -19,6 +20,7 @@ from app.services.user_service import (
     update_vendedor,
     delete_vendedor,
     read_vendedores,
+    contar_vendedores,
     send_forgot_password,
     crear_plan_venta,
     listar_planes_venta,
@@ -27,6 +29,7 @@ from app.services.user_service import (
     eliminar_plan_de_venta,
     create_client,
     get_all_clients,
+    contar_clientes,
     get_vendedor_clients,
     get_client,
 )
@@ -142,8 +145,12 @@ def asignar_cliente_a_vendedor(user_id: int, client: PutClient, db: Session = De
 
 # Obtener los usuarios vendedores (protegido)
 @router.get("/vendedores",response_model=List[User])
-def read_users_vendedores( db: Session = Depends(get_db),skip: int = 0, limit: int = 100, current_user: DBUser = Depends(get_current_user)):
-    return read_vendedores( db,skip,limit,current_user)
+def read_users_vendedores(request: Request, response: Response, db: Session = Depends(get_db),skip: int = 0, limit: int = 100,
+                          cursor: Optional[str] = None, count: bool = False, current_user: DBUser = Depends(get_current_user)):
+    vendedores = read_vendedores( db,skip,limit,current_user, cursor)
+    pagination.agregar_encabezados(request, response, vendedores, limit,
+                                   contar_vendedores(db) if count else None, campo="usuario_id")
+    return vendedores
 
 
 # Actualizar usuario vendedor por ID (protegido)
@@ -230,8 +237,11 @@ def create_client_route(user: ClientCreate, db: Session = Depends(get_db)):
     return create_client(user, db)
 
 @router.get("/clients")
-def get_clients_route(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
-    return get_all_clients(db, skip, limit)
+def get_clients_route(request: Request, response: Response, db: Session = Depends(get_db), skip: int = 0, limit: int = 100,
+                      cursor: Optional[str] = None, count: bool = False):
+    clients = get_all_clients(db, skip, limit, cursor)
+    pagination.agregar_encabezados(request, response, clients, limit, contar_clientes(db) if count else None)
+    return clients
 
 
 @router.get("/clients-small/{vendedor_id}")
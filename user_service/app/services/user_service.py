@@ -5,7 +5,7 @@ from email.mime.multipart import MIMEMultipart
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException, Depends
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pydantic import ValidationError
 from passlib.context import CryptContext
 from jose import JWTError, jwt
@@ -14,6 +14,7 @@ from fastapi.security import OAuth2PasswordBearer
 from app.models.db_models import Base, DBUser, PlanVendedor, PlanVenta, DBClient
 from app.models.database import engine, get_db
 from app.models.user import UserCreate, UserUpdate, ClientCreate
+from app.utils import pagination
 from config.config import DATABASE_URL, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
 
@@ -267,15 +268,12 @@ def obtener_plan_venta_por_id(plan_id: int, db: Session, current_user: DBUser):
 
 
 
-def read_vendedores(db: Session, skip: int, limit: int, current_user: DBUser):
+def read_vendedores(db: Session, skip: int, limit: int, current_user: DBUser, cursor: Optional[str] = None):
     try:
-        vendedores = (
-            db.query(DBUser)
-            .filter(DBUser.rol == "vendedor")  
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        vendedores = pagination.paginar(
+            db.query(DBUser).filter(DBUser.rol == "vendedor"),
+            DBUser.usuario_id, skip, limit, cursor
+        ).all()
         return vendedores
 
     except HTTPException:
@@ -284,6 +282,13 @@ def read_vendedores(db: Session, skip: int, limit: int, current_user: DBUser):
         raise HTTPException(status_code=500, detail=f"Error al obtener los vendedores: {str(e)}")
 
 
+def contar_vendedores(db: Session) -> Tuple[int, bool]:
+    try:
+        return pagination.contar(db.query(DBUser).filter(DBUser.rol == "vendedor"))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Error al contar los vendedores: {str(e)}")
+
+
 def read_vendedor(user_id: int, db: Session, current_user: DBUser):
     try:
         user = db.query(DBUser).filter(DBUser.usuario_id == user_id).first()
@@ -537,9 +542,9 @@ def create_client(user: ClientCreate, db: Session):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear usuario cliente: {str(e)}")
 
-def get_all_clients(db: Session, skip: int, limit: int):
+def get_all_clients(db: Session, skip: int, limit: int, cursor: Optional[str] = None):
     try:
-        clients: list[DBClient] = db.query(DBClient).offset(skip).limit(limit).all()
+        clients: list[DBClient] = pagination.paginar(db.query(DBClient), DBClient.id, skip, limit, cursor).all()
         response = [
             {
                 "id": client.id,
@@ -559,6 +564,13 @@ def get_all_clients(db: Session, skip: int, limit: int):
         raise HTTPException(status_code=500, detail=f"Error al obtener los clientes: {str(e)}")
 
 
+def contar_clientes(db: Session) -> Tuple[int, bool]:
+    try:
+        return pagination.contar(db.query(DBClient))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Error al contar los clientes: {str(e)}")
+
+
 def get_vendedor_clients(vendedor_id: int, db: Session, skip: int, limit: int):
     try:
         clients: list[DBClient] = db.query(DBClient).filter(DBClient.vendedor_id == vendedor_id).offset(skip).limit(limit).all()
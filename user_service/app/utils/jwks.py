@@ -0,0 +1,191 @@
+"""
+/**
+ * @file jwks.py
+ * @brief Verificación local de tokens RS256 con las claves públicas del servicio de seguridad.
+ *
+ * Las claves se descargan de JWKS_URL (/.well-known/jwks.json) y se guardan ya construidas por
+ * kid, así que verificar un token no hace ninguna llamada de red ni vuelve a parsear la clave.
+ * Un hilo en segundo plano revalida el JWKS cada JWKS_REFRESH_SECONDS, o antes si el servidor
+ * anuncia un Cache-Control max-age menor, enviando If-None-Match: mientras no haya rotación
+ * la respuesta es un 304 sin cuerpo. Una rotación llega así a todos los servicios dentro de un
+ * intervalo de refresco, sin reinicios.
+ *
+ * Un token con un kid desconocido (firmado con la clave recién rotada) fuerza una descarga
+ * inmediata, limitada a una cada JWKS_MIN_REFRESH_SECONDS para que tokens con kids inventados
+ * no se conviertan en una llamada por request. Si el servicio de seguridad no responde se
+ * siguen usando las últimas claves válidas.
+ *
+ * <p><b>Autor:</b> Equipo de Desarrollo Grupo 1</p>
+ * <p><b>Versión:</b> 1.0</p>
+ */
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+from config.config import (
+    JWKS_URL, JWKS_REFRESH_SECONDS, JWKS_MIN_REFRESH_SECONDS, JWKS_TIMEOUT,
+    JWT_ISSUER, JWT_AUDIENCE, JWT_LEEWAY_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import Counter, Gauge
+    PROMETHEUS_AVAILABLE = True
+
+    jwks_refresh_total = Counter(
+        "jwks_refresh_total",
+        "Descargas del JWKS del servicio de seguridad",
+        ["resultado"],  # ok | no_modificado | error
+    )
+    jwks_keys = Gauge("jwks_keys", "Claves públicas RS256 cargadas")
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+ALGORITHM_RS256 = "RS256"
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def _intervalo(cache_control: Optional[str], maximo: float, minimo: float) -> float:
+    """Segundos hasta la próxima revalidación: el max-age del servidor, acotado por la configuración."""
+    if not cache_control:
+        return maximo
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return minimo
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return maximo
+    return min(max(float(match.group(1)), minimo), maximo)
+
+
+class JWKSClient:
+    """Caché de claves públicas por kid con revalidación condicional (ETag) en segundo plano."""
+
+    def __init__(self, url: str = JWKS_URL, refresh_seconds: float = JWKS_REFRESH_SECONDS,
+                 min_refresh_seconds: float = JWKS_MIN_REFRESH_SECONDS, timeout: float = JWKS_TIMEOUT,
+                 issuer: str = JWT_ISSUER, audience: str = JWT_AUDIENCE, leeway: int = JWT_LEEWAY_SECONDS,
+                 transport: Optional[httpx.BaseTransport] = None):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.timeout = timeout
+        self.issuer = issuer
+        self.audience = audience
+        self.leeway = leeway
+        self._transport = transport
+        self._http: Optional[httpx.Client] = None
+        self._keys: Dict[str, Key] = {}
+        self._etag: Optional[str] = None
+        self._intervalo = refresh_seconds
+        self._ultima_descarga = float("-inf")
+        self._lock = threading.Lock()  # una descarga a la vez
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    @property
+    def kids(self):
+        return list(self._keys)
+
+    def _client(self) -> httpx.Client:
+        if self._http is None:
+            self._http = httpx.Client(timeout=self.timeout, transport=self._transport)
+        return self._http
+
+    # Descarga
+    def refresh(self) -> bool:
+        """Revalida el JWKS. True si las claves quedaron al día (200 o 304)."""
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> bool:
+        self._ultima_descarga = time.monotonic()
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        try:
+            response = self._client().get(self.url, headers=headers)
+            if response.status_code == 304:
+                resultado = "no_modificado"
+            else:
+                response.raise_for_status()
+                keys = {}
+                for data in response.json().get("keys", []):
+                    if data.get("kty") != "RSA" or not data.get("kid") or data.get("use", "sig") != "sig":
+                        continue
+                    keys[data["kid"]] = jwk.construct(data, algorithm=ALGORITHM_RS256)
+                # Reemplazo atómico: los kids retirados dejan de validar en el mismo paso
+                self._keys = keys
+                self._etag = response.headers.get("ETag")
+                resultado = "ok"
+                logger.info(f"JWKS actualizado: {sorted(keys)}")
+            self._intervalo = _intervalo(response.headers.get("Cache-Control"),
+                                         self.refresh_seconds, self.min_refresh_seconds)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el JWKS desde {self.url}: {e}. Se mantienen las claves actuales")
+            self._contar("error")
+            return False
+        self._contar(resultado)
+        return True
+
+    def _contar(self, resultado: str) -> None:
+        if PROMETHEUS_AVAILABLE:
+            jwks_refresh_total.labels(resultado=resultado).inc()
+            jwks_keys.set(len(self._keys))
+
+    # Verificación
+    def get_key(self, kid: str) -> Optional[Key]:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._lock:
+            # Otro hilo pudo haber descargado mientras se esperaba el lock
+            if kid not in self._keys and time.monotonic() - self._ultima_descarga >= self.min_refresh_seconds:
+                self._refresh_locked()
+        return self._keys.get(kid)
+
+    def verify(self, token: str) -> dict:
+        """Verifica firma RS256, exp/nbf, iss y aud. Lanza JWTError si el token no es válido."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.get_key(kid) if kid else None
+        if key is None:
+            raise JWTError(f"Clave desconocida: {kid}")
+        return jwt.decode(
+            token, key, algorithms=[ALGORITHM_RS256],
+            audience=self.audience or None, issuer=self.issuer or None,
+            options={"verify_aud": bool(self.audience), "leeway": self.leeway},
+        )
+
+    # Refresco en segundo plano
+    def start(self) -> None:
+        """Arranca el hilo de revalidación (idempotente; no hace nada sin JWKS_URL)."""
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            ok = self.refresh()
+            self._stop.wait(self._intervalo if ok else self.min_refresh_seconds)
+
+
+# Instancia global (por proceso)
+jwks_client = JWKSClient()
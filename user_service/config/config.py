@@ -10,3 +10,17 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 # Configuración de JWT
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+
+# Verificación RS256 con las claves públicas del servicio de seguridad (app/utils/jwks.py).
+# Sin JWKS_URL solo se aceptan tokens HS256 firmados con SECRET_KEY
+JWKS_URL = os.getenv("JWKS_URL", "")
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "300"))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "10"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "3"))
+JWT_ISSUER = os.getenv("JWT_ISSUER", "experimento-seguridad")
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "api-users")
+JWT_LEEWAY_SECONDS = int(os.getenv("JWT_LEEWAY_SECONDS", "60"))
+
+# Paginación de listados (app/utils/pagination.py)
+PAGINATION_COUNT_TTL = float(os.getenv("PAGINATION_COUNT_TTL", "30"))
+PAGINATION_EXACT_COUNT_MAX = int(os.getenv("PAGINATION_EXACT_COUNT_MAX", "100000"))
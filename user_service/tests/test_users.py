@@ -414,6 +414,8 @@ def test_update_user_as_non_admin(test_db):
 def vendedor_test(test_db):
     test_db.query(DBUser).filter(DBUser.email == "pedro@test.com").delete()
     test_db.commit()
+    # SQLite reutiliza el id borrado; se descartan instancias viejas que sigan en la sesión
+    test_db.expunge_all()
 
     vendedor = DBUser(
         nombre_usuario="Pedro Perez",
@@ -550,4 +552,43 @@ def test_eliminar_plan_de_venta_success(test_db, plan_existente):
 def test_eliminar_plan_de_venta_not_found(test_db):
     with pytest.raises(HTTPException) as exc:
         eliminar_plan_de_venta(88888, test_db, None)
-    assert exc.value.status_code == 404
\ No newline at end of file
+    assert exc.value.status_code == 404
+
+# ----------------------------
+# Paginación con count=true (rutas)
+# ----------------------------
+def test_listados_con_count_agregan_total():
+    """GET /vendedores y GET /clients con count=true responden X-Total-Count"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy.pool import StaticPool
+    from app.main import app
+    from app.models.db_models import DBClient
+    from app.models.database import get_db as route_get_db
+    from app.utils import pagination
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    sesion.add_all([DBUser(nombre_usuario=f"V{i}", email=f"v{i}@test.com", contrasena="x", rol="vendedor")
+                    for i in range(3)])
+    sesion.add_all([DBClient(empresa="E", nombre_usuario=f"C{i}", email=f"c{i}@test.com", contrasena="x")
+                    for i in range(2)])
+    sesion.commit()
+
+    app.dependency_overrides[route_get_db] = lambda: sesion
+    app.dependency_overrides[get_current_user] = lambda: sesion.query(DBUser).first()
+    pagination.limpiar_conteos()
+    try:
+        cliente = TestClient(app)
+        response = cliente.get("/vendedores", params={"count": "true", "limit": 2})
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "3"
+        assert len(response.json()) == 2
+
+        response = cliente.get("/clients", params={"count": "true"})
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "2"
+    finally:
+        app.dependency_overrides.clear()
+        sesion.close()
+        Base.metadata.drop_all(bind=engine)